@@ -1,9 +1,9 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, abort, jsonify, request
 import threading
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 
-from host_main import HiveMindHostEnhanced
+# host_main (websockets, codecs) is imported on /api/start only, so serving the
+# dashboard page stays a cold start of Flask alone
 from hivemind.common.protocol import Protocol
 from werkzeug.utils import secure_filename
 import os
@@ -13,13 +13,20 @@ UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
+# /debug/profile shows the live process's stacks and thread names to whoever asks: off unless enabled
+app.config['PROFILE_ENDPOINT'] = os.environ.get('HIVEMIND_PROFILE_ENDPOINT') == '1'
 
 # _host_state holds: host, thread, loop
 _host_state = {"host": None, "thread": None, "loop": None}
-_host_state.update({"demo_event": None, "demo_future": None})
+# The demo tone's mixer source
+_DEMO_SOURCE = "demo"
+# One /debug/profile at a time
+_profile_lock = threading.Lock()
+# Fingerprinted, precompressed dashboard assets; built on the first page request
+_assets = {"pipeline": None, "lock": threading.Lock()}
 
 
-def _run_host(host: HiveMindHostEnhanced):
+def _run_host(host):
     # Run host.start() inside its own asyncio event loop on a dedicated thread.
     loop = asyncio.new_event_loop()
     _host_state["loop"] = loop
@@ -36,9 +43,54 @@ def _run_host(host: HiveMindHostEnhanced):
         _host_state["loop"] = None
 
 
+def _shed():
+    """503 for optional dashboard polling while the host sheds load (None otherwise)."""
+    host = _host_state.get("host")
+    if not host or not host.capacity.shedding:
+        return None
+    retry_after = host.capacity.retry_after_s
+    response = jsonify({"ok": False, "reason": "host busy", "retry_after": retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(int(retry_after))
+    return response
+
+
+def _asset_pipeline():
+    from hivemind.host.static_assets import AssetPipeline
+
+    with _assets["lock"]:
+        if _assets["pipeline"] is None:
+            _assets["pipeline"] = AssetPipeline(
+                app.static_folder, os.path.join(app.root_path, app.template_folder, 'index.html')).build()
+        return _assets["pipeline"]
+
+
+def _send_asset(asset, cache_control):
+    """The best precompressed body for this client, or 304 if its cached copy is current."""
+    encoding, body = asset.select(request.accept_encodings.quality)
+    response = app.response_class(body, mimetype=asset.mimetype)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = cache_control
+    response.set_etag(asset.etag(encoding))
+    return response.make_conditional(request)
+
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    # Revalidated on every load; with its CSS and JS inlined, that is the only request
+    return _send_asset(_asset_pipeline().page, 'no-cache')
+
+
+@app.route('/assets/<name>')
+def asset(name):
+    from hivemind.config import ASSET_MAX_AGE_S
+
+    found = _asset_pipeline().assets.get(name)
+    if found is None:
+        abort(404)
+    return _send_asset(found, f'public, max-age={ASSET_MAX_AGE_S}, immutable')
 
 
 @app.route('/api/status')
@@ -48,9 +100,51 @@ def status():
         "running": bool(host and host.running),
         "session_code": host.session_manager.session_code if host else None,
         "node_count": len(host.session_manager.nodes) if host else 0,
+        "capacity": host.capacity.get_state() if host else None,
+        "udp_sync": host.udp_sync.get_metrics() if host and host.udp_sync else None,
     })
 
 
+@app.route('/api/nodes')
+def nodes():
+    host = _host_state.get("host")
+    if not host:
+        return jsonify({"nodes": [], "channel_maps": []})
+    busy = _shed()
+    if busy is not None:
+        return busy
+
+    from hivemind.host.spatial import CHANNEL_MAPS
+
+    items = []
+    for device_id, info in list(host.session_manager.nodes.items()):
+        items.append({
+            "device_id": device_id,
+            "name": info.get("name"),
+            "tier": host.bitrate_controller.tier_for(device_id),
+            **host.spatial.get_node(device_id),
+        })
+    return jsonify({"nodes": items, "channel_maps": list(CHANNEL_MAPS)})
+
+
+@app.route('/api/nodes/<device_id>/spatial', methods=['POST'])
+def set_node_spatial(device_id):
+    host = _host_state.get("host")
+    if not host:
+        return jsonify({"ok": False, "reason": "host not running"}), 400
+
+    data = request.get_json() or {}
+    try:
+        placement = host.spatial.set_node(
+            device_id,
+            channel_map=data.get('channel_map', 'stereo'),
+            delay_ms=data.get('delay_ms', 0.0),
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"ok": False, "reason": str(e)}), 400
+    return jsonify({"ok": True, **placement})
+
+
 @app.route('/api/session/create', methods=['POST'])
 def create_session():
     host = _host_state.get("host")
@@ -61,6 +155,77 @@ def create_session():
     return jsonify({"ok": True, "session_code": code})
 
 
+@app.route('/api/timeline')
+def timeline():
+    host = _host_state.get("host")
+    if not host:
+        return jsonify({"events": [], "total": 0, "next": None})
+    busy = _shed()
+    if busy is not None:
+        return busy
+
+    after = request.args.get('after', type=int)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    return jsonify(host.session_manager.timeline.window(after_id=after, limit=limit))
+
+
+@app.route('/api/metrics')
+def metrics():
+    host = _host_state.get("host")
+    if not host:
+        return jsonify({"series": [], "resolutions": []})
+    return jsonify(host.metrics.describe())
+
+
+@app.route('/api/metrics/<name>')
+def metric_history(name):
+    """min/max/avg buckets of one series; `start`/`end` are epoch seconds, `step` a minimum bucket size."""
+    host = _host_state.get("host")
+    if not host:
+        return jsonify({"ok": False, "reason": "host not running"}), 400
+    busy = _shed()
+    if busy is not None:
+        return busy
+
+    try:
+        history = host.metrics.query(name, start=request.args.get('start', type=float),
+                                     end=request.args.get('end', type=float),
+                                     step=request.args.get('step', type=float))
+    except KeyError:
+        return jsonify({"ok": False, "reason": f"unknown series: {name}"}), 404
+    return jsonify(history)
+
+
+@app.route('/debug/profile')
+def debug_profile():
+    """Sample the running process for `seconds` and return collapsed stacks (or a JSON report).
+
+    Only served with `PROFILE_ENDPOINT` set (`HIVEMIND_PROFILE_ENDPOINT=1`).
+    Not shed under load: a profile of the overloaded host is the point.
+    """
+    if not app.config['PROFILE_ENDPOINT']:
+        abort(404)
+    from hivemind.config import PROFILE_HZ, PROFILE_MAX_SECONDS
+    from hivemind.host.profiler import SamplingProfiler
+
+    seconds = request.args.get('seconds', 5.0, type=float)
+    hz = request.args.get('hz', PROFILE_HZ, type=float)
+    if not 0 < seconds <= PROFILE_MAX_SECONDS or not 0 < hz <= 1000:
+        return jsonify({"ok": False, "reason": f"seconds must be in (0, {PROFILE_MAX_SECONDS}], hz in (0, 1000]"}), 400
+    if not _profile_lock.acquire(blocking=False):
+        return jsonify({"ok": False, "reason": "a profile is already running"}), 409
+    try:
+        thread = _host_state.get("thread")
+        profiler = SamplingProfiler(_host_state.get("loop"), thread.ident if thread else None, hz=hz)
+        profiler.profile(seconds)
+    finally:
+        _profile_lock.release()
+
+    if request.args.get('format') == 'json':
+        return jsonify({**profiler.report(), "stacks": dict(profiler.stacks.most_common())})
+    return app.response_class(profiler.collapsed(), mimetype='text/plain')
+
+
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
     from flask import send_from_directory
@@ -93,7 +258,7 @@ def schedule():
     if not host:
         return jsonify({"ok": False, "reason": "host not running"}), 400
 
-    host.session_manager.add_scheduled_track(track_url, start_at)
+    event = host.session_manager.add_scheduled_track(track_url, start_at)
 
     # Broadcast schedule to nodes
     msg = Protocol.create_schedule_message(track_url=track_url, start_at=start_at)
@@ -108,83 +273,51 @@ def schedule():
     except Exception:
         pass
 
-    return jsonify({"ok": True, "start_at": start_at})
+    return jsonify({"ok": True, "start_at": start_at, "id": event["id"]})
 
 
 @app.route('/api/demo/start', methods=['POST'])
 def demo_start():
     data = request.get_json() or {}
     duration = float(data.get('duration', 5.0))
-    chunk_ms = int(data.get('chunk_ms', 20))
 
     host = _host_state.get("host")
     loop = _host_state.get("loop")
     if not host or not loop:
         return jsonify({"ok": False, "reason": "host not running"}), 400
 
-    if _host_state.get('demo_future') is not None:
-        return jsonify({"ok": False, "reason": "demo already running"}), 400
+    async def _start_tone():
+        # A mixer source like any track, so it is sequenced, encoded per tier and sent with the stream
+        from hivemind.host.mixer import ToneSource
 
-    async def _demo_generator(host_app, duration_s, chunk_ms, stop_event: asyncio.Event):
-        sr = host_app.codec_manager.sample_rate
-        channels = host_app.codec_manager.channels
-        codec = host_app.codec_manager
-        import math, time
-        start = time.time()
-        freq = 440.0
-        while (time.time() - start) < duration_s and not stop_event.is_set():
-            frame_count = int(sr * (chunk_ms / 1000.0))
-            pcm = bytearray()
-            for n in range(frame_count):
-                t = n / sr
-                val = int(0.5 * 32767.0 * math.sin(2.0 * math.pi * freq * t))
-                pcm.extend(int(val).to_bytes(2, 'little', signed=True))
-
-            encoded, _ = codec.encode(bytes(pcm))
-            msg = Protocol.create_audio_chunk(play_at=time.time() + 0.2, sample_rate=sr, channels=channels, audio_data=encoded)
-            try:
-                await host_app.network_server.broadcast(msg)
-            except Exception:
-                pass
-            await asyncio.sleep(chunk_ms / 1000.0)
-
-    # create stop event on host loop
-    async def _make_event():
-        return asyncio.Event()
-
-    fut_event = asyncio.run_coroutine_threadsafe(_make_event(), loop)
-    stop_event = fut_event.result()
-
-    # schedule generator on host loop
-    future = asyncio.run_coroutine_threadsafe(_demo_generator(host, duration, chunk_ms, stop_event), loop)
-    _host_state['demo_event'] = stop_event
-    _host_state['demo_future'] = future
+        if host._mixer is not None and _DEMO_SOURCE in host._mixer.sources:
+            return False
+        mixer = host.mixer
+        at = host.play_source(ToneSource(_DEMO_SOURCE, sample_rate=mixer.sample_rate))
+        mixer.fade_out(_DEMO_SOURCE, at + int(duration * mixer.sample_rate), mixer.sample_rate // 100)
+        return True
 
+    if not asyncio.run_coroutine_threadsafe(_start_tone(), loop).result(timeout=2):
+        return jsonify({"ok": False, "reason": "demo already running"}), 400
     return jsonify({"ok": True})
 
 
 @app.route('/api/demo/stop', methods=['POST'])
 def demo_stop():
-    loop = _host_state.get('loop')
-    stop_event = _host_state.get('demo_event')
-    future = _host_state.get('demo_future')
-    if not loop or not stop_event or not future:
+    host = _host_state.get("host")
+    loop = _host_state.get("loop")
+    if not host or not loop:
         return jsonify({"ok": False, "reason": "demo not running"}), 400
 
-    try:
-        # set the event flag on host loop thread-safely
-        loop.call_soon_threadsafe(stop_event.set)
-        # optionally wait for future to finish
-        try:
-            future.result(timeout=2)
-        except Exception:
-            pass
-    except Exception:
-        pass
+    async def _stop_tone():
+        mixer = host._mixer
+        if mixer is None or _DEMO_SOURCE not in mixer.sources:
+            return False
+        mixer.fade_out(_DEMO_SOURCE, mixer.position, mixer.sample_rate // 100)
+        return True
 
-    # clear stored refs
-    _host_state['demo_event'] = None
-    _host_state['demo_future'] = None
+    if not asyncio.run_coroutine_threadsafe(_stop_tone(), loop).result(timeout=2):
+        return jsonify({"ok": False, "reason": "demo not running"}), 400
     return jsonify({"ok": True})
 
 
@@ -193,6 +326,8 @@ def start():
     if _host_state.get("host") and _host_state["host"].running:
         return jsonify({"started": False, "reason": "already running"}), 400
 
+    from host_main import HiveMindHostEnhanced
+
     host = HiveMindHostEnhanced(enable_web_dashboard=False)
     _host_state["host"] = host
     t = threading.Thread(target=_run_host, args=(host,), daemon=True)
@@ -1,3 +1,34 @@
-"""Minimal hivemind package stubs for local development and testing."""
+"""Minimal hivemind package stubs for local development and testing.
+
+Heavy subsystems (network server, codecs, node client) are imported lazily on
+first attribute access, so `import hivemind` stays cheap for processes that
+only need part of the package, such as the dashboard.
+"""
+
+import importlib
 
 __version__ = "0.0.0-stub"
+
+_LAZY_ATTRS = {
+    "HiveMindClient": "hivemind.node.client",
+    "NetworkServer": "hivemind.host.network_server",
+    "SessionManager": "hivemind.host.session_manager",
+    "AudioCodecManager": "hivemind.common.audio_codec",
+    "Protocol": "hivemind.common.protocol",
+    "MessageType": "hivemind.common.protocol",
+}
+
+__all__ = ["__version__", *_LAZY_ATTRS]
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
@@ -1,13 +1,20 @@
 from typing import Optional
 
+# Largest Opus frame (120 ms at 48 kHz); decoding with this bound accepts any frame size
+MAX_OPUS_FRAME_SAMPLES = 5760
+
 
 class AudioCodecManager:
-    def __init__(self, use_compression: bool = True, sample_rate: int = 48000, channels: int = 2):
+    def __init__(self, use_compression: bool = True, sample_rate: int = 48000, channels: int = 2,
+                 bitrate: Optional[int] = None, frame_ms: int = 20):
         self.use_compression = use_compression
         self.sample_rate = sample_rate
         self.channels = channels
+        self.bitrate = bitrate
+        self.frame_ms = frame_ms
         self._encoder = None
         self._decoder = None
+        self._decode_into = None
 
         if use_compression:
             try:
@@ -15,11 +22,24 @@ class AudioCodecManager:
 
                 self._encoder = Encoder(self.sample_rate, self.channels, 'audio')
                 self._decoder = Decoder(self.sample_rate, self.channels)
+                if bitrate:
+                    self._encoder.bitrate = bitrate
+                self._decode_into = _libopus_decode_into(self._decoder, self.channels)
             except Exception:
                 # Fallback to no compression
                 self._encoder = None
                 self._decoder = None
 
+    @property
+    def frame_samples(self) -> int:
+        """Samples per channel in one encoded frame."""
+        return int(self.sample_rate * self.frame_ms / 1000)
+
+    @property
+    def frame_bytes(self) -> int:
+        """Bytes of 16-bit PCM in one encoded frame."""
+        return self.frame_samples * self.channels * 2
+
     def encode(self, pcm_frames: Optional[bytes]):
         """Encode PCM frames (bytes) into Opus if available, else return raw bytes."""
         if not pcm_frames:
@@ -46,9 +66,7 @@ class AudioCodecManager:
 
         if self._encoder:
             try:
-                # Use a 20ms frame size (typical): samples_per_channel = sample_rate * 20 / 1000
-                frame_size = int(self.sample_rate * 20 / 1000)
-                encoded = self._encoder.encode(data, frame_size)
+                encoded = self._encoder.encode(data, self.frame_samples)
                 return encoded, True
             except Exception:
                 pass
@@ -63,9 +81,49 @@ class AudioCodecManager:
 
         if self._decoder:
             try:
-                pcm = self._decoder.decode(data, 960)
+                pcm = self._decoder.decode(data, MAX_OPUS_FRAME_SAMPLES)
                 return pcm
             except Exception:
                 pass
 
         return data
+
+    def decode_into(self, data: Optional[bytes], out) -> int:
+        """Decode into `out` (a writable buffer, e.g. a `PcmPool` slot); returns the bytes written.
+
+        With libopus the samples are written straight into `out`, so a caller
+        reusing its buffers allocates nothing per packet. `out` should hold
+        `MAX_OPUS_FRAME_SAMPLES` frames; anything beyond it is cut off.
+        """
+        if not data:
+            return 0
+        if self._decode_into is not None:
+            try:
+                return self._decode_into(data, out)
+            except Exception:
+                pass
+        pcm = self.decode(data)
+        n = min(len(pcm), len(out))
+        out[:n] = pcm[:n]
+        return n
+
+
+def _libopus_decode_into(decoder, channels: int):
+    """opus_decode() into a caller's buffer through opuslib's ctypes layer (None if it is not there)."""
+    try:
+        import ctypes
+
+        from opuslib.api import decoder as opus_api
+
+        decode, state = opus_api.libopus_decode, decoder._state
+    except (ImportError, AttributeError):
+        return None
+
+    def decode_into(data: bytes, out) -> int:
+        pcm = (ctypes.c_int16 * (len(out) // 2)).from_buffer(out)
+        samples = decode(state, data, len(data), pcm, len(out) // (2 * channels), 0)
+        if samples < 0:
+            raise ValueError(f"opus_decode failed ({samples})")
+        return samples * channels * 2
+
+    return decode_into
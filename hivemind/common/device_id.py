@@ -34,7 +34,8 @@ def get_device_metadata(device_name: str = None) -> dict:
     return {
         "device_id": generate_device_id(),
         "device_name": device_name or platform.node(),
-        "latency_profile_ms": 50,
-        "speaker_power_score": 0.5,
+        # Unknown until measured; the host keeps learned values in its profile store
+        "latency_profile_ms": None,
+        "speaker_power_score": None,
         "join_time": int(__import__('time').time()),
     }
@@ -1,49 +1,342 @@
+import base64
+import json
+import struct
 from enum import Enum
+from typing import Dict, Iterable, List, Optional, Union
 
 
 class MessageType(Enum):
     JOIN_REQUEST = "join_request"
     JOIN_ACCEPT = "join_accept"
     JOIN_REJECT = "join_reject"
+    JOIN_CHALLENGE = "join_challenge"
+    JOIN_CONFIRM = "join_confirm"
     TIME_SYNC_REQUEST = "time_sync_request"
     TIME_SYNC_RESPONSE = "time_sync_response"
     HEARTBEAT = "heartbeat"
     SCHEDULE_TRACK = "schedule_track"
     AUDIO_CHUNK = "audio_chunk"
+    SILENCE = "silence"
+    STREAM_REPORT = "stream_report"
+    STANDBY_UPDATE = "standby_update"
+    REDIRECT = "redirect"
+    # Primary <-> standby host replication
+    REPLICA_HELLO = "replica_hello"
+    REPLICA_STATE = "replica_state"
+    REPLICA_POSITION = "replica_position"
+
+
+# Resolved once at import so message builders don't pay for Enum attribute lookups
+_JOIN_ACCEPT = MessageType.JOIN_ACCEPT.value
+_JOIN_REJECT = MessageType.JOIN_REJECT.value
+_JOIN_CHALLENGE = MessageType.JOIN_CHALLENGE.value
+_JOIN_CONFIRM = MessageType.JOIN_CONFIRM.value
+_TIME_SYNC_RESPONSE = MessageType.TIME_SYNC_RESPONSE.value
+_HEARTBEAT = MessageType.HEARTBEAT.value
+_SCHEDULE_TRACK = MessageType.SCHEDULE_TRACK.value
+_AUDIO_CHUNK = MessageType.AUDIO_CHUNK.value
+_SILENCE = MessageType.SILENCE.value
+_STREAM_REPORT = MessageType.STREAM_REPORT.value
+_STANDBY_UPDATE = MessageType.STANDBY_UPDATE.value
+_REDIRECT = MessageType.REDIRECT.value
+
+# Join rejection from a standby that has not taken over; the node keeps its resume token
+STANDBY_NOT_ACTIVE = "Standby host is not active"
+# Join rejection from a primary whose standby took the session over (the node keeps its token too)
+HOST_SUPERSEDED = "Host was superseded by its standby"
+# Join rejections while authenticating (see hivemind.common.session_auth)
+AUTH_FAILED = "Invalid session code"
+AUTH_LOCKED = "Too many failed joins; try again later"
+# Join rejection from a host without headroom for another node (see hivemind.host.capacity)
+HOST_BUSY = "Host at capacity"
+
+
+class FixedMessage(dict):
+    """A message without variable fields: built once, and encoded once per wire format.
+
+    Every send shares the same instance, so it cannot be changed. Messages
+    with variable fields stay plain dict literals: copying and filling a
+    template is no faster than building them.
+    """
+
+    __slots__ = ("frames",)
+
+    def __init__(self, **fields):
+        super().__init__(**fields)
+        # serializer name -> encoded message
+        self.frames: Dict[str, Union[str, bytes]] = {}
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("FixedMessage is shared and cannot be changed")
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _read_only
+
+
+# Rejections sent as is, often in bursts (failed guesses, nodes failing over early)
+_FIXED_REJECTS = {reason: FixedMessage(type=_JOIN_REJECT, reason=reason)
+                  for reason in (AUTH_FAILED, AUTH_LOCKED, STANDBY_NOT_ACTIVE, HOST_SUPERSEDED)}
+_REDIRECT_HERE = FixedMessage(type=_REDIRECT, host=None, port=None)
+_NO_STANDBY = FixedMessage(type=_STANDBY_UPDATE, standby=None)
 
 
 class Protocol:
     @staticmethod
-    def create_join_reject(reason: str):
-        return {"type": MessageType.JOIN_REJECT.value, "reason": reason}
+    def create_join_reject(reason: str, retry_after: Optional[float] = None):
+        if retry_after is None:
+            fixed = _FIXED_REJECTS.get(reason)
+            if fixed is not None:
+                return fixed
+            return {"type": _JOIN_REJECT, "reason": reason}
+        # Seconds before trying again is worthwhile
+        return {"type": _JOIN_REJECT, "reason": reason, "retry_after": retry_after}
+
+    @staticmethod
+    def create_join_challenge(challenge: dict):
+        """Host's SPAKE2 share and proof; the node answers with `join_confirm`."""
+        return {"type": _JOIN_CHALLENGE, **challenge}
+
+    @staticmethod
+    def create_join_confirm(response: dict):
+        return {"type": _JOIN_CONFIRM, "payload": response}
 
     @staticmethod
-    def create_join_accept(device_id: str, session_info: dict):
-        return {"type": MessageType.JOIN_ACCEPT.value, "device_id": device_id, "session": session_info}
+    def create_join_accept(device_id: str, session_info: dict, serializer: Optional[str] = None,
+                           resume_token: Optional[str] = None, node_state: Optional[dict] = None,
+                           resumed: bool = False, standby: Optional[dict] = None,
+                           room_key: Optional[str] = None, time_sync: Optional[dict] = None,
+                           sync_port: Optional[int] = None, resume_confirm: Optional[str] = None,
+                           term: int = 0):
+        message = {"type": _JOIN_ACCEPT, "device_id": device_id, "session": session_info}
+        if serializer is not None:
+            message["serializer"] = serializer
+        if resume_token is not None:
+            message["resume_token"] = resume_token
+        if resumed:
+            message["resumed"] = True
+        if node_state is not None:
+            # The resumed record, or the stored profile of a known device
+            message["node_state"] = node_state
+        if standby is not None:
+            # {"host", "port"} of the hot standby to fail over to
+            message["standby"] = standby
+        if room_key is not None:
+            # Audio key, sealed with this node's handshake key
+            message["room_key"] = room_key
+        if time_sync is not None:
+            # Answer to the time-sync request that came with the join, so a node is synced on arrival
+            message["time_sync"] = time_sync
+        if sync_port is not None:
+            # UDP port answering binary time-sync probes (see hivemind.host.udp_sync)
+            message["sync_port"] = sync_port
+        if resume_confirm is not None:
+            # The host's proof of the session key a resuming node proved (see session_auth.resume_confirm)
+            message["resume_confirm"] = resume_confirm
+        if term:
+            # Standby takeovers so far; nodes refuse a host behind the highest they have seen
+            message["term"] = term
+        return message
+
+    @staticmethod
+    def create_standby_update(standby: Optional[dict]):
+        if standby is None:
+            return _NO_STANDBY
+        return {"type": _STANDBY_UPDATE, "standby": standby}
+
+    @staticmethod
+    def create_redirect(host: Optional[str] = None, port: Optional[int] = None):
+        """Reconnect (resuming) to `host`:`port` now; None keeps the current address (a restarted host)."""
+        if host is None and port is None:
+            return _REDIRECT_HERE
+        return {"type": _REDIRECT, "host": host, "port": port}
 
     @staticmethod
     def create_time_sync_response(host_time: float, client_time: float):
-        return {"type": MessageType.TIME_SYNC_RESPONSE.value, "host_time": host_time, "client_time": client_time}
+        return {"type": _TIME_SYNC_RESPONSE, "host_time": host_time, "client_time": client_time}
 
     @staticmethod
     def create_heartbeat_ack(device_id: str):
-        return {"type": MessageType.HEARTBEAT.value, "device_id": device_id}
+        return {"type": _HEARTBEAT, "device_id": device_id}
 
     @staticmethod
-    def create_audio_chunk(play_at: float, sample_rate: int, channels: int, audio_data: bytes):
-        return {
-            "type": MessageType.AUDIO_CHUNK.value,
+    def create_audio_chunk(play_at: float, sample_rate: int, channels: int, audio_data: bytes,
+                           sequence: Optional[int] = None, tier: Optional[int] = None,
+                           encrypted: bool = False):
+        message = {
+            "type": _AUDIO_CHUNK,
             "play_at": play_at,
             "sample_rate": sample_rate,
             "channels": channels,
             "audio_data": audio_data,
         }
+        if sequence is not None:
+            message["sequence"] = sequence
+        if tier is not None:
+            message["tier"] = tier
+        if encrypted:
+            message["enc"] = 1
+        return message
+
+    @staticmethod
+    def create_silence(until_sequence: int, play_at: float):
+        """DTX marker: frames before `until_sequence` (due at `play_at`) are silence and are not sent."""
+        return {"type": _SILENCE, "until": until_sequence, "play_at": play_at}
+
+    @staticmethod
+    def create_stream_report(device_id: str, late_chunks: int = 0, rtt_ms: Optional[float] = None,
+                             cpu_load: Optional[float] = None):
+        """Node -> host link feedback used for adaptive bitrate.
+
+        `cpu_load` is the share of the node's decode CPU budget used since the last report.
+        """
+        payload = {"device_id": device_id, "late_chunks": late_chunks}
+        if rtt_ms is not None:
+            payload["rtt_ms"] = rtt_ms
+        if cpu_load is not None:
+            payload["cpu_load"] = cpu_load
+        return {"type": _STREAM_REPORT, "payload": payload}
 
     @staticmethod
     def create_schedule_message(track_url: str, start_at: float, duration: float = 0.0):
         return {
-            "type": MessageType.SCHEDULE_TRACK.value,
+            "type": _SCHEDULE_TRACK,
             "track_url": track_url,
             "start_at": start_at,
             "duration": duration,
         }
+
+
+# ---------------------------------------------------------------------------
+# Wire serialization
+#
+# Text frames are always JSON (stdlib or orjson, which are wire-compatible);
+# binary frames are msgpack. Bytes values travel base64-encoded in JSON and
+# natively in msgpack. Every connection starts on JSON and may switch to a
+# faster format chosen during the join handshake.
+# ---------------------------------------------------------------------------
+
+def _b64_default(obj):
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(obj)).decode("ascii")
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+class Serializer:
+    """Encodes messages for one wire format; subclasses implement `encode`."""
+
+    name = "json"
+    binary = False
+
+    def dumps(self, message: dict) -> Union[str, bytes]:
+        if message.__class__ is FixedMessage:
+            frame = message.frames.get(self.name)
+            if frame is None:
+                frame = message.frames[self.name] = self.encode(message)
+            return frame
+        return self.encode(message)
+
+    def encode(self, message: dict) -> Union[str, bytes]:
+        return json.dumps(message, default=_b64_default)
+
+    def loads(self, data: Union[str, bytes]) -> dict:
+        return json.loads(data)
+
+
+class OrjsonSerializer(Serializer):
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._dumps = orjson.dumps
+        self._loads = orjson.loads
+
+    def encode(self, message: dict) -> str:
+        # Text frame so stdlib-JSON peers can still read it
+        return self._dumps(message, default=_b64_default).decode("utf-8")
+
+    def loads(self, data: Union[str, bytes]) -> dict:
+        return self._loads(data)
+
+
+class MsgpackSerializer(Serializer):
+    name = "msgpack"
+    binary = True
+
+    def __init__(self):
+        import msgpack
+
+        self._packb = msgpack.packb
+        self._unpackb = msgpack.unpackb
+
+    def encode(self, message: dict) -> bytes:
+        return self._packb(message, use_bin_type=True)
+
+    def loads(self, data: Union[str, bytes]) -> dict:
+        return self._unpackb(data, raw=False)
+
+
+def _detect_serializers() -> Dict[str, Serializer]:
+    found: Dict[str, Serializer] = {}
+    for cls in (MsgpackSerializer, OrjsonSerializer):
+        try:
+            found[cls.name] = cls()
+        except ImportError:
+            pass
+    found["json"] = Serializer()
+    return found
+
+
+# Preference order: first entry is the fastest available
+SERIALIZERS: Dict[str, Serializer] = _detect_serializers()
+JSON_SERIALIZER: Serializer = SERIALIZERS.get("orjson") or SERIALIZERS["json"]
+BINARY_SERIALIZER: Optional[Serializer] = SERIALIZERS.get("msgpack")
+
+
+def available_serializers() -> List[str]:
+    """Names of usable serializers, fastest first; offered in `join_request`."""
+    return list(SERIALIZERS)
+
+
+def get_serializer(name: Optional[str]) -> Serializer:
+    """Return the serializer for `name`, falling back to the fastest JSON one."""
+    if name in ("json", "orjson", None):
+        return JSON_SERIALIZER
+    return SERIALIZERS.get(name) or JSON_SERIALIZER
+
+
+def negotiate_serializer(offered: Optional[Iterable[str]]) -> str:
+    """Pick the host's most preferred serializer that the peer also offered."""
+    offered = set(offered or ())
+    for name in SERIALIZERS:
+        if name in offered:
+            return name
+    return "json"
+
+
+def decode_frame(raw: Union[str, bytes]) -> dict:
+    """Decode one inbound frame: text frames are JSON, binary frames msgpack."""
+    if isinstance(raw, str) or BINARY_SERIALIZER is None or raw[:1] == b"{":
+        return JSON_SERIALIZER.loads(raw)
+    return BINARY_SERIALIZER.loads(raw)
+
+
+# Binary time-sync probe over UDP: magic, version, then the client's send time and the
+# host's receive and send times (zero in a request). Requests are as long as answers,
+# so the responder never sends more than it gets.
+SYNC_PACKET = struct.Struct("!4sB3xddd")
+SYNC_MAGIC = b"HMTS"
+SYNC_VERSION = 1
+
+
+def pack_sync(client_time: float, host_received: float = 0.0, host_sent: float = 0.0) -> bytes:
+    return SYNC_PACKET.pack(SYNC_MAGIC, SYNC_VERSION, client_time, host_received, host_sent)
+
+
+def unpack_sync(data: bytes) -> Optional[tuple]:
+    """`(client_time, host_received, host_sent)` of a sync packet, or None if it is not one."""
+    if len(data) != SYNC_PACKET.size:
+        return None
+    magic, version, *times = SYNC_PACKET.unpack(data)
+    if magic != SYNC_MAGIC or version != SYNC_VERSION:
+        return None
+    return tuple(times)
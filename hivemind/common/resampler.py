@@ -0,0 +1,191 @@
+import math
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from hivemind.config import CHANNELS, SAMPLE_RATE
+
+_INT16_SCALE = 1.0 / 32768.0
+_SQRT1_2 = math.sqrt(0.5)
+
+
+def pcm_to_float(pcm, channels: int) -> np.ndarray:
+    """Interleaved 16-bit PCM to float32 `(frames, channels)` in [-1, 1)."""
+    data = np.frombuffer(pcm, dtype=np.int16)
+    data = data[: len(data) - len(data) % channels]
+    out = data.astype(np.float32)
+    out *= _INT16_SCALE
+    return out.reshape(-1, channels)
+
+
+def float_to_pcm(frames: np.ndarray) -> bytes:
+    """float32 `(frames, channels)` to interleaved 16-bit PCM, clipping out-of-range samples."""
+    scaled = np.clip(frames, -1.0, 32767.0 / 32768.0) * 32768.0
+    return scaled.astype(np.int16).tobytes()
+
+
+@lru_cache(maxsize=None)
+def mix_matrix(in_channels: int, out_channels: int) -> np.ndarray:
+    """`(in, out)` gain matrix for up/downmixing between channel layouts.
+
+    Layouts follow the usual WAV/SMPTE order (L, R, C, LFE, Ls, Rs for 5.1;
+    FL, FR, RL, RR for quad). Downmixes use the ITU -3 dB coefficients and
+    drop LFE; unknown layouts fold channel `i` onto output `i % out`.
+    """
+    m = np.zeros((in_channels, out_channels), dtype=np.float32)
+    if in_channels == out_channels:
+        np.fill_diagonal(m, 1.0)
+    elif in_channels == 1:
+        m[0, :min(out_channels, 2)] = 1.0
+    elif out_channels == 1:
+        inputs = [c for c in range(in_channels) if not (in_channels == 6 and c == 3)]
+        m[inputs, 0] = 1.0 / len(inputs)
+    elif out_channels == 2 and in_channels == 4:
+        m[[0, 2], 0] = (1.0, _SQRT1_2)
+        m[[1, 3], 1] = (1.0, _SQRT1_2)
+    elif out_channels == 2 and in_channels == 6:
+        m[[0, 2, 4], 0] = (1.0, _SQRT1_2, _SQRT1_2)
+        m[[1, 2, 5], 1] = (1.0, _SQRT1_2, _SQRT1_2)
+    elif in_channels == 2:
+        m[0, 0] = m[1, 1] = 1.0
+    else:
+        for c in range(in_channels):
+            m[c, c % out_channels] = 1.0
+    # Keep full-scale input from clipping after the sum
+    peak = m.sum(axis=0).max()
+    if peak > 1.0:
+        m /= peak
+    return m
+
+
+@lru_cache(maxsize=16)
+def polyphase_bank(up: int, down: int, taps: int, rolloff: float, beta: float) -> np.ndarray:
+    """Kaiser-windowed sinc filter split into `up` phases of `taps` coefficients.
+
+    Row `p` interpolates at fractional input position `p / up`; each row is
+    normalized to unity DC gain. The cutoff sits at `rolloff` times the lower
+    of the two Nyquist frequencies.
+    """
+    cutoff = rolloff * min(1.0, up / down)
+    half = taps / 2.0
+    t = (taps // 2 - 1) + np.arange(up)[:, None] / up - np.arange(taps)[None, :]
+    window = np.i0(beta * np.sqrt(np.clip(1.0 - (t / half) ** 2, 0.0, None))) / np.i0(beta)
+    bank = cutoff * np.sinc(cutoff * t) * window
+    bank /= bank.sum(axis=1, keepdims=True)
+    return bank.astype(np.float32)
+
+
+class Resampler:
+    """Streaming rational-ratio polyphase resampler for `(frames, channels)` float32 blocks.
+
+    The ratio `out_rate / in_rate` is reduced to `up / down`; each output
+    sample is one dot product of `taps` inputs with the precomputed filter
+    phase for its fractional position, evaluated for a whole block at once.
+    Input history and the fractional position carry across calls, so
+    arbitrary chunk sizes produce the same output as one long call. The
+    group delay is `taps / 2` input samples.
+    """
+
+    def __init__(self, in_rate: int, out_rate: int, channels: int, taps: int = 32,
+                 rolloff: float = 0.92, beta: float = 8.0):
+        g = math.gcd(in_rate, out_rate)
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.channels = channels
+        self.up = out_rate // g
+        self.down = in_rate // g
+        self.taps = taps
+        self.bank = polyphase_bank(self.up, self.down, taps, rolloff, beta)
+        self._history = np.zeros((taps - 1, channels), dtype=np.float32)
+        self._pos = 0  # next output position, in 1/up input samples from the start of history
+
+    def process(self, frames: np.ndarray) -> np.ndarray:
+        buf = np.concatenate((self._history, frames.astype(np.float32, copy=False)))
+        up, down, taps = self.up, self.down, self.taps
+        last_start = len(buf) - taps  # last valid window start
+        if last_start < 0:
+            self._history = buf
+            return np.empty((0, self.channels), dtype=np.float32)
+
+        n_out = max(0, (last_start * up - self._pos) // down + 1)
+        positions = self._pos + down * np.arange(n_out, dtype=np.int64)
+        starts = positions // up
+        phases = positions % up
+        windows = sliding_window_view(buf, taps, axis=0)[starts]  # (n_out, channels, taps)
+        out = np.einsum("kct,kt->kc", windows, self.bank[phases], optimize=True)
+
+        self._pos += down * n_out
+        consumed = self._pos // up
+        self._pos -= consumed * up
+        self._history = buf[consumed:].copy()
+        return out.astype(np.float32, copy=False)
+
+    def flush(self) -> np.ndarray:
+        """Drain the samples still held back by the filter delay."""
+        return self.process(np.zeros((self.taps // 2, self.channels), dtype=np.float32))
+
+    def reset(self):
+        self._history = np.zeros((self.taps - 1, self.channels), dtype=np.float32)
+        self._pos = 0
+
+
+class AudioConverter:
+    """Brings any PCM source to the pipeline's rate, layout and 16-bit format.
+
+    Input is interleaved int16 bytes or float32 samples (1-D interleaved or
+    `(frames, channels)`); `process` returns 16-bit PCM in the output layout.
+    Channel mixing happens before resampling when it reduces the channel
+    count, after it otherwise, so the filter runs on the fewest channels.
+    """
+
+    def __init__(self, in_rate: int, in_channels: int, out_rate: int = SAMPLE_RATE,
+                 out_channels: int = CHANNELS, taps: int = 32):
+        self.in_rate = in_rate
+        self.in_channels = in_channels
+        self.out_rate = out_rate
+        self.out_channels = out_channels
+        self.matrix: Optional[np.ndarray] = None
+        if in_channels != out_channels:
+            self.matrix = mix_matrix(in_channels, out_channels)
+        self._mix_first = out_channels < in_channels
+        self.resampler: Optional[Resampler] = None
+        if in_rate != out_rate:
+            width = out_channels if self._mix_first else in_channels
+            self.resampler = Resampler(in_rate, out_rate, width, taps=taps)
+
+    @property
+    def passthrough(self) -> bool:
+        return self.matrix is None and self.resampler is None
+
+    def _frames(self, data) -> np.ndarray:
+        if isinstance(data, np.ndarray) and data.dtype == np.float32:
+            return data.reshape(-1, self.in_channels)
+        return pcm_to_float(data, self.in_channels)
+
+    def process_float(self, data) -> np.ndarray:
+        """Convert one chunk and return float32 `(frames, out_channels)`."""
+        frames = self._frames(data)
+        if self.matrix is not None and self._mix_first:
+            frames = frames @ self.matrix
+        if self.resampler is not None:
+            frames = self.resampler.process(frames)
+        if self.matrix is not None and not self._mix_first:
+            frames = frames @ self.matrix
+        return frames
+
+    def flush_float(self) -> np.ndarray:
+        """Output still held back by the resampler at the end of a stream."""
+        if self.resampler is None:
+            return np.empty((0, self.out_channels), dtype=np.float32)
+        frames = self.resampler.flush()
+        if self.matrix is not None and not self._mix_first:
+            frames = frames @ self.matrix
+        return frames
+
+    def process(self, data) -> bytes:
+        """Convert one chunk to interleaved 16-bit PCM."""
+        if self.passthrough and isinstance(data, (bytes, bytearray)):
+            return bytes(data)
+        return float_to_pcm(self.process_float(data))
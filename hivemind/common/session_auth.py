@@ -0,0 +1,296 @@
+"""Session-code authentication (SPAKE2) and room-wide audio encryption.
+
+A session code has only a few thousand values, so it never goes on the
+wire, not even hashed: a node and the host run SPAKE2 keyed by the code,
+which gives an eavesdropper nothing to test guesses against and an active
+attacker one guess per join attempt. The node proves it derived the key
+first; the host sends its own proof only after checking the node's, right
+before it accepts. So a guess can only be tested by sending a proof. Each
+peer address has its own failure budget: a wrong proof spends from it, and
+so does a challenge left unanswered until it times out or its socket
+closes.
+That key stays the node's session key: a reconnecting node proves it with
+an HMAC over a counter inside its join, which resumes without another
+exchange or round trip (and stays cheap when a standby takes over). The
+host answers with its own HMAC over the same counter in the accept, so a
+resumed node also knows it is back with a host that holds its key.
+
+With encryption on, the host seals each audio frame once with a room key
+that every node receives, wrapped in its own handshake key, in
+`join_accept`. Sealing cost therefore follows frames, not listeners.
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import struct
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from hivemind.common.protocol import JSON_SERIALIZER, MessageType, Protocol, decode_frame
+
+# RFC 3526 2048-bit MODP group (safe prime; 2 generates the prime-order subgroup)
+_P = int(
+    "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74020BBEA63B139B22514A0879"
+    "8E3404DDEF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B"
+    "0BFF5CB6F406B7EDEE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF0598DA4836"
+    "1C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB9ED529077096966D670C354E4ABC9804"
+    "F1746C08CA18217C32905E462E36CE3BE39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF6"
+    "955817183995497CEA956AE515D2261898FA051015728E5A8AACAA68FFFFFFFFFFFFFFFF", 16)
+_G = 2
+_EXPONENT_BITS = 256
+
+
+def _hash_to_group(label: bytes) -> int:
+    # Squaring lands in the prime-order subgroup; nobody knows its discrete log
+    digest = hashlib.shake_256(b"hivemind-spake2 " + label).digest(_P.bit_length() // 8)
+    return pow(int.from_bytes(digest, "big"), 2, _P)
+
+
+_M = _hash_to_group(b"M")
+_N = _hash_to_group(b"N")
+
+CIPHER = "chacha20-poly1305"
+
+
+@lru_cache(maxsize=None)
+def _aead():
+    """`cryptography`'s ChaCha20Poly1305, imported on first use (None if it is not installed).
+
+    Only encrypted rooms pay for loading it; authentication needs nothing
+    beyond the standard library.
+    """
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+    except ImportError:  # encryption is optional; authentication is not
+        return None
+    return ChaCha20Poly1305
+
+
+def __getattr__(name):
+    # `InvalidTag` is cryptography's own, so it is bound on first use like the cipher
+    if name == "InvalidTag":
+        try:
+            from cryptography.exceptions import InvalidTag
+        except ImportError:
+            class InvalidTag(Exception):
+                pass
+        globals()["InvalidTag"] = InvalidTag
+        return InvalidTag
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def available_ciphers() -> List[str]:
+    """Audio ciphers this process can open; offered in `join_request`."""
+    return [CIPHER] if _aead() is not None else []
+
+
+@lru_cache(maxsize=8)
+def _masks(session_code: str):
+    """(M^w, N^w and their inverses) for a session code; reused across joins."""
+    w = int.from_bytes(hashlib.sha256(b"hivemind-spake2 code " + session_code.encode()).digest(), "big")
+    m, n = pow(_M, w, _P), pow(_N, w, _P)
+    return m, pow(m, -1, _P), n, pow(n, -1, _P)
+
+
+def _encode(value: int) -> str:
+    return format(value, "x")
+
+
+def _in_subgroup(value: int) -> bool:
+    """Whether `value` lies in the prime-order subgroup, i.e. `pow(value, (_P - 1) // 2, _P) == 1`.
+
+    With a safe prime that subgroup is the quadratic residues, so the
+    Legendre symbol decides it, ~50x faster than the exponentiation.
+    """
+    a, n, symbol = value % _P, _P, 1
+    while a:
+        while not a & 1:
+            a >>= 1
+            if n & 7 in (3, 5):
+                symbol = -symbol
+        a, n = n, a
+        if a & 3 == 3 and n & 3 == 3:
+            symbol = -symbol
+        a %= n
+    return n == 1 and symbol == 1
+
+
+def _decode(text) -> int:
+    value = int(str(text), 16)
+    if not 1 < value < _P - 1:
+        raise ValueError("Handshake value out of range")
+    # A share outside the prime-order subgroup would leak bits of the code's mask
+    if not _in_subgroup(value):
+        raise ValueError("Handshake value not in the group")
+    return value
+
+
+class _Handshake:
+    def __init__(self, session_code: str, identity: str):
+        self.session_code = session_code
+        self.identity = identity
+        self.secret = secrets.randbits(_EXPONENT_BITS)
+        self.key: Optional[bytes] = None
+        self._confirm = None
+
+    def _derive(self, x: int, y: int, shared: int):
+        if shared in (1, _P - 1):
+            raise ValueError("Degenerate handshake")
+        transcript = b"".join(
+            struct.pack(">I", len(part)) + part
+            for part in (self.identity.encode(), _encode(x).encode(), _encode(y).encode(),
+                         _encode(shared).encode())
+        )
+        secret = hashlib.sha256(transcript).digest()
+        self.key = hmac.new(secret, b"session key", hashlib.sha256).digest()
+        confirm = hmac.new(secret, b"confirm", hashlib.sha256).digest()
+        self._confirm = {
+            "host": hmac.new(confirm, b"host" + transcript, hashlib.sha256).hexdigest(),
+            "node": hmac.new(confirm, b"node" + transcript, hashlib.sha256).hexdigest(),
+        }
+
+
+class ClientHandshake(_Handshake):
+    """Node (or standby) side: `hello()` goes in the join, `respond()` answers the challenge.
+
+    `check()` verifies the host's proof, which arrives only after ours;
+    until it passes (`host_confirmed`), the host is not trusted.
+    """
+
+    host_confirmed = False
+
+    def hello(self) -> dict:
+        m, _, _, _ = _masks(self.session_code)
+        self._x = pow(_G, self.secret, _P) * m % _P
+        return {"X": _encode(self._x)}
+
+    def respond(self, challenge: dict) -> dict:
+        """Our proof of the session key for the host's share; ValueError if the share is invalid."""
+        _, _, _, n_inv = _masks(self.session_code)
+        y = _decode(challenge["Y"])
+        self._derive(self._x, y, pow(y * n_inv % _P, self.secret, _P))
+        return {"confirm": self._confirm["node"]}
+
+    def check(self, confirm: dict):
+        """Verify the host's proof; ValueError if the host used another code."""
+        if self._confirm is None or not hmac.compare_digest(
+                self._confirm["host"], str((confirm or {}).get("confirm", ""))):
+            raise ValueError("Host does not know the session code")
+        self.host_confirmed = True
+
+
+class HostHandshake(_Handshake):
+    """Host side: built from the peer's hello; `verify()` checks the peer's proof.
+
+    The challenge carries only the host's share: its proof (`confirm()`)
+    is released once the peer's has been verified, so a peer cannot test
+    a guess of the code without spending a failed join.
+    """
+
+    verified = False
+
+    def __init__(self, session_code: str, identity: str, hello: dict):
+        super().__init__(session_code, identity)
+        _, m_inv, n, _ = _masks(session_code)
+        x = _decode(hello["X"])
+        self._y = pow(_G, self.secret, _P) * n % _P
+        self._derive(x, self._y, pow(x * m_inv % _P, self.secret, _P))
+
+    def challenge(self) -> dict:
+        return {"Y": _encode(self._y)}
+
+    def verify(self, response: dict) -> bool:
+        self.verified = hmac.compare_digest(self._confirm["node"], str((response or {}).get("confirm", "")))
+        return self.verified
+
+    def confirm(self) -> dict:
+        """The host's proof, for a peer that has proven the code."""
+        if not self.verified:
+            raise ValueError("Peer has not proven the session code")
+        return {"confirm": self._confirm["host"]}
+
+
+def resume_proof(session_key: bytes, identity: str, counter: int) -> str:
+    """Proof of a session key for a resuming join; `counter` must grow with every resume."""
+    return hmac.new(session_key, b"resume %s %d" % (identity.encode(), counter), hashlib.sha256).hexdigest()
+
+
+def resume_confirm(session_key: bytes, identity: str, counter: int) -> str:
+    """The host's answer to a resume proof for `counter`; never valid as a node's proof."""
+    return hmac.new(session_key, b"resume accept %s %d" % (identity.encode(), counter),
+                    hashlib.sha256).hexdigest()
+
+
+def seal_key(key: bytes, secret: bytes, context: str = "room key") -> str:
+    """Seal a short secret under a handshake key (requires `cryptography`).
+
+    By default the secret is the room key, sealed for one node. `context`
+    is authenticated with it, so a sealed secret cannot be moved to
+    another use or record.
+    """
+    nonce = os.urandom(12)
+    return (nonce + _aead()(key).encrypt(nonce, secret, context.encode())).hex()
+
+
+def open_key(key: bytes, sealed: str, context: str = "room key") -> bytes:
+    """Inverse of `seal_key`; raises `InvalidTag` if it was altered, or sealed under another key or context."""
+    data = bytes.fromhex(sealed)
+    return _aead()(key).decrypt(data[:12], data[12:], context.encode())
+
+
+class RoomCipher:
+    """Seals audio frames once for the whole room (ChaCha20-Poly1305).
+
+    Nonces are a random per-instance prefix plus a counter, so one key can
+    be shared by every sender instance without coordinating. Sequence and
+    tier are authenticated with the payload, so frames cannot be replayed
+    under another position.
+    """
+
+    _AAD = struct.Struct(">qh")
+
+    def __init__(self, key: Optional[bytes] = None):
+        aead = _aead()
+        if aead is None:
+            raise RuntimeError("Audio encryption needs the 'cryptography' package")
+        self.key = key or aead.generate_key()
+        self._aead = aead(self.key)
+        self._prefix = os.urandom(4)
+        self._counter = 0
+
+    def seal(self, data: bytes, sequence: int, tier: int = 0) -> bytes:
+        self._counter += 1
+        nonce = self._prefix + self._counter.to_bytes(8, "big")
+        return nonce + self._aead.encrypt(nonce, data, self._AAD.pack(sequence, tier or 0))
+
+    def open(self, data: bytes, sequence: int, tier: int = 0) -> bytes:
+        """Decrypt a sealed frame; raises `InvalidTag` if it was altered or sealed with another key."""
+        return self._aead.decrypt(data[:12], data[12:], self._AAD.pack(sequence, tier or 0))
+
+
+async def authenticate(ws, session_code: str, message: dict, identity: str,
+                       timeout: float = 5.0) -> Tuple[object, ClientHandshake]:
+    """Send a join (or replica hello) on `ws` and answer the host's challenge.
+
+    Returns the host's final reply (the raw frame: accept, reject or the
+    first state message) and the handshake, whose key is the session key.
+    Raises ValueError if the host could not prove it knows the code.
+    """
+    handshake = ClientHandshake(session_code, identity)
+    message["payload"]["auth"] = handshake.hello()
+    await ws.send(JSON_SERIALIZER.dumps(message))
+    raw = await asyncio.wait_for(ws.recv(), timeout)
+    reply = decode_frame(raw)
+    if reply.get("type") != MessageType.JOIN_CHALLENGE.value:
+        return raw, handshake
+    await ws.send(JSON_SERIALIZER.dumps(Protocol.create_join_confirm(handshake.respond(reply))))
+    raw = await asyncio.wait_for(ws.recv(), timeout)
+    reply = decode_frame(raw)
+    if reply.get("type") == MessageType.JOIN_REJECT.value:
+        return raw, handshake
+    if reply.get("type") != MessageType.JOIN_CONFIRM.value:
+        raise ValueError("Host did not prove the session code")
+    handshake.check(reply.get("payload"))
+    return await asyncio.wait_for(ws.recv(), timeout), handshake
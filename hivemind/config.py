@@ -1 +1,109 @@
 DEFAULT_PORT = 7878
+
+# Inbound message dispatch (see hivemind.host.dispatcher)
+MAX_FRAME_BYTES = 256 * 1024            # hard WebSocket frame limit
+MAX_UNAUTHENTICATED_FRAME_BYTES = 4096  # frames from unjoined clients above this are dropped unparsed
+MAX_HANDLER_CONCURRENCY = 64            # handlers running at once across all clients
+MAX_CLIENT_QUEUE = 256                  # pending messages per client before dropping
+
+# Connection scale (see hivemind.host.network_server)
+SOCKET_SNDBUF_BYTES = 256 * 1024        # kernel send buffer per connection
+SCALE_SOCKET_SNDBUF_BYTES = 32 * 1024   # ... in scale mode, where most clients are idle listeners
+SCALE_WS_MAX_QUEUE = 4                  # inbound frames buffered per connection in scale mode
+SCALE_PING_INTERVAL_S = 60.0            # keepalive period in scale mode
+
+# Per-message-type token buckets: type -> (messages per second, burst)
+RATE_LIMITS = {
+    "join_request": (1.0, 3),
+    "time_sync_request": (20.0, 40),
+    "heartbeat": (2.0, 5),
+    "stream_report": (2.0, 5),
+    "replica_hello": (1.0, 3),
+    "join_confirm": (1.0, 3),
+}
+
+# Failed session-code proofs allowed per peer address: (per second, burst); see hivemind.common.session_auth
+AUTH_FAILURE_LIMIT = (0.2, 10)
+AUTH_TIMEOUT_S = 5.0              # a challenge not answered by then (or whose socket closes) counts as failed
+
+# Admission control and load shedding (see hivemind.host.capacity)
+CAPACITY_AUDIO_BUDGET = 0.5       # share of each chunk's duration the audio path may spend
+CAPACITY_MAX_LOOP_LAG_MS = 20.0   # event-loop lag that counts as fully loaded
+CAPACITY_SHED_AT = 0.7            # load above which low-priority work is shed
+CAPACITY_ADMIT_BELOW = 0.85       # new nodes are admitted while the projected load stays below this
+CAPACITY_RETRY_AFTER_S = 10.0     # told to nodes turned away at capacity
+CAPACITY_INTERVAL_S = 0.1         # loop-lag probe period
+
+# Sampling profiler (see hivemind.host.profiler)
+PROFILE_HZ = 100                  # stack samples per second
+PROFILE_MAX_OVERHEAD = 0.02       # sampling backs off to stay under this share of wall time
+PROFILE_MAX_SECONDS = 60          # longest on-demand profile (/debug/profile)
+
+# Metrics history (see hivemind.host.metrics_history)
+METRICS_RESOLUTIONS = ((1, 600), (10, 6 * 3600), (60, 7 * 86400))  # (bucket s, retention s)
+METRICS_MAX_SERIES = 32
+METRICS_INTERVAL_S = 1.0          # host metrics are sampled this often
+METRICS_SNAPSHOT_S = 60.0         # history is written to disk this often (with --metrics-history)
+
+# Dashboard assets (see hivemind.host.static_assets)
+ASSET_INLINE_BYTES = 14 * 1024    # compressed CSS/JS inlined into the page up to this (one initial TCP window)
+ASSET_MAX_AGE_S = 365 * 86400     # fingerprinted assets never change under their name
+
+# Audio pipeline
+SAMPLE_RATE = 48000
+CHANNELS = 2
+CHUNK_DURATION_MS = 20
+LOOKAHEAD_MS = 300
+
+# Adaptive bitrate (see hivemind.host.bitrate_controller); tier 0 is the best quality
+BITRATE_TIERS = (
+    (128000, 20),   # (Opus bitrate bps, frame size ms)
+    (96000, 20),
+    (64000, 40),
+    (48000, 40),
+    (32000, 60),
+)
+MAX_SEND_BUFFER_BYTES = 256 * 1024  # frames are skipped for a client whose socket backlog exceeds this
+
+# Discontinuous transmission (see hivemind.host.silence)
+SILENCE_THRESHOLD_DBFS = -60.0  # chunks peaking below this are silence
+SILENCE_HANGOVER_MS = 200       # audio keeps flowing this long after the last sound
+SILENCE_REFRESH_MS = 1000       # "silence until" markers are repeated this often
+
+# Session timeline (see hivemind.host.timeline)
+SESSION_INFO_EVENTS = 8       # playing/upcoming events sent with a join accept
+TIMELINE_HORIZON_S = 0.5      # events are handed to the mixer this long before their start
+
+# Speaker-array placement (see hivemind.host.spatial)
+MAX_NODE_DELAY_MS = 1000.0    # per-node alignment delay limit
+
+# Hot standby (see hivemind.host.replication)
+REPLICATION_INTERVAL_S = 0.25     # node and timeline state is diffed and sent this often
+FAILOVER_MISSED_INTERVALS = 6     # replication messages missed in a row before the standby takes over
+FAILOVER_RTT_FACTOR = 4.0         # liveness timeouts also allow this many measured round trips
+FAILOVER_CONNECT_TIMEOUT_S = 1.0  # per-address connect timeout while failing over
+FAILOVER_PROBES = 5               # a primary that lost its standby checks this often whether it took over
+
+# Zero-downtime restart (see hivemind.host.handoff)
+HANDOFF_TIMEOUT_S = 5.0           # longest wait for the other process at each hand-off step
+HANDOFF_DRAIN_S = 5.0             # the old process waits this long for redirected nodes to leave
+
+# UDP time sync (see hivemind.host.udp_sync)
+UDP_SYNC_POLL_S = 0.25            # the responder thread checks for shutdown this often
+
+# Node clock sync
+SYNC_INTERVAL_S = 2.0       # steady-state time-sync period
+SYNC_BURST = 5              # requests sent back to back right after joining
+SYNC_WINDOW = 8             # samples kept; the lowest-RTT one wins
+HEARTBEAT_INTERVAL_S = 5.0
+STREAM_REPORT_INTERVAL_S = 1.0
+
+# Node decode pipeline and CPU budget (see hivemind.node.decoder)
+DECODE_WAKEUP_MS = 60       # low-power mode: the node decodes one batch per wakeup, this far apart
+DECODE_POOL_SLOTS = 16      # preallocated PCM buffers, i.e. the largest batch decoded at once
+NODE_CPU_BUDGET = 0.25      # share of one core a node's decoding may use before asking for a cheaper tier
+
+# Node reconnects
+RECONNECT_BASE_S = 0.05     # first retry delay; doubles per attempt
+RECONNECT_MAX_S = 5.0
+LINK_TIMEOUT_S = 1.0        # inbound silence that triggers a liveness ping
@@ -1,6 +1,27 @@
+import queue
+
+from hivemind.config import CHANNELS, SAMPLE_RATE
+
+
 class AudioCapture:
-    def __init__(self):
+    """Hands captured PCM to the distribution loop.
+
+    Capture devices that run at another rate or channel layout pass their
+    native `sample_rate` / `channels`; chunks are then converted to the
+    pipeline format in `push_chunk`, on the capture thread.
+    """
+
+    def __init__(self, max_chunks: int = 64, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS):
         self._running = False
+        # Filled by the platform capture callback (or `push_chunk` in tests/demos)
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._converter = None
+        if (sample_rate, channels) != (SAMPLE_RATE, CHANNELS):
+            from hivemind.common.resampler import AudioConverter
+
+            self._converter = AudioConverter(sample_rate, channels)
 
     def start(self):
         self._running = True
@@ -8,5 +29,30 @@ class AudioCapture:
     def stop(self):
         self._running = False
 
+    def push_chunk(self, chunk) -> bool:
+        """Queue a PCM chunk for distribution; drops it if the consumer is behind."""
+        if self._converter is not None:
+            chunk = self._converter.process(chunk)
+            if not chunk:
+                return True
+        try:
+            self._queue.put_nowait(chunk)
+            return True
+        except queue.Full:
+            return False
+
     def get_chunk(self, timeout: float = 0.1):
-        return None
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self) -> int:
+        """Discard everything queued (e.g. captured while a standby host was idle)."""
+        dropped = 0
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return dropped
+            dropped += 1
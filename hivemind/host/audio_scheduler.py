@@ -1,4 +1,58 @@
+import time
+
+from hivemind.config import CHANNELS, LOOKAHEAD_MS, SAMPLE_RATE
+
+
 class AudioScheduler:
+    """Assigns each captured chunk a sequence number and a host-clock play time.
+
+    Chunks are laid end to end on a continuous timeline starting `lookahead_ms`
+    in the future; the timeline is re-anchored only when capture stalls or
+    runs ahead by more than half the lookahead.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS,
+                 lookahead_ms: float = LOOKAHEAD_MS, clock=time.time):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.lookahead = lookahead_ms / 1000.0
+        self.clock = clock
+        self.sequence = 0
+        self._next_play_at = None
+
+    @property
+    def next_play_at(self) -> float:
+        """Play time the next chunk will get."""
+        target = self.clock() + self.lookahead
+        if self._next_play_at is None or abs(self._next_play_at - target) > self.lookahead / 2:
+            return target
+        return self._next_play_at
+
+    @property
+    def position(self):
+        """`(sequence, play_at)` of the next chunk on the current timeline (play_at None before the first)."""
+        return self.sequence, self._next_play_at
+
+    def resume_at(self, sequence: int, next_play_at: float):
+        """Continue another scheduler's timeline (a standby following its primary)."""
+        self.sequence = sequence
+        self._next_play_at = next_play_at
+
     def schedule_chunk(self, audio_chunk):
-        # Return simple schedule metadata
-        return {"play_at": 0.0, "sample_rate": 48000, "channels": 2}
+        frames = len(audio_chunk or b"") // (2 * self.channels)
+        duration = frames / self.sample_rate
+
+        target = self.clock() + self.lookahead
+        if self._next_play_at is None or abs(self._next_play_at - target) > self.lookahead / 2:
+            self._next_play_at = target
+
+        info = {
+            "play_at": self._next_play_at,
+            "sample_rate": self.sample_rate,
+            "channels": self.channels,
+            "sequence": self.sequence,
+            "duration": duration,
+        }
+        self._next_play_at += duration
+        self.sequence += 1
+        return info
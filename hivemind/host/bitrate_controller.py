@@ -0,0 +1,284 @@
+import logging
+import math
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from hivemind.common.audio_codec import AudioCodecManager
+from hivemind.config import BITRATE_TIERS, CHANNELS, LOOKAHEAD_MS, SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+
+class LinkState:
+    """Congestion signals and current tier for one node's link."""
+
+    __slots__ = ("tier", "buffer_bytes", "buffer_prev", "rtt_ms", "rtt_base_ms",
+                 "late_chunks", "dropped", "last_change", "clean_since",
+                 "cpu_load", "cpu_floor", "cpu_change", "cpu_calm_since")
+
+    def __init__(self, now: float, tier: int = 0):
+        self.tier = tier
+        self.buffer_bytes = 0
+        self.buffer_prev = 0
+        self.rtt_ms: Optional[float] = None
+        self.rtt_base_ms: Optional[float] = None
+        self.late_chunks = 0
+        self.dropped = 0
+        self.last_change = now
+        self.clean_since: Optional[float] = None
+        # The node's decoder: share of its CPU budget used, and the best tier it can afford
+        self.cpu_load: Optional[float] = None
+        self.cpu_floor = 0
+        self.cpu_change = now
+        self.cpu_calm_since: Optional[float] = None
+
+
+class AdaptiveBitrateController:
+    """Moves each node up and down the bitrate tier ladder from congestion feedback.
+
+    A node is considered congested when its socket send buffer is above
+    `buffer_high_bytes` or grew by more than `buffer_growth_bytes` since the last
+    evaluation, when its RTT exceeds `rtt_inflation` times its best observed RTT
+    (plus `rtt_slack_ms`), or when it reported late chunks or had frames skipped.
+    Congestion steps the node down at most once per `downgrade_interval`; it
+    steps back up one tier only after `upgrade_after` seconds without congestion.
+    `min_tier` caps every node's quality while the host sheds load.
+
+    Nodes also report how much of their decode CPU budget they use. Above
+    `cpu_high` the node's best allowed tier drops one step (lower bitrate,
+    and from tier 2 larger frames, which cost fewer decoder calls), at most
+    once per `downgrade_interval`; below `cpu_low` for `upgrade_after` it
+    is raised again.
+    """
+
+    def __init__(self, tiers: Sequence[Tuple[int, int]] = BITRATE_TIERS,
+                 buffer_high_bytes: int = 64 * 1024,
+                 buffer_growth_bytes: int = 16 * 1024,
+                 rtt_inflation: float = 1.5,
+                 rtt_slack_ms: float = 20.0,
+                 downgrade_interval: float = 1.0,
+                 upgrade_after: float = 5.0,
+                 cpu_high: float = 1.0,
+                 cpu_low: float = 0.5,
+                 clock=time.monotonic):
+        self.tiers = list(tiers)
+        self.buffer_high_bytes = buffer_high_bytes
+        self.buffer_growth_bytes = buffer_growth_bytes
+        self.rtt_inflation = rtt_inflation
+        self.rtt_slack_ms = rtt_slack_ms
+        self.downgrade_interval = downgrade_interval
+        self.upgrade_after = upgrade_after
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.clock = clock
+        self.links: Dict[str, LinkState] = {}
+        self.min_tier = 0
+
+    @property
+    def lowest_tier(self) -> int:
+        return len(self.tiers) - 1
+
+    def _link(self, device_id: str) -> LinkState:
+        link = self.links.get(device_id)
+        if link is None:
+            link = self.links[device_id] = LinkState(self.clock())
+        return link
+
+    def tier_for(self, device_id: Optional[str]) -> int:
+        link = self.links.get(device_id)
+        return link.tier if link else 0
+
+    def set_tier(self, device_id: str, tier: int):
+        link = self._link(device_id)
+        link.tier = max(0, min(self.lowest_tier, int(tier)))
+        link.last_change = self.clock()
+        link.clean_since = None
+
+    def observe_send_buffer(self, device_id: str, nbytes: int):
+        self._link(device_id).buffer_bytes = nbytes
+
+    def observe_rtt(self, device_id: str, rtt_ms: float):
+        link = self._link(device_id)
+        link.rtt_ms = rtt_ms
+        if link.rtt_base_ms is None or rtt_ms < link.rtt_base_ms:
+            link.rtt_base_ms = rtt_ms
+
+    def report_late(self, device_id: str, count: int):
+        self._link(device_id).late_chunks += max(0, int(count))
+
+    def observe_drop(self, device_id: str):
+        self._link(device_id).dropped += 1
+
+    def report_cpu(self, device_id: str, load: float):
+        """Fold in a node's decode CPU budget use; returns the best tier it can afford."""
+        link = self._link(device_id)
+        now = self.clock()
+        link.cpu_load = load
+        if load > self.cpu_high:
+            link.cpu_calm_since = None
+            if link.cpu_floor < self.lowest_tier and now - link.cpu_change >= self.downgrade_interval:
+                link.cpu_floor += 1
+                link.cpu_change = now
+                logger.info("Node %s over its CPU budget (%.0f%%), tier %d at best",
+                            device_id, load * 100, link.cpu_floor)
+        elif load < self.cpu_low:
+            if link.cpu_calm_since is None:
+                link.cpu_calm_since = now
+            elif link.cpu_floor > 0 and now - link.cpu_calm_since >= self.upgrade_after:
+                link.cpu_floor -= 1
+                link.cpu_change = link.cpu_calm_since = now
+        else:
+            link.cpu_calm_since = None
+        return link.cpu_floor
+
+    def is_congested(self, link: LinkState) -> bool:
+        if link.buffer_bytes > self.buffer_high_bytes:
+            return True
+        if link.buffer_bytes - link.buffer_prev > self.buffer_growth_bytes:
+            return True
+        if link.late_chunks or link.dropped:
+            return True
+        if link.rtt_ms is not None and link.rtt_base_ms is not None:
+            if link.rtt_ms > link.rtt_base_ms * self.rtt_inflation + self.rtt_slack_ms:
+                return True
+        return False
+
+    def evaluate(self, device_id: str) -> int:
+        """Fold the signals gathered since the last call into a tier decision."""
+        link = self._link(device_id)
+        now = self.clock()
+        congested = self.is_congested(link)
+        link.buffer_prev = link.buffer_bytes
+        link.late_chunks = 0
+        link.dropped = 0
+
+        floor = max(self.min_tier, link.cpu_floor)
+        if link.tier < floor:
+            # Host over capacity or node over its CPU budget; recovers through the normal upgrade path once lifted
+            link.tier = floor
+            link.last_change = now
+            link.clean_since = None
+        elif congested:
+            link.clean_since = None
+            if link.tier < self.lowest_tier and now - link.last_change >= self.downgrade_interval:
+                link.tier += 1
+                link.last_change = now
+                logger.info("Node %s congested, down to tier %d", device_id, link.tier)
+        else:
+            if link.clean_since is None:
+                link.clean_since = now
+            elif (link.tier > floor and now - link.clean_since >= self.upgrade_after
+                    and now - link.last_change >= self.upgrade_after):
+                link.tier -= 1
+                link.last_change = now
+                link.clean_since = now
+                logger.info("Node %s recovered, up to tier %d", device_id, link.tier)
+        return link.tier
+
+    def get_state(self, device_id: str) -> dict:
+        link = self.links.get(device_id)
+        if link is None:
+            return {"tier": 0}
+        return {"tier": link.tier, "rtt_ms": link.rtt_ms, "rtt_base_ms": link.rtt_base_ms,
+                "send_buffer_bytes": link.buffer_bytes, "cpu_load": link.cpu_load, "cpu_floor": link.cpu_floor}
+
+    def forget(self, device_id: str):
+        self.links.pop(device_id, None)
+
+
+class _TierStream:
+    """Re-frames contiguous capture chunks into one tier's encoder frame size.
+
+    The frames of the last lookahead are kept, so a joining node can be sent
+    what is still ahead of the play head instead of waiting for new frames.
+    """
+
+    __slots__ = ("codec", "pending", "pending_play_at", "last_sequence", "recent")
+
+    def __init__(self, codec: AudioCodecManager):
+        self.codec = codec
+        self.pending = bytearray()
+        self.pending_play_at = 0.0
+        self.last_sequence: Optional[int] = None
+        # Room for a full lookahead (plus one frame of slack) of this tier's frames
+        self.recent = deque(maxlen=math.ceil(LOOKAHEAD_MS / codec.frame_ms) + 1)
+
+    def push(self, pcm: bytes, play_at: float, sequence: int) -> List[Tuple[int, float, bytes]]:
+        if self.last_sequence is None or sequence != self.last_sequence + 1:
+            # Tier was idle for a while; stale samples would play at the wrong time
+            self.pending.clear()
+        self.last_sequence = sequence
+        if not self.pending:
+            self.pending_play_at = play_at
+        self.pending.extend(pcm)
+
+        codec = self.codec
+        frame_bytes = codec.frame_bytes
+        frame_seconds = codec.frame_ms / 1000.0
+        out = []
+        while len(self.pending) >= frame_bytes:
+            frame = bytes(self.pending[:frame_bytes])
+            del self.pending[:frame_bytes]
+            encoded, _ = codec.encode(frame)
+            # Numbered like the chunk that completed it, whatever the tier, so a node
+            # that switches tiers still sees one increasing sequence
+            out.append((sequence, self.pending_play_at, encoded))
+            self.recent.append(out[-1])
+            self.pending_play_at += frame_seconds
+        return out
+
+
+class TierEncoderPool:
+    """One shared encoder per tier in use, so encode cost scales with tiers, not nodes.
+
+    `variant` separates streams of different content at the same tier (e.g.
+    per-channel-map renders); None is the plain stream.
+    """
+
+    def __init__(self, tiers: Sequence[Tuple[int, int]] = BITRATE_TIERS,
+                 use_compression: bool = True,
+                 sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS):
+        self.tiers = list(tiers)
+        self.use_compression = use_compression
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._streams: Dict[tuple, _TierStream] = {}
+
+    def _stream(self, tier: int, variant=None) -> _TierStream:
+        stream = self._streams.get((tier, variant))
+        if stream is None:
+            bitrate, frame_ms = self.tiers[tier]
+            codec = AudioCodecManager(use_compression=self.use_compression,
+                                      sample_rate=self.sample_rate, channels=self.channels,
+                                      bitrate=bitrate, frame_ms=frame_ms)
+            stream = self._streams[(tier, variant)] = _TierStream(codec)
+        return stream
+
+    def prepare(self, tier: int, variant=None):
+        """Build `tier`'s encoder ahead of its first frame."""
+        self._stream(tier, variant)
+
+    def encode(self, tier: int, pcm: bytes, play_at: float, sequence: int,
+               variant=None) -> List[Tuple[int, float, bytes]]:
+        """Feed one capture chunk to `tier`; return the frames it completed.
+
+        Each frame is `(sequence, play_at, payload)`: `sequence` is the
+        scheduler's sequence of the chunk that completed the frame, and
+        `play_at` the play time of its first sample. No tier's frames are
+        shorter than a chunk, so a chunk completes at most one frame.
+        """
+        return self._stream(tier, variant).push(pcm, play_at, sequence)
+
+    def recent(self, tier: int, after: float, variant=None) -> List[Tuple[int, float, bytes]]:
+        """Frames of `tier` already encoded that play after host time `after`, in order."""
+        stream = self._streams.get((tier, variant))
+        if stream is None:
+            return []
+        return [frame for frame in stream.recent if frame[1] > after]
+
+    def active_tiers(self) -> List[int]:
+        return sorted({tier for tier, _ in self._streams})
+
+    def stream_count(self) -> int:
+        return len(self._streams)
@@ -0,0 +1,123 @@
+import logging
+from typing import Optional
+
+from hivemind.config import (
+    CAPACITY_ADMIT_BELOW,
+    CAPACITY_AUDIO_BUDGET,
+    CAPACITY_MAX_LOOP_LAG_MS,
+    CAPACITY_RETRY_AFTER_S,
+    CAPACITY_SHED_AT,
+    CHUNK_DURATION_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CapacityMonitor:
+    """Measures how much of its real-time budget the host is using, and gates joins on it.
+
+    Load is the largest of three ratios, each 1.0 at its budget:
+
+    - audio: time spent rendering, encoding and sending a chunk, against
+      `audio_budget` of the chunk's duration (chunks DTX holds back cost
+      next to nothing, so the load decays through silence and idle spells)
+    - loop lag: how late a periodic wakeup of the event loop fires, against
+      `max_loop_lag_ms`
+    - egress: bytes per second sent to nodes, against `egress_bps` (only when
+      the uplink is known)
+
+    Each is smoothed (EWMA) so one slow chunk does not flip decisions. A new
+    node is admitted only if the load, scaled by one more node, stays under
+    `admit_below`; above `shed_at` the host sheds low-priority work.
+    """
+
+    def __init__(self, audio_budget: float = CAPACITY_AUDIO_BUDGET,
+                 max_loop_lag_ms: float = CAPACITY_MAX_LOOP_LAG_MS,
+                 egress_bps: Optional[float] = None,
+                 shed_at: float = CAPACITY_SHED_AT,
+                 admit_below: float = CAPACITY_ADMIT_BELOW,
+                 retry_after_s: float = CAPACITY_RETRY_AFTER_S,
+                 smoothing: float = 0.1):
+        self.audio_budget = audio_budget
+        self.max_loop_lag = max_loop_lag_ms / 1000.0
+        self.egress_bps = egress_bps
+        self.shed_at = shed_at
+        self.admit_below = admit_below
+        self.retry_after_s = retry_after_s
+        self.smoothing = smoothing
+        self.audio = 0.0      # share of the audio budget in use
+        self.loop_lag = 0.0   # seconds
+        self.egress = 0.0     # bytes per second
+        self.rejected = 0
+        self._shedding = False
+
+    def _smooth(self, current: float, sample: float) -> float:
+        return current + self.smoothing * (sample - current)
+
+    def observe_chunk(self, busy_s: float, duration_s: float):
+        """Time the audio path took for one chunk of `duration_s` seconds."""
+        if duration_s > 0:
+            self.audio = self._smooth(self.audio, busy_s / (duration_s * self.audio_budget))
+
+    def observe_idle(self, idle_s: float, chunk_s: float = CHUNK_DURATION_MS / 1000.0):
+        """The audio path had nothing to do for `idle_s` seconds; decays as that many empty chunks would."""
+        if idle_s > 0:
+            self.audio *= (1.0 - self.smoothing) ** (idle_s / chunk_s)
+
+    def observe_loop_lag(self, lag_s: float):
+        self.loop_lag = self._smooth(self.loop_lag, max(0.0, lag_s))
+
+    def observe_egress(self, bytes_per_s: float):
+        # Rate samples are already averaged over their interval
+        self.egress = bytes_per_s
+
+    @property
+    def load(self) -> float:
+        load = max(self.audio, self.loop_lag / self.max_loop_lag)
+        if self.egress_bps:
+            load = max(load, self.egress / self.egress_bps)
+        return load
+
+    @property
+    def headroom(self) -> float:
+        """Share of the budget still free (negative when over it)."""
+        return 1.0 - self.load
+
+    @property
+    def shedding(self) -> bool:
+        """Whether low-priority work should wait (with hysteresis, so it doesn't flap)."""
+        load = self.load
+        if self._shedding:
+            self._shedding = load > self.shed_at * 0.8
+        elif load > self.shed_at:
+            self._shedding = True
+            logger.warning("Host load %.2f: shedding low-priority work", load)
+        return self._shedding
+
+    def admit(self, nodes: int) -> Optional[float]:
+        """Whether a new node fits next to `nodes` listeners: None if so, else seconds to retry after."""
+        if not nodes:
+            return None
+        # Sending and egress grow with listeners; assume the next one costs the average
+        if self.load * (nodes + 1) / nodes < self.admit_below:
+            return None
+        self.rejected += 1
+        return self.retry_after_s
+
+    def tier_floor(self, floor: int, lowest: int) -> int:
+        """Best tier nodes may use: one step cheaper per call under pressure, one better once it passes."""
+        if self.shedding:
+            return min(floor + 1, lowest)
+        if self.load < self.shed_at * 0.5:
+            return max(floor - 1, 0)
+        return floor
+
+    def get_state(self) -> dict:
+        return {
+            "load": self.load,
+            "audio": self.audio,
+            "loop_lag_ms": self.loop_lag * 1000.0,
+            "egress_bps": self.egress,
+            "shedding": self._shedding,
+            "rejected_joins": self.rejected,
+        }
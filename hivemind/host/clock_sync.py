@@ -1,7 +1,63 @@
 import time
 
 
+class HostClock:
+    """The session time base: the wall clock plus an offset.
+
+    The offset is zero on a primary. A standby adopts its primary's time
+    base by setting it to its measured offset, so play times and node clock
+    estimates stay valid when it takes over.
+    """
+
+    __slots__ = ("offset",)
+
+    def __init__(self, offset: float = 0.0):
+        self.offset = offset
+
+    def __call__(self) -> float:
+        return time.time() + self.offset
+
+
 class ClockSyncService:
+    def __init__(self, skew_min_span_s: float = 30.0, clock=time.time):
+        # device_id -> {"offset": s, "rtt": s, "samples": n, "skew_ppm": ppm} as last reported by the node
+        self.estimates = {}
+        # device_id -> (host time, offset) of the first estimate, for measuring skew
+        self._skew_ref = {}
+        self.skew_min_span_s = skew_min_span_s
+        self.clock = clock
+
     def handle_sync_request(self, device_id: str, client_time: float):
-        host_time = time.time()
+        host_time = self.clock()
         return {"host_time": host_time, "client_time": client_time}
+
+    def record_estimate(self, device_id: str, offset: float, rtt: float = None):
+        """Remember a node's current offset estimate so it survives reconnects."""
+        now = self.clock()
+        entry = self.estimates.setdefault(device_id, {"samples": 0})
+        entry["offset"] = offset
+        if rtt is not None:
+            entry["rtt"] = rtt
+        entry["samples"] += 1
+
+        ref = self._skew_ref.setdefault(device_id, (now, offset))
+        if now - ref[0] >= self.skew_min_span_s:
+            entry["skew_ppm"] = (offset - ref[1]) / (now - ref[0]) * 1e6
+
+    def seed_estimate(self, device_id: str, offset: float, skew_ppm: float = None):
+        """Start a node from a stored estimate; its own reports replace it."""
+        entry = {"offset": offset, "samples": 0}
+        if skew_ppm is not None:
+            entry["skew_ppm"] = skew_ppm
+        self.estimates[device_id] = entry
+
+    def restore_estimate(self, device_id: str, estimate: dict):
+        """Adopt an estimate replicated from another host."""
+        self.estimates[device_id] = dict(estimate)
+
+    def get_estimate(self, device_id: str):
+        return self.estimates.get(device_id)
+
+    def forget(self, device_id: str):
+        self.estimates.pop(device_id, None)
+        self._skew_ref.pop(device_id, None)
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Dict, Optional, Tuple
+
+from hivemind.config import MAX_CLIENT_QUEUE, MAX_HANDLER_CONCURRENCY, RATE_LIMITS
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `capacity` banked."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def consume(self, amount: float = 1.0, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+
+class FailureLimiter:
+    """Failed attempts allowed per source (e.g. a peer address), one token bucket each.
+
+    An attempt in progress holds one of its source's tokens without spending
+    it: `begin()` refuses once all of them are spent or held, so concurrent
+    attempts cannot overrun the budget, and `end()` spends the token only if
+    the attempt failed. Sources whose budget has refilled are forgotten.
+    """
+
+    def __init__(self, rate: float, capacity: float, max_sources: int = 1024):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.max_sources = max_sources
+        self._buckets: Dict[object, TokenBucket] = {}
+        self._pending: Dict[object, int] = {}
+
+    def tokens(self, source) -> float:
+        """Attempts `source` may still start."""
+        bucket = self._buckets.get(source)
+        if bucket is None:
+            tokens = self.capacity
+        else:
+            bucket.consume(0.0)  # refill
+            tokens = bucket.tokens
+        return tokens - self._pending.get(source, 0)
+
+    def begin(self, source) -> bool:
+        if self.tokens(source) < 1.0:
+            return False
+        self._pending[source] = self._pending.get(source, 0) + 1
+        return True
+
+    def end(self, source, failed: bool):
+        pending = self._pending.pop(source, 0) - 1
+        if pending > 0:
+            self._pending[source] = pending
+        if failed:
+            bucket = self._buckets.get(source)
+            if bucket is None:
+                if len(self._buckets) >= self.max_sources:
+                    self._forget_refilled()
+                bucket = self._buckets[source] = TokenBucket(self.rate, self.capacity)
+            bucket.consume()
+
+    def _forget_refilled(self):
+        now = time.monotonic()
+        for source, bucket in list(self._buckets.items()):
+            bucket.consume(0.0, now)
+            if bucket.tokens >= bucket.capacity and source not in self._pending:
+                del self._buckets[source]
+
+
+class MessageDispatcher:
+    """Runs message handlers with per-client ordering and bounded resources.
+
+    Every client gets a bounded FIFO queue drained by a single worker task, so
+    messages from one client are handled in arrival order. The worker only
+    exists while the queue has messages, so idle clients cost no task. A global semaphore
+    caps how many handlers run at once across all clients, and per-client,
+    per-message-type token buckets drop floods before they are queued.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_HANDLER_CONCURRENCY,
+                 max_queue: int = MAX_CLIENT_QUEUE,
+                 rate_limits: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.rate_limits = dict(RATE_LIMITS if rate_limits is None else rate_limits)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._queues: Dict[object, deque] = {}
+        self._workers: Dict[object, asyncio.Task] = {}
+        self._buckets: Dict[Tuple[object, str], TokenBucket] = {}
+        self.metrics = {
+            "dispatched": 0,
+            "handled": 0,
+            "handler_errors": 0,
+            "dropped_queue_full": 0,
+            "dropped_rate_limited": 0,
+            "dropped_oversize": 0,
+            "dropped_invalid": 0,
+        }
+
+    def open_client(self, client):
+        """Give a newly connected client its message queue."""
+        if client in self._queues:
+            return
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._queues[client] = deque()
+
+    def close_client(self, client):
+        """Forget the client; a running worker still finishes what is already queued."""
+        queue = self._queues.pop(client, None)
+        for key in [k for k in self._buckets if k[0] is client]:
+            del self._buckets[key]
+        if queue is not None and len(queue) >= self.max_queue:
+            # Drop the backlog of a flooding client
+            self.metrics["dropped_queue_full"] += len(queue)
+            queue.clear()
+
+    def allow(self, client, mtype: str) -> bool:
+        """Charge one token from the client's bucket for `mtype`."""
+        limit = self.rate_limits.get(mtype)
+        if limit is None:
+            return True
+        key = (client, mtype)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*limit)
+        if bucket.consume():
+            return True
+        self.metrics["dropped_rate_limited"] += 1
+        return False
+
+    def submit(self, client, handler: Callable, payload: dict, audio_data) -> bool:
+        """Queue `handler(client, payload, audio_data)` behind the client's earlier messages."""
+        queue = self._queues.get(client)
+        if queue is None:
+            return False
+        if len(queue) >= self.max_queue:
+            self.metrics["dropped_queue_full"] += 1
+            return False
+        queue.append((handler, payload, audio_data))
+        self.metrics["dispatched"] += 1
+        if client not in self._workers:
+            self._workers[client] = asyncio.create_task(self._worker(client, queue))
+        return True
+
+    async def _worker(self, client, queue: deque):
+        try:
+            while queue:
+                handler, payload, audio_data = queue.popleft()
+                async with self._semaphore:
+                    try:
+                        await handler(client, payload, audio_data)
+                    except Exception:
+                        self.metrics["handler_errors"] += 1
+                        logger.exception("Handler failed for client %s", getattr(client, "addr", client))
+                    finally:
+                        self.metrics["handled"] += 1
+        finally:
+            if self._workers.get(client) is asyncio.current_task():
+                del self._workers[client]
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {getattr(c, "addr", str(c)): len(q) for c, q in self._queues.items()}
+
+    def get_metrics(self) -> dict:
+        depths = [len(q) for q in self._queues.values()]
+        return {
+            **self.metrics,
+            "clients": len(self._queues),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+        }
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import Optional
+
+from hivemind.common.protocol import JSON_SERIALIZER, Protocol
+from hivemind.config import HANDOFF_DRAIN_S, HANDOFF_TIMEOUT_S
+from hivemind.host.replication import restore_state
+
+logger = logging.getLogger(__name__)
+
+# Messages on the hand-off socket, one JSON object per line
+_REQUEST = "handoff_request"   # new -> old
+_STATE = "handoff_state"       # old -> new, after the sockets: session snapshot and time base
+_READY = "handoff_ready"       # new -> old: accepting connections on the inherited socket
+_FINAL = "handoff_final"       # old -> new: audio stopped; final snapshot with the timeline position
+
+_FD_MARKER = b"F"              # the one byte the sockets are attached to: listening, then time-sync
+_MAX_FDS = 2
+
+
+class _Channel:
+    """Newline-delimited JSON over a non-blocking Unix socket."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self._buffer = b""
+
+    async def send(self, message: dict):
+        data = JSON_SERIALIZER.dumps(message)
+        await asyncio.get_running_loop().sock_sendall(self.sock, data.encode("utf-8") + b"\n")
+
+    async def recv(self, expect: str, timeout: float = HANDOFF_TIMEOUT_S) -> dict:
+        loop = asyncio.get_running_loop()
+        while b"\n" not in self._buffer:
+            data = await asyncio.wait_for(loop.sock_recv(self.sock, 65536), timeout)
+            if not data:
+                raise ConnectionError("Hand-off peer went away")
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        message = JSON_SERIALIZER.loads(line)
+        if message.get("type") != expect:
+            raise ValueError(f"Expected {expect}, got {message.get('type')}")
+        return message
+
+
+class HandoffListener:
+    """Old process: hands the listening socket and the session to a successor asking on `path`.
+
+    1. The successor connects to the Unix socket at `path` and asks.
+    2. It gets the listening socket's file descriptor (SCM_RIGHTS), and the
+       UDP time-sync socket's if there is one, a full session snapshot and
+       the time base. It starts accepting on the same socket, so connections
+       queue rather than being refused; until this host stops, probes are
+       answered by whichever process reads them first.
+    3. On its "ready", this host stops accepting, finishes the chunk in
+       flight, and sends the final snapshot with the timeline position.
+    4. Nodes and standbys get a redirect to the same address. They resume
+       on the successor within a few ms, well inside their jitter buffer.
+       This host waits up to `drain` seconds for them to go, then stops.
+
+    `path` is created mode 0600: whoever can connect can take the session.
+    """
+
+    def __init__(self, host, path: str, drain: float = HANDOFF_DRAIN_S):
+        self.host = host
+        self.path = path
+        self.drain = drain
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            listener = _listen(self.path)
+            try:
+                conn, _ = await loop.sock_accept(listener)
+            finally:
+                # One successor at a time; it binds `path` itself once it has taken over
+                listener.close()
+                _unlink(self.path)
+            conn.setblocking(False)
+            try:
+                await self._hand_off(_Channel(conn))
+                return
+            except (OSError, ConnectionError, ValueError, asyncio.TimeoutError) as e:
+                logger.warning(f"Hand-off to a new host process failed ({e}); still serving")
+            finally:
+                conn.close()
+
+    async def _hand_off(self, channel: _Channel):
+        host = self.host
+        server = host.network_server
+        await channel.recv(_REQUEST)
+        fds = [server._server.sockets[0].fileno()]
+        if host.udp_sync is not None and host.udp_sync._sock is not None:
+            fds.append(host.udp_sync._sock.fileno())
+        socket.send_fds(channel.sock, [_FD_MARKER], fds)
+        # Node keys and the session code travel in the clear: `path` is only open to this user
+        await channel.send({"type": _STATE, "snapshot": host.replication.snapshot(full=True),
+                            "session_code": host.session_manager.session_code,
+                            "clock_offset": host.host_clock.offset})
+        await channel.recv(_READY)
+
+        # The successor accepts everything from here on; no going back
+        logger.info("Handing the session over to a new host process")
+        server.stop_accepting()
+        await host._stop_distribution()
+        try:
+            await channel.send({"type": _FINAL, "snapshot": host.replication.snapshot(full=True)})
+        except OSError:
+            logger.exception("Could not send the final snapshot to the new host process")
+
+        # Nodes and standbys reconnect to the same address, which is now the successor
+        clients = [c for c in dict.fromkeys(server.clients.values()) if c.authenticated]
+        await server.send_to(clients + host.replication.replicas, Protocol.create_redirect())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.drain
+        while loop.time() < deadline and any(c.is_open for c in clients + host.replication.replicas):
+            await asyncio.sleep(0.05)
+        logger.info("Hand-off complete; stopping")
+        await host.stop()
+
+
+class Successor:
+    """New process: takes over from a host serving the hand-off socket at `path`."""
+
+    def __init__(self, host, channel: _Channel):
+        self.host = host
+        self._channel = channel
+
+    @classmethod
+    async def connect(cls, host, path: str) -> Optional["Successor"]:
+        """Inherit the sockets and session from the host at `path` (None if there is none).
+
+        Sets `host.network_server.sock` (and `host.udp_sync.sock`); call
+        `complete()` once the server is up.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            sock, fds = await loop.run_in_executor(None, _request, path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return None
+        channel = _Channel(sock)
+        try:
+            state = await channel.recv(_STATE)
+        except BaseException:
+            for fd in fds:
+                os.close(fd)
+            sock.close()
+            raise
+        host.network_server.sock = socket.socket(fileno=fds[0])
+        if len(fds) > 1:
+            if host.udp_sync is not None:
+                host.udp_sync.sock = socket.socket(fileno=fds[1])
+            else:
+                os.close(fds[1])
+        # Same machine, same wall clock: the predecessor's time base carries over as is
+        host.host_clock.offset = state["clock_offset"]
+        host.session_manager.session_code = state["session_code"]
+        restore_state(host, state["snapshot"])
+        logger.info("Taking over session %s (%d nodes) from the running host",
+                    host.session_manager.session_code, len(host.session_manager.nodes))
+        return cls(host, channel)
+
+    async def complete(self):
+        """Tell the predecessor we are accepting; apply its final snapshot once its audio has stopped."""
+        channel = self._channel
+        try:
+            await channel.send({"type": _READY})
+            final = await channel.recv(_FINAL)
+        except (OSError, ConnectionError, ValueError, asyncio.TimeoutError) as e:
+            # It has stopped accepting either way; carry on from the earlier snapshot
+            logger.warning(f"No final snapshot from the previous host process ({e})")
+            return
+        finally:
+            channel.sock.close()
+        restore_state(self.host, final["snapshot"])
+
+
+def _listen(path: str) -> socket.socket:
+    _unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    os.chmod(path, 0o600)
+    sock.listen(1)
+    sock.setblocking(False)
+    return sock
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _request(path: str):
+    """Blocking: ask the host at `path` for its listening socket (run in an executor)."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(HANDOFF_TIMEOUT_S)
+        sock.connect(path)
+        sock.sendall(JSON_SERIALIZER.dumps({"type": _REQUEST}).encode("utf-8") + b"\n")
+        marker, fds, _, _ = socket.recv_fds(sock, len(_FD_MARKER), _MAX_FDS)
+        if marker != _FD_MARKER or not fds:
+            raise ConnectionError("Running host sent no listening socket")
+        sock.setblocking(False)
+        return sock, fds
+    except BaseException:
+        sock.close()
+        raise
@@ -0,0 +1,169 @@
+import logging
+import os
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from hivemind.config import METRICS_MAX_SERIES, METRICS_RESOLUTIONS
+
+logger = logging.getLogger(__name__)
+
+_FIELDS = ("bucket", "count", "sum", "min", "max")
+
+
+class RingSeries:
+    """`slots` buckets of `step` seconds in preallocated arrays, reused round-robin.
+
+    Each bucket keeps the count, sum, min and max of the values that fell in
+    it, so any resolution answers min/max/average exactly. A slot is reset
+    when time comes round to it again; memory never grows.
+    """
+
+    def __init__(self, step: float, slots: int):
+        self.step = step
+        self.slots = slots
+        self.bucket = np.full(slots, -1, dtype=np.int64)
+        self.count = np.zeros(slots, dtype=np.int64)
+        self.sum = np.zeros(slots)
+        self.min = np.zeros(slots)
+        self.max = np.zeros(slots)
+        self.latest = -1
+
+    @property
+    def span(self) -> float:
+        return self.step * self.slots
+
+    def add(self, t: float, value: float):
+        bucket = int(t // self.step)
+        i = bucket % self.slots
+        if self.bucket[i] != bucket:
+            if bucket < self.bucket[i]:
+                return  # older than what the slot already holds
+            self.bucket[i] = bucket
+            self.count[i] = 1
+            self.sum[i] = self.min[i] = self.max[i] = value
+        else:
+            self.count[i] += 1
+            self.sum[i] += value
+            if value < self.min[i]:
+                self.min[i] = value
+            elif value > self.max[i]:
+                self.max[i] = value
+        if bucket > self.latest:
+            self.latest = bucket
+
+    def query(self, start: float, end: float) -> list:
+        buckets = self.bucket
+        first = max(int(start // self.step), self.latest - self.slots + 1)
+        found = np.flatnonzero((buckets >= first) & (buckets <= int(end // self.step)))
+        found = found[np.argsort(buckets[found])]
+        step = self.step
+        return [{"t": float(buckets[i] * step), "min": float(self.min[i]), "max": float(self.max[i]),
+                 "avg": float(self.sum[i] / self.count[i]), "count": int(self.count[i])} for i in found]
+
+
+class MetricsHistory:
+    """In-process time series of host metrics at several fixed resolutions.
+
+    Every value is folded into one `RingSeries` per resolution in
+    `resolutions` (`(step_s, retention_s)` pairs, 1 s for 10 min, 10 s for
+    6 h and 1 min for a week by default). That is 12,840 buckets of 40
+    bytes, about 500 KB, per series. Series are host-wide aggregates (worst
+    node, average tier, ...) rather than per node, and there are at most
+    `max_series` of them, so memory stays fixed whatever the uptime or the
+    number of nodes.
+    """
+
+    def __init__(self, resolutions: Sequence[Tuple[float, float]] = METRICS_RESOLUTIONS,
+                 max_series: int = METRICS_MAX_SERIES, clock=time.time):
+        self.resolutions = tuple((float(step), float(retention)) for step, retention in resolutions)
+        self.max_series = max_series
+        self.clock = clock
+        self.series: Dict[str, Tuple[RingSeries, ...]] = {}
+
+    def _rings(self, name: str) -> Optional[Tuple[RingSeries, ...]]:
+        rings = self.series.get(name)
+        if rings is None:
+            if len(self.series) >= self.max_series:
+                return None
+            rings = self.series[name] = tuple(RingSeries(step, int(round(retention / step)))
+                                              for step, retention in self.resolutions)
+        return rings
+
+    def record(self, values: Dict[str, float], t: Optional[float] = None):
+        """Add one sample per series; None values are skipped."""
+        t = self.clock() if t is None else t
+        for name, value in values.items():
+            if value is None:
+                continue
+            rings = self._rings(name)
+            if rings is None:
+                logger.warning("Metrics history full (%d series); dropping %s", self.max_series, name)
+                continue
+            for ring in rings:
+                ring.add(t, float(value))
+
+    def query(self, name: str, start: Optional[float] = None, end: Optional[float] = None,
+              step: Optional[float] = None) -> dict:
+        """Buckets of `name` between `start` and `end` (default: the last 10 minutes).
+
+        Uses the finest resolution that still holds `start` and is at least
+        `step` seconds wide. Raises KeyError for an unknown series.
+        """
+        rings = self.series[name]
+        end = self.clock() if end is None else end
+        start = end - self.resolutions[0][1] if start is None else start
+        ring = rings[-1]
+        for candidate in rings:
+            if candidate.step >= (step or 0) and candidate.latest * candidate.step - start < candidate.span:
+                ring = candidate
+                break
+        return {"name": name, "step": ring.step, "start": start, "end": end, "points": ring.query(start, end)}
+
+    def describe(self) -> dict:
+        return {"series": sorted(self.series),
+                "resolutions": [{"step": step, "retention": retention} for step, retention in self.resolutions]}
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Copies of every ring's arrays, keyed `name/step/field` (see `save`)."""
+        out = {}
+        for name, rings in self.series.items():
+            for ring in rings:
+                for field in _FIELDS:
+                    out[f"{name}/{ring.step:g}/{field}"] = getattr(ring, field).copy()
+        return out
+
+    @staticmethod
+    def save(arrays: Dict[str, np.ndarray], path):
+        """Write `arrays()` to `path` atomically (blocking: run it off the event loop)."""
+        path = str(path)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    def load(self, path) -> bool:
+        """Restore series from a snapshot; rings whose layout changed since are skipped."""
+        try:
+            snapshot = np.load(str(path))
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError):
+            logger.warning("Unreadable metrics snapshot %s; starting empty", path)
+            return False
+        with snapshot:
+            names = {key.split("/", 1)[0] for key in snapshot.files}
+            for name in names:
+                rings = self._rings(name)
+                if rings is None:
+                    break
+                for ring in rings:
+                    prefix = f"{name}/{ring.step:g}/"
+                    if prefix + "bucket" not in snapshot.files or snapshot[prefix + "bucket"].shape != (ring.slots,):
+                        continue
+                    for field in _FIELDS:
+                        getattr(ring, field)[:] = snapshot[prefix + field]
+                    ring.latest = int(ring.bucket.max())
+        logger.info("Restored %d metric series from %s", len(names), path)
+        return True
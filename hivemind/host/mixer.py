@@ -0,0 +1,342 @@
+import logging
+from bisect import bisect_left, bisect_right
+from typing import Dict, Optional
+
+import numpy as np
+
+from hivemind.common.resampler import AudioConverter, pcm_to_float
+from hivemind.config import CHANNELS, CHUNK_DURATION_MS, SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Longest block the mixer renders in one call (1 s at 48 kHz)
+MAX_BLOCK_FRAMES = SAMPLE_RATE
+
+
+class Envelope:
+    """Piecewise-linear gain over mixer sample positions.
+
+    Breakpoints `(position, value)` are interpolated linearly; the value is
+    held constant before the first and after the last one.
+    """
+
+    __slots__ = ("xp", "fp")
+
+    def __init__(self, value: float = 1.0):
+        self.xp = [0]
+        self.fp = [float(value)]
+
+    def value(self, position: int) -> float:
+        i = bisect_right(self.xp, position)
+        if i == 0:
+            return self.fp[0]
+        if i == len(self.xp):
+            return self.fp[-1]
+        x0, x1 = self.xp[i - 1], self.xp[i]
+        f0, f1 = self.fp[i - 1], self.fp[i]
+        return f0 + (f1 - f0) * (position - x0) / (x1 - x0)
+
+    def ramp(self, start: int, end: int, to_value: float, from_value: Optional[float] = None):
+        """Ramp to `to_value` between two positions; replaces anything scheduled after `start`."""
+        start = int(start)
+        end = max(start + 1, int(end))
+        if from_value is None:
+            from_value = self.value(start)
+        keep = bisect_left(self.xp, start)
+        del self.xp[keep:], self.fp[keep:]
+        self.xp += [start, end]
+        self.fp += [float(from_value), float(to_value)]
+
+    def is_flat(self, start: int, end: int) -> bool:
+        """True if the value is constant over `[start, end)`."""
+        i = bisect_right(self.xp, start)
+        if i == len(self.xp):
+            return True
+        return self.xp[i] >= end and (i == 0 or self.fp[i - 1] == self.fp[i])
+
+    def fill(self, out: np.ndarray, positions: np.ndarray):
+        out[:] = np.interp(positions, self.xp, self.fp)
+
+    def prune(self, position: int):
+        """Drop breakpoints that no longer affect `position` or later."""
+        i = bisect_right(self.xp, position) - 1
+        if i > 0:
+            del self.xp[:i], self.fp[:i]
+
+
+class MixerSource:
+    """One input to the mixer. Subclasses fill float32 `(frames, channels)` blocks.
+
+    `start_sample` is the mixer position of the source's first sample and
+    `stop_sample` (optional) the position at which it is dropped. `level` is
+    the user gain and `fade` the scheduled fades; a source with
+    `ducks_others` set attenuates every other source while it plays.
+    """
+
+    def __init__(self, name: str, gain: float = 1.0, ducks_others: bool = False):
+        self.name = name
+        self.ducks_others = ducks_others
+        self.start_sample = 0
+        self.stop_sample: Optional[int] = None
+        self.finished = False
+        self.level = Envelope(gain)
+        self.fade = Envelope(1.0)
+        self.duck_gain = 1.0
+
+    def render(self, out: np.ndarray) -> int:
+        """Write up to `len(out)` frames into `out`; return how many were written."""
+        raise NotImplementedError
+
+
+def to_frames(pcm, channels: int) -> np.ndarray:
+    """Interleaved 16-bit PCM (or float32 samples) to float32 `(frames, channels)`."""
+    if isinstance(pcm, np.ndarray) and pcm.dtype == np.float32:
+        data = pcm
+        if data.ndim == 1:
+            data = data[: len(data) - len(data) % channels].reshape(-1, channels)
+    else:
+        data = pcm_to_float(pcm, channels)
+    if data.shape[1] != channels:
+        raise ValueError(f"Source has {data.shape[1]} channels, mixer expects {channels}")
+    return data
+
+
+class PcmSource(MixerSource):
+    """A decoded track (or announcement) held in memory.
+
+    `pcm` in another rate or layout is converted once, up front, to
+    `out_rate` / `out_channels` (the mixer's).
+    """
+
+    def __init__(self, name: str, pcm, channels: int = CHANNELS, loop: bool = False,
+                 sample_rate: int = SAMPLE_RATE, out_rate: int = SAMPLE_RATE,
+                 out_channels: int = CHANNELS, **kwargs):
+        super().__init__(name, **kwargs)
+        if sample_rate != out_rate or channels != out_channels:
+            converter = AudioConverter(sample_rate, channels, out_rate, out_channels)
+            self.data = np.concatenate((converter.process_float(pcm), converter.flush_float()))
+        else:
+            self.data = to_frames(pcm, channels)
+        self.loop = loop
+        self.cursor = 0
+
+    def render(self, out: np.ndarray) -> int:
+        n = len(out)
+        total = len(self.data)
+        written = 0
+        while written < n and total:
+            take = min(n - written, total - self.cursor)
+            out[written:written + take] = self.data[self.cursor:self.cursor + take]
+            written += take
+            self.cursor += take
+            if self.cursor >= total:
+                if not self.loop:
+                    self.finished = True
+                    break
+                self.cursor = 0
+        return written
+
+
+class ToneSource(MixerSource):
+    """Phase-continuous sine generator (test tones, alerts)."""
+
+    def __init__(self, name: str, frequency: float = 440.0, amplitude: float = 0.5,
+                 sample_rate: int = SAMPLE_RATE, **kwargs):
+        super().__init__(name, **kwargs)
+        self.step = 2.0 * np.pi * frequency / sample_rate
+        self.amplitude = amplitude
+        self.phase = 0.0
+        self._ramp = np.arange(MAX_BLOCK_FRAMES, dtype=np.float64)
+
+    def render(self, out: np.ndarray) -> int:
+        n = len(out)
+        wave = np.sin(self.phase + self.step * self._ramp[:n])
+        wave *= self.amplitude
+        out[:] = wave[:, None]
+        self.phase = (self.phase + self.step * n) % (2.0 * np.pi)
+        return n
+
+
+class CaptureSource(MixerSource):
+    """The live capture stream; fed one chunk per block by `Mixer.process`."""
+
+    def __init__(self, name: str = "capture", channels: int = CHANNELS, **kwargs):
+        super().__init__(name, **kwargs)
+        self.channels = channels
+        self.pending: Optional[bytes] = None
+
+    def render(self, out: np.ndarray) -> int:
+        if not self.pending:
+            return 0
+        data = to_frames(self.pending, self.channels)
+        self.pending = None
+        n = min(len(out), len(data))
+        out[:n] = data[:n]
+        return n
+
+
+class Mixer:
+    """Sums any number of sources into one 16-bit PCM stream, one block at a time.
+
+    Positions are counted in samples since the mixer started, so gain ramps,
+    crossfades and source starts land on an exact sample. While a ducking
+    source plays, every other source is pulled down to `duck_level` over
+    `duck_attack_ms` and released over `duck_release_ms`. Mixing happens in
+    preallocated float32 buffers; per block the cost is one copy and one
+    multiply-add per active source.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS,
+                 block_ms: int = CHUNK_DURATION_MS, duck_level: float = 0.25,
+                 duck_attack_ms: float = 20.0, duck_release_ms: float = 300.0):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_frames = int(sample_rate * block_ms / 1000)
+        self.duck_level = duck_level
+        self.duck_attack = sample_rate * duck_attack_ms / 1000.0
+        self.duck_release = sample_rate * duck_release_ms / 1000.0
+        self.position = 0
+        self.sources: Dict[str, MixerSource] = {}
+
+        self._bus = np.zeros((MAX_BLOCK_FRAMES, channels), dtype=np.float32)
+        self._scratch = np.zeros((MAX_BLOCK_FRAMES, channels), dtype=np.float32)
+        self._gains = np.ones(MAX_BLOCK_FRAMES, dtype=np.float32)
+        self._fades = np.ones(MAX_BLOCK_FRAMES, dtype=np.float32)
+        self._out = np.zeros((MAX_BLOCK_FRAMES, channels), dtype=np.int16)
+        self._index = np.arange(MAX_BLOCK_FRAMES, dtype=np.float64)
+
+    @property
+    def capture(self) -> Optional[CaptureSource]:
+        source = self.sources.get("capture")
+        return source if isinstance(source, CaptureSource) else None
+
+    @property
+    def active(self) -> bool:
+        """True when some source other than live capture is playing or pending."""
+        return any(not isinstance(s, CaptureSource) for s in self.sources.values())
+
+    def add_source(self, source: MixerSource, start_sample: Optional[int] = None) -> MixerSource:
+        """Add (or replace) a source; it starts at `start_sample` (default: the next block)."""
+        source.start_sample = self.position if start_sample is None else int(start_sample)
+        self.sources[source.name] = source
+        return source
+
+    def remove_source(self, name: str):
+        self.sources.pop(name, None)
+
+    def set_gain(self, name: str, gain: float, ramp_ms: float = 10.0, at_sample: Optional[int] = None):
+        """Move a source's level to `gain` over `ramp_ms`, from `at_sample` (default: the next block)."""
+        start = self.position if at_sample is None else max(self.position, int(at_sample))
+        end = start + int(self.sample_rate * ramp_ms / 1000)
+        self.sources[name].level.ramp(start, end, gain)
+
+    def fade_out(self, name: str, at_sample: int, duration_samples: int):
+        """Fade a source to silence starting at `at_sample`, then drop it."""
+        source = self.sources[name]
+        source.fade.ramp(at_sample, at_sample + duration_samples, 0.0)
+        source.stop_sample = at_sample + duration_samples
+
+    def crossfade(self, from_name: Optional[str], to_source: MixerSource, at_sample: int,
+                  duration_samples: int) -> MixerSource:
+        """Start `to_source` at `at_sample`, fading it in while `from_name` fades out."""
+        if from_name in self.sources:
+            self.fade_out(from_name, at_sample, duration_samples)
+        to_source.fade.ramp(at_sample, at_sample + duration_samples, 1.0, from_value=0.0)
+        return self.add_source(to_source, start_sample=at_sample)
+
+    def sample_at(self, play_at: float, next_play_at: float) -> int:
+        """Position that plays at host time `play_at`, given the next block's play time."""
+        return self.position + int(round((play_at - next_play_at) * self.sample_rate))
+
+    def process(self, capture_chunk: Optional[bytes] = None) -> bytes:
+        """Mix one block. Its length follows `capture_chunk`, or `block_frames` without one."""
+        channels = self.channels
+        if capture_chunk:
+            n = len(capture_chunk) // (2 * channels)
+            capture = self.capture
+            if capture is None:
+                capture = self.add_source(CaptureSource(channels=channels))
+            if len(self.sources) == 1 and self._is_unity(capture, n):
+                # Nothing to mix in: pass the capture through untouched
+                self.position += n
+                return capture_chunk
+            capture.pending = capture_chunk
+        else:
+            n = self.block_frames
+        if n > MAX_BLOCK_FRAMES:
+            raise ValueError(f"Block of {n} frames exceeds {MAX_BLOCK_FRAMES}")
+
+        start = self.position
+        end = start + n
+        bus = self._bus[:n]
+        bus.fill(0.0)
+        ducking = any(s.ducks_others and s.start_sample < end for s in self.sources.values())
+
+        for source in list(self.sources.values()):
+            if source.start_sample >= end:
+                continue
+            offset = max(0, source.start_sample - start)
+            stop = n if source.stop_sample is None else min(n, source.stop_sample - start)
+            written = source.render(self._scratch[offset:stop]) if stop > offset else 0
+            if written:
+                scratch = self._scratch[offset:offset + written]
+                gains = self._block_gains(source, start + offset, written, ducking)
+                if gains is None:
+                    pass
+                elif isinstance(gains, float):
+                    if gains != 1.0:
+                        scratch *= gains
+                    bus[offset:offset + written] += scratch
+                else:
+                    scratch *= gains[:, None]
+                    bus[offset:offset + written] += scratch
+            source.level.prune(end)
+            source.fade.prune(end)
+            if source.finished or (source.stop_sample is not None and source.stop_sample <= end):
+                del self.sources[source.name]
+
+        self.position = end
+        np.clip(bus, -1.0, 32767.0 / 32768.0, out=bus)
+        bus *= 32768.0
+        out = self._out[:n]
+        np.copyto(out, bus, casting="unsafe")
+        return out.tobytes()
+
+    def _is_unity(self, source: MixerSource, n: int) -> bool:
+        start = self.position
+        return (source.duck_gain == 1.0 and source.stop_sample is None
+                and source.level.is_flat(start, start + n) and source.level.value(start) == 1.0
+                and source.fade.is_flat(start, start + n) and source.fade.value(start) == 1.0)
+
+    def _block_gains(self, source: MixerSource, position: int, n: int, ducking: bool):
+        """Gains for one source block: a float when constant, None when silent, else an array."""
+        duck_from = source.duck_gain
+        target = self.duck_level if ducking and not source.ducks_others else 1.0
+        if duck_from == target:
+            duck_to = duck_from
+        else:
+            rate = self.duck_attack if target < duck_from else self.duck_release
+            step = (1.0 - self.duck_level) * n / max(rate, 1.0)
+            duck_to = max(target, duck_from - step) if target < duck_from else min(target, duck_from + step)
+            source.duck_gain = duck_to
+
+        end = position + n
+        level, fade = source.level, source.fade
+        if duck_from == duck_to and level.is_flat(position, end) and fade.is_flat(position, end):
+            gain = level.value(position) * fade.value(position) * duck_to
+            return None if gain == 0.0 else gain
+
+        positions = self._index[:n] + position
+        gains = self._gains[:n]
+        level.fill(gains, positions)
+        fades = self._fades[:n]
+        fade.fill(fades, positions)
+        gains *= fades
+        if duck_from != duck_to:
+            fades[:] = self._index[:n]
+            fades *= (duck_to - duck_from) / n
+            fades += duck_from
+            gains *= fades
+        elif duck_to != 1.0:
+            gains *= duck_to
+        return gains
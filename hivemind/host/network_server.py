@@ -1,25 +1,115 @@
 import asyncio
-import json
+import itertools
 import logging
 import base64
-from typing import Callable, Dict, Any
+import socket
+from typing import Callable, Dict, Optional
 
-import websockets
+from hivemind.common.protocol import JSON_SERIALIZER, decode_frame, get_serializer
+from hivemind.config import (
+    MAX_FRAME_BYTES,
+    MAX_SEND_BUFFER_BYTES,
+    MAX_UNAUTHENTICATED_FRAME_BYTES,
+    SCALE_PING_INTERVAL_S,
+    SCALE_SOCKET_SNDBUF_BYTES,
+    SCALE_WS_MAX_QUEUE,
+    SOCKET_SNDBUF_BYTES,
+)
+from hivemind.host.dispatcher import MessageDispatcher
+from hivemind.host.traffic_recorder import CLOSE, CONNECT, DROPPED, INBOUND, OUTBOUND, TrafficRecorder
 
 logger = logging.getLogger(__name__)
 
+# websockets' State.OPEN, bound when the server starts (websockets is imported lazily)
+_OPEN = None
+
+
+class SharedFrame:
+    """A message serialized and framed once, then written to many connections.
+
+    Server-to-client frames are never masked, so every connection without a
+    negotiated extension can be handed the same bytes object; it is freed
+    when the last transport holding it has passed it to the kernel.
+    """
+
+    __slots__ = ("data", "_frame")
+
+    def __init__(self, data):
+        self.data = data
+        self._frame = None
+
+    @property
+    def frame(self) -> bytes:
+        if self._frame is None:
+            from websockets.frames import Frame, Opcode
+
+            data = self.data
+            if isinstance(data, str):
+                frame = Frame(Opcode.TEXT, data.encode("utf-8"))
+            else:
+                frame = Frame(Opcode.BINARY, bytes(data))
+            self._frame = frame.serialize(mask=False)
+        return self._frame
+
 
 class WSClient:
-    def __init__(self, ws, addr: str, server: "NetworkServer"):
+    __slots__ = ("ws", "addr", "server", "conn_id", "device_id", "authenticated", "serializer", "handshake")
+
+    def __init__(self, ws, addr: str, server: "NetworkServer", conn_id: int = 0):
         self.ws = ws
         self.addr = addr
         self.server = server
+        self.conn_id = conn_id
         self.device_id = None
         self.authenticated = False
+        # Wire format; starts as JSON and may change after the join handshake
+        self.serializer = JSON_SERIALIZER
+        # (HostHandshake, message type, payload) between join_challenge and join_confirm
+        self.handshake = None
+
+    @property
+    def is_open(self) -> bool:
+        return getattr(self.ws, "state", None) == _OPEN
+
+    def set_serializer(self, name: str):
+        self.serializer = get_serializer(name)
+
+    def write_buffer_size(self) -> int:
+        """Bytes queued in the transport but not yet accepted by the socket."""
+        transport = getattr(self.ws, "transport", None)
+        try:
+            return transport.get_write_buffer_size() if transport else 0
+        except Exception:
+            return 0
+
+    def write_shared(self, shared: SharedFrame) -> Optional[bool]:
+        """Write a pre-built frame straight to the transport, without waiting for drain.
+
+        Returns False when this connection can't take a shared frame (an
+        extension was negotiated, or it is closing) and needs `ws.send`,
+        and None when the frame was dropped because the client is too far
+        behind (counted under `dropped_backpressure`).
+        """
+        protocol = getattr(self.ws, "protocol", None)
+        if protocol is None or protocol.extensions or protocol.state != _OPEN:
+            return False
+        transport = self.ws.transport
+        if transport.is_closing():
+            return False
+        if transport.get_write_buffer_size() > self.server.max_send_buffer_bytes:
+            # A listener this far behind is dropped frames, never waited on
+            self.server.send_metrics["dropped_backpressure"] += 1
+            return None
+        transport.write(shared.frame)
+        return True
 
     async def send_message(self, message):
         try:
-            await self.ws.send(json.dumps(message))
+            data = self.serializer.dumps(message)
+            await self.ws.send(data)
+            recorder = self.server.recorder
+            if recorder is not None:
+                recorder.record(OUTBOUND, self.conn_id, data)
         except Exception:
             logger.exception("Failed to send to client %s", self.addr)
 
@@ -29,13 +119,41 @@ class NetworkServer:
 
     Exposes `register_handler(message_type, handler)` where handler is
     `async def handler(client, payload, audio_data)` and `broadcast(message)`.
+    Handlers for one client run in arrival order through a `MessageDispatcher`.
+    With a `TrafficRecorder`, every frame in and out is logged for replay.
+
+    Compression is never negotiated (audio doesn't compress and deflate
+    state costs memory per connection), so `send_to` frames each message
+    once and writes the same bytes to every socket. `scale_mode` trims the
+    remaining per-connection cost for hosts with thousands of idle listeners:
+    smaller kernel send buffers, a shorter inbound queue and rarer keepalives.
+
+    Set `sock` before `start()` to serve on an already-listening socket (one
+    inherited from a previous host process, see `hivemind.host.handoff`).
     """
 
-    def __init__(self, port: int = 7878, host: str = "0.0.0.0"):
+    def __init__(self, port: int = 7878, host: str = "0.0.0.0",
+                 dispatcher: MessageDispatcher = None,
+                 max_frame_bytes: int = MAX_FRAME_BYTES,
+                 max_unauthenticated_frame_bytes: int = MAX_UNAUTHENTICATED_FRAME_BYTES,
+                 recorder: Optional[TrafficRecorder] = None,
+                 scale_mode: bool = False,
+                 max_send_buffer_bytes: int = MAX_SEND_BUFFER_BYTES):
         self.port = port
         self.host = host
         self.handlers: Dict[str, Callable] = {}
         self.clients: Dict[str, WSClient] = {}
+        self.dispatcher = dispatcher or MessageDispatcher()
+        self.max_frame_bytes = max_frame_bytes
+        self.max_unauthenticated_frame_bytes = max_unauthenticated_frame_bytes
+        self.recorder = recorder
+        self.scale_mode = scale_mode
+        self.max_send_buffer_bytes = max_send_buffer_bytes
+        self.sndbuf_bytes = SCALE_SOCKET_SNDBUF_BYTES if scale_mode else SOCKET_SNDBUF_BYTES
+        self.send_metrics = {"shared_frames": 0, "shared_writes": 0, "fallback_sends": 0,
+                             "dropped_backpressure": 0, "bytes_sent": 0}
+        self._conn_ids = itertools.count(1)
+        self.sock: Optional[socket.socket] = None
         self._server = None
         self._stop_event = asyncio.Event()
 
@@ -45,21 +163,45 @@ class NetworkServer:
         self.handlers[key] = handler
 
     async def _handler(self, websocket, path=None):
+        from websockets import ConnectionClosed
+
         addr = f"{websocket.remote_address[0]}:{websocket.remote_address[1]}"
-        client = WSClient(websocket, addr, self)
+        self._tune_socket(websocket)
+        client = WSClient(websocket, addr, self, next(self._conn_ids))
         client_id = addr
         self.clients[client_id] = client
+        self.dispatcher.open_client(client)
+        metrics = self.dispatcher.metrics
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record(CONNECT, client.conn_id, addr)
         logger.info(f"Client connected: {addr}")
 
         try:
             async for raw in websocket:
+                if recorder is not None:
+                    recorder.record(INBOUND, client.conn_id, raw)
+
+                # Cheap checks first: an unjoined client never gets a large frame parsed
+                if not client.authenticated and len(raw) > self.max_unauthenticated_frame_bytes:
+                    metrics["dropped_oversize"] += 1
+                    continue
+
                 try:
-                    msg = json.loads(raw)
+                    msg = decode_frame(raw)
                 except Exception:
-                    logger.warning("Received non-JSON from %s", addr)
+                    metrics["dropped_invalid"] += 1
+                    logger.warning("Received undecodable frame from %s", addr)
+                    continue
+                if not isinstance(msg, dict):
+                    metrics["dropped_invalid"] += 1
                     continue
 
                 mtype = msg.get("type")
+                handler = self.handlers.get(mtype)
+                if handler is None or not self.dispatcher.allow(client, mtype):
+                    continue
+
                 payload = msg.get("payload")
                 audio_data = msg.get("audio_data")
 
@@ -70,19 +212,48 @@ class NetworkServer:
                     except Exception:
                         audio_data = audio_data
 
-                handler = self.handlers.get(mtype)
-                if handler:
-                    # Call handler but don't block other clients
-                    asyncio.create_task(handler(client, payload or {}, audio_data))
+                self.dispatcher.submit(client, handler, payload or {}, audio_data)
 
-        except websockets.ConnectionClosed:
+        except ConnectionClosed:
             logger.info(f"Client disconnected: {addr}")
         finally:
+            if recorder is not None:
+                recorder.record(CLOSE, client.conn_id)
             self.clients.pop(client_id, None)
+            if client.device_id is not None and self.clients.get(client.device_id) is client:
+                del self.clients[client.device_id]
+            self.dispatcher.close_client(client)
+
+    def _tune_socket(self, websocket):
+        sock = websocket.transport.get_extra_info("socket")
+        if sock is None:
+            return
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.sndbuf_bytes:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf_bytes)
+        except OSError:
+            logger.debug("Could not tune socket for %s", websocket.remote_address, exc_info=True)
 
     async def start(self):
-        logger.info(f"Starting WebSocket server on {self.host}:{self.port}")
-        self._server = await websockets.serve(self._handler, self.host, self.port)
+        # Imported here so merely importing the server (e.g. by the dashboard) stays cheap
+        global _OPEN
+        import websockets
+        from websockets.protocol import State
+
+        _OPEN = State.OPEN
+        options = {"max_size": self.max_frame_bytes, "compression": None}
+        if self.scale_mode:
+            options.update(max_queue=SCALE_WS_MAX_QUEUE, ping_interval=SCALE_PING_INTERVAL_S,
+                           ping_timeout=SCALE_PING_INTERVAL_S)
+        if self.sock is not None:
+            host, port = self.sock.getsockname()[:2]
+            logger.info(f"Serving WebSocket connections on inherited socket {host}:{port}")
+            self._server = await websockets.serve(self._handler, sock=self.sock, **options)
+        else:
+            logger.info(f"Starting WebSocket server on {self.host}:{self.port}"
+                        f"{' (scale mode)' if self.scale_mode else ''}")
+            self._server = await websockets.serve(self._handler, self.host, self.port, **options)
         await self._stop_event.wait()
         # shutdown
         self._server.close()
@@ -92,27 +263,49 @@ class NetworkServer:
     async def stop(self):
         self._stop_event.set()
 
-    async def broadcast(self, message):
-        # Convert any bytes in message to base64 strings for JSON transport
-        def _serialize(obj: Any):
-            if isinstance(obj, (bytes, bytearray)):
-                return base64.b64encode(bytes(obj)).decode('ascii')
-            raise TypeError()
+    def stop_accepting(self):
+        """Close the listening socket(s) but keep every open connection."""
+        self._server.server.close()
 
-        try:
-            data = json.dumps(message, default=_serialize)
-        except TypeError:
-            # Fallback: strip non-serializable entries
-            msg = {}
-            for k, v in message.items():
-                if isinstance(v, (bytes, bytearray)):
-                    msg[k] = base64.b64encode(bytes(v)).decode('ascii')
-                else:
-                    msg[k] = v
-            data = json.dumps(msg)
+    def get_metrics(self) -> dict:
+        """Dispatch counters plus current per-client queue depths."""
+        return {**self.dispatcher.get_metrics(), **self.send_metrics,
+                "queue_depths": self.dispatcher.queue_depths()}
+
+    async def broadcast(self, message):
+        """Send to every joined client once (a node is listed under its address and its device id)."""
+        await self.send_to(list(dict.fromkeys(c for c in self.clients.values() if c.authenticated)), message)
 
-        for client in list(self.clients.values()):
+    async def send_to(self, clients, message):
+        """Send `message` to `clients`, serializing and framing once per wire format in use."""
+        frames = {}
+        recorder = self.recorder
+        metrics = self.send_metrics
+        for client in clients:
+            serializer = client.serializer
+            shared = frames.get(serializer)
+            if shared is None:
+                try:
+                    shared = frames[serializer] = SharedFrame(serializer.dumps(message))
+                except Exception:
+                    logger.exception("Failed to serialize broadcast")
+                    return
+                metrics["shared_frames"] += 1
             try:
-                await client.ws.send(data)
+                written = client.write_shared(shared)
+                if written:
+                    metrics["shared_writes"] += 1
+                    metrics["bytes_sent"] += len(shared.frame)
+                elif written is None:
+                    # Logged apart from what went out: the client never got it
+                    if recorder is not None:
+                        recorder.record(DROPPED, client.conn_id, shared.data)
+                    continue
+                else:
+                    metrics["fallback_sends"] += 1
+                    metrics["bytes_sent"] += len(shared.data)
+                    await client.ws.send(shared.data)
+                if recorder is not None:
+                    recorder.record(OUTBOUND, client.conn_id, shared.data)
             except Exception:
                 logger.exception("Broadcast to client failed")
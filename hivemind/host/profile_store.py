@@ -0,0 +1,160 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def default_profile_path() -> Path:
+    """Where learned profiles live unless a path is given: `$HIVEMIND_PROFILE_DB`, else the user's state dir."""
+    if os.environ.get("HIVEMIND_PROFILE_DB"):
+        return Path(os.environ["HIVEMIND_PROFILE_DB"]).expanduser()
+    state = os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state"
+    return Path(state) / "hiveminde" / "profiles.sqlite3"
+
+
+# Learned per-device values that survive host restarts
+PROFILE_FIELDS = ("latency_ms", "clock_offset", "clock_skew_ppm", "tier", "output_delay_ms")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS node_profiles ("
+    " device_id TEXT PRIMARY KEY,"
+    " latency_ms REAL, clock_offset REAL, clock_skew_ppm REAL,"
+    " tier INTEGER, output_delay_ms REAL,"
+    " joins INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL)"
+)
+_UPSERT = (
+    "INSERT INTO node_profiles (device_id, latency_ms, clock_offset, clock_skew_ppm, tier,"
+    " output_delay_ms, joins, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    " ON CONFLICT(device_id) DO UPDATE SET latency_ms=excluded.latency_ms,"
+    " clock_offset=excluded.clock_offset, clock_skew_ppm=excluded.clock_skew_ppm,"
+    " tier=excluded.tier, output_delay_ms=excluded.output_delay_ms,"
+    " joins=excluded.joins, updated_at=excluded.updated_at"
+)
+
+
+class NodeProfileStore:
+    """SQLite-backed store of what the host has learned about each device.
+
+    All profiles are loaded into memory on `open()`, so `get()` and `update()`
+    never touch the disk and are safe to call from the event loop. Updates mark
+    the profile dirty; a writer thread flushes dirty profiles in one
+    transaction every `flush_interval` seconds and once more on `close()`.
+    """
+
+    def __init__(self, path=None, flush_interval: float = 2.0, clock=time.time):
+        self.path = str(path or default_profile_path())
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._profiles: Dict[str, dict] = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._loaded = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.writes = 0
+
+    def open(self):
+        """Start the writer thread and wait until existing profiles are loaded."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profile-store", daemon=True)
+        self._thread.start()
+        self._loaded.wait()
+
+    def close(self):
+        """Flush pending writes and stop the writer thread (blocking)."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+    def get(self, device_id: str) -> Optional[dict]:
+        with self._lock:
+            profile = self._profiles.get(device_id)
+            return dict(profile) if profile else None
+
+    def update(self, device_id: str, **fields):
+        """Merge learned values into a device's profile; persisted on the next flush."""
+        unknown = set(fields) - set(PROFILE_FIELDS) - {"joins"}
+        if unknown:
+            raise ValueError(f"Unknown profile fields: {sorted(unknown)}")
+        with self._lock:
+            profile = self._profiles.setdefault(device_id, {"joins": 0})
+            profile.update((k, v) for k, v in fields.items() if v is not None)
+            profile["updated_at"] = self.clock()
+            self._dirty.add(device_id)
+
+    def record_join(self, device_id: str) -> Optional[dict]:
+        """Count a join and return the profile as it was before it (None if new)."""
+        previous = self.get(device_id)
+        self.update(device_id, joins=(previous or {}).get("joins", 0) + 1)
+        return previous
+
+    def flush(self):
+        """Ask the writer thread to persist dirty profiles now."""
+        self._wake.set()
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def _run(self):
+        try:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path)
+        except (OSError, sqlite3.Error):
+            logger.exception("Cannot open profile store %s; profiles will not persist", self.path)
+            self._loaded.set()
+            return
+        try:
+            self._load(conn)
+            self._loaded.set()
+            while not self._stop.is_set():
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                self._write(conn)
+            self._write(conn)
+        finally:
+            self._loaded.set()
+            conn.close()
+
+    def _load(self, conn):
+        conn.execute(_SCHEMA)
+        conn.commit()
+        columns = PROFILE_FIELDS + ("joins", "updated_at")
+        rows = conn.execute(f"SELECT device_id, {', '.join(columns)} FROM node_profiles").fetchall()
+        with self._lock:
+            for row in rows:
+                profile = {k: v for k, v in zip(columns, row[1:]) if v is not None}
+                # Anything learned before the load wins over the stored copy
+                profile.update(self._profiles.get(row[0], {}))
+                self._profiles[row[0]] = profile
+        logger.info("Loaded %d node profiles from %s", len(rows), self.path)
+
+    def _write(self, conn):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            rows = []
+            for device_id in dirty:
+                p = self._profiles[device_id]
+                rows.append((device_id, *(p.get(k) for k in PROFILE_FIELDS),
+                             p.get("joins", 0), p["updated_at"]))
+        if not rows:
+            return
+        try:
+            with conn:
+                conn.executemany(_UPSERT, rows)
+            self.writes += 1
+        except sqlite3.Error:
+            logger.exception("Failed to persist %d node profiles", len(rows))
+            with self._lock:
+                self._dirty |= dirty
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from hivemind.config import PROFILE_HZ, PROFILE_MAX_OVERHEAD
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = str(Path(__file__).resolve().parents[2]) + os.sep
+
+# Innermost frame of an event loop waiting for I/O or its next timer
+_SELECT = ("selectors.py", "select")
+
+LOOP_THREAD = "event-loop"
+IDLE = "(idle)"
+CALLBACKS = "(callbacks)"   # loop time outside any task: transports, call_soon/call_later
+
+
+class SamplingProfiler:
+    """Statistical profiler for a running host: no restart, no tracing hooks.
+
+    A background thread wakes `hz` times a second, takes the stack of every
+    other thread with `sys._current_frames()`, and counts each stack in
+    collapsed form (`thread;outer;...;inner count` per line, the input of
+    flamegraph.pl and speedscope). For the event-loop thread each sample is
+    also charged to the task running at that moment, named after its
+    outermost coroutine from this project (`NetworkServer._handler`,
+    `HiveMindHostEnhanced._audio_distribution_loop`, ...), or to `(idle)`
+    while the loop waits in its selector.
+
+    Overhead: a sample holds the GIL while it walks the stacks, which is time
+    taken from the event loop: about 100 us for an idle host's three
+    threads, so 1% at the default 100 Hz. The sampler times each sample and
+    stretches the interval so sampling stays under `max_overhead` of wall
+    time (2% by default) whatever `hz` asks for; `report()` states the
+    overhead actually paid.
+    """
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None, loop_thread: Optional[int] = None,
+                 hz: float = PROFILE_HZ, max_overhead: float = PROFILE_MAX_OVERHEAD):
+        self.loop = loop
+        self.loop_thread = loop_thread
+        self.hz = hz
+        self.max_overhead = max_overhead
+        self.stacks = Counter()
+        self.tasks = Counter()
+        self.threads = Counter()
+        self.samples = 0
+        self._spent = 0.0       # seconds spent sampling
+        self._started = None
+        self._stopped = None
+        self._labels = {}       # code object -> frame label
+        self._project = {}      # code object -> whether it is this project's
+        self._ignore = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._stopped = None
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._stopped = time.perf_counter()
+
+    def profile(self, seconds: float) -> "SamplingProfiler":
+        """Sample for `seconds` (blocking; the calling thread is left out)."""
+        self._ignore.add(threading.get_ident())
+        self.start()
+        try:
+            time.sleep(seconds)
+        finally:
+            self.stop()
+            self._ignore.discard(threading.get_ident())
+        return self
+
+    def _run(self):
+        self._ignore.add(threading.get_ident())
+        interval = 1.0 / self.hz
+        keep = (1.0 - self.max_overhead) / self.max_overhead
+        while not self._stop.wait(interval):
+            began = time.perf_counter()
+            self._sample()
+            cost = time.perf_counter() - began
+            self._spent += cost
+            # Idle for at least `keep` times what the sample cost
+            interval = max(1.0 / self.hz, cost * keep)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{os.path.basename(code.co_filename)}:{code.co_qualname}"
+            self._labels[code] = label
+        return label
+
+    def _ours(self, code) -> bool:
+        ours = self._project.get(code)
+        if ours is None:
+            ours = self._project[code] = os.path.abspath(code.co_filename).startswith(_PROJECT_ROOT)
+        return ours
+
+    def _task_label(self, codes) -> str:
+        """Outermost project coroutine among the running task's frames (`codes`, innermost first)."""
+        label = outermost = None
+        for code in codes:
+            if code.co_name == "_run" and os.path.basename(code.co_filename) == "events.py":
+                break  # asyncio.Handle._run: the task's frames are all inside it
+            outermost = code.co_qualname
+            if self._ours(code):
+                label = outermost
+        return label or outermost
+
+    def _sample(self):
+        frames = sys._current_frames()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in frames.items():
+            if ident in self._ignore:
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            if ident == self.loop_thread:
+                thread = LOOP_THREAD
+                code = codes[0]
+                if self.loop is not None and asyncio.current_task(self.loop) is not None:
+                    self.tasks[self._task_label(codes)] += 1
+                elif (os.path.basename(code.co_filename), code.co_name) == _SELECT:
+                    self.tasks[IDLE] += 1
+                else:
+                    self.tasks[CALLBACKS] += 1
+            else:
+                thread = names.get(ident, str(ident))
+            label = self._label
+            self.stacks[";".join([thread] + [label(code) for code in reversed(codes)])] += 1
+            self.threads[thread] += 1
+        self.samples += 1
+
+    @property
+    def elapsed(self) -> float:
+        if self._started is None:
+            return 0.0
+        return (self._stopped or time.perf_counter()) - self._started
+
+    @property
+    def overhead(self) -> float:
+        """Share of wall time spent taking samples."""
+        elapsed = self.elapsed
+        return self._spent / elapsed if elapsed else 0.0
+
+    def collapsed(self) -> str:
+        """One `stack count` line per distinct stack, most frequent first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def report(self) -> dict:
+        loop_samples = sum(self.tasks.values())
+        return {
+            "seconds": self.elapsed,
+            "samples": self.samples,
+            "hz": self.samples / self.elapsed if self.elapsed else 0.0,
+            "overhead": self.overhead,
+            # Share of event-loop time per coroutine
+            "loop": {label: count / loop_samples for label, count in self.tasks.most_common()},
+            "threads": dict(self.threads.most_common()),
+        }
+
+    def save(self, path):
+        """Write the collapsed stacks to `path` and log where loop time went."""
+        with open(path, "w") as f:
+            f.write(self.collapsed())
+        report = self.report()
+        logger.info("Profile: %d samples over %.1f s (%.2f%% overhead) written to %s",
+                    report["samples"], report["seconds"], report["overhead"] * 100, path)
+        for label, share in report["loop"].items():
+            logger.info("  %5.1f%%  %s", share * 100, label)
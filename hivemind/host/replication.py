@@ -0,0 +1,428 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from hivemind.common.protocol import (
+    JSON_SERIALIZER,
+    MessageType,
+    Protocol,
+    available_serializers,
+    decode_frame,
+)
+from hivemind.common.session_auth import authenticate, available_ciphers, open_key, seal_key
+from hivemind.config import (
+    FAILOVER_CONNECT_TIMEOUT_S,
+    FAILOVER_MISSED_INTERVALS,
+    FAILOVER_PROBES,
+    FAILOVER_RTT_FACTOR,
+    RECONNECT_BASE_S,
+    RECONNECT_MAX_S,
+    REPLICATION_INTERVAL_S,
+    SYNC_BURST,
+    SYNC_INTERVAL_S,
+)
+from hivemind.node.time_sync_client import TimeSyncClient
+
+logger = logging.getLogger(__name__)
+
+_HELLO = MessageType.REPLICA_HELLO.value
+_STATE = MessageType.REPLICA_STATE.value
+_POSITION = MessageType.REPLICA_POSITION.value
+_TIME_SYNC_REQUEST = MessageType.TIME_SYNC_REQUEST.value
+_TIME_SYNC_RESPONSE = MessageType.TIME_SYNC_RESPONSE.value
+_REDIRECT = MessageType.REDIRECT.value
+
+# Node record fields that let their holder resume as the node; sealed on the replication link
+_KEY_FIELDS = ("session_key", "resume_counter")
+_CODE_CONTEXT = "session code"
+
+
+class _Redirected(Exception):
+    """The primary is handing over to a new process (see hivemind.host.handoff)."""
+
+
+def node_record(host, device_id: str) -> dict:
+    """What a standby needs to resume one node: identity, resume token and learned state."""
+    info = host.session_manager.nodes[device_id]
+    map_key, delay = host.spatial.placement(device_id)
+    clock = host.clock_sync.get_estimate(device_id)
+    return {
+        "name": info.get("name"),
+        "metadata": info.get("metadata") or {},
+        "resume_token": info.get("resume_token"),
+        "session_key": info.get("session_key"),
+        "resume_counter": info.get("resume_counter", 0),
+        "latency_ms": info.get("latency_ms"),
+        "output_delay_ms": info.get("output_delay_ms"),
+        "tier": host.bitrate_controller.tier_for(device_id),
+        # Copied: the service updates its estimates in place
+        "clock": dict(clock) if clock else None,
+        "channel_map": host.spatial.describe(map_key),
+        "delay_ms": delay * 1000.0,
+    }
+
+
+def seal_record(key: bytes, device_id: str, record: dict) -> dict:
+    """`record` with the node's session key and resume counter sealed under a replication link's key.
+
+    Without `cryptography` they are left out: the node then runs a full
+    handshake with the standby instead of resuming on its key.
+    """
+    sealed = {k: v for k, v in record.items() if k not in _KEY_FIELDS}
+    if record.get("session_key") and available_ciphers():
+        counter = int(record.get("resume_counter") or 0)
+        sealed["keys"] = seal_key(key, bytes.fromhex(record["session_key"]) + counter.to_bytes(8, "big"),
+                                  f"node {device_id}")
+    return sealed
+
+
+def _open(key: Optional[bytes], sealed: str, context: str) -> bytes:
+    """Open something sealed for this link; ValueError if we cannot (it fails the link like any bad message)."""
+    from hivemind.common.session_auth import InvalidTag
+
+    if key is None:
+        raise ValueError("Sealed replication state, but no replication key to open it")
+    try:
+        return open_key(key, sealed, context)
+    except InvalidTag:
+        raise ValueError("Sealed replication state failed authentication") from None
+
+
+def _open_record(key: Optional[bytes], device_id: str, record: dict) -> dict:
+    if "keys" not in record:
+        return record
+    secret = _open(key, record["keys"], f"node {device_id}")
+    return {**record, "session_key": secret[:-8].hex(), "resume_counter": int.from_bytes(secret[-8:], "big")}
+
+
+def restore_state(host, msg: dict, key: Optional[bytes] = None):
+    """Apply a `ReplicationSource.snapshot()` (full or diff) to `host`.
+
+    `key` opens the node keys (and a changed session code) that a primary
+    sealed for this replication link (see `ReplicationSource.seal`).
+    """
+    sm = host.session_manager
+    if "term" in msg:
+        host.term = msg["term"]
+    if "session_code" in msg:
+        sm.session_code = _open(key, msg["session_code"], _CODE_CONTEXT).decode()
+    nodes = msg.get("nodes") or {}
+    removed = list(msg.get("removed") or ())
+    if msg.get("full"):
+        removed += [d for d in sm.nodes if d not in nodes]
+        if msg.get("next_play_at") is not None:
+            host.audio_scheduler.resume_at(msg["sequence"], msg["next_play_at"])
+    for device_id, record in nodes.items():
+        _restore_node(host, device_id, _open_record(key, device_id, record))
+    for device_id in removed:
+        sm.remove_node(device_id)
+        host.bitrate_controller.forget(device_id)
+        host.clock_sync.forget(device_id)
+        host.spatial.forget(device_id)
+    if "timeline" in msg:
+        sm.timeline.restore(msg["timeline"])
+
+
+def _restore_node(host, device_id: str, record: dict):
+    fields = {k: record.get(k) for k in
+              ("name", "metadata", "resume_token", "session_key", "resume_counter")}
+    fields.update({k: record[k] for k in ("latency_ms", "output_delay_ms") if record.get(k) is not None})
+    host.session_manager.restore_node(device_id, **fields)
+    host.bitrate_controller.set_tier(device_id, record.get("tier", 0))
+    if record.get("clock"):
+        host.clock_sync.restore_estimate(device_id, record["clock"])
+    placement = host.spatial.get_node(device_id)
+    if placement != {"channel_map": record["channel_map"], "delay_ms": record["delay_ms"]}:
+        host.spatial.set_node(device_id, record["channel_map"], record["delay_ms"])
+
+
+class ReplicationSource:
+    """Primary side: streams session state to attached standby hosts.
+
+    A standby gets a full snapshot when it attaches, then every `interval`
+    the nodes that changed or left (and the timeline, when it changed), and
+    after every distributed chunk the position of the audio timeline. The
+    periodic message goes out even when nothing changed, so a standby can
+    tell a quiet primary from a dead one.
+
+    The link itself is plain WebSocket. What would let an eavesdropper pose
+    as a node, each node's session key and resume counter, is sealed under
+    the key of the standby's own handshake. The session code is never sent:
+    the standby proved it to attach, and only a changed code goes out, sealed.
+
+    When the standby drops off, it may have taken over while we were still
+    alive (a stall longer than its timeout, a partition). We then ask it a
+    few times: if it serves the session under a newer term, this host steps
+    down and redirects its nodes there, so the session never has two hosts.
+    """
+
+    def __init__(self, host, interval: float = REPLICATION_INTERVAL_S):
+        self.host = host
+        self.interval = interval
+        self.replicas = []
+        # replica connection -> [link key, session code it knows]
+        self._links: Dict[object, List] = {}
+        # {"host", "port"} advertised to nodes in join_accept
+        self.standby: Optional[dict] = None
+        # ...and of the last standby that detached, which may have taken over
+        self.last_standby: Optional[dict] = None
+        self._sent_nodes = {}
+        self._sent_timeline = None
+        self._changed: Optional[asyncio.Event] = None
+
+    def mark_changed(self):
+        """Send the next diff now instead of at the next interval (e.g. a node just joined)."""
+        if self._changed is not None:
+            self._changed.set()
+
+    def attach(self, client, address: dict, key: bytes) -> dict:
+        """Register a standby connection that authenticated with handshake key `key`.
+
+        Returns the full snapshot to send it, sealed for that link.
+        """
+        self.replicas.append(client)
+        self._links[client] = [key, self.host.session_manager.session_code]
+        self.standby = address
+        logger.info("Standby attached from %s, advertised as %s:%s", client.addr, address["host"], address["port"])
+        return self.seal(self.snapshot(full=True), client)
+
+    def seal(self, message: dict, client) -> dict:
+        """A copy of a snapshot for one replica, with node keys and a changed session code sealed."""
+        link = self._links[client]
+        key = link[0]
+        sealed = dict(message)
+        if message.get("nodes"):
+            sealed["nodes"] = {device_id: seal_record(key, device_id, record)
+                               for device_id, record in message["nodes"].items()}
+        code = self.host.session_manager.session_code
+        if code != link[1]:
+            if available_ciphers():
+                sealed["session_code"] = seal_key(key, code.encode(), _CODE_CONTEXT)
+            else:
+                logger.warning("Session code changed, but the standby cannot be told without 'cryptography'")
+            link[1] = code
+        return sealed
+
+    def snapshot(self, full: bool = False) -> dict:
+        """Session state with node keys in the clear: `seal` it for a replica."""
+        host = self.host
+        sm = host.session_manager
+        nodes = {device_id: node_record(host, device_id) for device_id in sm.nodes}
+        message = {"type": _STATE, "term": host.term}
+        if full:
+            sequence, next_play_at = host.audio_scheduler.position
+            message.update(full=True, nodes=nodes, timeline=sm.timeline.snapshot(),
+                           sequence=sequence, next_play_at=next_play_at)
+            return message
+
+        message["nodes"] = {d: r for d, r in nodes.items() if self._sent_nodes.get(d) != r}
+        removed = [d for d in self._sent_nodes if d not in nodes]
+        if removed:
+            message["removed"] = removed
+        if sm.timeline.version != self._sent_timeline:
+            message["timeline"] = sm.timeline.snapshot()
+            self._sent_timeline = sm.timeline.version
+        self._sent_nodes = nodes
+        return message
+
+    async def publish_position(self, schedule_info: dict):
+        """Tell standbys where the timeline continues after a chunk that has been sent."""
+        if not self.replicas:
+            return
+        message = {
+            "type": _POSITION,
+            "sequence": schedule_info["sequence"] + 1,
+            "next_play_at": schedule_info["play_at"] + schedule_info["duration"],
+        }
+        await self.host.network_server.send_to(self.replicas, message)
+
+    async def announce(self):
+        """Push the current standby address to every joined node."""
+        clients = [c for c in set(self.host.network_server.clients.values()) if c.device_id is not None]
+        await self.host.network_server.send_to(clients, Protocol.create_standby_update(self.standby))
+
+    async def run(self):
+        self._changed = changed = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(changed.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            changed.clear()
+            alive = [c for c in self.replicas if c.is_open]
+            if len(alive) != len(self.replicas):
+                self.replicas = alive
+                self._links = {c: link for c, link in self._links.items() if c in alive}
+                if not alive:
+                    logger.warning("Standby host detached")
+                    self.last_standby, self.standby = self.standby, None
+                    await self.announce()
+                    self.host._spawn(self._watch_takeover(self.last_standby))
+            if self.replicas:
+                message = self.snapshot()
+                for replica in self.replicas:
+                    await self.host.network_server.send_to([replica], self.seal(message, replica))
+
+    async def _watch_takeover(self, address: dict):
+        """Step down if the standby that just detached now serves the session under a newer term."""
+        import websockets
+
+        uri = f"ws://{address['host']}:{address['port']}"
+        for _ in range(FAILOVER_PROBES):
+            await asyncio.sleep(FAILOVER_MISSED_INTERVALS * self.interval)
+            if self.replicas:
+                # It came back as a standby
+                return
+            try:
+                async with websockets.connect(uri, compression=None,
+                                              open_timeout=FAILOVER_CONNECT_TIMEOUT_S) as ws:
+                    # Authenticated both ways, so nobody without the code can make us step down
+                    raw, _ = await authenticate(ws, self.host.session_manager.session_code,
+                                                {"type": _HELLO, "payload": {"probe": True}}, "replica")
+            except (OSError, ValueError, asyncio.TimeoutError, websockets.WebSocketException):
+                continue
+            term = decode_frame(raw).get("term")
+            if isinstance(term, int) and term > self.host.term:
+                logger.warning("Standby %s:%s took the session over (term %d)", address["host"], address["port"], term)
+                await self.host.step_down(address)
+                return
+
+
+class StandbyReplica:
+    """Standby side: mirrors a primary's session and takes it over when the primary goes away.
+
+    Connects to the primary as a replica, applies its snapshots and diffs,
+    follows its audio timeline and measures the offset to its clock, which
+    becomes this host's time base. Once it holds a snapshot and has heard
+    nothing from the primary for `timeout` (`missed_intervals` replication
+    messages plus a few round trips), it promotes the host under the next
+    term: nodes failing over present their resume tokens and find their
+    records here. A lost link alone is not enough; until then the standby
+    keeps reconnecting. A primary that is restarting redirects its standbys
+    like its nodes; they follow the new process instead of taking over.
+    """
+
+    def __init__(self, host, primary: Tuple[str, int], advertise_host: Optional[str] = None,
+                 missed_intervals: int = FAILOVER_MISSED_INTERVALS):
+        self.host = host
+        self.primary = primary
+        self.advertise_host = advertise_host
+        self.missed_intervals = missed_intervals
+        self.time_sync = TimeSyncClient(clock=time.time)
+        self.promoted = asyncio.Event()
+        self.synced = False
+        self._last_heard = 0.0
+        # Key from the handshake with the primary; opens what it seals for us
+        self._key: Optional[bytes] = None
+
+    async def run(self):
+        import websockets
+
+        delay = RECONNECT_BASE_S
+        while not self.promoted.is_set():
+            try:
+                await self._follow()
+            except _Redirected:
+                logger.info("Primary %s:%d is restarting; following the new process", *self.primary)
+                delay = RECONNECT_BASE_S
+                continue
+            except (OSError, ValueError, asyncio.TimeoutError, websockets.WebSocketException):
+                logger.debug("Replication link to %s:%d lost", *self.primary, exc_info=True)
+            if self.synced:
+                remaining = self._last_heard + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    self.promote()
+                    return
+                # The primary may only have stalled; keep trying it until the timeout runs out
+                await asyncio.sleep(min(delay, remaining))
+            else:
+                await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_S)
+
+    @property
+    def timeout(self) -> float:
+        """Primary silence after which the standby takes over."""
+        rtt = self.time_sync.last_rtt or 0.0
+        return self.missed_intervals * REPLICATION_INTERVAL_S + FAILOVER_RTT_FACTOR * rtt
+
+    async def _follow(self):
+        import websockets
+
+        server = self.host.network_server
+        while server._server is None:
+            await asyncio.sleep(0.01)
+        host, port = self.primary
+        ws = await websockets.connect(f"ws://{host}:{port}", compression=None, max_size=None,
+                                      open_timeout=max(1.0, self.timeout))
+        syncing = None
+        try:
+            hello = {
+                "host": self.advertise_host,
+                "port": server._server.sockets[0].getsockname()[1],
+                "serializers": available_serializers(),
+            }
+            # Prove the session code like a node does; the first state message follows
+            raw, handshake = await authenticate(ws, self.host.session_manager.session_code,
+                                                {"type": _HELLO, "payload": hello}, "replica",
+                                                timeout=max(1.0, self.timeout))
+            self._key = handshake.key
+            self.apply(decode_frame(raw))
+            syncing = asyncio.create_task(self._sync_loop(ws))
+            while True:
+                timeout = self._last_heard + self.timeout - time.monotonic() if self.synced else None
+                raw = await asyncio.wait_for(ws.recv(), timeout)
+                self.apply(decode_frame(raw))
+        finally:
+            if syncing is not None:
+                syncing.cancel()
+            # Never wait on a close handshake with a primary that may be dead
+            ws.transport.abort()
+
+    async def _sync_loop(self, ws):
+        for n in itertools.count():
+            await ws.send(JSON_SERIALIZER.dumps({"type": _TIME_SYNC_REQUEST,
+                                                 "payload": self.time_sync.make_request()}))
+            await asyncio.sleep(0.02 if n < SYNC_BURST else SYNC_INTERVAL_S)
+
+    def apply(self, msg: dict):
+        self._last_heard = time.monotonic()
+        mtype = msg.get("type")
+        if mtype == _POSITION:
+            self.host.audio_scheduler.resume_at(msg["sequence"], msg["next_play_at"])
+        elif mtype == _TIME_SYNC_RESPONSE:
+            self.time_sync.handle_response(msg["host_time"], msg["client_time"])
+            # Adopt the primary's time base so nodes' clock estimates stay valid
+            self.host.host_clock.offset = self.time_sync.offset
+        elif mtype == _STATE:
+            self._apply_state(msg)
+        elif mtype == _REDIRECT:
+            host, port = self.primary
+            self.primary = (msg.get("host") or host, int(msg.get("port") or port))
+            raise _Redirected()
+        elif mtype == MessageType.JOIN_REJECT.value:
+            raise ConnectionError(f"Primary refused replication: {msg.get('reason')}")
+
+    def _apply_state(self, msg: dict):
+        restore_state(self.host, msg, self._key)
+        if msg.get("full"):
+            if not self.synced:
+                sm = self.host.session_manager
+                logger.info("Standby synced with %s:%d: session %s, %d nodes",
+                            *self.primary, sm.session_code, len(sm.nodes))
+            self.synced = True
+
+    def promote(self):
+        if self.promoted.is_set():
+            return
+        sm = self.host.session_manager
+        now = time.time()
+        for info in sm.nodes.values():
+            # Give every replicated node the full stale timeout to fail over
+            info["last_seen"] = now
+        # Nodes that reach us refuse the old primary from now on, and it steps down when it finds us
+        self.host.term += 1
+        logger.warning("Lost primary %s:%d; standby taking over session %s (%d nodes, term %d)",
+                       *self.primary, sm.session_code, len(sm.nodes), self.host.term)
+        self.promoted.set()
@@ -1,20 +1,68 @@
+import hmac
+import secrets
 import time
 
+from hivemind.common.session_auth import resume_proof
+from hivemind.host.timeline import START, Timeline
+
 
 class SessionManager:
-    def __init__(self):
+    def __init__(self, clock=time.time):
         self.session_code = "HM-0000"
         self.nodes = {}
-        self.scheduled_tracks = []
+        self.timeline = Timeline(clock=clock)
 
     def accept_node(self, device_id: str, device_name: str, metadata: dict) -> bool:
         if device_id in self.nodes:
             return False
-        self.nodes[device_id] = {"name": device_name, "metadata": metadata, "last_seen": time.time()}
+        self.nodes[device_id] = {
+            "name": device_name,
+            "metadata": metadata,
+            "last_seen": time.time(),
+            "resume_token": secrets.token_urlsafe(16),
+        }
+        return True
+
+    def resume_node(self, device_id: str, resume_token: str) -> bool:
+        """Reattach a returning node to its existing record if the token matches."""
+        info = self.nodes.get(device_id)
+        if not info or not resume_token:
+            return False
+        if not hmac.compare_digest(str(info.get("resume_token", "")), str(resume_token)):
+            return False
+        info["last_seen"] = time.time()
+        info["resumes"] = info.get("resumes", 0) + 1
         return True
 
+    def verify_resume(self, device_id: str, resume: dict):
+        """Session key of a node whose resume proof checks out (and is newer than the last), else None."""
+        info = self.nodes.get(device_id)
+        if not info or not info.get("session_key") or not isinstance(resume, dict):
+            return None
+        counter = resume.get("counter")
+        if not isinstance(counter, int) or counter <= info.get("resume_counter", 0):
+            return None
+        key = bytes.fromhex(info["session_key"])
+        if not hmac.compare_digest(resume_proof(key, device_id, counter), str(resume.get("proof", ""))):
+            return None
+        info["resume_counter"] = counter
+        return key
+
+    def restore_node(self, device_id: str, **fields):
+        """Create or update a node replicated from another host, keeping its resume token."""
+        info = self.nodes.setdefault(device_id, {"last_seen": time.time()})
+        info.update(fields)
+
+    def update_node(self, device_id: str, **fields):
+        if device_id in self.nodes:
+            self.nodes[device_id].update(fields)
+
     def get_session_info(self):
-        return {"code": self.session_code, "node_count": len(self.nodes), "scheduled": list(self.scheduled_tracks)}
+        """Session summary for join accepts; the timeline part is a fixed-size window."""
+        window = self.timeline.window()
+        # No session code: join accepts travel unencrypted
+        return {"node_count": len(self.nodes),
+                "scheduled": window["events"], "scheduled_total": window["total"]}
 
     def generate_session_code(self):
         import random
@@ -23,9 +71,8 @@ class SessionManager:
         return code
 
     def add_scheduled_track(self, track_url: str, start_at: float, duration: float = 0.0):
-        item = {"track_url": track_url, "start_at": start_at, "duration": duration}
-        self.scheduled_tracks.append(item)
-        return item
+        """Announce a track start that nodes play themselves (no host-side audio)."""
+        return self.timeline.add(START, start_at, track_url, duration=duration).describe()
 
     def update_heartbeat(self, device_id: str):
         if device_id in self.nodes:
@@ -0,0 +1,57 @@
+import numpy as np
+
+from hivemind.config import SILENCE_HANGOVER_MS, SILENCE_REFRESH_MS, SILENCE_THRESHOLD_DBFS
+
+# What to do with a chunk (see SilenceDetector.update)
+SEND = "send"        # encode and distribute as usual
+MARK = "mark"        # silent: send a "silence until" marker instead
+SKIP = "skip"        # silent and already announced: send nothing
+
+_EPSILON = 1e-6  # durations are float sums of chunk lengths
+
+
+def peak(pcm) -> int:
+    """Largest absolute 16-bit sample in `pcm` (0 if empty)."""
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    if not samples.size:
+        return 0
+    # No np.abs: it would allocate, and overflows on -32768
+    return max(int(samples.max()), -int(samples.min()))
+
+
+class SilenceDetector:
+    """Discontinuous transmission: decides which captured chunks are worth encoding.
+
+    A chunk is silent when its peak stays below `threshold_dbfs`. Audio keeps
+    flowing for `hangover_ms` after the last sound so decays are not cut
+    off; after that nothing is encoded, and nodes get a marker ("silence
+    until sequence N") when the silence starts and every `refresh_ms` after.
+    Silent chunks are still scheduled, so the timeline runs on unbroken and
+    the first chunk after the gap plays exactly where it belongs.
+    """
+
+    def __init__(self, threshold_dbfs: float = SILENCE_THRESHOLD_DBFS,
+                 hangover_ms: float = SILENCE_HANGOVER_MS, refresh_ms: float = SILENCE_REFRESH_MS):
+        self.threshold = int(32767 * 10 ** (threshold_dbfs / 20.0))
+        self.hangover = hangover_ms / 1000.0
+        self.refresh = refresh_ms / 1000.0
+        self.silent = False
+        self.skipped = 0
+        self._quiet = 0.0   # seconds of silence so far
+        self._marked = 0.0  # ... when the last marker went out
+
+    def update(self, pcm, duration: float) -> str:
+        """Classify the next chunk (`duration` seconds long): SEND, MARK or SKIP."""
+        if peak(pcm) > self.threshold:
+            self._quiet = 0.0
+            self.silent = False
+            return SEND
+        self._quiet += duration
+        if self._quiet <= self.hangover + _EPSILON:
+            return SEND
+        self.skipped += 1
+        if not self.silent or self._quiet - self._marked >= self.refresh - _EPSILON:
+            self.silent = True
+            self._marked = self._quiet
+            return MARK
+        return SKIP
@@ -0,0 +1,98 @@
+import logging
+from typing import Dict, Hashable, Optional, Sequence, Tuple, Union
+
+from hivemind.config import CHANNELS, MAX_NODE_DELAY_MS
+
+logger = logging.getLogger(__name__)
+
+# Named channel maps as (source channel -> node channel) gain rows for a stereo source.
+# None (plain stereo) is the pass-through every node gets by default.
+CHANNEL_MAPS = {
+    "stereo": None,
+    "swap": ((0.0, 1.0), (1.0, 0.0)),
+    "left": ((1.0, 1.0), (0.0, 0.0)),
+    "right": ((0.0, 0.0), (1.0, 1.0)),
+    "center": ((0.5, 0.5), (0.5, 0.5)),
+    "mono": ((0.5, 0.5), (0.5, 0.5)),
+    # Passive-matrix ambience (L - R); what a rear speaker gets from a stereo mix
+    "surround": ((0.5, 0.5), (-0.5, -0.5)),
+    "surround_left": ((0.5, 0.0), (-0.5, 0.0)),
+    "surround_right": ((0.0, -0.5), (0.0, 0.5)),
+}
+
+MapSpec = Union[str, Sequence[Sequence[float]]]
+
+
+class SpatialLayout:
+    """Per-node channel map and alignment delay for nodes used as a speaker array.
+
+    Nodes sharing a channel map share one rendered stream (and one encode
+    per tier); the delay is applied by moving the node's play times, so it
+    costs nothing to render. A node's placement is `(map_key, delay_s)`;
+    `map_key` is None for plain stereo, a `CHANNEL_MAPS` name, or a tuple
+    matrix for a custom map.
+    """
+
+    def __init__(self, channels: int = CHANNELS, max_delay_ms: float = MAX_NODE_DELAY_MS):
+        self.channels = channels
+        self.max_delay_ms = max_delay_ms
+        self.placements: Dict[str, Tuple[Optional[Hashable], float]] = {}
+        self._matrices = {}
+
+    def parse_map(self, channel_map: MapSpec) -> Optional[Hashable]:
+        """Validate a map name or custom `(source, node)` matrix; return its key."""
+        if channel_map is None:
+            return None
+        if isinstance(channel_map, str):
+            if channel_map not in CHANNEL_MAPS:
+                raise ValueError(f"Unknown channel map: {channel_map}")
+            return None if CHANNEL_MAPS[channel_map] is None else channel_map
+        matrix = tuple(tuple(float(g) for g in row) for row in channel_map)
+        if len(matrix) != self.channels or any(len(row) != self.channels for row in matrix):
+            raise ValueError(f"Channel matrix must be {self.channels}x{self.channels}")
+        return matrix
+
+    def set_node(self, device_id: str, channel_map: MapSpec = "stereo", delay_ms: float = 0.0) -> dict:
+        key = self.parse_map(channel_map)
+        delay_ms = float(delay_ms)
+        if not 0.0 <= delay_ms <= self.max_delay_ms:
+            raise ValueError(f"Delay must be between 0 and {self.max_delay_ms} ms")
+        if key is None and delay_ms == 0.0:
+            self.placements.pop(device_id, None)
+        else:
+            self.placements[device_id] = (key, delay_ms / 1000.0)
+        logger.info("Node %s: channel map %s, delay %.1f ms", device_id, self.describe(key), delay_ms)
+        return self.get_node(device_id)
+
+    def placement(self, device_id: Optional[str]) -> Tuple[Optional[Hashable], float]:
+        return self.placements.get(device_id, (None, 0.0))
+
+    def get_node(self, device_id: str) -> dict:
+        key, delay = self.placement(device_id)
+        return {"channel_map": self.describe(key), "delay_ms": delay * 1000.0}
+
+    @staticmethod
+    def describe(key) -> Union[str, list]:
+        if key is None:
+            return "stereo"
+        return key if isinstance(key, str) else [list(row) for row in key]
+
+    def forget(self, device_id: str):
+        self.placements.pop(device_id, None)
+
+    def distinct_maps(self) -> int:
+        return len({key for key, _ in self.placements.values()} | {None})
+
+    def render(self, key: Optional[Hashable], pcm: bytes) -> bytes:
+        """Apply a channel map to interleaved 16-bit PCM."""
+        if key is None:
+            return pcm
+        from hivemind.common.resampler import float_to_pcm, pcm_to_float
+
+        matrix = self._matrices.get(key)
+        if matrix is None:
+            import numpy as np
+
+            rows = CHANNEL_MAPS[key] if isinstance(key, str) else key
+            matrix = self._matrices[key] = np.asarray(rows, dtype=np.float32)
+        return float_to_pcm(pcm_to_float(pcm, self.channels) @ matrix)
@@ -0,0 +1,132 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from typing import Callable, Dict, Optional, Tuple
+
+from hivemind.config import ASSET_INLINE_BYTES
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+IDENTITY = "identity"
+# Preferred first when a client accepts several
+ENCODINGS = ("br", "gzip")
+
+_TAG = re.compile(r'<link rel="stylesheet" href="/static/(?P<css>[^"]+)">'
+                  r'|<script src="/static/(?P<js>[^"]+)"></script>'
+                  r'|(?P<attr>(?:href|src))="/static/(?P<ref>[^"]+)"')
+
+
+class Asset:
+    """One file, fingerprinted by its content and stored precompressed."""
+
+    __slots__ = ("name", "mimetype", "digest", "bodies")
+
+    def __init__(self, name: str, data: bytes, mimetype: Optional[str] = None):
+        self.name = name
+        self.mimetype = mimetype or mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.digest = hashlib.sha256(data).hexdigest()[:12]
+        self.bodies: Dict[str, bytes] = {IDENTITY: data, "gzip": gzip.compress(data, 9, mtime=0)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(data, quality=11)
+        # Compression that does not pay is not offered
+        for encoding in ENCODINGS:
+            if encoding in self.bodies and len(self.bodies[encoding]) >= len(data):
+                del self.bodies[encoding]
+
+    @property
+    def hashed_name(self) -> str:
+        stem, ext = os.path.splitext(self.name)
+        return f"{stem}.{self.digest}{ext}"
+
+    @property
+    def size(self) -> int:
+        """Bytes on the wire for a client that accepts every encoding."""
+        return min(len(body) for body in self.bodies.values())
+
+    def etag(self, encoding: str) -> str:
+        return self.digest if encoding == IDENTITY else f"{self.digest}-{encoding}"
+
+    def select(self, quality: Callable[[str], float]) -> Tuple[str, bytes]:
+        """The best body for a client; `quality(encoding)` is its Accept-Encoding weight (0: refused)."""
+        for encoding in ENCODINGS:
+            if encoding in self.bodies and quality(encoding) > 0:
+                return encoding, self.bodies[encoding]
+        return IDENTITY, self.bodies[IDENTITY]
+
+
+class AssetPipeline:
+    """The dashboard page and its static files, prepared once for cheap serving.
+
+    Every file in `static_dir` is stored under a name carrying a hash of its
+    content (`script.<hash>.js`), gzipped (and brotli-compressed if the
+    `brotli` package is installed). Its URL changes whenever its content
+    does, so clients may cache it for good. The page's own stylesheets and
+    scripts are inlined in document order while their compressed size fits
+    in `inline_bytes` (one initial TCP window by default). The rest are
+    linked under their hashed names. With the current assets, the dashboard
+    loads in a single request.
+
+    The page is a static HTML file: it is read as is, not rendered. Edits
+    to it or to `static_dir` take effect when the pipeline is built again
+    (on dashboard restart).
+    """
+
+    def __init__(self, static_dir: str, page_path: str, url_prefix: str = "/assets/",
+                 inline_bytes: int = ASSET_INLINE_BYTES):
+        self.static_dir = static_dir
+        self.page_path = page_path
+        self.url_prefix = url_prefix
+        self.inline_bytes = inline_bytes
+        # hashed name -> asset, and original name -> URL
+        self.assets: Dict[str, Asset] = {}
+        self.urls: Dict[str, str] = {}
+        self.inlined = []
+        self.page: Optional[Asset] = None
+
+    def build(self) -> "AssetPipeline":
+        originals = {}
+        for root, _, files in os.walk(self.static_dir):
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.static_dir).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    asset = Asset(name, f.read())
+                originals[name] = asset
+                self.assets[asset.hashed_name] = asset
+                self.urls[name] = self.url_prefix + asset.hashed_name
+
+        budget = self.inline_bytes
+
+        def rewrite(match):
+            nonlocal budget
+            name = match.group("css") or match.group("js")
+            if name is None:
+                name = match.group("ref")
+                return f'{match.group("attr")}="{self.urls[name]}"' if name in self.urls else match.group(0)
+            asset = originals.get(name)
+            if asset is None:
+                return match.group(0)
+            if asset.size > budget:
+                return match.group(0).replace(f"/static/{name}", self.urls[name])
+            budget -= asset.size
+            self.inlined.append(name)
+            text = asset.bodies[IDENTITY].decode("utf-8")
+            if match.group("css"):
+                return "<style>" + text.replace("</style", "<\\/style") + "</style>"
+            return "<script>" + text.replace("</script", "<\\/script") + "</script>"
+
+        with open(self.page_path, encoding="utf-8") as f:
+            page = _TAG.sub(rewrite, f.read())
+        self.page = Asset(os.path.basename(self.page_path), page.encode("utf-8"), "text/html")
+        logger.info("Dashboard assets: %d files, %s inlined, page %d bytes (%d compressed)",
+                    len(self.assets), ", ".join(self.inlined) or "none",
+                    len(self.page.bodies[IDENTITY]), self.page.size)
+        return self
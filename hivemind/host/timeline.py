@@ -0,0 +1,185 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional
+
+from hivemind.config import SESSION_INFO_EVENTS
+
+# Event kinds
+START = "start"          # start `track` from `source` (announce only, without a source)
+STOP = "stop"            # fade `track` out over `fade_ms`
+CROSSFADE = "crossfade"  # start `track` while `replaces` fades out over `fade_ms`
+VOLUME = "volume"        # ramp `track` to `gain` over `ramp_ms`
+
+KINDS = (START, STOP, CROSSFADE, VOLUME)
+
+
+class TimelineEvent:
+    __slots__ = ("event_id", "kind", "start_at", "track", "source", "duration", "replaces", "params",
+                 "ends_at")
+
+    def __init__(self, event_id: int, kind: str, start_at: float, track: str, source=None,
+                 duration: float = 0.0, replaces: Optional[str] = None, params: Optional[dict] = None):
+        self.event_id = event_id
+        self.kind = kind
+        self.start_at = start_at
+        self.track = track
+        self.source = source
+        self.duration = duration
+        self.replaces = replaces
+        self.params = params or {}
+        self.ends_at = start_at + duration
+
+    def describe(self) -> dict:
+        info = {"id": self.event_id, "kind": self.kind, "track_url": self.track,
+                "start_at": self.start_at, "duration": self.duration, **self.params}
+        if self.replaces is not None:
+            info["replaces"] = self.replaces
+        return info
+
+
+class Timeline:
+    """Future session events (starts, stops, crossfades, volume changes) in start order.
+
+    Pending events sit in a heap keyed by start time; `due(until)` pops the
+    ones starting before `until` for the host to hand to the mixer, which
+    places them on an exact sample. Fired events with a duration (tracks)
+    stay listed as playing until they end or are stopped; everything else
+    is forgotten once fired or past, so the timeline only ever holds what is
+    still ahead. Events may be added from other threads (the dashboard).
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.version = 0
+        self._heap = []
+        self._ids = itertools.count(1)
+        self._events: Dict[int, TimelineEvent] = {}
+        self._playing: Dict[int, TimelineEvent] = {}
+        self._first_page = (None, None)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._events) + len(self._playing)
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._events)
+
+    def add(self, kind: str, start_at: float, track: str, source=None, duration: float = 0.0,
+            replaces: Optional[str] = None, **params) -> TimelineEvent:
+        if kind not in KINDS:
+            raise ValueError(f"Unknown timeline event: {kind}")
+        with self._lock:
+            event = TimelineEvent(next(self._ids), kind, float(start_at), track, source, duration,
+                                  replaces, params)
+            self._events[event.event_id] = event
+            heapq.heappush(self._heap, (event.start_at, event.event_id))
+            self.version += 1
+        return event
+
+    def cancel(self, event_id: int) -> bool:
+        """Drop a pending event (or stop listing a playing one)."""
+        with self._lock:
+            # The heap entry is skipped when it surfaces
+            found = self._events.pop(event_id, None) or self._playing.pop(event_id, None)
+            if found:
+                self.version += 1
+            return found is not None
+
+    def due(self, until: float) -> List[TimelineEvent]:
+        """Pop, in start order, every pending event starting before `until`."""
+        fired = []
+        heap = self._heap
+        with self._lock:
+            while heap and heap[0][0] < until:
+                _, event_id = heapq.heappop(heap)
+                event = self._events.pop(event_id, None)
+                if event is None:
+                    continue
+                fired.append(event)
+                ended = event.track if event.kind == STOP else event.replaces
+                if ended is not None:
+                    self._end_playing(ended, event.start_at + event.params.get("fade_ms", 0.0) / 1000.0)
+                if event.duration > 0:
+                    self._playing[event_id] = event
+            if fired:
+                self.version += 1
+        return fired
+
+    def _end_playing(self, name: str, at: float):
+        for event in self._playing.values():
+            if event.track == name and event.ends_at > at:
+                event.ends_at = at
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Forget tracks that have ended and pending events that can no longer happen."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            ended = [i for i, e in self._playing.items() if e.ends_at <= now]
+            for event_id in ended:
+                del self._playing[event_id]
+            heap = self._heap
+            # Never fired (no audio loop running) and already over
+            while heap and (heap[0][1] not in self._events or self._events[heap[0][1]].ends_at <= now):
+                _, event_id = heapq.heappop(heap)
+                if self._events.pop(event_id, None) is not None:
+                    ended.append(event_id)
+            if ended:
+                self.version += 1
+        return len(ended)
+
+    def window(self, now: Optional[float] = None, limit: int = SESSION_INFO_EVENTS,
+               after_id: Optional[int] = None) -> dict:
+        """Up to `limit` playing and upcoming events in start order.
+
+        `after_id` continues from a previous page; `next` is the id to pass for
+        the following page (None on the last one). The first page is cached
+        until the timeline changes, since every join accept carries it.
+        """
+        self.expire(now)
+        with self._lock:
+            if after_id is None and self._first_page[0] == (self.version, limit):
+                return self._first_page[1]
+            events = sorted(self._playing.values(), key=lambda e: (e.start_at, e.event_id))
+            live = (entry for entry in self._heap if entry[1] in self._events)
+            # The first page needs only the head of the heap, not a full sort
+            upcoming = sorted(live) if after_id is not None else heapq.nsmallest(limit + 1, live)
+            events += [self._events[event_id] for _, event_id in upcoming]
+            total = len(self._events) + len(self._playing)
+            if after_id is not None:
+                index = next((i for i, e in enumerate(events) if e.event_id == after_id), None)
+                events = events[index + 1:] if index is not None else events
+            page = events[:limit]
+            result = {
+                "events": [e.describe() for e in page],
+                "total": total,
+                "next": page[-1].event_id if len(events) > limit else None,
+            }
+            if after_id is None:
+                self._first_page = ((self.version, limit), result)
+        return result
+
+    def snapshot(self) -> List[dict]:
+        """Every playing and pending event, for replication (sources are not included)."""
+        with self._lock:
+            events = list(self._playing.values()) + list(self._events.values())
+        return [e.describe() for e in sorted(events, key=lambda e: (e.start_at, e.event_id))]
+
+    def restore(self, entries: List[dict]):
+        """Replace the timeline with replicated entries (announcements only, no sources)."""
+        with self._lock:
+            self._heap.clear()
+            self._events.clear()
+            self._playing.clear()
+            for entry in entries:
+                params = {k: v for k, v in entry.items()
+                          if k not in ("id", "kind", "track_url", "start_at", "duration", "replaces")}
+                event = TimelineEvent(entry["id"], entry["kind"], entry["start_at"], entry["track_url"],
+                                      None, entry.get("duration", 0.0), entry.get("replaces"), params)
+                self._events[event.event_id] = event
+                self._heap.append((event.start_at, event.event_id))
+            heapq.heapify(self._heap)
+            self._ids = itertools.count(max((e["id"] for e in entries), default=0) + 1)
+            self.version += 1
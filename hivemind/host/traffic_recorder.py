@@ -0,0 +1,123 @@
+import logging
+import struct
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Iterator, Union
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"HMREC\x01"
+
+# Record kinds
+CONNECT = 0    # data: remote address (utf-8)
+INBOUND = 1    # frame received from the client
+OUTBOUND = 2   # frame sent to the client
+CLOSE = 3      # data: empty
+DROPPED = 4    # frame not sent: the client was too far behind (see NetworkServer.send_to)
+
+_TEXT = 0x01
+# kind, flags, connection id, seconds since recording started, payload length
+_HEADER = struct.Struct("<BBIdI")
+
+TrafficRecord = namedtuple("TrafficRecord", "kind conn t data")
+
+
+class TrafficRecorder:
+    """Append-only binary log of everything a `NetworkServer` sends and receives.
+
+    `record()` runs on the event loop and only appends a tuple to a deque; a
+    writer thread packs pending records every `flush_interval` seconds and
+    writes them through a large buffered file. If the writer falls behind by
+    more than `max_pending_bytes`, new records are dropped (and counted)
+    rather than growing memory without bound.
+    """
+
+    def __init__(self, path, flush_interval: float = 0.2,
+                 max_pending_bytes: int = 64 * 1024 * 1024, clock=time.monotonic):
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self.max_pending_bytes = max_pending_bytes
+        self.clock = clock
+        self.records = 0
+        self.dropped = 0
+        self._epoch = clock()
+        self._pending = deque()
+        # Each counter has a single writer thread; their difference is the backlog
+        self._queued_bytes = 0
+        self._written_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+
+    def open(self):
+        if self._thread is not None:
+            return
+        self._file = open(self.path, "wb", buffering=1024 * 1024)
+        self._file.write(MAGIC)
+        self._epoch = self.clock()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="traffic-recorder", daemon=True)
+        self._thread.start()
+        logger.info("Recording traffic to %s", self.path)
+
+    def close(self):
+        """Write everything still pending and close the log (blocking)."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+        self._file = None
+        logger.info("Recorded %d frames (%d dropped) to %s", self.records, self.dropped, self.path)
+
+    def record(self, kind: int, conn: int, data: Union[bytes, str] = b""):
+        size = len(data)
+        if self._queued_bytes - self._written_bytes + size > self.max_pending_bytes:
+            self.dropped += 1
+            return
+        self._pending.append((kind, conn, self.clock() - self._epoch, data))
+        self._queued_bytes += size
+
+    def _write(self):
+        # deque.append (event loop) and popleft (here) are thread-safe
+        pending = self._pending
+        out = self._file
+        pack = _HEADER.pack
+        count = len(pending)
+        written = 0
+        for _ in range(count):
+            kind, conn, t, data = pending.popleft()
+            written += len(data)
+            flags = 0
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+                flags = _TEXT
+            out.write(pack(kind, flags, conn, t, len(data)))
+            out.write(data)
+        self._written_bytes += written
+        self.records += count
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self._write()
+        self._write()
+        self._file.flush()
+
+
+def read_records(path) -> Iterator[TrafficRecord]:
+    """Iterate over a traffic log; text frames come back as `str`, binary as `bytes`."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a HiveMind traffic log")
+        size = _HEADER.size
+        while True:
+            header = f.read(size)
+            if len(header) < size:
+                return
+            kind, flags, conn, t, length = _HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return  # truncated tail (recording was killed mid-write)
+            yield TrafficRecord(kind, conn, t, data.decode("utf-8") if flags & _TEXT else data)
@@ -0,0 +1,113 @@
+import logging
+import socket
+import struct
+import sys
+import threading
+import time
+from typing import Optional
+
+from hivemind.common.protocol import SYNC_PACKET, pack_sync, unpack_sync
+from hivemind.config import UDP_SYNC_POLL_S
+from hivemind.host.clock_sync import HostClock
+
+logger = logging.getLogger(__name__)
+
+# Not exported by the socket module; the value is the same on all mainstream Linux architectures
+SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35 if sys.platform.startswith("linux") else None)
+_TIMESPEC = struct.Struct("@ll")
+
+
+class UdpSyncResponder:
+    """Answers binary time-sync probes (`SYNC_PACKET`) on a UDP port, from its own thread.
+
+    Time-sync requests on the WebSocket queue behind audio frames in TCP and
+    wait for the event loop to run their handler, which inflates and
+    randomizes the round trips the nodes measure. Here, each probe is
+    answered as soon as the thread receives it. The answer carries two host
+    times: when the probe arrived and when the answer left. The arrival time
+    comes from the kernel (`SO_TIMESTAMPNS`) where it is available, so even
+    a wait for this thread is left out of the node's round trip.
+
+    Set `sock` before `start()` to answer on an already-bound socket (one
+    inherited from a previous host process, see `hivemind.host.handoff`).
+    The port is never shared any other way: no SO_REUSEPORT, so no other
+    process can bind it and read the probes.
+    """
+
+    def __init__(self, clock: HostClock = None, port: int = 0, host: str = "0.0.0.0"):
+        self.clock = clock or HostClock()
+        self.host = host
+        self.port = port
+        self.kernel_timestamps = False
+        self.answered = 0
+        self.dropped = 0
+        self.sock: Optional[socket.socket] = None
+        self._sock: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        sock = self.sock
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((self.host, self.port))
+        if SO_TIMESTAMPNS is not None:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+                self.kernel_timestamps = True
+            except OSError:
+                pass
+        # Lets the thread notice stop() between probes
+        sock.settimeout(UDP_SYNC_POLL_S)
+        self._sock = sock
+        self.port = sock.getsockname()[1]
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="time-sync", daemon=True)
+        self._thread.start()
+        logger.info(f"Answering UDP time-sync probes on port {self.port}"
+                    f"{' (kernel timestamps)' if self.kernel_timestamps else ''}")
+
+    def stop(self):
+        """Stop answering (blocks for up to UDP_SYNC_POLL_S)."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = self.sock = None
+
+    def _run(self):
+        sock = self._sock
+        ancillary = socket.CMSG_SPACE(_TIMESPEC.size) if self.kernel_timestamps else 0
+        while not self._stopping.is_set():
+            try:
+                data, ancdata, _, addr = sock.recvmsg(SYNC_PACKET.size + 1, ancillary)
+            except socket.timeout:
+                continue
+            except OSError:
+                if not self._stopping.is_set():
+                    logger.exception("UDP time-sync socket failed")
+                return
+            received = None
+            for level, kind, value in ancdata:
+                if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS and len(value) >= _TIMESPEC.size:
+                    seconds, nanoseconds = _TIMESPEC.unpack_from(value)
+                    received = seconds + nanoseconds * 1e-9
+            offset = self.clock.offset
+            received = (received if received is not None else time.time()) + offset
+            packet = unpack_sync(data)
+            if packet is None or packet[1] or packet[2]:
+                # Not a request (or an answer looped back): never answered
+                self.dropped += 1
+                continue
+            try:
+                sock.sendto(pack_sync(packet[0], received, time.time() + offset), addr)
+            except OSError:
+                self.dropped += 1
+                continue
+            self.answered += 1
+
+    def get_metrics(self) -> dict:
+        return {"port": self.port, "kernel_timestamps": self.kernel_timestamps,
+                "answered": self.answered, "dropped": self.dropped}
@@ -0,0 +1,58 @@
+import heapq
+from typing import List, Optional, Tuple
+
+
+class JitterBuffer:
+    """Orders incoming audio frames by sequence and releases them when due.
+
+    Frames are `(sequence, play_at, payload)` with `play_at` on the host clock.
+    Duplicates and frames older than the playout position are discarded.
+    """
+
+    def __init__(self, max_frames: int = 256):
+        self.max_frames = max_frames
+        self._heap: List[Tuple[int, float, bytes]] = []
+        self._seen = set()
+        self.next_sequence: Optional[int] = None
+        self.late = 0
+        self.overflow = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, sequence: int, play_at: float, payload: bytes) -> bool:
+        if sequence in self._seen or (self.next_sequence is not None and sequence < self.next_sequence):
+            return False
+        if len(self._heap) >= self.max_frames:
+            self.overflow += 1
+            return False
+        self._seen.add(sequence)
+        heapq.heappush(self._heap, (sequence, play_at, payload))
+        return True
+
+    def pop_due(self, host_now: float) -> List[Tuple[int, float, bytes]]:
+        """Pop every frame whose play time has been reached, in sequence order."""
+        due = []
+        heap = self._heap
+        while heap and heap[0][1] <= host_now:
+            frame = heapq.heappop(heap)
+            self._seen.discard(frame[0])
+            self.next_sequence = frame[0] + 1
+            due.append(frame)
+        return due
+
+    def drop_late(self, host_now: float, tolerance: float = 0.0) -> int:
+        """Discard queued frames that can no longer start on time."""
+        dropped = 0
+        heap = self._heap
+        while heap and heap[0][1] < host_now - tolerance:
+            frame = heapq.heappop(heap)
+            self._seen.discard(frame[0])
+            self.next_sequence = frame[0] + 1
+            dropped += 1
+        self.late += dropped
+        return dropped
+
+    def clear(self):
+        self._heap.clear()
+        self._seen.clear()
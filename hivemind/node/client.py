@@ -1,29 +1,542 @@
 import asyncio
+import base64
+import hmac
 import logging
+import random
+import time
+from typing import Optional
+
+import websockets
+
+from hivemind.common.protocol import (
+    HOST_SUPERSEDED,
+    JSON_SERIALIZER,
+    STANDBY_NOT_ACTIVE,
+    MessageType,
+    Protocol,
+    available_serializers,
+    decode_frame,
+    get_serializer,
+)
+from hivemind.common.session_auth import (
+    ClientHandshake,
+    InvalidTag,
+    RoomCipher,
+    available_ciphers,
+    open_key,
+    resume_confirm,
+    resume_proof,
+)
+from hivemind.config import (
+    FAILOVER_CONNECT_TIMEOUT_S,
+    FAILOVER_RTT_FACTOR,
+    HEARTBEAT_INTERVAL_S,
+    LINK_TIMEOUT_S,
+    NODE_CPU_BUDGET,
+    RECONNECT_BASE_S,
+    RECONNECT_MAX_S,
+    STREAM_REPORT_INTERVAL_S,
+    SYNC_BURST,
+    SYNC_INTERVAL_S,
+)
+from hivemind.node.buffer_manager import JitterBuffer
+from hivemind.node.playback_engine import PlaybackEngine, Sink
+from hivemind.node.time_sync_client import TimeSyncClient, UdpSyncProbe
 
 logger = logging.getLogger(__name__)
 
+# Messages an emulated lossy link may drop; the join handshake always goes through
+_LOSSY_TYPES = {MessageType.AUDIO_CHUNK.value, MessageType.TIME_SYNC_RESPONSE.value,
+                MessageType.TIME_SYNC_REQUEST.value}
+
 
 class HiveMindClient:
-    def __init__(self, session_code: str):
+    """Node-side connection: joins a session, keeps clock sync and plays audio.
+
+    `clock` is the node's local clock (injectable for simulation), `sink`
+    receives decoded frames at their scheduled local start time, and `link`
+    optionally emulates network delay/loss (see `hivemind.sim.LinkConditions`).
+
+    If the connection drops, the client reconnects with exponential backoff and
+    presents the host's resume token, so the host reattaches its existing
+    record. Clock sync and the jitter buffer survive the reconnect, so playout
+    of already-buffered audio continues through the gap. If the host named a
+    hot standby, it is tried right after the original host; it shares the
+    primary's time base and timeline. A standby that took over serves under
+    a higher term, and from then on the node refuses hosts with a lower one:
+    a former primary that is still running cannot take it back.
+
+    The join carries a time-sync request that the host answers in its
+    accept, and the accept is followed by the frames still ahead of the play
+    head, so a node joining mid-stream is heard from the next frame due.
+
+    While the host suppresses silence it sends markers instead of audio;
+    clock sync carries on, and the first frame after the gap lands on the
+    same timeline.
+
+    A host that is being restarted sends a redirect: the client reconnects
+    (resuming) right away instead of waiting for the old process to close.
+
+    If the accept names a UDP time-sync port, clock probes go there instead:
+    they skip TCP queuing behind audio and the host's message handlers, so
+    their round trips are shorter and steadier. The periodic WebSocket
+    request still goes out, since it reports our estimate to the host.
+
+    `decode_wakeup_ms` puts playback in low-power mode: frames are decoded
+    in batches on a worker thread, once per wakeup (see `PlaybackEngine`).
+    Either way, the stream report tells the host how much of `cpu_budget`
+    (a share of one core) decoding used, and a node over budget is moved to
+    cheaper tiers.
+    """
+
+    def __init__(self, session_code: str, device_id: Optional[str] = None,
+                 device_name: Optional[str] = None, clock=time.time,
+                 sink: Optional[Sink] = None, link=None,
+                 sync_interval: float = SYNC_INTERVAL_S,
+                 decode_wakeup_ms: Optional[float] = None,
+                 cpu_budget: float = NODE_CPU_BUDGET):
         self.session_code = session_code
+        self.device_id = device_id
+        self.device_name = device_name
+        self.clock = clock
+        self.link = link
+        self.sync_interval = sync_interval
+        self.cpu_budget = cpu_budget
         self.connected = False
+        self.joined = asyncio.Event()
+        self.join_error: Optional[str] = None
+        # Seconds a host at capacity asked us to wait before joining again
+        self.retry_after: Optional[float] = None
+        self.session_info: dict = {}
+        self.resume_token: Optional[str] = None
+        self.node_state: dict = {}
+        self.reconnects = 0
+        self.failovers = 0
+        self.redirects = 0
+        # (host, port) of the hot standby named by the host, if any
+        self.standby = None
+        # Highest host term seen (standby takeovers, see hivemind.host.replication)
+        self.term = 0
+        self._address = None
+        self._closing = False
+        self._lost = asyncio.Event()
+        self._last_rx = 0.0
+
+        self.time_sync = TimeSyncClient(clock=clock)
+        # (address, port) of the host's UDP time-sync responder, if it has one
+        self.sync_address = None
+        self.udp_sync: Optional[UdpSyncProbe] = None
+        self._udp_sync_address = None
+        self.buffer = JitterBuffer()
+        self.playback = PlaybackEngine(self.buffer, self.time_sync, sink=sink, wakeup_ms=decode_wakeup_ms)
+        self.late_chunks = 0
+        self._late_reported = 0
+        self._cpu_reported = (0.0, time.monotonic())
+        # While the host suppresses silence: where its last marker runs to (None while audio flows)
+        self.silent_until: Optional[int] = None
+        # Frames dropped for want of a room key: sealed ones we could not open, unsealed ones in an encrypted room
+        self.undecryptable = 0
+        self._handshake: Optional[ClientHandshake] = None
+        # Key from the last full handshake; proves a resume without a new one
+        self._session_key: Optional[bytes] = None
+        self._resume_counter = 0
+        # Counter of the resume proof in the current join; the host's accept must answer it
+        self._resume_sent: Optional[int] = None
+        self._room: Optional[RoomCipher] = None
+
+        self._ws = None
+        self._serializer = JSON_SERIALIZER
+        self._tasks = []
 
     async def connect(self, host: str, port: int):
-        logger.info(f"Connecting to {host}:{port} (stub)")
-        await asyncio.sleep(0.01)
+        if self.device_id is None:
+            from hivemind.common.device_id import get_device_metadata
+
+            metadata = get_device_metadata(self.device_name)
+            self.device_id = metadata["device_id"]
+            self.device_name = metadata["device_name"]
+
+        self._address = (host, port)
+        self._closing = False
+        await self._open()
+        if self.join_error:
+            await self.disconnect()
+            raise ConnectionError(f"Join rejected: {self.join_error}")
+
+        self._tasks.append(asyncio.create_task(self._sync_loop()))
+        self._tasks.append(asyncio.create_task(self._heartbeat_loop()))
+        self._tasks.append(asyncio.create_task(self._report_loop()))
+        self._tasks.append(asyncio.create_task(self._watchdog_loop()))
+        self._tasks.append(asyncio.create_task(self._supervise()))
+        self._tasks.append(asyncio.create_task(self.playback.run()))
+
+    async def _open(self, address=None, open_timeout: float = 10.0):
+        """Open one connection and complete the (possibly resuming) join handshake."""
+        host, port = address or self._address
+        logger.info(f"Connecting to {host}:{port}")
+        self.joined.clear()
+        self.join_error = None
+        self.retry_after = None
+        self._lost.clear()
+        self._serializer = JSON_SERIALIZER
+        self._tasks = [t for t in self._tasks if not t.done()]
+        # The host never negotiates compression; do not offer it
+        self._ws = await websockets.connect(f"ws://{host}:{port}", compression=None,
+                                            open_timeout=open_timeout)
         self.connected = True
+        self._last_rx = time.monotonic()
+        self._tasks.append(asyncio.create_task(self._receive_loop(self._ws)))
+
+        # The session code is proven, never sent
+        self._handshake = ClientHandshake(self.session_code, self.device_id)
+        payload = {
+            "device_id": self.device_id,
+            "device_name": self.device_name or self.device_id,
+            "auth": self._handshake.hello(),
+            "metadata": {},
+            "serializers": available_serializers(),
+            "ciphers": available_ciphers(),
+            # Answered in the accept: synced on arrival, without a round trip of its own
+            "sync": self.time_sync.make_request(),
+            "term": self.term,
+        }
+        self._resume_sent = None
+        if self.resume_token:
+            payload["resume_token"] = self.resume_token
+            payload["resume_from"] = self.buffer.next_sequence
+            if self._session_key is not None:
+                self._resume_counter += 1
+                self._resume_sent = self._resume_counter
+                payload["resume"] = {
+                    "counter": self._resume_counter,
+                    "proof": resume_proof(self._session_key, self.device_id, self._resume_counter),
+                }
+        await self._send_now(JSON_SERIALIZER.dumps({"type": MessageType.JOIN_REQUEST.value, "payload": payload}))
+        await self.joined.wait()
+        if not self.connected and not self.join_error:
+            raise ConnectionError("Connection closed during join")
+
+    async def _supervise(self):
+        """Reconnect with exponential backoff whenever the link is lost."""
+        while not self._closing:
+            await self._lost.wait()
+            delay = RECONNECT_BASE_S
+            while not self._closing and not await self._reconnect_once():
+                await asyncio.sleep(max(delay * random.uniform(0.5, 1.0), self.retry_after or 0.0))
+                delay = min(delay * 2, RECONNECT_MAX_S)
+
+    async def _reconnect_once(self) -> bool:
+        """Try the current host, then the standby; True once one of them accepts us."""
+        addresses = [self._address]
+        if self.standby and self.standby != self._address:
+            addresses.append(self.standby)
+        # With somewhere else to go, don't wait long on a host that may be dead (or stepped down)
+        timeout = FAILOVER_CONNECT_TIMEOUT_S if len(addresses) > 1 else 10.0
+        for address in addresses:
+            try:
+                await self._open(address, open_timeout=timeout)
+            except (OSError, asyncio.TimeoutError, ConnectionError, websockets.WebSocketException):
+                logger.debug("Reconnect to %s:%d failed", *address, exc_info=True)
+                continue
+            if not self.join_error:
+                if address != self._address:
+                    self.failovers += 1
+                    logger.warning("Failed over to standby host %s:%d", *address)
+                    self._address = address
+                self.reconnects += 1
+                logger.info("Reconnected to host")
+                return True
+            logger.warning(f"Rejoin rejected: {self.join_error}")
+            await self._ws.close()
+            if self.join_error not in (STANDBY_NOT_ACTIVE, HOST_SUPERSEDED):
+                # Host no longer knows us (e.g. stale sweep); rejoin as a new node
+                self.resume_token = None
+        return False
+
+    async def _watchdog_loop(self):
+        """Detect half-open links (e.g. a Wi-Fi blip) that TCP has not noticed yet."""
+        while not self._closing:
+            timeout = self._link_timeout()
+            await asyncio.sleep(timeout / 2)
+            ws = self._ws
+            if not self.connected or time.monotonic() - self._last_rx < timeout:
+                continue
+            try:
+                pong = await ws.ping()
+                await asyncio.wait_for(pong, timeout)
+                self._last_rx = time.monotonic()
+            except Exception:
+                logger.info("Link to host timed out")
+                self._drop(ws)
+
+    def _link_timeout(self) -> float:
+        """Inbound silence before the link is pinged, and how long the pong may take."""
+        rtt = self.time_sync.last_rtt
+        return max(LINK_TIMEOUT_S, FAILOVER_RTT_FACTOR * rtt) if rtt is not None else LINK_TIMEOUT_S
+
+    def _drop(self, ws):
+        # Once per connection: a redirect drops it before its receive loop ends
+        if ws is not self._ws or not self.connected:
+            return
+        self.connected = False
+        transport = getattr(ws, "transport", None)
+        if transport is not None:
+            transport.abort()
+        self.joined.set()
+        if not self._closing:
+            self._lost.set()
 
     async def run(self):
-        # Simple stub main loop that waits until disconnected
-        while self.connected:
+        while not self._closing:
             await asyncio.sleep(0.5)
 
     async def disconnect(self):
-        if self.connected:
-            self.connected = False
-            logger.info("Client disconnected")
+        if self._closing:
+            return
+        self._closing = True
+        self.connected = False
+        self._lost.set()
+        self.playback.stop()
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        if self.udp_sync is not None:
+            self.udp_sync.close()
+            self.udp_sync = None
+        try:
+            await self._ws.close()
+        except Exception:
+            pass
+        logger.info("Client disconnected")
 
     async def send_message(self, message):
-        # Stub message sender
-        logger.debug(f"Client send_message: {message}")
+        if not self.connected:
+            return
+        mtype = message.get("type")
+        link = self.link
+        if link is not None and mtype in _LOSSY_TYPES and link.should_drop():
+            return
+        data = self._serializer.dumps(message)
+        delay = link.sample_delay() if link is not None else 0.0
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, lambda: asyncio.ensure_future(self._send_now(data)))
+        else:
+            await self._send_now(data)
+
+    async def _send_now(self, data):
+        try:
+            await self._ws.send(data)
+        except Exception:
+            logger.debug("Send failed", exc_info=True)
+
+    async def _receive_loop(self, ws):
+        loop = asyncio.get_running_loop()
+        try:
+            async for raw in ws:
+                self._last_rx = time.monotonic()
+                try:
+                    msg = decode_frame(raw)
+                except Exception:
+                    continue
+                link = self.link
+                if link is not None:
+                    if msg.get("type") in _LOSSY_TYPES and link.should_drop():
+                        continue
+                    delay = link.sample_delay()
+                    if delay > 0:
+                        loop.call_later(delay, self._handle_message, msg)
+                        continue
+                self._handle_message(msg)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._drop(ws)
+
+    def _handle_message(self, msg: dict):
+        mtype = msg.get("type")
+        if mtype == MessageType.AUDIO_CHUNK.value:
+            self._handle_audio_chunk(msg)
+        elif mtype == MessageType.TIME_SYNC_RESPONSE.value:
+            # While UDP probes are answered, WebSocket samples would only crowd them out of the window
+            if not self._udp_synced():
+                self.time_sync.handle_response(msg["host_time"], msg["client_time"])
+        elif mtype == MessageType.SILENCE.value:
+            self.silent_until = msg["until"]
+        elif mtype == MessageType.JOIN_CHALLENGE.value:
+            try:
+                response = self._handshake.respond(msg)
+            except (KeyError, ValueError):
+                self._fail_host_auth()
+                return
+            # The accept follows the confirm, so this request times just that round trip
+            response["sync"] = self.time_sync.make_request()
+            confirm = JSON_SERIALIZER.dumps(Protocol.create_join_confirm(response))
+            asyncio.ensure_future(self._send_now(confirm))
+        elif mtype == MessageType.JOIN_CONFIRM.value:
+            # The host's proof, sent once it has checked ours
+            try:
+                self._handshake.check(msg.get("payload"))
+            except ValueError:
+                self._fail_host_auth()
+        elif mtype == MessageType.JOIN_ACCEPT.value:
+            if not self._host_proven(msg):
+                self._fail_host_auth()
+                return
+            if msg.get("term", 0) < self.term:
+                # A primary still serving after its standby took over
+                self.join_error = HOST_SUPERSEDED
+                self.joined.set()
+                return
+            self.term = msg.get("term", 0)
+            # A warm start's stored clock first, so the answer to the pipelined request refines it
+            if msg.get("node_state"):
+                self._apply_node_state(msg["node_state"])
+            sync = msg.get("time_sync")
+            if sync:
+                self.time_sync.handle_response(sync["host_time"], sync["client_time"])
+            if self._handshake.key is not None:
+                # Accepted after a full handshake (not a proven resume)
+                self._session_key = self._handshake.key
+                self._resume_counter = 0
+            self._room = None
+            if msg.get("room_key"):
+                try:
+                    self._room = RoomCipher(open_key(self._session_key, msg["room_key"]))
+                except (InvalidTag, TypeError, ValueError):
+                    # Sealed under a key other than ours
+                    self._fail_host_auth()
+                    return
+            self.session_info = msg.get("session") or {}
+            self._serializer = get_serializer(msg.get("serializer"))
+            self.resume_token = msg.get("resume_token", self.resume_token)
+            self._set_standby(msg.get("standby"))
+            sync_port = msg.get("sync_port")
+            self.sync_address = (self._ws.remote_address[0], int(sync_port)) if sync_port else None
+            self.joined.set()
+        elif mtype == MessageType.JOIN_REJECT.value:
+            self.join_error = msg.get("reason", "rejected")
+            self.retry_after = msg.get("retry_after")
+            self.joined.set()
+        elif mtype == MessageType.STANDBY_UPDATE.value:
+            self._set_standby(msg.get("standby"))
+        elif mtype == MessageType.REDIRECT.value:
+            host, port = self._address
+            self._address = (msg.get("host") or host, int(msg.get("port") or port))
+            self.redirects += 1
+            logger.info("Host redirected us to %s:%d", *self._address)
+            self._drop(self._ws)
+
+    def _host_proven(self, accept: dict) -> bool:
+        """Whether the host behind `accept` proved the session code (or our session key, on a resume)."""
+        if self._handshake.key is not None:
+            # Full handshake: the host's confirm must have come before its accept
+            return self._handshake.host_confirmed
+        if self._resume_sent is None:
+            return False
+        expected = resume_confirm(self._session_key, self.device_id, self._resume_sent)
+        return hmac.compare_digest(expected, str(accept.get("resume_confirm", "")))
+
+    def _fail_host_auth(self):
+        self.join_error = "Host failed authentication"
+        self.joined.set()
+
+    def _set_standby(self, standby: Optional[dict]):
+        self.standby = (standby["host"], int(standby["port"])) if standby else None
+
+    def _apply_node_state(self, state: dict):
+        self.node_state = state
+        clock = state.get("clock")
+        if clock and not self.time_sync.synced and clock.get("offset") is not None:
+            # Lost our own estimate (e.g. process restart); start from the host's copy
+            self.time_sync.seed(clock["offset"], clock.get("rtt"))
+
+    def _handle_audio_chunk(self, msg: dict):
+        sequence = msg.get("sequence")
+        if sequence is None:
+            return
+        play_at = msg["play_at"]
+        if self.time_sync.synced and play_at < self.time_sync.to_host(self.clock()):
+            self.late_chunks += 1
+            return
+        audio = msg.get("audio_data") or b""
+        if isinstance(audio, str):
+            audio = base64.b64decode(audio)
+        if msg.get("enc"):
+            try:
+                audio = self._room.open(audio, sequence, msg.get("tier"))
+            except (AttributeError, InvalidTag):
+                self.undecryptable += 1
+                return
+        elif self._room is not None:
+            # The room is encrypted: an unsealed frame did not come from the host
+            self.undecryptable += 1
+            return
+        self.silent_until = None
+        self.buffer.push(sequence, play_at, audio)
+
+    async def _send_sync_request(self):
+        payload = self.time_sync.make_request()
+        if self.time_sync.synced:
+            payload["offset"] = self.time_sync.offset
+            payload["rtt"] = self.time_sync.rtt
+        await self.send_message({"type": MessageType.TIME_SYNC_REQUEST.value, "payload": payload})
+
+    async def _sync(self, report: bool = True):
+        """One clock probe: over UDP if the host offers it, and over the WebSocket to `report` our estimate."""
+        if await self._probe_udp() and not report:
+            return
+        await self._send_sync_request()
+
+    async def _probe_udp(self) -> bool:
+        """Send a UDP time-sync probe; False if the host has no responder."""
+        address = self.sync_address
+        if self.udp_sync is not None and self._udp_sync_address != address:
+            # Moved to another host (failover, redirect)
+            self.udp_sync.close()
+            self.udp_sync = None
+        if address is None:
+            return False
+        if self.udp_sync is None:
+            try:
+                _, self.udp_sync = await asyncio.get_running_loop().create_datagram_endpoint(
+                    lambda: UdpSyncProbe(self.time_sync), remote_addr=address)
+            except OSError as e:
+                logger.warning(f"UDP time sync unavailable ({e}); syncing over the WebSocket")
+                self.sync_address = None
+                return False
+            self._udp_sync_address = address
+        self.udp_sync.probe()
+        return True
+
+    def _udp_synced(self) -> bool:
+        probe = self.udp_sync
+        return probe is not None and time.monotonic() - probe.answered_at < 2 * self.sync_interval
+
+    async def _sync_loop(self):
+        for _ in range(SYNC_BURST):
+            await self._sync(report=False)
+            await asyncio.sleep(0.02)
+        while not self._closing:
+            await asyncio.sleep(self.sync_interval)
+            await self._sync()
+
+    async def _heartbeat_loop(self):
+        while not self._closing:
+            await self.send_message({"type": MessageType.HEARTBEAT.value,
+                                     "payload": {"device_id": self.device_id}})
+            await asyncio.sleep(HEARTBEAT_INTERVAL_S)
+
+    async def _report_loop(self):
+        """Feed link quality back to the host's adaptive bitrate controller."""
+        while not self._closing:
+            await asyncio.sleep(STREAM_REPORT_INTERVAL_S)
+            late = self.late_chunks + self.buffer.late
+            rtt = self.time_sync.last_rtt
+            cpu, now = self.playback.decode_cpu, time.monotonic()
+            reported_cpu, reported_at = self._cpu_reported
+            await self.send_message(Protocol.create_stream_report(
+                self.device_id, late_chunks=late - self._late_reported,
+                rtt_ms=rtt * 1000.0 if rtt is not None else None,
+                cpu_load=(cpu - reported_cpu) / ((now - reported_at) * self.cpu_budget)))
+            self._late_reported = late
+            self._cpu_reported = (cpu, now)
@@ -0,0 +1,69 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence
+
+from hivemind.common.audio_codec import MAX_OPUS_FRAME_SAMPLES, AudioCodecManager
+from hivemind.config import DECODE_POOL_SLOTS
+
+
+class PcmPool:
+    """`slots` PCM buffers carved out of one preallocated block and handed out round-robin.
+
+    A buffer comes round again `slots` handouts later; whoever holds it
+    must be done with it by then.
+    """
+
+    def __init__(self, slots: int, slot_bytes: int):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.memory = bytearray(slots * slot_bytes)
+        view = memoryview(self.memory)
+        self._buffers = [view[i * slot_bytes:(i + 1) * slot_bytes] for i in range(slots)]
+        self._next = 0
+
+    def take(self) -> memoryview:
+        buffer = self._buffers[self._next]
+        self._next = (self._next + 1) % self.slots
+        return buffer
+
+
+class BatchDecoder:
+    """Decodes batches of packets on a worker thread, into a `PcmPool`.
+
+    The event loop (receiving, clock sync) never waits on the codec, and
+    decoding several packets per wakeup costs one thread hand-off instead
+    of one per packet. A batch is at most `pool.slots` packets, so its PCM
+    stays valid until the next batch is decoded. `cpu_seconds` is the
+    worker's CPU time, for the node's CPU budget report.
+    """
+
+    def __init__(self, codec: AudioCodecManager, slots: int = DECODE_POOL_SLOTS):
+        self.codec = codec
+        self.pool = PcmPool(slots, MAX_OPUS_FRAME_SAMPLES * codec.channels * 2)
+        self.cpu_seconds = 0.0
+        self.batches = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="decode")
+
+    @property
+    def max_batch(self) -> int:
+        return self.pool.slots
+
+    def _decode_batch(self, payloads: Sequence[bytes]) -> List[memoryview]:
+        started = time.thread_time()
+        decoded = []
+        for payload in payloads:
+            buffer = self.pool.take()
+            decoded.append(buffer[:self.codec.decode_into(payload, buffer)])
+        self.cpu_seconds += time.thread_time() - started
+        self.batches += 1
+        return decoded
+
+    async def decode(self, payloads: Sequence[bytes]) -> List[memoryview]:
+        """PCM for up to `max_batch` packets, decoded off the event loop."""
+        if len(payloads) > self.max_batch:
+            raise ValueError(f"Batch of {len(payloads)} exceeds the pool ({self.max_batch})")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._decode_batch, payloads)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
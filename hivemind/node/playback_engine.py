@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Optional
+
+from hivemind.common.audio_codec import AudioCodecManager
+from hivemind.node.buffer_manager import JitterBuffer
+from hivemind.node.decoder import BatchDecoder
+from hivemind.node.time_sync_client import TimeSyncClient
+
+logger = logging.getLogger(__name__)
+
+# sink(sequence, play_at_host, pcm, local_play_time)
+Sink = Callable[[int, float, bytes, float], None]
+
+
+class PlaybackEngine:
+    """Releases frames from the jitter buffer at their scheduled local time.
+
+    The actual output device is abstracted as a `sink`; each frame is handed
+    over together with the local clock time at which it is meant to start.
+
+    With `wakeup_ms` (low-power mode) the engine wakes that often instead of
+    every tick. It then decodes everything due before its next wakeup as one
+    batch on a worker thread (see `BatchDecoder`). Fewer wakeups cost less
+    CPU, but frames are handed to the sink up to `wakeup_ms` early, so the
+    host's lookahead has to cover that. The sink then gets PCM as a
+    `memoryview` into a reused buffer; copy it to keep it past the call.
+
+    `decode_cpu` is the CPU time spent decoding so far, in either mode.
+    """
+
+    def __init__(self, buffer: JitterBuffer, time_sync: TimeSyncClient,
+                 codec: Optional[AudioCodecManager] = None, sink: Optional[Sink] = None,
+                 tick_ms: float = 5.0, late_tolerance_ms: float = 20.0,
+                 wakeup_ms: Optional[float] = None):
+        self.buffer = buffer
+        self.time_sync = time_sync
+        self._codec = codec
+        self.sink = sink
+        self.tick = tick_ms / 1000.0
+        self.late_tolerance = late_tolerance_ms / 1000.0
+        self.wakeup = wakeup_ms / 1000.0 if wakeup_ms else None
+        self.decoder: Optional[BatchDecoder] = None
+        self.played = 0
+        self.wakeups = 0
+        self._decode_cpu = 0.0
+        self._running = False
+
+    @property
+    def codec(self) -> AudioCodecManager:
+        # Built when playback starts (or on first use), so joining doesn't pay for decoder setup
+        if self._codec is None:
+            self._codec = AudioCodecManager()
+        return self._codec
+
+    @property
+    def decode_cpu(self) -> float:
+        return self._decode_cpu + (self.decoder.cpu_seconds if self.decoder is not None else 0.0)
+
+    def _deliver(self, frame, pcm):
+        if self.sink is None:
+            return
+        sequence, play_at, _ = frame
+        try:
+            self.sink(sequence, play_at, pcm, self.time_sync.to_local(play_at))
+        except Exception:
+            logger.exception("Playback sink failed")
+
+    def service(self) -> int:
+        """Play everything that is due now; returns the number of frames played."""
+        sync = self.time_sync
+        if not sync.synced:
+            return 0
+        host_now = sync.to_host(sync.clock())
+        self.buffer.drop_late(host_now, self.late_tolerance)
+        # Hand frames over one tick early so the output can start them on time
+        frames = self.buffer.pop_due(host_now + self.tick)
+        for frame in frames:
+            started = time.thread_time()
+            pcm = self.codec.decode(frame[2])
+            self._decode_cpu += time.thread_time() - started
+            self._deliver(frame, pcm)
+        self.played += len(frames)
+        return len(frames)
+
+    async def service_batch(self) -> int:
+        """Low-power mode: decode and play everything due before the next wakeup."""
+        sync = self.time_sync
+        if not sync.synced:
+            return 0
+        if self.decoder is None:
+            self.decoder = BatchDecoder(self.codec)
+        host_now = sync.to_host(sync.clock())
+        self.buffer.drop_late(host_now, self.late_tolerance)
+        frames = self.buffer.pop_due(host_now + self.wakeup + self.tick)
+        limit = self.decoder.max_batch
+        for i in range(0, len(frames), limit):
+            batch = frames[i:i + limit]
+            for frame, pcm in zip(batch, await self.decoder.decode([payload for _, _, payload in batch])):
+                self._deliver(frame, pcm)
+        self.played += len(frames)
+        return len(frames)
+
+    async def run(self):
+        self._running = True
+        if self._codec is None:
+            # Set up the decoder before the first frame is due, off the loop: probing for
+            # libopus takes tens of ms, longer than a frame may run late
+            codec = await asyncio.get_running_loop().run_in_executor(None, AudioCodecManager)
+            self._codec = self._codec or codec
+        try:
+            while self._running:
+                self.wakeups += 1
+                if self.wakeup is None:
+                    self.service()
+                    await asyncio.sleep(self.tick)
+                else:
+                    await self.service_batch()
+                    await asyncio.sleep(self.wakeup)
+        finally:
+            if self.decoder is not None:
+                self.decoder.close()
+                self._decode_cpu += self.decoder.cpu_seconds
+                self.decoder = None
+
+    def stop(self):
+        self._running = False
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+from hivemind.common.protocol import pack_sync, unpack_sync
+from hivemind.config import SYNC_WINDOW
+
+
+class TimeSyncClient:
+    """NTP-style estimate of the offset between the host clock and the local clock.
+
+    Each exchange yields `offset = (t1 + t2) / 2 - (t0 + t3) / 2` with round
+    trip `(t3 - t0) - (t2 - t1)`, where t1 and t2 are the host's receive and
+    send times (the same time when the host reports only one). The estimate
+    is taken from the lowest-RTT sample in a sliding window, since queuing
+    delay only ever inflates (and skews) a sample.
+    """
+
+    def __init__(self, clock=time.time, window: int = SYNC_WINDOW):
+        self.clock = clock
+        self.samples = deque(maxlen=window)
+        self.offset: float = 0.0
+        self.rtt: Optional[float] = None
+        self.last_rtt: Optional[float] = None
+        # Offset seeded without an RTT (a stored profile); stands until a second sample is measured
+        self._prior: Optional[float] = None
+
+    @property
+    def synced(self) -> bool:
+        return bool(self.samples) or self._prior is not None
+
+    def make_request(self) -> dict:
+        return {"client_time": self.clock()}
+
+    def handle_response(self, host_time: float, client_time: float, host_sent: Optional[float] = None) -> float:
+        """Fold one response into the estimate; returns the sample's RTT in seconds.
+
+        `host_time` is when the host received the request, `host_sent` when
+        it answered (if it says); the time in between is not round trip.
+        """
+        now = self.clock()
+        host_sent = host_time if host_sent is None else host_sent
+        rtt = max(0.0, (now - client_time) - (host_sent - host_time))
+        self.samples.append((rtt, (host_time + host_sent) / 2.0 - (client_time + now) / 2.0))
+        self.last_rtt = rtt
+        self.rtt, self.offset = min(self.samples)
+        if self._prior is not None:
+            if len(self.samples) < 2:
+                self.offset = self._prior
+            else:
+                self._prior = None
+        return rtt
+
+    def seed(self, offset: float, rtt: Optional[float] = None):
+        """Start from a previously known estimate (e.g. after a reconnect).
+
+        An estimate with an RTT competes with measured samples like any
+        other. One without (a stored profile) cannot be ranked against them,
+        so it stands until a second sample is measured: the single sample
+        pipelined in the join does not displace it.
+        """
+        self.offset = offset
+        self.rtt = rtt
+        if rtt is None:
+            self._prior = offset
+        else:
+            self.samples.append((rtt, offset))
+
+    def to_local(self, host_time: float) -> float:
+        return host_time - self.offset
+
+    def to_host(self, local_time: float) -> float:
+        return local_time + self.offset
+
+
+class UdpSyncProbe(asyncio.DatagramProtocol):
+    """Probes a host's UDP time-sync responder (see hivemind.host.udp_sync) for `time_sync`.
+
+    Only answers to one of the last few probes count, so a stray or
+    duplicated datagram cannot move the estimate.
+    """
+
+    def __init__(self, time_sync: TimeSyncClient):
+        self.time_sync = time_sync
+        self.transport = None
+        self.answered = 0
+        self.answered_at = float("-inf")
+        self._pending = deque(maxlen=SYNC_WINDOW)
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def probe(self):
+        client_time = self.time_sync.clock()
+        self._pending.append(client_time)
+        self.transport.sendto(pack_sync(client_time))
+
+    def datagram_received(self, data, addr):
+        packet = unpack_sync(data)
+        if packet is None or packet[0] not in self._pending:
+            return
+        client_time, host_received, host_sent = packet
+        self._pending.remove(client_time)
+        self.time_sync.handle_response(host_received, client_time, host_sent)
+        self.answered += 1
+        self.answered_at = time.monotonic()
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
@@ -0,0 +1,6 @@
+"""In-process simulation helpers for measuring sync accuracy."""
+
+from hivemind.sim.virtual import LinkConditions, VirtualClock
+from hivemind.sim.harness import NodeSpec, SyncHarness, SyncReport
+
+__all__ = ["LinkConditions", "VirtualClock", "NodeSpec", "SyncHarness", "SyncReport"]
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Sequence
+
+from hivemind.config import CHANNELS, CHUNK_DURATION_MS, SAMPLE_RATE
+from hivemind.node.client import HiveMindClient
+from hivemind.sim.virtual import LinkConditions, VirtualClock
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+class NodeSpec:
+    """One simulated node: its clock, its link and when it joins (seconds after start)."""
+
+    def __init__(self, clock: Optional[VirtualClock] = None, link: Optional[LinkConditions] = None,
+                 join_at: float = 0.0, name: Optional[str] = None):
+        self.clock = clock or VirtualClock()
+        self.link = link
+        self.join_at = join_at
+        self.name = name
+
+
+class SyncReport:
+    """Sync-error statistics computed from recorded playout times.
+
+    `records[node] = [(sequence, host_play_at, true_play_time), ...]`. Because the
+    simulated host runs on the real clock, `true_play_time - host_play_at` is
+    each node's absolute playout error, and the spread of `true_play_time`
+    across nodes for one sequence is the cross-node sync error.
+    """
+
+    def __init__(self, records: Dict[str, List[tuple]], join_times: Dict[str, float],
+                 stats: Dict[str, dict], threshold_ms: float = 5.0):
+        self.records = records
+        self.join_times = join_times
+        self.stats = stats
+        self.threshold_ms = threshold_ms
+
+    def node_errors_ms(self, node: str) -> List[float]:
+        return [(true - play_at) * 1000.0 for _, play_at, true in self.records.get(node, ())]
+
+    def spread_ms(self) -> List[float]:
+        by_sequence = defaultdict(list)
+        for rows in self.records.values():
+            for sequence, _, true in rows:
+                by_sequence[sequence].append(true)
+        return [(max(v) - min(v)) * 1000.0 for v in by_sequence.values() if len(v) > 1]
+
+    def convergence_s(self, node: str) -> Optional[float]:
+        """Time from join until the node's error stays within `threshold_ms`."""
+        rows = sorted(self.records.get(node, ()), key=lambda r: r[1])
+        if not rows:
+            return None
+        settled_at = None
+        for _, play_at, true in rows:
+            if abs(true - play_at) * 1000.0 > self.threshold_ms:
+                settled_at = None
+            elif settled_at is None:
+                settled_at = true
+        if settled_at is None:
+            return None
+        return max(0.0, settled_at - self.join_times[node])
+
+    def summary(self) -> dict:
+        spread = self.spread_ms()
+        nodes = {}
+        for node in self.records:
+            errors = [abs(e) for e in self.node_errors_ms(node)]
+            nodes[node] = {
+                "played": len(errors),
+                "p50_ms": percentile(errors, 50),
+                "p95_ms": percentile(errors, 95),
+                "max_ms": max(errors, default=None),
+                "convergence_s": self.convergence_s(node),
+                **self.stats.get(node, {}),
+            }
+        return {
+            "spread_p50_ms": percentile(spread, 50),
+            "spread_p95_ms": percentile(spread, 95),
+            "spread_p99_ms": percentile(spread, 99),
+            "spread_max_ms": max(spread, default=None),
+            "compared_sequences": len(spread),
+            "nodes": nodes,
+        }
+
+    def format(self) -> str:
+        def fmt(v, unit="ms"):
+            return "-" if v is None else f"{v:.2f}{unit}"
+
+        s = self.summary()
+        lines = [
+            f"cross-node spread over {s['compared_sequences']} chunks: "
+            f"p50 {fmt(s['spread_p50_ms'])}  p95 {fmt(s['spread_p95_ms'])}  "
+            f"p99 {fmt(s['spread_p99_ms'])}  max {fmt(s['spread_max_ms'])}",
+            f"{'node':<12}{'played':>8}{'late':>6}{'p50':>10}{'p95':>10}{'max':>10}{'converged':>12}",
+        ]
+        for node, n in s["nodes"].items():
+            lines.append(f"{node:<12}{n['played']:>8}{n.get('late', 0):>6}{fmt(n['p50_ms']):>10}"
+                         f"{fmt(n['p95_ms']):>10}{fmt(n['max_ms']):>10}{fmt(n['convergence_s'], 's'):>12}")
+        return "\n".join(lines)
+
+
+def _default_host_factory():
+    from host_main import HiveMindHostEnhanced
+
+    return HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:")
+
+
+class SyncHarness:
+    """Runs a host plus in-process simulated nodes and records when each would play.
+
+    The host is fed a constant low-level stream at the real chunk cadence
+    (digital silence would not be sent). Each node uses its `NodeSpec` clock
+    and link; playout is recorded through the node's playback sink as the
+    real time at which its local clock reaches the scheduled start of each
+    frame.
+    """
+
+    def __init__(self, nodes: Sequence[NodeSpec], chunk_ms: int = CHUNK_DURATION_MS,
+                 host_factory: Callable = _default_host_factory, threshold_ms: float = 5.0):
+        self.nodes = list(nodes)
+        self.chunk_ms = chunk_ms
+        self.host_factory = host_factory
+        self.threshold_ms = threshold_ms
+        self.host = None
+        self.clients: Dict[str, HiveMindClient] = {}
+
+    async def _feed(self):
+        chunk = b"\xe8\x03" * CHANNELS * int(SAMPLE_RATE * self.chunk_ms / 1000)
+        interval = self.chunk_ms / 1000.0
+        next_at = time.monotonic()
+        while True:
+            self.host.audio_capture.push_chunk(chunk)
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+
+    async def _join(self, name: str, spec: NodeSpec, port: int, records, join_times):
+        await asyncio.sleep(spec.join_at)
+        rows = records[name]
+        clock = spec.clock
+
+        def sink(sequence, play_at, pcm, local_time):
+            rows.append((sequence, play_at, clock.to_true(local_time)))
+
+        client = HiveMindClient(self.host.session_manager.session_code, device_id=name,
+                                clock=clock, sink=sink, link=spec.link)
+        self.clients[name] = client
+        join_times[name] = time.time()
+        await client.connect("localhost", port)
+
+    async def run(self, duration_s: float) -> SyncReport:
+        self.host = self.host_factory()
+        host_task = asyncio.create_task(self.host.start())
+        server = self.host.network_server
+        while server._server is None:
+            await asyncio.sleep(0.01)
+        port = server._server.sockets[0].getsockname()[1]
+
+        records: Dict[str, list] = {}
+        join_times: Dict[str, float] = {}
+        specs = {spec.name or f"sim-{i}": spec for i, spec in enumerate(self.nodes)}
+        joins = []
+        for name, spec in specs.items():
+            records[name] = []
+            joins.append(asyncio.create_task(self._join(name, spec, port, records, join_times)))
+        feeder = asyncio.create_task(self._feed())
+
+        try:
+            await asyncio.sleep(duration_s)
+        finally:
+            feeder.cancel()
+            for task in joins:
+                task.cancel()
+            stats = {}
+            for name, client in self.clients.items():
+                stats[name] = {
+                    "late": client.late_chunks + client.buffer.late,
+                    "offset_error_ms": (client.time_sync.offset - self._true_offset(specs[name].clock)) * 1000.0,
+                }
+                await client.disconnect()
+            await self.host.stop()
+            await host_task
+
+        return SyncReport(records, join_times, stats, threshold_ms=self.threshold_ms)
+
+    @staticmethod
+    def _true_offset(clock: VirtualClock) -> float:
+        """Actual host-minus-local offset right now, to score the node's estimate."""
+        now = time.time()
+        return -(clock.offset + clock.drift * (now - clock.epoch))
@@ -0,0 +1,52 @@
+import random
+import time
+from typing import Optional
+
+
+class VirtualClock:
+    """A node clock derived from the real clock with offset, drift and read jitter.
+
+    `local = true + offset + drift_ppm * 1e-6 * (true - epoch) + noise`, where the
+    noise is Gaussian with `jitter_ms` standard deviation. Calling the instance
+    reads the clock, so it can be passed anywhere a `time.time`-like callable is
+    expected.
+    """
+
+    def __init__(self, offset_s: float = 0.0, drift_ppm: float = 0.0, jitter_ms: float = 0.0,
+                 base=time.time, seed: Optional[int] = None):
+        self.offset = offset_s
+        self.drift = drift_ppm * 1e-6
+        self.jitter = jitter_ms / 1000.0
+        self.base = base
+        self.epoch = base()
+        self._rng = random.Random(seed)
+
+    def __call__(self) -> float:
+        true = self.base()
+        local = true + self.offset + self.drift * (true - self.epoch)
+        if self.jitter:
+            local += self._rng.gauss(0.0, self.jitter)
+        return local
+
+    def to_true(self, local: float) -> float:
+        """Real time at which this clock (ignoring read jitter) shows `local`."""
+        return (local - self.offset + self.drift * self.epoch) / (1.0 + self.drift)
+
+
+class LinkConditions:
+    """One-way delay, jitter and loss applied by a simulated node to its traffic."""
+
+    def __init__(self, delay_ms: float = 0.0, jitter_ms: float = 0.0, loss: float = 0.0,
+                 seed: Optional[int] = None):
+        self.delay = delay_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.loss = loss
+        self._rng = random.Random(seed)
+
+    def should_drop(self) -> bool:
+        return self.loss > 0 and self._rng.random() < self.loss
+
+    def sample_delay(self) -> float:
+        if not self.jitter:
+            return self.delay
+        return max(0.0, self.delay + self._rng.gauss(0.0, self.jitter))
@@ -11,16 +11,31 @@ import time
 import threading
 
 from hivemind.host.session_manager import SessionManager
-from hivemind.host.clock_sync import ClockSyncService
+from hivemind.host.clock_sync import ClockSyncService, HostClock
 from hivemind.host.audio_scheduler import AudioScheduler
 from hivemind.host.network_server import NetworkServer
 from hivemind.host.audio_capture import AudioCapture
-from hivemind.host.web_dashboard import WebDashboard
-from hivemind.common.protocol import Protocol, MessageType
-from hivemind.common.audio_codec import AudioCodecManager
+from hivemind.host.bitrate_controller import AdaptiveBitrateController, TierEncoderPool
+from hivemind.host.capacity import CapacityMonitor
+from hivemind.host.dispatcher import FailureLimiter
+from hivemind.host.handoff import HandoffListener, Successor
+from hivemind.host.profile_store import NodeProfileStore
+from hivemind.host.profiler import SamplingProfiler
+from hivemind.host.replication import ReplicationSource, StandbyReplica
+from hivemind.host.spatial import SpatialLayout
+from hivemind.host.timeline import CROSSFADE, START, STOP, VOLUME
+from hivemind.host.traffic_recorder import TrafficRecorder
+from hivemind.host.udp_sync import UdpSyncResponder
+from hivemind.common.protocol import (
+    AUTH_FAILED, AUTH_LOCKED, HOST_BUSY, HOST_SUPERSEDED, STANDBY_NOT_ACTIVE, MessageType, Protocol,
+    negotiate_serializer,
+)
 from hivemind.common.volume_control import VolumeController
 from hivemind.common.latency_calibration import LatencyCalibrator
-from hivemind.config import DEFAULT_PORT
+from hivemind.config import (
+    AUTH_FAILURE_LIMIT, AUTH_TIMEOUT_S, CAPACITY_INTERVAL_S, DEFAULT_PORT, MAX_SEND_BUFFER_BYTES, METRICS_INTERVAL_S,
+    METRICS_SNAPSHOT_S, TIMELINE_HORIZON_S,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -36,7 +51,19 @@ class HiveMindHostEnhanced:
     def __init__(self, port: int = DEFAULT_PORT, 
                  enable_compression: bool = True,
                  enable_web_dashboard: bool = True,
-                 web_port: int = 5000):
+                 web_port: int = 5000,
+                 profile_path: str = None,
+                 record_path: str = None,
+                 scale_mode: bool = False,
+                 standby_of: str = None,
+                 advertise_host: str = None,
+                 encrypt_audio: bool = False,
+                 dtx: bool = True,
+                 uplink_mbps: float = None,
+                 metrics_path: str = None,
+                 handoff_path: str = None,
+                 udp_sync_port: int = None,
+                 session_code: str = None):
         """
         Initialize enhanced HiveMind host.
         
@@ -45,35 +72,234 @@ class HiveMindHostEnhanced:
             enable_compression: Enable Opus compression
             enable_web_dashboard: Enable web dashboard
             web_port: Web dashboard port
+            profile_path: SQLite file for learned node profiles (":memory:" to not persist;
+                defaults to $HIVEMIND_PROFILE_DB, else the user's state dir)
+            record_path: Log all network traffic to this file for later replay
+            scale_mode: Tune connections for thousands of idle listeners
+            standby_of: "HOST:PORT" of a primary to mirror as a hot standby
+            advertise_host: Address nodes should use to reach this host as a standby
+            encrypt_audio: Seal audio frames with a room key (needs `cryptography`)
+            dtx: Don't encode or send silence; nodes get "silence until" markers instead
+            uplink_mbps: Upstream bandwidth to budget audio against (unlimited if None)
+            metrics_path: File the metrics history is restored from and snapshotted to
+            handoff_path: Unix socket for restarting without dropping nodes (see hivemind.host.handoff)
+            udp_sync_port: Answer time-sync probes over UDP on this port (0: any free port; None: off)
+            session_code: Code nodes (and standbys) must prove to join (default: the session manager's)
         """
         self.port = port
-        self.session_manager = SessionManager()
-        self.clock_sync = ClockSyncService()
-        self.audio_scheduler = AudioScheduler()
-        self.network_server = NetworkServer(port=port)
+        self.enable_compression = enable_compression
+        # Session time base; a standby adopts its primary's
+        self.host_clock = HostClock()
+        self.session_manager = SessionManager(clock=self.host_clock)
+        if session_code:
+            self.session_manager.session_code = session_code
+        self.clock_sync = ClockSyncService(clock=self.host_clock)
+        # Low-jitter clock probes on their own thread, bypassing the WebSocket and the handler queue
+        self.udp_sync = UdpSyncResponder(self.host_clock, port=udp_sync_port) if udp_sync_port is not None else None
+        self.audio_scheduler = AudioScheduler(clock=self.host_clock)
+        self.traffic_recorder = TrafficRecorder(record_path) if record_path else None
+        self.network_server = NetworkServer(port=port, recorder=self.traffic_recorder,
+                                            scale_mode=scale_mode)
         self.audio_capture = AudioCapture()
         
-        # Advanced features
-        self.codec_manager = AudioCodecManager(use_compression=enable_compression)
+        # Advanced features (codecs are built when the first node joins)
+        self._codec_manager = None
+        self._mixer = None
+        self._current_track = None
         self.volume_controller = VolumeController()
         self.latency_calibrator = LatencyCalibrator()
         
-        # Web dashboard
+        # Adaptive bitrate: one shared encoder per tier, tier chosen per node
+        self.bitrate_controller = AdaptiveBitrateController()
+        self.tier_encoders = TierEncoderPool(use_compression=enable_compression)
+        
+        # Per-node channel map and alignment delay (speaker array)
+        self.spatial = SpatialLayout()
+        
+        # What we learned about each device, so rejoining devices warm-start
+        self.profile_store = NodeProfileStore(profile_path)
+        
+        # Discontinuous transmission; the encode stage also sleeps while no node is joined
+        self.silence_detector = None
+        if dtx:
+            from hivemind.host.silence import SilenceDetector
+            
+            self.silence_detector = SilenceDetector()
+        self._listening = asyncio.Event()
+        
+        # Measured headroom: turns new nodes away and sheds optional work at capacity
+        self.capacity = CapacityMonitor(egress_bps=uplink_mbps * 1e6 / 8 if uplink_mbps else None)
+        
+        # Fixed-size history of host metrics, for looking back after an incident (built on first use)
+        self._metrics = None
+        self.metrics_path = metrics_path
+        self.late_chunks = 0
+        
+        # Joins prove the session code without sending it; audio is optionally sealed once per frame
+        self.room_cipher = None
+        if encrypt_audio:
+            from hivemind.common.session_auth import RoomCipher
+            
+            self.room_cipher = RoomCipher()
+        self._failed_joins = FailureLimiter(*AUTH_FAILURE_LIMIT)
+        
+        # Hot standby: a primary streams its state to standbys; a standby mirrors one primary.
+        # `term` counts takeovers: a host behind the newest one steps down (see hivemind.host.replication)
+        self.term = 0
+        self.superseded = False
+        self.replication = ReplicationSource(self)
+        self.standby = None
+        if standby_of:
+            primary_host, _, primary_port = standby_of.rpartition(':')
+            self.standby = StandbyReplica(self, (primary_host or 'localhost', int(primary_port)),
+                                          advertise_host=advertise_host)
+        
+        # Zero-downtime restart: a new process on the same socket takes the session over
+        self.handoff_path = handoff_path
+        self._handing_off = False
+        self._distribution = None
+        
+        # Web dashboard (constructed on start)
+        self.enable_web_dashboard = enable_web_dashboard
+        self.web_port = web_port
         self.web_dashboard = None
-        if enable_web_dashboard:
-            self.web_dashboard = WebDashboard(self, port=web_port)
         
         self.running = False
+        self._tasks = set()
         
         # Register message handlers
         self._register_handlers()
     
+    @property
+    def codec_manager(self):
+        """Default-quality codec, created on first use."""
+        if self._codec_manager is None:
+            from hivemind.common.audio_codec import AudioCodecManager
+            
+            self._codec_manager = AudioCodecManager(use_compression=self.enable_compression)
+        return self._codec_manager
+    
+    @property
+    def metrics(self):
+        """Metrics history, created on first use (its arrays need numpy)."""
+        if self._metrics is None:
+            from hivemind.host.metrics_history import MetricsHistory
+            
+            self._metrics = MetricsHistory()
+        return self._metrics
+    
+    @property
+    def mixer(self):
+        """Mixer between capture and encoding, created when the first extra source is added."""
+        if self._mixer is None:
+            from hivemind.host.mixer import Mixer
+            
+            self._mixer = Mixer()
+        return self._mixer
+    
+    def play_source(self, source, start_at: float = None, crossfade_ms: float = 0.0,
+                    replace: str = None) -> int:
+        """
+        Mix a source (track, announcement, generator) into the stream.
+        
+        Args:
+            source: MixerSource to add
+            start_at: Host time at which it should be heard (default: next chunk)
+            crossfade_ms: Fade it in over this long while `replace` fades out
+            replace: Name of the source to hand over from
+            
+        Returns:
+            Mixer sample position at which the source starts
+        """
+        mixer = self.mixer
+        at = mixer.position
+        if start_at is not None:
+            at = max(at, mixer.sample_at(start_at, self.audio_scheduler.next_play_at))
+        fade = max(1, int(mixer.sample_rate * crossfade_ms / 1000))
+        if crossfade_ms > 0:
+            mixer.crossfade(replace, source, at, fade)
+        else:
+            if replace in mixer.sources:
+                mixer.fade_out(replace, at, fade)
+            mixer.add_source(source, start_sample=at)
+        return at
+    
+    def schedule_track(self, track_url: str, pcm, start_at: float, crossfade_ms: float = 2000.0,
+                       sample_rate: int = None, channels: int = None):
+        """
+        Schedule a decoded track, crossfading from the previously scheduled one.
+        
+        Args:
+            track_url: Track identifier (also the mixer source name)
+            pcm: Decoded 16-bit PCM
+            start_at: Host time at which the crossfade starts
+            crossfade_ms: Crossfade length
+            sample_rate: Rate of `pcm` if not the stream's (converted on load)
+            channels: Channel count of `pcm` if not the stream's
+        """
+        from hivemind.host.mixer import PcmSource
+        
+        mixer = self.mixer
+        source = PcmSource(track_url, pcm,
+                           channels=channels or mixer.channels,
+                           sample_rate=sample_rate or mixer.sample_rate,
+                           out_rate=mixer.sample_rate,
+                           out_channels=mixer.channels)
+        event = self.session_manager.timeline.add(
+            CROSSFADE, start_at, track_url, source=source,
+            duration=len(source.data) / mixer.sample_rate,
+            replaces=self._current_track, fade_ms=crossfade_ms,
+        )
+        self._current_track = track_url
+        return event.describe()
+    
+    def schedule_event(self, kind: str, track_url: str, start_at: float, **params):
+        """
+        Queue a change to a playing source on the session timeline.
+        
+        Args:
+            kind: STOP (`fade_ms`) or VOLUME (`gain`, `ramp_ms`)
+            track_url: Mixer source the event applies to
+            start_at: Host time at which it takes effect
+            
+        Returns:
+            The event as listed in session info
+        """
+        return self.session_manager.timeline.add(kind, start_at, track_url, **params).describe()
+    
+    def _run_timeline(self):
+        """Hand timeline events starting within the horizon to the mixer, on their exact sample."""
+        timeline = self.session_manager.timeline
+        if not timeline.pending:
+            return
+        next_play_at = self.audio_scheduler.next_play_at
+        for event in timeline.due(next_play_at + TIMELINE_HORIZON_S):
+            params = event.params
+            if event.kind in (START, CROSSFADE):
+                if event.source is not None:
+                    self.play_source(event.source, start_at=event.start_at,
+                                     crossfade_ms=params.get('fade_ms', 0.0), replace=event.replaces)
+                continue
+            mixer = self._mixer
+            if mixer is None or event.track not in mixer.sources:
+                continue
+            at = max(mixer.position, mixer.sample_at(event.start_at, next_play_at))
+            if event.kind == STOP:
+                fade = max(1, int(mixer.sample_rate * params.get('fade_ms', 10.0) / 1000))
+                mixer.fade_out(event.track, at, fade)
+            elif event.kind == VOLUME:
+                mixer.set_gain(event.track, params['gain'], params.get('ramp_ms', 10.0), at_sample=at)
+    
     def _register_handlers(self):
         """Register network message handlers."""
         self.network_server.register_handler(
             MessageType.JOIN_REQUEST,
             self._handle_join_request
         )
+        self.network_server.register_handler(
+            MessageType.JOIN_CONFIRM,
+            self._handle_join_confirm
+        )
         self.network_server.register_handler(
             MessageType.TIME_SYNC_REQUEST,
             self._handle_time_sync_request
@@ -82,50 +308,371 @@ class HiveMindHostEnhanced:
             MessageType.HEARTBEAT,
             self._handle_heartbeat
         )
+        self.network_server.register_handler(
+            MessageType.STREAM_REPORT,
+            self._handle_stream_report
+        )
+        self.network_server.register_handler(
+            MessageType.REPLICA_HELLO,
+            self._handle_replica_hello
+        )
+    
+    @property
+    def active(self) -> bool:
+        """False while this host is a standby that has not taken over, or a primary that stepped down."""
+        return (self.standby is None or self.standby.promoted.is_set()) and not self.superseded
+    
+    def _inactive_reason(self) -> str:
+        return HOST_SUPERSEDED if self.superseded else STANDBY_NOT_ACTIVE
+    
+    async def step_down(self, successor: dict):
+        """
+        Stop serving a session that a standby has taken over, and send our nodes there.
+        
+        Args:
+            successor: {"host", "port"} of the host that now serves the session
+        """
+        if self.superseded:
+            return
+        logger.warning(f"Stepping down: the session continues on {successor['host']}:{successor['port']}")
+        self.superseded = True
+        await self._stop_distribution()
+        server = self.network_server
+        clients = [c for c in dict.fromkeys(server.clients.values()) if c.device_id is not None]
+        await server.send_to(clients, Protocol.create_redirect(successor['host'], successor['port']))
     
     async def _handle_join_request(self, client, payload: dict, audio_data):
-        """Handle join request from a node."""
+        """Handle join request from a node: challenge it to prove the session code."""
+        logger.info(f"Join request from {payload.get('device_name')} ({payload.get('device_id')})")
+        
+        if not self.active:
+            # A node failing over can beat our own detection of the primary's loss. It retries
+            # with backoff; waiting here would hold a dispatcher slot every other handler needs.
+            await client.send_message(Protocol.create_join_reject(self._inactive_reason()))
+            return
+        
+        # A known node proving its session key resumes without a new exchange
+        session_key = self.session_manager.verify_resume(payload.get('device_id'), payload.get('resume'))
+        if session_key is not None:
+            from hivemind.common.session_auth import resume_confirm
+            
+            # ...and learns from the accept that we hold the same key
+            proof = resume_confirm(session_key, payload['device_id'], payload['resume']['counter'])
+            await self._accept_join(client, payload, session_key, sync=payload.get('sync'), resume_proof=proof)
+            return
+        
+        # Only new devices are turned away; nodes already in the session are existing load
+        if payload.get('device_id') not in self.session_manager.nodes:
+            retry_after = self.capacity.admit(self.listener_count)
+            if retry_after is not None:
+                logger.warning(f"At capacity (load {self.capacity.load:.2f}); "
+                               f"turning away {payload.get('device_id')}")
+                await client.send_message(Protocol.create_join_reject(HOST_BUSY, retry_after=retry_after))
+                return
+        await self._challenge(client, MessageType.JOIN_REQUEST, payload, str(payload.get('device_id')))
+    
+    async def _challenge(self, client, kind: MessageType, payload: dict, identity: str):
+        """Answer a join or replica hello with the host's SPAKE2 share (its proof comes after the peer's)."""
+        from hivemind.common.session_auth import HostHandshake
+        
+        # Each peer address has its own failure budget; a challenge holds a token of it until
+        # the peer's proof arrives, so one address cannot test guesses in parallel either
+        source = client.addr.rpartition(':')[0]
+        if not self._failed_joins.begin(source):
+            await client.send_message(Protocol.create_join_reject(AUTH_LOCKED))
+            return
+        try:
+            handshake = HostHandshake(self.session_manager.session_code, identity, payload.get('auth') or {})
+        except (KeyError, ValueError, TypeError):
+            self._failed_joins.end(source, failed=True)
+            await client.send_message(Protocol.create_join_reject(AUTH_FAILED))
+            return
+        pending = client.handshake = (handshake, kind, payload)
+        self._spawn(self._expire_challenge(client, source, pending))
+        await client.send_message(Protocol.create_join_challenge(handshake.challenge()))
+    
+    async def _expire_challenge(self, client, source: str, pending):
+        """Count a challenge as a failed join once it times out unanswered or its socket closes."""
+        try:
+            await asyncio.wait_for(client.ws.wait_closed(), AUTH_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            pass
+        if client.handshake is pending:
+            client.handshake = None
+            self._failed_joins.end(source, failed=True)
+            await client.ws.close()
+    
+    async def _handle_join_confirm(self, client, payload: dict, audio_data):
+        """Finish a join (or replica hello) once the peer has proven the session code."""
+        pending, client.handshake = client.handshake, None
+        if pending is None:
+            return
+        handshake, kind, request = pending
+        proven = handshake.verify(payload)
+        self._failed_joins.end(client.addr.rpartition(':')[0], failed=not proven)
+        if not proven:
+            logger.warning(f"Failed session code proof from {client.addr}")
+            await client.send_message(Protocol.create_join_reject(AUTH_FAILED))
+            return
+        # Only a peer that has proven the code learns that we know it too
+        await client.send_message(Protocol.create_join_confirm(handshake.confirm()))
+        if kind == MessageType.REPLICA_HELLO:
+            await self._attach_replica(client, request, handshake.key)
+        else:
+            await self._accept_join(client, request, handshake.key, new_key=True, sync=payload.get('sync'))
+    
+    async def _accept_join(self, client, payload: dict, session_key: bytes, new_key: bool = False,
+                           sync: dict = None, resume_proof: str = None):
+        """
+        Admit an authenticated node, resuming its record if it presents a resume token.
+        
+        The accept answers the time-sync request `sync` that came with the
+        join, and is followed by the frames still ahead of the play head, so
+        the node can start playing on the next frame due. A node that
+        resumed with a proof instead of a handshake gets ours (`resume_proof`).
+        """
         device_id = payload['device_id']
         device_name = payload['device_name']
-        session_code = payload['session_code']
-        metadata = payload['metadata']
+        metadata = payload.get('metadata') or {}
+        
+        term = payload.get('term')
+        if isinstance(term, int) and term > self.term:
+            # The node has been with a standby that took over from us
+            await client.send_message(Protocol.create_join_reject(HOST_SUPERSEDED))
+            if self.replication.last_standby is not None:
+                await self.step_down(self.replication.last_standby)
+            return
+        
+        room_key = None
+        if self.room_cipher is not None:
+            from hivemind.common.session_auth import CIPHER, seal_key
+            
+            if CIPHER not in (payload.get('ciphers') or ()):
+                await client.send_message(Protocol.create_join_reject("Node cannot decrypt audio"))
+                return
+            room_key = seal_key(session_key, self.room_cipher.key)
+        # Fresh handshake: its key replaces the node's session key for later resumes
+        key_fields = {'session_key': session_key.hex(), 'resume_counter': 0} if new_key else {}
         
-        logger.info(f"Join request from {device_name} ({device_id})")
+        serializer = negotiate_serializer(payload.get('serializers'))
         
-        # Validate session code
-        if session_code != self.session_manager.session_code:
-            logger.warning(f"Invalid session code: {session_code}")
-            response = Protocol.create_join_reject("Invalid session code")
+        # Reconnecting node: reattach its existing record and per-node state
+        resume_token = payload.get('resume_token')
+        if resume_token and self.session_manager.resume_node(device_id, resume_token):
+            logger.info(f"Resumed node: {device_name}")
+            self.session_manager.update_node(device_id, **key_fields)
+            self._attach_client(client, device_id)
+            backlog = self._backlog(device_id, payload.get('resume_from'))
+            
+            response = Protocol.create_join_accept(
+                device_id,
+                self.session_manager.get_session_info(),
+                serializer=serializer,
+                resume_token=resume_token,
+                node_state=self._node_state(device_id),
+                resumed=True,
+                standby=self.replication.standby,
+                room_key=room_key,
+                time_sync=self._pipelined_sync(device_id, sync),
+                sync_port=self.udp_sync.port if self.udp_sync else None,
+                resume_confirm=resume_proof,
+                term=self.term
+            )
             await client.send_message(response)
+            client.set_serializer(serializer)
+            await self._send_backlog(client, *backlog)
             return
         
         # Accept node
         if self.session_manager.accept_node(device_id, device_name, metadata):
             logger.info(f"Accepted node: {device_name}")
+            self.session_manager.update_node(device_id, **key_fields)
+            self._attach_client(client, device_id)
             
-            # Mark client as authenticated
-            client.device_id = device_id
-            client.authenticated = True
+            # Known device: start from its stored profile instead of from scratch
+            profile = self.profile_store.record_join(device_id)
+            node_state = self._warm_start(device_id, profile) if profile else None
+            if metadata.get('output_delay_ms') is not None:
+                self.session_manager.update_node(device_id, output_delay_ms=metadata['output_delay_ms'])
+                self.profile_store.update(device_id, output_delay_ms=metadata['output_delay_ms'])
             
-            # Add to server's client list
-            self.network_server.clients[device_id] = client
+            # Replicate the new record right away rather than at the next interval
+            self.replication.mark_changed()
             
-            # Calibrate latency (async)
-            asyncio.create_task(self._calibrate_node_latency(device_id))
+            # First listener: build the encoder now rather than at startup
+            self.tier_encoders.prepare(self.bitrate_controller.tier_for(device_id),
+                                       self.spatial.placement(device_id)[0])
             
-            # Send accept response
+            # Calibrate latency (async) unless the profile already has it
+            if self.session_manager.nodes[device_id].get('latency_ms') is None:
+                self._spawn(self._calibrate_node_latency(device_id))
+            
+            # Frames encoded from here on reach the node live
+            backlog = self._backlog(device_id)
+            
+            # Send accept response in JSON, then switch to the negotiated format
             session_info = self.session_manager.get_session_info()
-            response = Protocol.create_join_accept(device_id, session_info)
+            response = Protocol.create_join_accept(
+                device_id,
+                session_info,
+                serializer=serializer,
+                resume_token=self.session_manager.nodes[device_id]['resume_token'],
+                node_state=node_state,
+                standby=self.replication.standby,
+                room_key=room_key,
+                time_sync=self._pipelined_sync(device_id, sync),
+                sync_port=self.udp_sync.port if self.udp_sync else None,
+                resume_confirm=resume_proof,
+                term=self.term
+            )
             await client.send_message(response)
+            client.set_serializer(serializer)
+            await self._send_backlog(client, *backlog)
         else:
             logger.warning(f"Rejected node: {device_name}")
             response = Protocol.create_join_reject("Session full or invalid device")
             await client.send_message(response)
     
+    def _pipelined_sync(self, device_id: str, sync) -> dict:
+        """Time-sync response to the request carried by a join (None without one)."""
+        client_time = sync.get('client_time') if isinstance(sync, dict) else None
+        if not isinstance(client_time, (int, float)):
+            return None
+        return self.clock_sync.handle_sync_request(device_id, client_time)
+    
+    def _backlog(self, device_id: str, resume_from=None):
+        """
+        Frames of a node's stream that were encoded before it joined but have not played yet.
+        
+        Args:
+            device_id: Joining node (its channel map, delay and tier pick the stream)
+            resume_from: First sequence a resuming node is missing
+            
+        Returns:
+            (tier, delay, frames) for `_send_backlog`
+        """
+        map_key, delay = self.spatial.placement(device_id)
+        tier = self.bitrate_controller.tier_for(device_id)
+        frames = self.tier_encoders.recent(tier, self.host_clock() - delay, variant=map_key)
+        if isinstance(resume_from, int):
+            frames = [frame for frame in frames if frame[0] >= resume_from]
+        return tier, delay, frames
+    
+    async def _send_backlog(self, client, tier: int, delay: float, frames):
+        """Burst backlog frames to one node, exactly as they went out live."""
+        cipher = self.room_cipher
+        scheduler = self.audio_scheduler
+        for sequence, play_at, audio_bytes in frames:
+            if cipher is not None:
+                audio_bytes = cipher.seal(audio_bytes, sequence, tier)
+            message = Protocol.create_audio_chunk(
+                play_at=play_at + delay,
+                sample_rate=scheduler.sample_rate,
+                channels=scheduler.channels,
+                audio_data=audio_bytes,
+                sequence=sequence,
+                tier=tier,
+                encrypted=cipher is not None
+            )
+            await self.network_server.send_to([client], message)
+    
+    async def _handle_replica_hello(self, client, payload: dict, audio_data):
+        """A standby host asks to mirror this session; it proves the code like a node."""
+        if not self.active:
+            await client.send_message(Protocol.create_join_reject(self._inactive_reason()))
+            return
+        await self._challenge(client, MessageType.REPLICA_HELLO, payload, "replica")
+    
+    async def _attach_replica(self, client, payload: dict, key: bytes):
+        """Attach a standby host and start streaming session state to it (node keys sealed under `key`)."""
+        if payload.get('probe'):
+            # A former primary asking whether we took over: the term tells it
+            await client.send_message({'type': MessageType.REPLICA_STATE.value, 'term': self.term})
+            return
+        # A standby is not a listener: take it out of audio distribution
+        self.network_server.clients.pop(client.addr, None)
+        client.authenticated = True
+        address = {
+            "host": payload.get('host') or client.addr.rpartition(':')[0],
+            "port": int(payload['port']),
+        }
+        serializer = negotiate_serializer(payload.get('serializers'))
+        snapshot = self.replication.attach(client, address, key)
+        snapshot['serializer'] = serializer
+        await client.send_message(snapshot)
+        client.set_serializer(serializer)
+        await self.replication.announce()
+    
+    def _attach_client(self, client, device_id: str):
+        """Bind a connection to a node, replacing any connection it had before."""
+        previous = self.network_server.clients.get(device_id)
+        if previous is not None and previous is not client:
+            # Half-open socket from before a network blip; stop trusting it
+            previous.authenticated = False
+            previous.device_id = None
+            self._spawn(previous.ws.close())
+        
+        # Mark client as authenticated
+        client.device_id = device_id
+        client.authenticated = True
+        
+        # Add to server's client list
+        self.network_server.clients[device_id] = client
+        self._listening.set()
+    
+    def _node_state(self, device_id: str) -> dict:
+        """Per-node state handed back to a resuming or warm-started node."""
+        node = self.session_manager.nodes.get(device_id, {})
+        return {
+            "clock": self.clock_sync.get_estimate(device_id),
+            "latency_ms": node.get('latency_ms'),
+            "output_delay_ms": node.get('output_delay_ms'),
+            "tier": self.bitrate_controller.tier_for(device_id),
+        }
+    
+    def _warm_start(self, device_id: str, profile: dict) -> dict:
+        """
+        Seed a known device's per-node state from its stored profile.
+        
+        Args:
+            device_id: Joining device
+            profile: Profile as stored before this join
+            
+        Returns:
+            Node state to send with the join accept
+        """
+        fields = {k: profile[k] for k in ('latency_ms', 'output_delay_ms') if k in profile}
+        self.session_manager.update_node(device_id, **fields)
+        if 'tier' in profile:
+            self.bitrate_controller.set_tier(device_id, profile['tier'])
+        if 'clock_offset' in profile:
+            # Project the stored offset forward by the device's measured skew
+            offset = profile['clock_offset']
+            skew_ppm = profile.get('clock_skew_ppm')
+            if skew_ppm is not None:
+                offset += skew_ppm * 1e-6 * (time.time() - profile['updated_at'])
+            self.clock_sync.seed_estimate(device_id, offset, skew_ppm)
+        logger.info(f"Warm start for {device_id} from stored profile")
+        return self._node_state(device_id)
+    
+    def _save_profiles(self, device_ids=None):
+        """Copy current tiers into the profile store (written in the background)."""
+        for device_id in device_ids if device_ids is not None else list(self.session_manager.nodes):
+            if device_id not in self.bitrate_controller.links:
+                continue
+            tier = self.bitrate_controller.tier_for(device_id)
+            if (self.profile_store.get(device_id) or {}).get('tier') != tier:
+                self.profile_store.update(device_id, tier=tier)
+    
     async def _calibrate_node_latency(self, device_id: str):
         """Calibrate latency for a node."""
         await asyncio.sleep(2)  # Wait for node to stabilize
+        while self.capacity.shedding:
+            # Optional work: existing nodes' deadlines come first
+            await asyncio.sleep(1.0)
         latency = self.latency_calibrator.calibrate(device_id)
+        self.session_manager.update_node(device_id, latency_ms=latency)
+        self.profile_store.update(device_id, latency_ms=latency)
         logger.info(f"Calibrated {device_id}: {latency:.2f}ms")
     
     async def _handle_time_sync_request(self, client, payload: dict, audio_data):
@@ -135,6 +682,13 @@ class HiveMindHostEnhanced:
         
         client_time = payload['client_time']
         
+        # Nodes piggyback their current estimate so it survives reconnects
+        if 'offset' in payload:
+            self.clock_sync.record_estimate(client.device_id, payload['offset'], payload.get('rtt'))
+            estimate = self.clock_sync.get_estimate(client.device_id)
+            self.profile_store.update(client.device_id, clock_offset=estimate['offset'],
+                                      clock_skew_ppm=estimate.get('skew_ppm'))
+        
         # Get sync response
         sync_data = self.clock_sync.handle_sync_request(
             client.device_id,
@@ -160,36 +714,197 @@ class HiveMindHostEnhanced:
         response = Protocol.create_heartbeat_ack(device_id)
         await client.send_message(response)
     
+    async def _handle_stream_report(self, client, payload: dict, audio_data):
+        """Handle link feedback (late chunks, RTT) from a node."""
+        if not client.authenticated:
+            return
+        
+        late = max(0, int(payload.get('late_chunks', 0)))
+        self.late_chunks += late
+        self.bitrate_controller.report_late(client.device_id, late)
+        rtt_ms = payload.get('rtt_ms')
+        if rtt_ms is not None:
+            self.bitrate_controller.observe_rtt(client.device_id, float(rtt_ms))
+        # A node short of CPU for decoding gets cheaper tiers (lower bitrate, larger frames)
+        cpu_load = payload.get('cpu_load')
+        if cpu_load is not None:
+            self.bitrate_controller.report_cpu(client.device_id, float(cpu_load))
+    
+    @property
+    def has_listeners(self) -> bool:
+        """Whether a joined node is connected."""
+        return any(client.device_id is not None for client in self.network_server.clients.values())
+    
+    @property
+    def listener_count(self) -> int:
+        """Joined nodes currently connected."""
+        return sum(1 for key, client in self.network_server.clients.items() if key == client.device_id)
+    
     async def _audio_distribution_loop(self):
         """Distribute captured audio to all nodes."""
+        from hivemind.host.silence import MARK, SEND
+        
         logger.info("Starting audio distribution")
+        loop = asyncio.get_running_loop()
+        next_block = last_capture = 0.0
+        detector = self.silence_detector
         
-        while self.running:
-            # Get captured audio chunk
-            audio_chunk = self.audio_capture.get_chunk(timeout=0.1)
+        while self.running and not self._handing_off:
+            if not self.has_listeners:
+                # Nobody to play it: no capture, mixing or encoding until a node joins
+                self._listening.clear()
+                idle_since = time.monotonic()
+                await self._listening.wait()
+                self.capacity.observe_idle(time.monotonic() - idle_since)
+                # Captured while idle; too old to schedule
+                self.audio_capture.drain()
+                continue
             
-            if audio_chunk is None:
+            self._run_timeline()
+            
+            # With mixed sources but no live capture, the mixer's blocks set the pace
+            mixer = self._mixer
+            paced = mixer is not None and mixer.active and time.monotonic() - last_capture > 0.25
+            timeout = max(0.0, next_block - time.monotonic()) if paced else 0.1
+            
+            # Get captured audio chunk without blocking the event loop
+            audio_chunk = await loop.run_in_executor(None, self.audio_capture.get_chunk, timeout)
+            
+            if audio_chunk is not None:
+                last_capture = time.monotonic()
+            elif not paced:
                 continue
             
+            # Mix in tracks, announcements and generators
+            if mixer is not None:
+                audio_chunk = mixer.process(audio_chunk)
+                next_block = max(next_block, time.monotonic() - 0.1) + mixer.block_frames / mixer.sample_rate
+            
             # Apply volume control
             audio_chunk = self.volume_controller.apply_volume(audio_chunk)
             
-            # Schedule the chunk
+            # Schedule the chunk (silence too, so the timeline runs on through gaps)
             schedule_info = self.audio_scheduler.schedule_chunk(audio_chunk)
             
-            # Encode audio (with compression if enabled)
-            audio_bytes, is_compressed = self.codec_manager.encode(audio_chunk)
+            action = detector.update(audio_chunk, schedule_info['duration']) if detector else SEND
+            started = time.perf_counter()
+            if action == SEND:
+                await self._distribute_chunk(audio_chunk, schedule_info)
+            elif action == MARK:
+                await self.network_server.broadcast(self._silence_marker(schedule_info))
+            # Chunks held back count too, so the audio load decays through silence
+            self.capacity.observe_chunk(time.perf_counter() - started, schedule_info['duration'])
+            await self.replication.publish_position(schedule_info)
+    
+    def _silence_marker(self, schedule_info: dict) -> dict:
+        """Announce silence through the next refresh; audio arriving sooner simply ends it."""
+        duration = schedule_info['duration']
+        chunks = 1 + (round(self.silence_detector.refresh / duration) if duration else 0)
+        return Protocol.create_silence(schedule_info['sequence'] + chunks,
+                                       schedule_info['play_at'] + chunks * duration)
+    
+    async def _distribute_chunk(self, audio_chunk, schedule_info: dict):
+        """
+        Render and encode a chunk once per (channel map, tier) in use.
+        
+        Each node gets its map's stream at its tier, with play times shifted
+        by its alignment delay, so cost follows distinct maps, not nodes.
+        """
+        controller = self.bitrate_controller
+        spatial = self.spatial
+        # (map, tier) -> delay -> clients
+        groups = {}
+        for client in set(self.network_server.clients.values()):
+            device_id = client.device_id
+            if device_id is None:
+                # Not joined (or still authenticating): no audio
+                continue
             
-            # Create audio chunk message
-            message = Protocol.create_audio_chunk(
-                play_at=schedule_info['play_at'],
-                sample_rate=schedule_info['sample_rate'],
-                channels=schedule_info['channels'],
-                audio_data=audio_bytes
+            backlog = client.write_buffer_size()
+            controller.observe_send_buffer(device_id, backlog)
+            if backlog > MAX_SEND_BUFFER_BYTES:
+                # Sending would wait on this socket's drain and stall every other node
+                controller.observe_drop(device_id)
+                controller.evaluate(device_id)
+                continue
+            map_key, delay = spatial.placement(device_id)
+            group = groups.setdefault((map_key, controller.evaluate(device_id)), {})
+            group.setdefault(delay, []).append(client)
+        
+        rendered = {}
+        cipher = self.room_cipher
+        for (map_key, tier), by_delay in groups.items():
+            pcm = rendered.get(map_key)
+            if pcm is None:
+                pcm = rendered[map_key] = spatial.render(map_key, audio_chunk)
+            frames = self.tier_encoders.encode(
+                tier, pcm, schedule_info['play_at'], schedule_info['sequence'], variant=map_key
             )
-            
-            # Broadcast to all nodes
-            await self.network_server.broadcast(message)
+            for sequence, play_at, audio_bytes in frames:
+                if cipher is not None:
+                    # Once per frame, whatever the number of listeners
+                    audio_bytes = cipher.seal(audio_bytes, sequence, tier)
+                for delay, clients in by_delay.items():
+                    message = Protocol.create_audio_chunk(
+                        play_at=play_at + delay,
+                        sample_rate=schedule_info['sample_rate'],
+                        channels=schedule_info['channels'],
+                        audio_data=audio_bytes,
+                        sequence=sequence,
+                        tier=tier,
+                        encrypted=cipher is not None
+                    )
+                    await self.network_server.send_to(clients, message)
+    
+    async def _capacity_loop(self):
+        """Probe event-loop lag and egress; cap node tiers while the host is over capacity."""
+        capacity = self.capacity
+        controller = self.bitrate_controller
+        metrics = self.network_server.send_metrics
+        sent, since = metrics['bytes_sent'], time.monotonic()
+        while self.running:
+            before = time.monotonic()
+            await asyncio.sleep(CAPACITY_INTERVAL_S)
+            now = time.monotonic()
+            capacity.observe_loop_lag(now - before - CAPACITY_INTERVAL_S)
+            if now - since < 1.0:
+                continue
+            capacity.observe_egress((metrics['bytes_sent'] - sent) / (now - since))
+            sent, since = metrics['bytes_sent'], now
+            floor = capacity.tier_floor(controller.min_tier, controller.lowest_tier)
+            if floor != controller.min_tier:
+                logger.info(f"Best tier allowed: {floor} (load {capacity.load:.2f})")
+                controller.min_tier = floor
+    
+    def _sample_metrics(self, late_before: int) -> dict:
+        """Host-wide values for the metrics history (aggregated, so one series each however many nodes)."""
+        nodes = list(self.session_manager.nodes)
+        rtts = [estimate['rtt'] for estimate in map(self.clock_sync.get_estimate, nodes)
+                if estimate and estimate.get('rtt') is not None]
+        tier_for = self.bitrate_controller.tier_for
+        return {
+            'nodes': self.listener_count,
+            'load': self.capacity.load,
+            'loop_lag_ms': self.capacity.loop_lag * 1000.0,
+            'egress_kbps': self.capacity.egress * 8 / 1000.0,
+            'tier': sum(map(tier_for, nodes)) / len(nodes) if nodes else None,
+            # A node's offset is uncertain by up to half the round trip it was measured over
+            'sync_error_ms': max(rtts) * 500.0 if rtts else None,
+            'late_chunks': self.late_chunks - late_before,
+        }
+    
+    async def _metrics_loop(self):
+        """Record host metrics every second; snapshot the history to disk if a path is set."""
+        loop = asyncio.get_running_loop()
+        late = self.late_chunks
+        saved_at = time.monotonic()
+        while self.running:
+            await asyncio.sleep(METRICS_INTERVAL_S)
+            self.metrics.record(self._sample_metrics(late))
+            late = self.late_chunks
+            if self.metrics_path and time.monotonic() - saved_at >= METRICS_SNAPSHOT_S:
+                saved_at = time.monotonic()
+                await loop.run_in_executor(None, self.metrics.save, self.metrics.arrays(), self.metrics_path)
     
     async def _monitoring_loop(self):
         """Monitor session health."""
@@ -198,9 +913,12 @@ class HiveMindHostEnhanced:
             
             # Check for stale nodes
             stale_nodes = self.session_manager.check_stale_nodes()
+            self._save_profiles()
             for device_id in stale_nodes:
                 logger.warning(f"Removing stale node: {device_id}")
                 self.session_manager.remove_node(device_id)
+                self.bitrate_controller.forget(device_id)
+                self.clock_sync.forget(device_id)
                 if device_id in self.network_server.clients:
                     del self.network_server.clients[device_id]
             
@@ -208,8 +926,19 @@ class HiveMindHostEnhanced:
             node_count = len(self.session_manager.nodes)
             logger.info(f"Session status: {node_count} nodes connected")
     
+    def _spawn(self, coro):
+        """Run a background task that is cancelled when the host stops."""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+    
     def _start_web_dashboard(self):
         """Start web dashboard in separate thread."""
+        if self.enable_web_dashboard and self.web_dashboard is None:
+            from hivemind.host.web_dashboard import WebDashboard
+            
+            self.web_dashboard = WebDashboard(self, port=self.web_port)
         if self.web_dashboard:
             dashboard_thread = threading.Thread(
                 target=self.web_dashboard.run,
@@ -222,13 +951,27 @@ class HiveMindHostEnhanced:
         """Start the host."""
         self.running = True
         
+        # Take over from a host running on the same hand-off socket, if there is one
+        successor = None
+        if self.handoff_path:
+            successor = await Successor.connect(self, self.handoff_path)
+        
+        if self.udp_sync:
+            self.udp_sync.start()
+        
         print("=" * 60)
         print("🎵 HiveMind Host (Enhanced)")
         print("=" * 60)
         print(f"Session Code: {self.session_manager.session_code}")
         print(f"Network Port: {self.port}")
-        print(f"Compression: {'Enabled (Opus)' if self.codec_manager.use_compression else 'Disabled'}")
-        if self.web_dashboard:
+        print(f"Compression: {'Enabled (Opus)' if self.enable_compression else 'Disabled'}")
+        print(f"Audio Encryption: {'Enabled (ChaCha20-Poly1305)' if self.room_cipher else 'Disabled'}")
+        print(f"Silence Suppression: {'Enabled (DTX)' if self.silence_detector else 'Disabled'}")
+        if self.udp_sync:
+            print(f"UDP Time Sync: port {self.udp_sync.port}")
+        if self.standby is not None:
+            print(f"Standby of: {self.standby.primary[0]}:{self.standby.primary[1]}")
+        if self.enable_web_dashboard:
             print(f"Web Dashboard: http://localhost:5000")
         print("=" * 60)
         print("\nWaiting for nodes to join...")
@@ -240,24 +983,83 @@ class HiveMindHostEnhanced:
         # Start audio capture
         self.audio_capture.start()
         
-        # Start background tasks
-        asyncio.create_task(self._audio_distribution_loop())
-        asyncio.create_task(self._monitoring_loop())
+        # Load stored node profiles (off the event loop)
+        await asyncio.get_running_loop().run_in_executor(None, self.profile_store.open)
+        if self.metrics_path:
+            await asyncio.get_running_loop().run_in_executor(None, self.metrics.load, self.metrics_path)
+        if self.traffic_recorder:
+            self.traffic_recorder.open()
+        
+        # Start background tasks (a standby only mirrors its primary until it takes over)
+        if self.standby is not None:
+            self._spawn(self.standby.run())
+            self._spawn(self._take_over_when_promoted())
+        elif successor is not None:
+            self._spawn(self._take_over_from(successor))
+        else:
+            self._start_session_tasks()
         
         # Start network server (this blocks)
         await self.network_server.start()
     
+    def _start_session_tasks(self):
+        self._distribution = self._spawn(self._audio_distribution_loop())
+        self._spawn(self._capacity_loop())
+        self._spawn(self._metrics_loop())
+        self._spawn(self._monitoring_loop())
+        self._spawn(self.replication.run())
+        if self.handoff_path:
+            self._spawn(HandoffListener(self, self.handoff_path).run())
+    
+    async def _take_over_when_promoted(self):
+        """Start serving the mirrored session once the standby is promoted."""
+        await self.standby.promoted.wait()
+        # Audio captured while idle is stale; the timeline continues from the primary's position
+        self.audio_capture.drain()
+        self._start_session_tasks()
+    
+    async def _take_over_from(self, successor: Successor):
+        """Start serving the inherited session once the previous process has stopped its audio."""
+        while self.network_server._server is None:
+            await asyncio.sleep(0.01)
+        await successor.complete()
+        self.audio_capture.drain()
+        self._start_session_tasks()
+    
+    async def _stop_distribution(self):
+        """Finish the chunk in flight and send no more audio (the session is moving to another process)."""
+        self._handing_off = True
+        # Wakes the loop if it is idle without listeners
+        self._listening.set()
+        if self._distribution is not None:
+            await self._distribution
+    
     async def stop(self):
         """Stop the host."""
         logger.info("Stopping host...")
         self.running = False
         
-        # Stop audio capture
+        # Stop audio capture and the time-sync responder
         self.audio_capture.stop()
+        if self.udp_sync:
+            await asyncio.get_running_loop().run_in_executor(None, self.udp_sync.stop)
         
-        # Stop network server
+        # Stop background tasks (but not a hand-off stopping us) and the network server
+        current = asyncio.current_task()
+        for task in list(self._tasks):
+            if task is not current:
+                task.cancel()
         await self.network_server.stop()
         
+        # Persist what we learned this session
+        self._save_profiles()
+        await asyncio.get_running_loop().run_in_executor(None, self.profile_store.close)
+        if self.traffic_recorder:
+            await asyncio.get_running_loop().run_in_executor(None, self.traffic_recorder.close)
+        if self.metrics_path:
+            await asyncio.get_running_loop().run_in_executor(None, self.metrics.save, self.metrics.arrays(),
+                                                             self.metrics_path)
+        
         logger.info("Host stopped")
 
 
@@ -274,6 +1076,33 @@ async def main():
                        help='Disable web dashboard')
     parser.add_argument('--web-port', type=int, default=5000,
                        help='Web dashboard port (default: 5000)')
+    parser.add_argument('--profile-db', default=None,
+                       help='Node profile database (default: $HIVEMIND_PROFILE_DB, '
+                            'else ~/.local/state/hiveminde/profiles.sqlite3)')
+    parser.add_argument('--record', default=None, metavar='PATH',
+                       help='Record all network traffic to PATH (see scripts/replay_traffic.py)')
+    parser.add_argument('--scale', action='store_true',
+                       help='Connection-scale mode for large listener crowds (see scripts/load_test.py)')
+    parser.add_argument('--standby-of', default=None, metavar='HOST:PORT',
+                       help='Run as a hot standby mirroring the primary at HOST:PORT')
+    parser.add_argument('--advertise-host', default=None,
+                       help='Address nodes should use to reach this standby (default: as seen by the primary)')
+    parser.add_argument('--encrypt', action='store_true',
+                       help='Encrypt audio frames (requires the cryptography package)')
+    parser.add_argument('--no-dtx', action='store_true',
+                       help='Send silence as audio instead of "silence until" markers')
+    parser.add_argument('--uplink-mbps', type=float, default=None,
+                       help='Upstream bandwidth; new nodes are turned away before audio would exceed it')
+    parser.add_argument('--profile', default=None, metavar='PATH',
+                       help='Sample stacks while running and write collapsed stacks to PATH on exit')
+    parser.add_argument('--metrics-history', default=None, metavar='PATH',
+                       help='Keep the metrics history across restarts in PATH (.npz snapshot)')
+    parser.add_argument('--handoff', default=None, metavar='PATH',
+                       help='Hand the session to (or take it over from) a host started with the same PATH')
+    parser.add_argument('--udp-sync', action='store_true',
+                       help='Answer clock-sync probes over UDP (same port number as --port)')
+    parser.add_argument('--session-code', default=None, metavar='CODE',
+                       help="Session code (default: HM-0000); a standby must use its primary's")
     
     args = parser.parse_args()
     
@@ -281,9 +1110,26 @@ async def main():
         port=args.port,
         enable_compression=not args.no_compression,
         enable_web_dashboard=not args.no_web,
-        web_port=args.web_port
+        web_port=args.web_port,
+        profile_path=args.profile_db,
+        record_path=args.record,
+        scale_mode=args.scale,
+        standby_of=args.standby_of,
+        advertise_host=args.advertise_host,
+        encrypt_audio=args.encrypt,
+        dtx=not args.no_dtx,
+        uplink_mbps=args.uplink_mbps,
+        metrics_path=args.metrics_history,
+        handoff_path=args.handoff,
+        udp_sync_port=args.port if args.udp_sync else None,
+        session_code=args.session_code
     )
     
+    profiler = None
+    if args.profile:
+        profiler = SamplingProfiler(asyncio.get_running_loop(), threading.get_ident())
+        profiler.start()
+    
     try:
         await host.start()
     except KeyboardInterrupt:
@@ -293,6 +1139,10 @@ async def main():
         logger.error(f"Error: {e}", exc_info=True)
         await host.stop()
         sys.exit(1)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.save(args.profile)
 
 
 if __name__ == "__main__":
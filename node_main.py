@@ -8,8 +8,8 @@ import asyncio
 import logging
 import sys
 
+from hivemind.config import DECODE_WAKEUP_MS
 from hivemind.node.client import HiveMindClient
-from hivemind.common.volume_control import VolumeController
 
 # Configure logging
 logging.basicConfig(
@@ -32,6 +32,10 @@ async def main():
                        help='Host port (default: 7878)')
     parser.add_argument('--volume', type=float, default=1.0,
                        help='Initial volume (0.0 to 1.0, default: 1.0)')
+    parser.add_argument('--low-power', action='store_true',
+                       help='Decode audio in batches on a worker thread, waking up less often')
+    parser.add_argument('--wakeup-ms', type=float, default=DECODE_WAKEUP_MS,
+                       help=f'Decode wakeup period in low-power mode (default: {DECODE_WAKEUP_MS})')
     
     args = parser.parse_args()
     
@@ -56,18 +60,25 @@ async def main():
     print(f"Connecting to {host_address}:{port}")
     print(f"Session: {session_code}")
     print(f"Volume: {args.volume:.1f}")
+    if args.low_power:
+        print(f"Low-power mode: decoding every {args.wakeup_ms:.0f} ms")
     print("=" * 60)
     print("\nPress Ctrl+C to disconnect\n")
     
     # Create client
-    client = HiveMindClient(session_code)
-    
-    # Set initial volume
-    volume_controller = VolumeController(master_volume=args.volume)
+    client = HiveMindClient(session_code, decode_wakeup_ms=args.wakeup_ms if args.low_power else None)
     
     try:
-        # Connect to host
-        await client.connect(host_address, port)
+        # Connect to host; one at capacity says when to come back
+        while True:
+            try:
+                await client.connect(host_address, port)
+                break
+            except ConnectionError:
+                if client.retry_after is None:
+                    raise
+                print(f"Host is at capacity; retrying in {client.retry_after:.0f}s")
+                await asyncio.sleep(client.retry_after)
         
         # Run main loop
         await client.run()
@@ -0,0 +1,65 @@
+"""Microbenchmark: per-block mixer cost as sources, ducking and crossfades are added.
+
+Each scenario mixes 20 ms blocks at 48 kHz stereo; the last column is the
+share of the real-time budget (one block per 20 ms) a single block uses.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np  # noqa: E402
+
+from hivemind.host.mixer import Mixer, PcmSource, ToneSource  # noqa: E402
+
+
+def _track(seconds=10.0):
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(int(48000 * seconds) * 2) * 3000).astype(np.int16).tobytes()
+
+
+def _scenario(tracks=0, tones=0, duck=False, crossfade=False):
+    mixer = Mixer()
+    track = _track()
+    for i in range(tracks):
+        mixer.add_source(PcmSource(f"track{i}", track, loop=True))
+    for i in range(tones):
+        mixer.add_source(ToneSource(f"tone{i}", 220.0 * (i + 1)))
+    if duck:
+        mixer.add_source(PcmSource("announcement", track, loop=True, ducks_others=True))
+    if crossfade:
+        # A crossfade that never ends, so every block takes the ramp path
+        mixer.crossfade("track0", PcmSource("next", track, loop=True), 0, 10 ** 9)
+    return mixer
+
+
+SCENARIOS = {
+    "capture passthrough": dict(),
+    "capture + 1 track": dict(tracks=1),
+    "capture + 4 tracks": dict(tracks=4),
+    "capture + 2 tones": dict(tones=2),
+    "4 tracks, ducked": dict(tracks=4, duck=True),
+    "2 tracks, crossfading": dict(tracks=2, crossfade=True),
+}
+
+
+def bench(number=2000):
+    capture = _track(0.02)
+    rows = []
+    for name, kwargs in SCENARIOS.items():
+        mixer = _scenario(**kwargs)
+        per_block = timeit.timeit(lambda: mixer.process(capture), number=number) / number
+        rows.append((name, per_block))
+    return rows
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{'scenario':<26}{'us/block':>10}{'budget':>9}")
+    for name, per_block in bench(number):
+        print(f"{name:<26}{per_block * 1e6:>10.1f}{per_block / 0.02:>9.2%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Microbenchmark: encode/decode cost per message type for each available serializer.
+
+Compares the original stdlib path (Enum lookups + json with a base64 default)
+against every serializer detected in `hivemind.common.protocol`.
+"""
+import base64
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from hivemind.common.protocol import AUTH_FAILED, SERIALIZERS, MessageType, Protocol  # noqa: E402
+
+
+def _legacy_dumps(message):
+    def _serialize(obj):
+        if isinstance(obj, (bytes, bytearray)):
+            return base64.b64encode(bytes(obj)).decode('ascii')
+        raise TypeError()
+    return json.dumps(message, default=_serialize)
+
+
+def _legacy_audio_chunk():
+    return {
+        "type": MessageType.AUDIO_CHUNK.value,
+        "play_at": 1700000000.25,
+        "sample_rate": 48000,
+        "channels": 2,
+        "audio_data": os.urandom(160),
+    }
+
+
+MESSAGES = {
+    "audio_chunk": lambda: Protocol.create_audio_chunk(1700000000.25, 48000, 2, os.urandom(160)),
+    "time_sync_response": lambda: Protocol.create_time_sync_response(1700000000.25, 1700000000.20),
+    "heartbeat": lambda: Protocol.create_heartbeat_ack("hm_0123456789abcdef"),
+    "join_accept": lambda: Protocol.create_join_accept(
+        "hm_0123456789abcdef", {"node_count": 12, "scheduled": [], "scheduled_total": 0}),
+    # Fixed message: encoded once, then served from its cache
+    "join_reject": lambda: Protocol.create_join_reject(AUTH_FAILED),
+}
+
+
+def bench(number=20000):
+    rows = []
+    legacy = _legacy_audio_chunk()
+    legacy_frame = _legacy_dumps(legacy)
+    rows.append((
+        "audio_chunk", "legacy",
+        timeit.timeit(lambda: _legacy_dumps(_legacy_audio_chunk()), number=number) / number,
+        timeit.timeit(lambda: json.loads(legacy_frame), number=number) / number,
+        len(legacy_frame),
+    ))
+    for mtype, build in MESSAGES.items():
+        message = build()
+        for name, serializer in SERIALIZERS.items():
+            frame = serializer.dumps(message)
+            enc = timeit.timeit(lambda: serializer.dumps(build()), number=number) / number
+            dec = timeit.timeit(lambda: serializer.loads(frame), number=number) / number
+            rows.append((mtype, name, enc, dec, len(frame)))
+    return rows
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'message':<20}{'format':<10}{'encode us':>12}{'decode us':>12}{'bytes':>8}")
+    for mtype, name, enc, dec, size in bench(number):
+        print(f"{mtype:<20}{name:<10}{enc * 1e6:>12.2f}{dec * 1e6:>12.2f}{size:>8}")
+
+
+if __name__ == '__main__':
+    main()
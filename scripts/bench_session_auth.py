@@ -0,0 +1,91 @@
+"""Microbenchmark: what session authentication and audio encryption cost.
+
+    python scripts/bench_session_auth.py [listeners ...]
+
+Joins: CPU per full SPAKE2 handshake on each side, and per resume proof.
+Audio: CPU to build one frame message (20 ms Opus, 20 ms PCM) in the clear
+and sealed with the room key, which is the same for any number of
+listeners, against sealing and framing it separately for each of N
+listeners (what per-node keys would need). Encryption needs the
+`cryptography` package.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from hivemind.common.protocol import BINARY_SERIALIZER, JSON_SERIALIZER, Protocol  # noqa: E402
+from hivemind.common.session_auth import (  # noqa: E402
+    ClientHandshake,
+    HostHandshake,
+    RoomCipher,
+    available_ciphers,
+    resume_proof,
+)
+
+FRAMES = {"opus 20ms": 320, "pcm 20ms": 3840}
+
+
+def _us(fn, number):
+    return timeit.timeit(fn, number=number) / number * 1e6
+
+
+def bench_joins(number=50):
+    code = "HM-1234"
+    ClientHandshake(code, "dev").hello()  # warm the per-code cache
+
+    def full():
+        node = ClientHandshake(code, "dev")
+        host = HostHandshake(code, "dev", node.hello())
+        return node, host
+
+    node, host = full()
+    challenge = host.challenge()
+    fresh = ClientHandshake(code, "dev")
+    hello = fresh.hello()
+    key = os.urandom(32)
+    proof = resume_proof(key, "dev", 1)
+    return [
+        ("node hello", _us(lambda: ClientHandshake(code, "dev").hello(), number)),
+        ("host challenge", _us(lambda: HostHandshake(code, "dev", hello), number)),
+        ("node respond", _us(lambda: node.respond(challenge), number)),
+        ("host verify", _us(lambda: host.verify({"confirm": "00" * 32}), number * 100)),
+        ("resume proof", _us(lambda: resume_proof(key, "dev", 1) == proof, number * 100)),
+    ]
+
+
+def bench_frames(listeners, number=2000):
+    serializer = BINARY_SERIALIZER or JSON_SERIALIZER
+    cipher = RoomCipher()
+    rows = []
+    for name, size in FRAMES.items():
+        audio = os.urandom(size)
+
+        def message(data, encrypted):
+            return serializer.dumps(Protocol.create_audio_chunk(1.0, 48000, 2, data, sequence=1, tier=0,
+                                                                encrypted=encrypted))
+
+        # The send path frames each message once for all listeners (see NetworkServer.send_to)
+        plain = _us(lambda: message(audio, False), number)
+        sealed = _us(lambda: message(cipher.seal(audio, 1, 0), True), number)
+        for n in listeners:
+            rows.append((name, n, plain, sealed, sealed * n))
+    return rows
+
+
+def main():
+    listeners = [int(a) for a in sys.argv[1:]] or [1, 10, 100, 1000]
+    print(f"{'join step':<20}{'us':>12}")
+    for step, us in bench_joins():
+        print(f"{step:<20}{us:>12.1f}")
+    if not available_ciphers():
+        print("\ninstall 'cryptography' to benchmark audio encryption")
+        return
+    print(f"\n{'frame':<12}{'listeners':>10}{'plain us':>10}{'room key us':>13}{'per-node keys us':>18}")
+    for name, n, plain, sealed, per_node in bench_frames(listeners):
+        print(f"{name:<12}{n:>10}{plain:>10.2f}{sealed:>13.2f}{per_node:>18.2f}")
+
+
+if __name__ == '__main__':
+    main()
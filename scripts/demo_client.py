@@ -1,10 +1,15 @@
 """Simple demo client to connect to the WebSocket NetworkServer and send a join request."""
 import asyncio
 import json
+import os
 import sys
 
 import websockets
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from hivemind.common.session_auth import authenticate  # noqa: E402
+
 
 async def run(host='localhost', port=7878, session_code='HM-0000'):
     uri = f"ws://{host}:{port}"
@@ -14,12 +19,11 @@ async def run(host='localhost', port=7878, session_code='HM-0000'):
             "payload": {
                 "device_id": "demo-1",
                 "device_name": "Demo Client",
-                "session_code": session_code,
                 "metadata": {}
             }
         }
-        await ws.send(json.dumps(msg))
-        print('Sent join_request')
+        reply, _ = await authenticate(ws, session_code, msg, "demo-1")
+        print('Join reply:', json.loads(reply).get('type'))
 
 
 if __name__ == '__main__':
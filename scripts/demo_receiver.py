@@ -8,11 +8,14 @@ import time
 import websockets
 
 from hivemind.common.audio_codec import AudioCodecManager
+from hivemind.common.resampler import AudioConverter
 
 
 async def run(host='localhost', port=7878, out='received.wav', timeout=5.0):
     uri = f"ws://{host}:{port}"
-    codec = AudioCodecManager(use_compression=True)
+    codecs = {}
+    converters = {}
+    layout = None  # (sample_rate, channels) of the first chunk; the WAV is written in it
 
     pcm_frames = bytearray()
 
@@ -33,22 +36,31 @@ async def run(host='localhost', port=7878, out='received.wav', timeout=5.0):
             if isinstance(audio, str):
                 audio = base64.b64decode(audio)
 
-            pcm = codec.decode(audio)
+            fmt = (msg.get('sample_rate', 48000), msg.get('channels', 2))
+            if fmt not in codecs:
+                codecs[fmt] = AudioCodecManager(use_compression=True, sample_rate=fmt[0], channels=fmt[1])
+            if layout is None:
+                layout = fmt
+            pcm = codecs[fmt].decode(audio)
+            if pcm and fmt != layout:
+                # Sender changed format mid-stream; keep the file consistent
+                if fmt not in converters:
+                    converters[fmt] = AudioConverter(fmt[0], fmt[1], layout[0], layout[1])
+                pcm = converters[fmt].process(pcm)
             if pcm:
                 pcm_frames.extend(pcm)
 
     if pcm_frames:
-        # write 16-bit mono WAV
+        # write 16-bit WAV in the layout the sender used
         with wave.open(out, 'wb') as wf:
-            wf.setnchannels(codec.channels)
+            wf.setnchannels(layout[1])
             wf.setsampwidth(2)
-            wf.setframerate(codec.sample_rate)
+            wf.setframerate(layout[0])
             wf.writeframes(bytes(pcm_frames))
         print('Wrote', out)
     else:
         print('No audio received')
 
-
 if __name__ == '__main__':
     import sys
     host = sys.argv[1] if len(sys.argv) > 1 else 'localhost'
@@ -1,47 +1,44 @@
-"""Demo sender: generate a sine PCM, encode with AudioCodecManager, send audio_chunk messages to server."""
+"""Demo sender: generate a mono sine PCM, convert it to the codec format, encode and send audio_chunk messages."""
 import asyncio
-import base64
-import json
 import math
 import time
 
 import websockets
 
 from hivemind.common.audio_codec import AudioCodecManager
+from hivemind.common.protocol import JSON_SERIALIZER, Protocol
+from hivemind.common.resampler import AudioConverter
 
 
-async def run(host='localhost', port=7878, duration=1.0):
+async def run(host='localhost', port=7878, duration=1.0, source_rate=44100):
     uri = f"ws://{host}:{port}"
     codec = AudioCodecManager(use_compression=True)
 
-    # generate 48000Hz, 16-bit mono PCM for `duration` seconds
-    sr = codec.sample_rate
-    channels = codec.channels
+    # generate a 16-bit mono sine at `source_rate`, then bring it to the codec's rate and layout
     freq = 440.0
-    samples = int(sr * duration)
+    samples = int(source_rate * duration)
     pcm = bytearray()
     for n in range(samples):
-        t = n / sr
-        val = int(0.5 * 32767.0 * math.sin(2.0 * math.pi * freq * t))
-        pcm.extend(int(val).to_bytes(2, 'little', signed=True))
-
-    encoded, compressed = codec.encode(bytes(pcm))
-    data_b64 = base64.b64encode(encoded).decode('ascii')
-
-    msg = {
-        'type': 'audio_chunk',
-        'payload': {
-            'play_at': time.time() + 0.5,
-            'sample_rate': sr,
-            'channels': channels,
-        },
-        'audio_data': data_b64,
-    }
-
+        val = int(0.5 * 32767.0 * math.sin(2.0 * math.pi * freq * n / source_rate))
+        pcm.extend(val.to_bytes(2, 'little', signed=True))
+    converter = AudioConverter(source_rate, 1, codec.sample_rate, codec.channels)
+    pcm = converter.process(bytes(pcm))
+
+    start = time.time() + 0.5
+    frame_bytes = codec.frame_bytes
+    offsets = range(0, len(pcm) - frame_bytes + 1, frame_bytes)
     async with websockets.connect(uri) as ws:
-        await ws.send(json.dumps(msg))
-        print('Sent audio_chunk')
-
+        for i, offset in enumerate(offsets):
+            encoded, compressed = codec.encode(pcm[offset:offset + frame_bytes])
+            msg = Protocol.create_audio_chunk(
+                play_at=start + i * codec.frame_ms / 1000.0,
+                sample_rate=codec.sample_rate,
+                channels=codec.channels,
+                audio_data=encoded,
+                sequence=i,
+            )
+            await ws.send(JSON_SERIALIZER.dumps(msg))
+        print(f'Sent {len(offsets)} audio_chunk frames')
 
 if __name__ == '__main__':
     import sys
@@ -0,0 +1,219 @@
+"""Load test: one host fanning a live audio stream out to thousands of listeners.
+
+    python scripts/load_test.py --connections 2000 --duration 20 --workers 4
+
+Starts a `NetworkServer` in scale mode in this process and opens the
+listener connections from `--workers` child processes, so the clients'
+own CPU doesn't land on the host's event loop. The host sends one
+audio-sized chunk every `--chunk-ms` to every connection through
+`send_to`, just as `_distribute_chunk` does for unjoined listeners.
+Latency is how late a chunk arrives relative to when it was sent (taken
+from its `play_at`, which is send time plus the lookahead); it is reported
+overall and per second so drift under sustained load shows up.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import websockets  # noqa: E402
+
+from hivemind.common.protocol import JSON_SERIALIZER, Protocol  # noqa: E402
+from hivemind.config import CHANNELS, LOOKAHEAD_MS, SAMPLE_RATE  # noqa: E402
+from hivemind.host.network_server import NetworkServer  # noqa: E402
+from hivemind.sim.harness import percentile  # noqa: E402
+
+LOOKAHEAD_S = LOOKAHEAD_MS / 1000.0
+CONNECT_CONCURRENCY = 64  # stay under the listen backlog while connecting
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+async def listen(url, count, stop_after, latencies):
+    """Open `count` connections and record `(second, latency_s)` for every chunk received."""
+    gate = asyncio.Semaphore(CONNECT_CONCURRENCY)
+    connected = []
+
+    async def one():
+        async with gate:
+            ws = await websockets.connect(url, compression=None, max_size=None, open_timeout=30)
+        connected.append(ws)
+        loads = JSON_SERIALIZER.loads
+        monotonic = time.monotonic
+        try:
+            async for raw in ws:
+                now = monotonic()
+                sent_at = loads(raw)["play_at"] - LOOKAHEAD_S
+                latencies.append((int(sent_at), now - sent_at))
+        except websockets.ConnectionClosed:
+            pass
+
+    tasks = [asyncio.create_task(one()) for _ in range(count)]
+    try:
+        await asyncio.wait_for(asyncio.gather(*tasks), stop_after)
+    except asyncio.TimeoutError:
+        pass
+    for ws in connected:
+        await ws.close()
+    return len(connected)
+
+
+def _worker(url, count, stop_after, out):
+    latencies = []
+    connected = asyncio.run(listen(url, count, stop_after, latencies))
+    out.put((connected, latencies))
+
+
+async def broadcast(server, chunks, chunk_ms, payload_bytes):
+    """Send `chunks` audio messages to every connected client, paced in real time."""
+    audio = os.urandom(payload_bytes)
+    interval = chunk_ms / 1000.0
+    next_at = time.monotonic()
+    send_times = []
+    for sequence in range(chunks):
+        now = time.monotonic()
+        message = Protocol.create_audio_chunk(
+            play_at=now + LOOKAHEAD_S, sample_rate=SAMPLE_RATE, channels=CHANNELS,
+            audio_data=audio, sequence=sequence,
+        )
+        await server.send_to(list(server.clients.values()), message)
+        send_times.append(time.monotonic() - now)
+        next_at += interval
+        await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+    return send_times
+
+
+def summarize(latencies, send_times, connections, chunks, rss_per_conn=None):
+    ms = [lat * 1000 for _, lat in latencies]
+    by_second = defaultdict(list)
+    for second, lat in latencies:
+        by_second[second].append(lat * 1000)
+    second_p99 = [percentile(v, 99) for _, v in sorted(by_second.items())]
+    send_ms = [t * 1000 for t in send_times]
+    return {
+        "connections": connections,
+        "expected": connections * chunks,
+        "received": len(ms),
+        "p50_ms": percentile(ms, 50),
+        "p99_ms": percentile(ms, 99),
+        "max_ms": max(ms, default=None),
+        "p99_per_second_ms": second_p99,
+        "fanout_p50_ms": percentile(send_ms, 50),
+        "fanout_max_ms": max(send_ms, default=None),
+        "rss_per_conn_bytes": rss_per_conn,
+    }
+
+
+async def run_in_process(connections, chunks=50, chunk_ms=20, payload_bytes=320):
+    """Small self-contained run (server and listeners on one loop); returns `summarize()`."""
+    server = NetworkServer(port=0, host="127.0.0.1", scale_mode=True)
+    serve = asyncio.create_task(server.start())
+    while server._server is None:
+        await asyncio.sleep(0.01)
+    url = f"ws://127.0.0.1:{server._server.sockets[0].getsockname()[1]}"
+    latencies = []
+    stop_after = 30 + chunks * chunk_ms / 1000.0
+    listeners = asyncio.create_task(listen(url, connections, stop_after, latencies))
+    while len(server.clients) < connections:
+        await asyncio.sleep(0.02)
+    send_times = await broadcast(server, chunks, chunk_ms, payload_bytes)
+    await asyncio.sleep(0.2)
+    listeners.cancel()
+    await server.stop()
+    await serve
+    return summarize(latencies, send_times, connections, chunks), server
+
+
+async def run(connections, duration, workers, chunk_ms, payload_bytes, port):
+    server = NetworkServer(port=port, host="127.0.0.1", scale_mode=True)
+    serve = asyncio.create_task(server.start())
+    while server._server is None:
+        await asyncio.sleep(0.01)
+    url = f"ws://127.0.0.1:{server._server.sockets[0].getsockname()[1]}"
+    rss_before = _rss_bytes()
+
+    chunks = int(duration * 1000 / chunk_ms)
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    stop_after = 60 + duration
+    procs = []
+    for w in range(workers):
+        count = connections // workers + (1 if w < connections % workers else 0)
+        proc = ctx.Process(target=_worker, args=(url, count, stop_after, out), daemon=True)
+        proc.start()
+        procs.append(proc)
+
+    t0 = time.monotonic()
+    while len(server.clients) < connections:
+        if time.monotonic() - t0 > 60:
+            print(f"only {len(server.clients)} of {connections} connected after 60s")
+            break
+        await asyncio.sleep(0.1)
+    connected = len(server.clients)
+    rss_after = _rss_bytes()
+    print(f"{connected} connections in {time.monotonic() - t0:.1f}s; streaming {chunks} chunks...")
+
+    send_times = await broadcast(server, chunks, chunk_ms, payload_bytes)
+    await asyncio.sleep(0.5)
+    await server.stop()  # closes every connection, which ends the workers
+    await serve
+
+    latencies = []
+    loop = asyncio.get_running_loop()
+    for _ in procs:
+        _, lats = await loop.run_in_executor(None, out.get)
+        latencies.extend(lats)
+    for proc in procs:
+        proc.join()
+
+    rss_per_conn = None
+    if rss_before and rss_after and connected:
+        rss_per_conn = (rss_after - rss_before) / connected
+    return summarize(latencies, send_times, connected, chunks, rss_per_conn), server
+
+
+def report(stats, server):
+    print(f"received {stats['received']}/{stats['expected']} chunks on {stats['connections']} connections")
+    print(f"latency p50 {stats['p50_ms']:.2f}ms  p99 {stats['p99_ms']:.2f}ms  max {stats['max_ms']:.2f}ms")
+    per_second = stats["p99_per_second_ms"]
+    if per_second:
+        print(f"per-second p99: min {min(per_second):.2f}ms  max {max(per_second):.2f}ms")
+    print(f"host send_to per chunk: p50 {stats['fanout_p50_ms']:.2f}ms  max {stats['fanout_max_ms']:.2f}ms")
+    if stats["rss_per_conn_bytes"] is not None:
+        print(f"host memory per connection: {stats['rss_per_conn_bytes'] / 1024:.1f} KiB")
+    metrics = server.get_metrics()
+    print("send path: " + ", ".join(f"{k} {metrics[k]}" for k in
+                                    ("shared_frames", "shared_writes", "fallback_sends", "dropped_backpressure")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of audio to stream")
+    parser.add_argument("--workers", type=int, default=max(1, min(8, (os.cpu_count() or 2) - 1)),
+                        help="client processes")
+    parser.add_argument("--chunk-ms", type=int, default=20)
+    parser.add_argument("--payload-bytes", type=int, default=320, help="audio bytes per chunk (320 = 128 kbps Opus)")
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+    stats, server = asyncio.run(run(args.connections, args.duration, args.workers,
+                                    args.chunk_ms, args.payload_bytes, args.port))
+    report(stats, server)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""Replay a traffic log recorded with `host_main.py --record PATH`.
+
+    python scripts/replay_traffic.py summary traffic.hmrec
+    python scripts/replay_traffic.py host traffic.hmrec --target ws://localhost:7878 \
+        --session-code HM-1234 --speed 4 --clones 10
+    python scripts/replay_traffic.py nodes traffic.hmrec --port 7879 --speed 1
+
+`host` plays every recorded client (optionally cloned N times under new
+device ids) against a running host, on the recorded schedule divided by
+`--speed`, and reports how far sending fell behind that schedule and how
+long the host took to answer joins, time syncs and heartbeats. `nodes`
+serves the recorded host-to-node streams to whichever nodes connect.
+
+Join handshakes cannot be replayed (they are bound to fresh random
+values), so both modes run them live with `--session-code` and replay
+everything after. Audio recorded from an `--encrypt` host stays sealed
+with that host's room key and cannot be played by nodes.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter, defaultdict, deque
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import websockets  # noqa: E402
+
+from hivemind.common.protocol import JSON_SERIALIZER, MessageType, Protocol, decode_frame  # noqa: E402
+from hivemind.common.session_auth import ClientHandshake, HostHandshake  # noqa: E402
+from hivemind.host.traffic_recorder import CLOSE, CONNECT, DROPPED, INBOUND, OUTBOUND, read_records  # noqa: E402
+from hivemind.sim.harness import percentile  # noqa: E402
+
+# request type -> reply types that answer it
+REPLIES = {
+    "join_request": ("join_accept", "join_reject"),
+    "time_sync_request": ("time_sync_response",),
+    "heartbeat": ("heartbeat",),
+}
+
+
+def load(path):
+    """Group a log into per-connection timelines: conn -> {"start", "end", "in", "out"}."""
+    conns = defaultdict(lambda: {"start": None, "end": None, "in": [], "out": []})
+    for rec in read_records(path):
+        conn = conns[rec.conn]
+        if rec.kind == CONNECT:
+            conn["start"] = rec.t
+        elif rec.kind == CLOSE:
+            conn["end"] = rec.t
+        elif rec.kind == INBOUND:
+            conn["in"].append((rec.t, rec.data))
+        elif rec.kind == OUTBOUND:
+            conn["out"].append((rec.t, rec.data))
+    for conn in conns.values():
+        if conn["start"] is None:
+            firsts = [frames[0][0] for frames in (conn["in"], conn["out"]) if frames]
+            conn["start"] = min(firsts, default=0.0)
+    return dict(conns)
+
+
+def _type(frame):
+    try:
+        return decode_frame(frame).get("type")
+    except Exception:
+        return None
+
+
+def summary(path):
+    kinds = Counter()
+    types = Counter()
+    size = Counter()
+    end = 0.0
+    conns = set()
+    for rec in read_records(path):
+        conns.add(rec.conn)
+        end = max(end, rec.t)
+        if rec.kind in (INBOUND, OUTBOUND):
+            direction = "in" if rec.kind == INBOUND else "out"
+            kinds[direction] += 1
+            size[direction] += len(rec.data)
+            types[(direction, _type(rec.data))] += 1
+        elif rec.kind == DROPPED:
+            kinds["dropped"] += 1
+    print(f"{len(conns)} connections over {end:.1f}s; "
+          f"in {kinds['in']} frames / {size['in']} B, out {kinds['out']} frames / {size['out']} B, "
+          f"{kinds['dropped']} dropped for backpressure")
+    for (direction, mtype), count in sorted(types.items(), key=lambda kv: -kv[1]):
+        print(f"  {direction:<4}{str(mtype):<22}{count:>9}")
+
+
+_JOIN_CHALLENGE = MessageType.JOIN_CHALLENGE.value
+_JOIN_CONFIRM = MessageType.JOIN_CONFIRM.value
+
+
+def _rewrite_join(frame, session_code, suffix):
+    """Turn a recorded JSON join into a fresh one for the target session, under a clone's device id.
+
+    Returns the frame to send and the handshake that answers the host's
+    challenge (None for any other frame).
+    """
+    if not isinstance(frame, str) or '"join_request"' not in frame:
+        return frame, None
+    msg = decode_frame(frame)
+    payload = msg.get("payload") or {}
+    payload["device_id"] = f"{payload.get('device_id')}{suffix}"
+    for key in ("session_code", "resume_token", "resume", "auth"):
+        payload.pop(key, None)
+    handshake = ClientHandshake(session_code, payload["device_id"])
+    payload["auth"] = handshake.hello()
+    return JSON_SERIALIZER.dumps(msg), handshake
+
+
+class ReplayStats:
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.lag = []
+        self.latency = defaultdict(list)
+        self.errors = 0
+
+    def report(self, elapsed):
+        print(f"sent {self.sent} frames, received {self.received} in {elapsed:.2f}s "
+              f"({self.sent / elapsed:.0f} sent/s, {self.received / elapsed:.0f} received/s), "
+              f"{self.errors} connection errors")
+        lag = [v * 1000 for v in self.lag]
+        print(f"send lag behind schedule: p50 {percentile(lag, 50) or 0:.2f}ms  "
+              f"p99 {percentile(lag, 99) or 0:.2f}ms  max {max(lag, default=0):.2f}ms")
+        for mtype, values in sorted(self.latency.items()):
+            ms = [v * 1000 for v in values]
+            print(f"  {mtype:<20} n={len(ms):<6} p50 {percentile(ms, 50):.2f}ms  p99 {percentile(ms, 99):.2f}ms")
+
+
+async def _drive_connection(target, conn, t0, speed, session_code, suffix, stats):
+    await asyncio.sleep(max(0.0, t0 + conn["start"] / speed - time.monotonic()))
+    pending = defaultdict(deque)  # reply type -> deque of (request type, sent at)
+    handshake = None
+    joined = asyncio.Event()
+    try:
+        async with websockets.connect(target, max_size=None) as ws:
+            async def receive():
+                async for raw in ws:
+                    now = time.monotonic()
+                    stats.received += 1
+                    mtype = _type(raw)
+                    if mtype == _JOIN_CHALLENGE and handshake is not None:
+                        confirm = Protocol.create_join_confirm(handshake.respond(decode_frame(raw)))
+                        await ws.send(JSON_SERIALIZER.dumps(confirm))
+                    elif mtype in REPLIES["join_request"]:
+                        joined.set()
+                    if not pending:
+                        continue
+                    queue = pending.get(mtype)
+                    if queue:
+                        request, sent_at = queue.popleft()
+                        stats.latency[request].append(now - sent_at)
+
+            receiver = asyncio.create_task(receive())
+            for t, frame in conn["in"]:
+                due = t0 + t / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                mtype = _type(frame)
+                if mtype == _JOIN_CONFIRM:
+                    continue  # answered live by the receiver
+                frame, join = _rewrite_join(frame, session_code, suffix)
+                if join is not None:
+                    handshake = join
+                now = time.monotonic()
+                stats.lag.append(max(0.0, now - due))
+                for reply in REPLIES.get(mtype, ()):
+                    pending[reply].append((mtype, now))
+                await ws.send(frame)
+                stats.sent += 1
+                if join is not None:
+                    # As the recorded client did, say nothing else until the handshake is done
+                    joined.clear()
+                    await asyncio.wait_for(joined.wait(), 10.0)
+            end = conn["end"] if conn["end"] is not None else (conn["in"][-1][0] if conn["in"] else conn["start"])
+            await asyncio.sleep(max(0.2, t0 + end / speed - time.monotonic()))
+            receiver.cancel()
+    except (OSError, asyncio.TimeoutError, websockets.WebSocketException):
+        stats.errors += 1
+
+
+async def replay_host(path, target, speed=1.0, clones=1, session_code="HM-0000"):
+    conns = [c for c in load(path).values() if c["in"]]
+    stats = ReplayStats()
+    t0 = time.monotonic() + 0.1
+    tasks = [
+        _drive_connection(target, conn, t0, speed, session_code, f"-r{k}" if clones > 1 else "", stats)
+        for conn in conns for k in range(clones)
+    ]
+    await asyncio.gather(*tasks)
+    stats.report(time.monotonic() - t0)
+    return stats
+
+
+async def _accept_node(ws, session_code):
+    """Run the join handshake as the host would; True once the node has proven the code."""
+    request = decode_frame(await ws.recv())
+    payload = request.get("payload") or {}
+    handshake = HostHandshake(session_code, str(payload.get("device_id")), payload.get("auth") or {})
+    await ws.send(JSON_SERIALIZER.dumps(Protocol.create_join_challenge(handshake.challenge())))
+    if not handshake.verify(decode_frame(await ws.recv()).get("payload")):
+        return False
+    await ws.send(JSON_SERIALIZER.dumps(Protocol.create_join_confirm(handshake.confirm())))
+    return True
+
+
+def _strip_room_key(frame):
+    # Sealed for the recorded node's session key; useless to this one
+    if not isinstance(frame, str) or '"room_key"' not in frame:
+        return frame
+    msg = decode_frame(frame)
+    msg.pop("room_key", None)
+    return JSON_SERIALIZER.dumps(msg)
+
+
+async def replay_nodes(path, port, speed=1.0, host="0.0.0.0", session_code="HM-0000"):
+    """Act as the host: stream a recorded connection's outbound frames to each node that connects."""
+    streams = [c for c in load(path).values() if c["out"]]
+    if not streams:
+        print("log has no outbound traffic")
+        return
+    counter = iter(range(1 << 62))
+
+    async def serve(ws):
+        conn = streams[next(counter) % len(streams)]
+        sent = 0
+        try:
+            if not await _accept_node(ws, session_code):
+                print(f"{ws.remote_address}: wrong session code")
+                return
+            t0 = time.monotonic() - conn["start"] / speed
+            for t, frame in conn["out"]:
+                if _type(frame) in (_JOIN_CHALLENGE, _JOIN_CONFIRM):
+                    continue  # this node's handshake was run live
+                delay = t0 + t / speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await ws.send(_strip_room_key(frame))
+                sent += 1
+        except websockets.ConnectionClosed:
+            pass
+        print(f"{ws.remote_address}: replayed {sent}/{len(conn['out'])} frames")
+
+    async with websockets.serve(serve, host, port, max_size=None):
+        print(f"Serving {len(streams)} recorded streams on port {port}; Ctrl+C to stop")
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("summary", help="frame counts per direction and message type")
+    p.add_argument("log")
+    p = sub.add_parser("host", help="drive a running host with the recorded clients")
+    p.add_argument("log")
+    p.add_argument("--target", default="ws://localhost:7878")
+    p.add_argument("--speed", type=float, default=1.0, help="playback speed (2 = twice as fast)")
+    p.add_argument("--clones", type=int, default=1, help="replay each client this many times")
+    p.add_argument("--session-code", default="HM-0000", help="session code of the target host")
+    p = sub.add_parser("nodes", help="serve the recorded host streams to connecting nodes")
+    p.add_argument("log")
+    p.add_argument("--port", type=int, default=7879)
+    p.add_argument("--speed", type=float, default=1.0)
+    p.add_argument("--session-code", default="HM-0000", help="session code nodes must prove")
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        summary(args.log)
+    elif args.command == "host":
+        asyncio.run(replay_host(args.log, args.target, args.speed, args.clones, args.session_code))
+    else:
+        try:
+            asyncio.run(replay_nodes(args.log, args.port, args.speed, session_code=args.session_code))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
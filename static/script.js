@@ -7,7 +7,8 @@ async function api(path, method = 'GET') {
 
 async function refresh() {
   const s = await api('/api/status');
-  document.getElementById('status').innerText = `Running: ${s.running}\nSession: ${s.session_code || '-'}\nNodes: ${s.node_count}`;
+  const load = s.capacity ? `\nLoad: ${Math.round(s.capacity.load * 100)}%${s.capacity.shedding ? ' (shedding)' : ''}` : '';
+  document.getElementById('status').innerText = `Running: ${s.running}\nSession: ${s.session_code || '-'}\nNodes: ${s.node_count}${load}`;
 }
 
 document.getElementById('start').addEventListener('click', async () => {
@@ -29,6 +30,72 @@ function appendLog(msg) {
 
 refresh();
 
+// Speakers: per-node channel map and alignment delay
+async function refreshNodes() {
+  const r = await api('/api/nodes');
+  // Host busy (503): the table can wait for the next round
+  if (!r.nodes) return;
+  const body = document.querySelector('#nodes tbody');
+  // Don't clobber a row that is being edited
+  if (body.contains(document.activeElement)) return;
+  body.innerHTML = '';
+  for (const n of r.nodes) {
+    const row = document.createElement('tr');
+    const options = r.channel_maps.map(m => `<option${m === n.channel_map ? ' selected' : ''}>${m}</option>`).join('');
+    row.innerHTML = `<td></td><td>${n.tier}</td>` +
+      `<td><select>${options}</select></td>` +
+      `<td><input type="number" min="0" step="1" value="${n.delay_ms}" /></td>` +
+      `<td><button>Apply</button></td>`;
+    row.firstChild.textContent = n.name || n.device_id;
+    row.querySelector('button').addEventListener('click', async () => {
+      const channel_map = row.querySelector('select').value;
+      const delay_ms = parseFloat(row.querySelector('input').value || '0');
+      const res = await fetch(`/api/nodes/${encodeURIComponent(n.device_id)}/spatial`, {
+        method: 'POST', headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ channel_map, delay_ms })
+      }).then(x => x.json());
+      if (res.ok) appendLog(`${n.name || n.device_id}: ${res.channel_map}, ${res.delay_ms} ms`);
+      else appendLog('Speaker update failed: ' + (res.reason||'unknown'));
+    });
+    body.appendChild(row);
+  }
+}
+
+refreshNodes();
+setInterval(refreshNodes, 5000);
+
+// History: min/max band and average of one metric series
+async function refreshHistory() {
+  const select = document.getElementById('history-series');
+  const d = await api('/api/metrics');
+  if (select.options.length !== d.series.length) {
+    const current = select.value;
+    select.innerHTML = d.series.map(n => `<option${n === current ? ' selected' : ''}>${n}</option>`).join('');
+  }
+  if (!select.value) return;
+  const span = parseFloat(document.getElementById('history-range').value);
+  const r = await api(`/api/metrics/${encodeURIComponent(select.value)}?start=${Date.now() / 1000 - span}`);
+  // Host busy (503): keep the last chart
+  if (!r.points) return;
+  const svg = document.getElementById('history-chart');
+  const pts = r.points;
+  if (!pts.length) { svg.innerHTML = ''; return; }
+  const lo = Math.min(...pts.map(p => p.min)), hi = Math.max(...pts.map(p => p.max));
+  const x = t => (t - r.start) / (r.end - r.start) * 600;
+  const y = v => 115 - (hi > lo ? (v - lo) / (hi - lo) : 0.5) * 110;
+  const upper = pts.map(p => `${x(p.t)},${y(p.max)}`), lower = pts.map(p => `${x(p.t)},${y(p.min)}`).reverse();
+  svg.innerHTML = `<polygon class="band" points="${upper.concat(lower).join(' ')}"/>` +
+    `<polyline class="avg" points="${pts.map(p => `${x(p.t)},${y(p.avg)}`).join(' ')}"/>`;
+  const last = pts[pts.length - 1];
+  document.getElementById('history-label').innerText =
+    `${select.value}: now ${last.avg.toFixed(2)}, range ${lo.toFixed(2)} to ${hi.toFixed(2)} (${r.step} s buckets)`;
+}
+
+document.getElementById('history-series').addEventListener('change', refreshHistory);
+document.getElementById('history-range').addEventListener('change', refreshHistory);
+refreshHistory();
+setInterval(refreshHistory, 10000);
+
 // Session create
 document.getElementById('create-session').addEventListener('click', async () => {
   const r = await api('/api/session/create', 'POST');
@@ -66,8 +133,7 @@ document.getElementById('schedule').addEventListener('click', async () => {
 // Demo controls
 document.getElementById('demo-start').addEventListener('click', async () => {
   const duration = parseFloat(document.getElementById('demo-duration').value || '5');
-  const chunk_ms = parseInt(document.getElementById('demo-chunk').value || '20');
-  const r = await api('/api/demo/start', 'POST', JSON.stringify({ duration, chunk_ms }));
+  const r = await api('/api/demo/start', 'POST', JSON.stringify({ duration }));
   if (r.ok) appendLog('Demo started'); else appendLog('Demo start failed: ' + (r.reason||'unknown'));
 });
 
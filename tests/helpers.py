@@ -0,0 +1,40 @@
+"""Helpers shared by the test modules (`from helpers import ...`)."""
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+async def start_host(host):
+    """Start `host` in a task; returns the task and the port it listens on once it does."""
+    task = asyncio.create_task(host.start())
+    server = host.network_server
+    while server._server is None:
+        await asyncio.sleep(0.01)
+    return task, server._server.sockets[0].getsockname()[1]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def host_process(port, *args):
+    """A host in its own process, as started from the command line."""
+    return subprocess.Popen(
+        [sys.executable, str(ROOT / "host_main.py"), "--port", str(port), "--no-web",
+         "--profile-db", ":memory:", *args],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def spin(seconds):
+    """Burn CPU on the calling thread for `seconds`."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
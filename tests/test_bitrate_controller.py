@@ -0,0 +1,159 @@
+import asyncio
+import json
+
+import pytest
+import websockets
+
+from hivemind.common.session_auth import authenticate
+from hivemind.host.bitrate_controller import AdaptiveBitrateController, TierEncoderPool
+from host_main import HiveMindHostEnhanced
+
+TIERS = [(128000, 20), (64000, 40), (32000, 60)]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_controller_steps_down_fast_and_up_with_hysteresis():
+    clock = FakeClock()
+    abr = AdaptiveBitrateController(tiers=TIERS, downgrade_interval=1.0, upgrade_after=5.0, clock=clock)
+
+    abr.observe_rtt("n", 10.0)
+    assert abr.evaluate("n") == 0
+
+    # Inflated RTT and a growing send buffer both count as congestion
+    clock.now = 1.0
+    abr.observe_rtt("n", 80.0)
+    assert abr.evaluate("n") == 1
+    clock.now = 1.5
+    assert abr.evaluate("n") == 1  # rate-limited by downgrade_interval
+    clock.now = 2.0
+    abr.observe_rtt("n", 12.0)
+    abr.observe_send_buffer("n", 200 * 1024)
+    assert abr.evaluate("n") == 2
+    clock.now = 3.0
+    abr.observe_send_buffer("n", 0)
+    assert abr.evaluate("n") == 2  # at the bottom
+
+    # Clean link: no upgrade until upgrade_after seconds have passed
+    for t in (4.0, 6.0, 7.5):
+        clock.now = t
+        assert abr.evaluate("n") == 2
+    clock.now = 8.0
+    assert abr.evaluate("n") == 1
+
+    # A single late-chunk report resets the clean streak
+    clock.now = 12.0
+    abr.report_late("n", 1)
+    assert abr.evaluate("n") == 2
+
+
+def test_node_over_cpu_budget_is_held_to_cheaper_tiers():
+    clock = FakeClock()
+    abr = AdaptiveBitrateController(tiers=TIERS, downgrade_interval=1.0, upgrade_after=5.0, clock=clock)
+    assert abr.evaluate("n") == 0
+
+    clock.now = 1.0
+    assert abr.report_cpu("n", 1.8) == 1
+    assert abr.evaluate("n") == 1
+    clock.now = 1.5
+    assert abr.report_cpu("n", 1.4) == 1  # rate-limited by downgrade_interval
+    clock.now = 2.0
+    assert abr.report_cpu("n", 1.2) == 2
+    # A clean link does not lift a node above what its CPU can decode
+    for t in (3.0, 9.0, 15.0):
+        clock.now = t
+        abr.report_cpu("n", 0.8)
+        assert abr.evaluate("n") == 2
+
+    # Comfortably within budget for upgrade_after: the floor comes back up, then the tier
+    clock.now = 16.0
+    assert abr.report_cpu("n", 0.3) == 2
+    clock.now = 21.0
+    assert abr.report_cpu("n", 0.3) == 1
+    clock.now = 27.0
+    assert abr.evaluate("n") == 1
+    assert abr.get_state("n")["cpu_floor"] == 1
+
+
+def test_tier_pool_reframes_chunks_per_tier():
+    pool = TierEncoderPool(tiers=TIERS, use_compression=False)
+    chunk = b"\x01\x00" * 960 * 2  # 20 ms stereo
+
+    assert len(pool.encode(0, chunk, 10.0, 0)) == 1
+    assert pool.encode(1, chunk, 10.0, 0) == []
+    frames = pool.encode(1, chunk, 10.02, 1)
+    assert [(seq, play_at, len(data)) for seq, play_at, data in frames] == [(1, 10.0, len(chunk) * 2)]
+
+    # A gap in sequence discards the stale partial frame
+    assert pool.encode(1, chunk, 11.0, 5) == []
+    assert pool.encode(1, chunk, 11.02, 6)[0][1] == 11.0
+    assert pool.active_tiers() == [0, 1]
+
+    # A node moved between tiers mid-stream still gets increasing sequence numbers
+    received = []
+    for sequence in range(7, 15):
+        play_at = 11.04 + (sequence - 7) * 0.02
+        for tier in (0, 1):
+            frames = pool.encode(tier, chunk, play_at, sequence)
+            if tier == (1 if 10 <= sequence < 12 else 0):
+                received += [seq for seq, _, _ in frames]
+    assert received == [7, 8, 9, 10, 12, 13, 14]
+
+
+@pytest.mark.asyncio
+async def test_slow_client_on_localhost_gets_cheaper_tier():
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False)
+    host.bitrate_controller = AdaptiveBitrateController(tiers=TIERS, downgrade_interval=0.0)
+    host.tier_encoders = TierEncoderPool(tiers=TIERS, use_compression=False)
+    server = host.network_server
+    task = asyncio.create_task(server.start())
+    while server._server is None:
+        await asyncio.sleep(0.01)
+    uri = f"ws://localhost:{server._server.sockets[0].getsockname()[1]}"
+
+    async def join(ws, device_id):
+        reply, _ = await authenticate(ws, host.session_manager.session_code, {
+            "type": "join_request",
+            "payload": {"device_id": device_id, "device_name": device_id, "metadata": {}},
+        }, device_id)
+        assert json.loads(reply)["type"] == "join_accept"
+
+    async with websockets.connect(uri) as fast, websockets.connect(uri) as slow:
+        await join(fast, "fast")
+        await join(slow, "slow")
+
+        chunk = b"\x00\x00" * 960 * 2
+        for _ in range(6):
+            # The slow node keeps reporting late chunks and a rising RTT
+            await slow.send(json.dumps({"type": "stream_report",
+                                        "payload": {"device_id": "slow", "late_chunks": 2, "rtt_ms": 150}}))
+            await asyncio.sleep(0.05)
+            await host._distribute_chunk(chunk, host.audio_scheduler.schedule_chunk(chunk))
+
+        assert host.bitrate_controller.tier_for("fast") == 0
+        assert host.bitrate_controller.tier_for("slow") > 0
+
+        fast_tiers = set()
+        while True:
+            try:
+                fast_tiers.add(json.loads(await asyncio.wait_for(fast.recv(), 0.2))["tier"])
+            except asyncio.TimeoutError:
+                break
+        slow_tiers = set()
+        while True:
+            try:
+                slow_tiers.add(json.loads(await asyncio.wait_for(slow.recv(), 0.2))["tier"])
+            except asyncio.TimeoutError:
+                break
+
+    await server.stop()
+    await task
+
+    assert fast_tiers == {0}
+    assert max(slow_tiers) > 0
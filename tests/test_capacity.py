@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from helpers import start_host
+from hivemind.common.protocol import HOST_BUSY
+from hivemind.config import CAPACITY_RETRY_AFTER_S
+from hivemind.host.bitrate_controller import AdaptiveBitrateController
+from hivemind.host.capacity import CapacityMonitor
+from hivemind.node.client import HiveMindClient
+from host_main import HiveMindHostEnhanced
+
+TIERS = [(128000, 20), (64000, 40), (32000, 60)]
+
+
+def test_joins_are_admitted_against_projected_load():
+    capacity = CapacityMonitor(audio_budget=0.5, egress_bps=1000.0, shed_at=0.7, admit_below=0.85,
+                               retry_after_s=5.0, smoothing=1.0)
+    assert capacity.admit(0) is None  # the first node is always welcome
+
+    capacity.observe_chunk(0.004, 0.02)  # 40% of the audio budget
+    assert capacity.load == pytest.approx(0.4)
+    assert capacity.admit(1) is None and capacity.admit(2) is None  # 0.8, 0.6
+    capacity.observe_egress(700.0)
+    assert capacity.admit(4) == 5.0  # 0.7 * 5/4 is over
+    assert capacity.rejected == 1
+
+    # Shedding starts above shed_at and stops well below it
+    assert not capacity.shedding
+    capacity.observe_egress(800.0)
+    assert capacity.shedding and capacity.tier_floor(0, 2) == 1
+    capacity.observe_egress(600.0)
+    assert capacity.shedding and capacity.tier_floor(1, 2) == 2
+    capacity.observe_egress(500.0)
+    assert not capacity.shedding and capacity.tier_floor(2, 2) == 2
+    capacity.observe_egress(0.0)
+    capacity.observe_chunk(0.0, 0.02)
+    assert capacity.tier_floor(2, 2) == 1
+    assert capacity.get_state()["rejected_joins"] == 1
+
+
+def test_tier_floor_overrides_a_clean_link():
+    abr = AdaptiveBitrateController(tiers=TIERS, downgrade_interval=1.0, upgrade_after=5.0, clock=lambda: 0.0)
+    abr.observe_rtt("n", 10.0)
+    assert abr.evaluate("n") == 0
+    abr.min_tier = 2
+    assert abr.evaluate("n") == 2
+
+
+@pytest.mark.asyncio
+async def test_host_at_capacity_turns_new_nodes_away_but_not_known_ones():
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:")
+    task, port = await start_host(host)
+    code = host.session_manager.session_code
+
+    known = HiveMindClient(code, device_id="known")
+    await known.connect("localhost", port)
+    host.capacity.admit_below = 0.0  # everything counts as over capacity
+
+    newcomer = HiveMindClient(code, device_id="new")
+    with pytest.raises(ConnectionError, match=HOST_BUSY):
+        await newcomer.connect("localhost", port)
+    assert newcomer.retry_after == CAPACITY_RETRY_AFTER_S
+    assert "new" not in host.session_manager.nodes
+
+    # A node already in the session rejoins regardless
+    host.network_server.clients["known"].ws.transport.abort()
+    await asyncio.sleep(0.1)
+    deadline = asyncio.get_running_loop().time() + 5.0
+    while not (known.connected and host.listener_count == 1):
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.05)
+
+    await known.disconnect()
+    await host.stop()
+    await task
+
+
+@pytest.mark.asyncio
+async def test_audio_load_decays_while_dtx_holds_chunks_back():
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:")
+    task, port = await start_host(host)
+    code = host.session_manager.session_code
+    known = HiveMindClient(code, device_id="known")
+    await known.connect("localhost", port)
+    # The last loud passage left the audio path over budget
+    host.capacity.audio = 2.0
+
+    silent = b"\x00\x00" * 960 * 2
+    for _ in range(60):
+        host.audio_capture.push_chunk(silent)
+        await asyncio.sleep(0.02)
+    assert host.silence_detector.skipped > 0
+    assert host.capacity.audio < host.capacity.shed_at * 0.5
+    newcomer = HiveMindClient(code, device_id="new")
+    await newcomer.connect("localhost", port)
+
+    # With nobody listening, the idle spell decays it as well
+    capacity = CapacityMonitor(smoothing=0.1)
+    capacity.audio = 2.0
+    capacity.observe_idle(1.0)
+    assert capacity.audio == pytest.approx(2.0 * 0.9 ** 50)
+
+    await newcomer.disconnect()
+    await known.disconnect()
+    await host.stop()
+    await task
+
+
+def test_dashboard_polling_is_shed_under_load():
+    pytest.importorskip("flask")
+    import app as dashboard
+
+    host = HiveMindHostEnhanced(port=0, enable_web_dashboard=False, profile_path=":memory:")
+    dashboard._host_state["host"] = host
+    try:
+        client = dashboard.app.test_client()
+        assert client.get("/api/nodes").status_code == 200
+        host.capacity.observe_loop_lag(1.0)
+        host.capacity.smoothing = 1.0
+        host.capacity.observe_loop_lag(1.0)
+        r = client.get("/api/nodes")
+        assert r.status_code == 503 and r.headers["Retry-After"] == str(int(CAPACITY_RETRY_AFTER_S))
+        status = client.get("/api/status").get_json()
+        assert status["capacity"]["shedding"]
+    finally:
+        dashboard._host_state["host"] = None
@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import pytest
+import websockets
+
+from hivemind.host.dispatcher import FailureLimiter, MessageDispatcher, TokenBucket
+from hivemind.host.network_server import NetworkServer
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=10.0, capacity=2)
+    now = bucket.updated
+    assert bucket.consume(now=now)
+    assert bucket.consume(now=now)
+    assert not bucket.consume(now=now)
+    assert bucket.consume(now=now + 0.2)
+
+
+def test_failure_limiter_charges_each_source_for_its_own_failures():
+    limiter = FailureLimiter(rate=0.0, capacity=2)
+    # Attempts in progress hold the budget; only failed ones spend it
+    assert limiter.begin("a") and limiter.begin("a")
+    assert not limiter.begin("a")
+    limiter.end("a", failed=False)
+    limiter.end("a", failed=True)
+    assert limiter.tokens("a") == 1
+    assert limiter.begin("a")
+    limiter.end("a", failed=True)
+    assert not limiter.begin("a")
+    # Another source is unaffected
+    assert limiter.tokens("b") == 2 and limiter.begin("b")
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_preserves_per_client_order():
+    dispatcher = MessageDispatcher(max_concurrency=2, rate_limits={})
+    seen = []
+
+    async def handler(client, payload, audio_data):
+        # Later messages finish faster; ordering must still hold per client
+        await asyncio.sleep(0.01 * (5 - payload["n"]))
+        seen.append((client, payload["n"]))
+
+    for client in ("a", "b"):
+        dispatcher.open_client(client)
+    for n in range(5):
+        for client in ("a", "b"):
+            dispatcher.submit(client, handler, {"n": n}, None)
+    for client in ("a", "b"):
+        dispatcher.close_client(client)
+
+    while dispatcher.metrics["handled"] < 10:
+        await asyncio.sleep(0.01)
+
+    assert [n for c, n in seen if c == "a"] == list(range(5))
+    assert [n for c, n in seen if c == "b"] == list(range(5))
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_drops_when_queue_full_or_rate_limited():
+    dispatcher = MessageDispatcher(max_queue=2, rate_limits={"heartbeat": (1.0, 1)})
+    gate = asyncio.Event()
+
+    async def handler(client, payload, audio_data):
+        await gate.wait()
+
+    dispatcher.open_client("c")
+    assert dispatcher.allow("c", "heartbeat")
+    assert not dispatcher.allow("c", "heartbeat")
+    assert dispatcher.allow("c", "other")
+
+    accepted = [dispatcher.submit("c", handler, {}, None) for _ in range(5)]
+    await asyncio.sleep(0)
+    # One message is in flight, two are queued, the rest are dropped
+    assert accepted.count(True) <= 3
+    metrics = dispatcher.get_metrics()
+    assert metrics["dropped_rate_limited"] == 1
+    assert metrics["dropped_queue_full"] >= 2
+    assert metrics["queue_depth_max"] <= 2
+
+    gate.set()
+    dispatcher.close_client("c")
+
+
+@pytest.mark.asyncio
+async def test_server_rejects_large_unauthenticated_frames():
+    server = NetworkServer(port=0, max_unauthenticated_frame_bytes=256)
+    received = []
+
+    async def handler(client, payload, audio_data):
+        received.append(payload)
+
+    server.register_handler("ping", handler)
+    task = asyncio.create_task(server.start())
+    while server._server is None:
+        await asyncio.sleep(0.01)
+    port = server._server.sockets[0].getsockname()[1]
+
+    async with websockets.connect(f"ws://localhost:{port}") as ws:
+        await ws.send(json.dumps({"type": "ping", "payload": {"pad": "x" * 1024}}))
+        await ws.send(json.dumps({"type": "ping", "payload": {"n": 1}}))
+        while not received:
+            await asyncio.sleep(0.01)
+
+    await server.stop()
+    await task
+
+    assert received == [{"n": 1}]
+    assert server.get_metrics()["dropped_oversize"] == 1
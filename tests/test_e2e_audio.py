@@ -18,12 +18,19 @@ async def relay_handler(server_client, payload, audio_data):
     await server_client.server.broadcast(msg)
 
 
+async def join_handler(server_client, payload, audio_data):
+    # Stand-in for the host's join handshake: broadcasts only reach joined clients
+    server_client.authenticated = True
+    await server_client.send_message({'type': 'join_accept'})
+
+
 @pytest.mark.asyncio
 async def test_e2e_audio_roundtrip():
     server = NetworkServer(port=0)
 
     # register handler for incoming audio_chunk
     server.register_handler('audio_chunk', relay_handler)
+    server.register_handler('join_request', join_handler)
 
     task = asyncio.create_task(server.start())
 
@@ -41,16 +48,21 @@ async def test_e2e_audio_roundtrip():
 
     async def sender():
         uri = f"ws://localhost:{port}"
+        await joined.wait()
         async with websockets.connect(uri) as ws:
             pcm = (b"\x00\x00\x00\x00" * 240)  # small silent frames
             msg = {'type': 'audio_chunk', 'payload': {'play_at': time.time() + 0.5, 'sample_rate': codec.sample_rate, 'channels': codec.channels}, 'audio_data': base64.b64encode(pcm).decode('ascii')}
             await ws.send(json.dumps(msg))
 
     received = []
+    joined = asyncio.Event()
 
     async def receiver():
         uri = f"ws://localhost:{port}"
         async with websockets.connect(uri) as ws:
+            await ws.send(json.dumps({'type': 'join_request', 'payload': {}}))
+            await asyncio.wait_for(ws.recv(), timeout=2.0)
+            joined.set()
             # wait for relayed message
             raw = await asyncio.wait_for(ws.recv(), timeout=2.0)
             m = json.loads(raw)
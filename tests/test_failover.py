@@ -0,0 +1,196 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from helpers import free_port, host_process, start_host
+from hivemind.common.protocol import HOST_SUPERSEDED, STANDBY_NOT_ACTIVE
+from hivemind.config import REPLICATION_INTERVAL_S
+from hivemind.host.replication import restore_state
+from hivemind.node.client import HiveMindClient
+from host_main import HiveMindHostEnhanced
+
+
+def _crash(host):
+    """Kill a host the way a dead process would: no close frames, nothing more sent."""
+    for task in list(host._tasks):
+        task.cancel()
+    host.network_server._server.close(close_connections=False)
+    for client in list(host.network_server.clients.values()) + host.replication.replicas:
+        client.ws.transport.abort()
+
+
+@pytest.mark.asyncio
+async def test_node_fails_over_to_standby_on_the_same_timeline():
+    primary = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                   profile_path=":memory:")
+    primary_task, primary_port = await start_host(primary)
+    standby = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                   profile_path=":memory:", standby_of=f"127.0.0.1:{primary_port}")
+    standby_task, standby_port = await start_host(standby)
+
+    async def feed():
+        # Both hosts capture the same source
+        chunk = b"\xe8\x03" * 960 * 2  # quiet, but not silence (which DTX would not send)
+        while True:
+            primary.audio_capture.push_chunk(chunk)
+            standby.audio_capture.push_chunk(chunk)
+            await asyncio.sleep(0.02)
+
+    feeder = asyncio.create_task(feed())
+    played = []
+    client = HiveMindClient(primary.session_manager.session_code, device_id="dev",
+                            sink=lambda seq, play_at, pcm, local: played.append((seq, play_at)))
+    await client.connect("localhost", primary_port)
+    token = client.resume_token
+    while client.standby is None or "dev" not in standby.session_manager.nodes or len(played) < 10:
+        await asyncio.sleep(0.02)
+    assert client.standby == ("127.0.0.1", standby_port)
+    primary.bitrate_controller.set_tier("dev", 1)
+    await asyncio.sleep(0.3)
+    assert standby.bitrate_controller.tier_for("dev") == 1
+    # Until it takes over, the standby turns joins away at once; nodes retry with backoff
+    early = HiveMindClient(primary.session_manager.session_code, device_id="early")
+    with pytest.raises(ConnectionError, match=STANDBY_NOT_ACTIVE):
+        await asyncio.wait_for(early.connect("127.0.0.1", standby_port), 1.0)
+
+    crashed_at = time.monotonic()
+    _crash(primary)
+    while client.failovers == 0:
+        assert time.monotonic() - crashed_at < standby.standby.timeout + 3.0
+        await asyncio.sleep(0.01)
+    failed_over_after = time.monotonic() - crashed_at
+    last_primary_sequence = primary.audio_scheduler.sequence
+    while played[-1][0] < last_primary_sequence + 25:
+        await asyncio.sleep(0.02)
+
+    # A lost link alone does not promote the standby: it waits out several replication intervals
+    assert failed_over_after >= standby.standby.missed_intervals * REPLICATION_INTERVAL_S
+    assert standby.active and standby.term == 1 and client.term == 1
+    # Switched by resuming the replicated record
+    assert client.resume_token == token
+    assert standby.session_manager.nodes["dev"]["resumes"] == 1
+    assert client.node_state["tier"] == 1
+    # One timeline: no missing sequence numbers, and play times keep their spacing except
+    # where the standby picked the timeline up again after the gap
+    sequences = [seq for seq, _ in played]
+    assert sequences == list(range(sequences[0], sequences[-1] + 1))
+    steps = [b - a for (_, a), (_, b) in zip(played, played[1:])]
+    assert sum(step != pytest.approx(0.02, abs=0.002) for step in steps) <= 1
+    assert min(steps) > 0.018
+
+    feeder.cancel()
+    await client.disconnect()
+    await standby.stop()
+    await standby_task
+    primary_task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_primary_steps_down_when_its_standby_took_over():
+    primary = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                   profile_path=":memory:")
+    primary_task, primary_port = await start_host(primary)
+    standby = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                   profile_path=":memory:", standby_of=f"127.0.0.1:{primary_port}")
+    standby_task, standby_port = await start_host(standby)
+    client = HiveMindClient(primary.session_manager.session_code, device_id="dev")
+    await client.connect("localhost", primary_port)
+    while client.standby is None or "dev" not in standby.session_manager.nodes:
+        await asyncio.sleep(0.02)
+
+    # The standby gave up on a primary that was only stalled: two hosts now serve the session
+    standby.standby.promote()
+    for replica in primary.replication.replicas:
+        replica.ws.transport.abort()
+    deadline = time.monotonic() + 5.0
+    while not (primary.superseded and client.connected and client._address == ("127.0.0.1", standby_port)):
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.02)
+    assert client.term == standby.term == 1 and client.redirects == 1
+
+    # The old primary takes no one back, and nodes refuse a host behind the term they know
+    late = HiveMindClient(primary.session_manager.session_code, device_id="late")
+    with pytest.raises(ConnectionError, match=HOST_SUPERSEDED):
+        await late.connect("localhost", primary_port)
+    fresh = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                 profile_path=":memory:", session_code=primary.session_manager.session_code)
+    fresh_task, fresh_port = await start_host(fresh)
+    stale = HiveMindClient(primary.session_manager.session_code, device_id="stale")
+    stale.term = 1
+    with pytest.raises(ConnectionError, match=HOST_SUPERSEDED):
+        await stale.connect("localhost", fresh_port)
+
+    await client.disconnect()
+    for host, task in ((standby, standby_task), (primary, primary_task), (fresh, fresh_task)):
+        await host.stop()
+        await task
+
+
+class _Replica:
+    addr = "127.0.0.1:50000"
+    is_open = True
+
+
+def test_replication_seals_node_keys_and_never_sends_the_code():
+    pytest.importorskip("cryptography")
+    primary = HiveMindHostEnhanced(port=0, enable_web_dashboard=False, profile_path=":memory:",
+                                   session_code="HM-4821")
+    primary.session_manager.accept_node("dev", "Dev", {})
+    primary.session_manager.update_node("dev", session_key="ab" * 32, resume_counter=3)
+    link_key, replica = b"k" * 32, _Replica()
+    message = primary.replication.attach(replica, {"host": "127.0.0.1", "port": 7879}, link_key)
+    wire = json.dumps(message)
+    assert "HM-4821" not in wire and "ab" * 32 not in wire and "resume_counter" not in wire
+
+    standby = HiveMindHostEnhanced(port=0, enable_web_dashboard=False, profile_path=":memory:",
+                                   session_code="HM-4821")
+    with pytest.raises(ValueError):
+        restore_state(standby, message, b"x" * 32)
+    restore_state(standby, message, link_key)
+    node = standby.session_manager.nodes["dev"]
+    assert node["session_key"] == "ab" * 32 and node["resume_counter"] == 3
+
+    # A code changed on the primary reaches the standby, sealed
+    primary.session_manager.generate_session_code()
+    update = primary.replication.seal(primary.replication.snapshot(), replica)
+    assert primary.session_manager.session_code not in json.dumps(update)
+    restore_state(standby, update, link_key)
+    assert standby.session_manager.session_code == primary.session_manager.session_code
+
+
+@pytest.mark.asyncio
+async def test_standby_process_takes_over_from_killed_primary():
+    primary_port, standby_port = free_port(), free_port()
+    primary = host_process(primary_port, "--session-code", "HM-4821")
+    standby = host_process(standby_port, "--session-code", "HM-4821", "--standby-of", f"127.0.0.1:{primary_port}")
+    client = HiveMindClient("HM-4821", device_id="dev")
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                await client.connect("127.0.0.1", primary_port)
+                break
+            except OSError:
+                assert time.monotonic() < deadline
+                await asyncio.sleep(0.1)
+        while client.standby is None:
+            assert time.monotonic() < deadline
+            await asyncio.sleep(0.05)
+        token = client.resume_token
+        await asyncio.sleep(0.2)  # the join reaches the standby in the next replication message
+
+        killed_at = time.monotonic()
+        primary.kill()
+        while client.failovers == 0:
+            assert time.monotonic() - killed_at < 6.0
+            await asyncio.sleep(0.01)
+        assert client._address == ("127.0.0.1", standby_port)
+        assert client.resume_token == token
+        assert client.connected
+    finally:
+        await client.disconnect()
+        for proc in (primary, standby):
+            proc.kill()
+            proc.wait()
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import pytest
+
+from helpers import start_host
+from hivemind.config import LOOKAHEAD_MS
+from hivemind.node.client import HiveMindClient
+from host_main import HiveMindHostEnhanced
+
+
+@pytest.mark.asyncio
+async def test_late_joiner_plays_within_one_lookahead():
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:")
+    task, port = await start_host(host)
+
+    async def feed():
+        chunk = b"\xe8\x03" * 960 * 2
+        next_at = time.monotonic()
+        while True:
+            host.audio_capture.push_chunk(chunk)
+            next_at += 0.02
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+
+    feeder = asyncio.create_task(feed())
+    code = host.session_manager.session_code
+    played = {"first": [], "late": []}
+
+    def sink(name):
+        return lambda seq, play_at, pcm, local: played[name].append((seq, time.time()))
+
+    first = HiveMindClient(code, device_id="first", sink=sink("first"))
+    await first.connect("localhost", port)
+    while len(played["first"]) < 5:
+        await asyncio.sleep(0.02)
+
+    late = HiveMindClient(code, device_id="late", sink=sink("late"))
+    joined_at = time.time()
+    await late.connect("localhost", port)
+    # Synced by the accept itself, before any time-sync round trip of its own
+    assert late.time_sync.synced
+    encoded_at_join = host.audio_scheduler.sequence
+    while not played["late"]:
+        await asyncio.sleep(0.005)
+
+    sequence, heard_at = played["late"][0]
+    assert heard_at - joined_at < LOOKAHEAD_MS / 1000.0
+    # Its first frames came from the backlog, not from chunks encoded after it joined
+    assert sequence < encoded_at_join
+
+    feeder.cancel()
+    for client in (first, late):
+        await client.disconnect()
+    await host.stop()
+    await task
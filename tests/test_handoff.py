@@ -0,0 +1,110 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+from helpers import free_port, host_process, start_host
+from hivemind.common.protocol import pack_sync, unpack_sync
+from hivemind.node.client import HiveMindClient
+from host_main import HiveMindHostEnhanced
+
+
+def _host(path):
+    return HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:", handoff_path=str(path), udp_sync_port=0)
+
+
+@pytest.mark.asyncio
+async def test_restarted_host_takes_over_the_socket_and_timeline(tmp_path):
+    path = tmp_path / "handoff.sock"
+    old = _host(path)
+    old_task, port = await start_host(old)
+    while not path.exists():
+        await asyncio.sleep(0.01)
+    hosts = [old]
+
+    async def feed():
+        chunk = b"\xe8\x03" * 960 * 2
+        while True:
+            for host in hosts:
+                host.audio_capture.push_chunk(chunk)
+            await asyncio.sleep(0.02)
+
+    feeder = asyncio.create_task(feed())
+    played = []
+    client = HiveMindClient(old.session_manager.session_code, device_id="dev",
+                            sink=lambda seq, play_at, pcm, local: played.append((seq, play_at)))
+    await client.connect("localhost", port)
+    token = client.resume_token
+    old.bitrate_controller.set_tier("dev", 1)
+    while len(played) < 10:
+        await asyncio.sleep(0.02)
+
+    new = _host(path)
+    hosts.append(new)
+    new_task, new_port = await start_host(new)
+    assert new_port == port
+    assert new.udp_sync.port == old.udp_sync.port
+    assert new.session_manager.session_code == old.session_manager.session_code
+    await asyncio.wait_for(old_task, 5)
+    last_old_sequence = old.audio_scheduler.sequence
+    while played[-1][0] < last_old_sequence + 25:
+        await asyncio.sleep(0.02)
+
+    # Moved by redirect, not by a dropped connection, and resumed with the same record
+    assert client.redirects == 1 and client.failovers == 0
+    assert client.resume_token == token
+    assert new.session_manager.nodes["dev"]["resumes"] == 1
+    assert client.node_state["tier"] == 1
+    # The time-sync socket came along too, and only the new process answers on it now
+    assert old.udp_sync.sock is None
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(1.0)
+        sock.sendto(pack_sync(1.5), ("127.0.0.1", new.udp_sync.port))
+        assert unpack_sync(sock.recv(64))[0] == 1.5
+    # Nothing missed across the switch
+    sequences = [seq for seq, _ in played]
+    assert sequences == list(range(sequences[0], sequences[-1] + 1))
+    for (_, a), (_, b) in zip(played, played[1:]):
+        assert b - a == pytest.approx(0.02, abs=0.002)
+    # The new process now serves the hand-off socket for the next restart
+    while not path.exists():
+        await asyncio.sleep(0.01)
+
+    feeder.cancel()
+    await client.disconnect()
+    await new.stop()
+    await new_task
+
+
+@pytest.mark.asyncio
+async def test_host_process_restarts_under_connected_node(tmp_path):
+    port, path = free_port(), str(tmp_path / "handoff.sock")
+    old = host_process(port, "--handoff", path)
+    new = None
+    client = HiveMindClient("HM-0000", device_id="dev")
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                await client.connect("127.0.0.1", port)
+                break
+            except OSError:
+                assert time.monotonic() < deadline
+                await asyncio.sleep(0.1)
+        token = client.resume_token
+
+        new = host_process(port, "--handoff", path)
+        while old.poll() is None:
+            assert time.monotonic() < deadline
+            await asyncio.sleep(0.05)
+        assert client.redirects == 1 and client.failovers == 0
+        assert client.resume_token == token
+        assert client.connected
+    finally:
+        await client.disconnect()
+        for proc in (old, new):
+            if proc is not None:
+                proc.kill()
+                proc.wait()
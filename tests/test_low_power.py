@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from helpers import spin, start_host
+from hivemind.common.audio_codec import AudioCodecManager
+from hivemind.node.buffer_manager import JitterBuffer
+from hivemind.node.client import HiveMindClient
+from hivemind.node.playback_engine import PlaybackEngine
+from hivemind.node.time_sync_client import TimeSyncClient
+from host_main import HiveMindHostEnhanced
+
+LOUD = b"\xe8\x03" * 960 * 2
+
+
+@pytest.mark.asyncio
+async def test_frames_due_before_the_next_wakeup_decode_as_one_batch_off_the_loop():
+    now = [100.0]
+    sync = TimeSyncClient(clock=lambda: now[0])
+    sync.seed(0.0, 0.001)
+    codec = AudioCodecManager(use_compression=False)
+    threads = set()
+    decode_into = codec.decode_into
+
+    def tracking_decode_into(data, out):
+        threads.add(threading.current_thread().name)
+        return decode_into(data, out)
+
+    codec.decode_into = tracking_decode_into
+    buffer = JitterBuffer()
+    for seq in range(10):
+        buffer.push(seq, 100.0 + seq * 0.02, bytes([seq]) * 3840)
+    played = []
+    engine = PlaybackEngine(buffer, sync, codec=codec, wakeup_ms=60,
+                            sink=lambda seq, play_at, pcm, local: played.append((seq, pcm)))
+
+    # Due now, plus everything starting before the next wakeup 60 ms on
+    assert await engine.service_batch() == 4
+    assert [seq for seq, _ in played] == [0, 1, 2, 3]
+    assert all(bytes(pcm) == bytes([seq]) * 3840 for seq, pcm in played)
+    assert engine.decoder.batches == 1
+    assert threads == {"decode_0"}
+    # PCM lands in the preallocated pool, not in fresh buffers
+    assert all(pcm.obj is engine.decoder.pool.memory for _, pcm in played)
+    engine.decoder.close()
+
+
+@pytest.mark.asyncio
+async def test_node_over_its_cpu_budget_gets_a_cheaper_tier():
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:")
+    task, port = await start_host(host)
+    client = HiveMindClient(host.session_manager.session_code, device_id="pi", decode_wakeup_ms=60)
+    # An underpowered node: 10 ms of CPU per 20 ms frame is twice its budget
+    codec = client.playback.codec
+    decode_into = codec.decode_into
+    codec.decode_into = lambda data, out: spin(0.01) or decode_into(data, out)
+    await client.connect("localhost", port)
+
+    deadline = time.monotonic() + 5.0
+    while host.bitrate_controller.tier_for("pi") == 0:
+        assert time.monotonic() < deadline
+        host.audio_capture.push_chunk(LOUD)
+        await asyncio.sleep(0.02)
+
+    state = host.bitrate_controller.get_state("pi")
+    assert state["cpu_load"] > 1.0 and state["cpu_floor"] == 1
+    assert client.playback.wakeups < client.playback.played
+
+    await client.disconnect()
+    await host.stop()
+    await task
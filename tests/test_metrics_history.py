@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from helpers import start_host
+from hivemind.host.metrics_history import MetricsHistory
+from hivemind.node.client import HiveMindClient
+from host_main import HiveMindHostEnhanced
+
+RESOLUTIONS = ((1, 10), (5, 60))
+
+
+def test_buckets_keep_min_max_avg_at_each_resolution():
+    history = MetricsHistory(RESOLUTIONS, clock=lambda: 1000.0)
+    for i in range(20):
+        history.record({"load": i, "sync_error_ms": None}, t=980.0 + i + 0.5)
+    assert list(history.series) == ["load"]
+
+    # The last 10 s fit the 1 s ring; older buckets were overwritten
+    fine = history.query("load", start=990.0)
+    assert fine["step"] == 1.0
+    assert [p["t"] for p in fine["points"]] == [990.0 + i for i in range(10)]
+    assert fine["points"][0] == {"t": 990.0, "min": 10.0, "max": 10.0, "avg": 10.0, "count": 1}
+    assert history.query("load", start=985.0)["step"] == 5.0
+
+    coarse = history.query("load", start=980.0, step=5)
+    assert [(p["min"], p["max"], p["avg"], p["count"]) for p in coarse["points"]] == [
+        (0.0, 4.0, 2.0, 5), (5.0, 9.0, 7.0, 5), (10.0, 14.0, 12.0, 5), (15.0, 19.0, 17.0, 5)]
+    with pytest.raises(KeyError):
+        history.query("nodes")
+
+
+def test_memory_is_fixed_and_snapshots_restore(tmp_path):
+    history = MetricsHistory(RESOLUTIONS, max_series=2)
+    sizes = [ring.bucket.size for ring in history._rings("a")]
+    for t in range(10000):
+        history.record({"a": t, "b": -t, "c": 1}, t=float(t))
+    assert [ring.bucket.size for ring in history.series["a"]] == sizes == [10, 12]
+    assert sorted(history.series) == ["a", "b"]
+
+    path = tmp_path / "metrics.npz"
+    MetricsHistory.save(history.arrays(), path)
+    restored = MetricsHistory(RESOLUTIONS, clock=lambda: 10000.0)
+    assert restored.load(path)
+    assert restored.query("b", start=9990.0) == history.query("b", start=9990.0, end=10000.0)
+    assert not MetricsHistory(RESOLUTIONS).load(tmp_path / "missing.npz")
+
+
+@pytest.mark.asyncio
+async def test_host_records_its_metrics_every_second(tmp_path):
+    path = tmp_path / "metrics.npz"
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:", metrics_path=str(path))
+    task, port = await start_host(host)
+    client = HiveMindClient(host.session_manager.session_code, device_id="dev")
+    await client.connect("localhost", port)
+    await asyncio.sleep(2.2)
+
+    assert {"nodes", "load", "loop_lag_ms", "egress_kbps", "tier", "late_chunks"} <= set(host.metrics.series)
+    nodes = host.metrics.query("nodes")["points"]
+    assert len(nodes) >= 2 and nodes[-1]["max"] == 1
+
+    await client.disconnect()
+    await host.stop()
+    await task
+    # Written on stop, and picked up by the next host
+    restarted = HiveMindHostEnhanced(port=0, enable_web_dashboard=False, profile_path=":memory:")
+    assert restarted.metrics.load(path) and restarted.metrics.query("nodes")["points"] == nodes
+
+
+def test_dashboard_serves_history():
+    pytest.importorskip("flask")
+    import app as dashboard
+
+    host = HiveMindHostEnhanced(port=0, enable_web_dashboard=False, profile_path=":memory:")
+    host.metrics.record({"nodes": 3}, t=1000.0)
+    dashboard._host_state["host"] = host
+    try:
+        client = dashboard.app.test_client()
+        assert client.get("/api/metrics").get_json()["series"] == ["nodes"]
+        r = client.get("/api/metrics/nodes?start=990&end=1010").get_json()
+        assert r["step"] == 1.0 and r["points"][0]["avg"] == 3.0
+        assert client.get("/api/metrics/nope").status_code == 404
+    finally:
+        dashboard._host_state["host"] = None
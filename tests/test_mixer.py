@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from hivemind.host.mixer import Envelope, Mixer, PcmSource, ToneSource
+
+
+def _const(value, frames, channels=2):
+    return np.full(frames * channels, value, dtype=np.int16).tobytes()
+
+
+def _samples(block, channels=2):
+    return np.frombuffer(block, dtype=np.int16).reshape(-1, channels)[:, 0]
+
+
+def test_capture_alone_passes_through_untouched():
+    mixer = Mixer()
+    chunk = _const(1234, 960)
+    assert mixer.process(chunk) is chunk
+    assert mixer.position == 960
+    assert not mixer.active
+
+
+def test_sources_are_summed_with_gain_and_clipped():
+    mixer = Mixer()
+    mixer.add_source(PcmSource("a", _const(8000, 4800), gain=0.5))
+    mixer.add_source(PcmSource("b", _const(2000, 4800)))
+    out = _samples(mixer.process(_const(1000, 960)))
+    assert np.all(out == 1000 + 4000 + 2000)
+
+    mixer.add_source(PcmSource("loud", _const(30000, 4800), gain=2.0))
+    assert np.all(_samples(mixer.process(_const(1000, 960))) == 32767)
+
+
+def test_source_start_and_crossfade_are_sample_accurate():
+    mixer = Mixer()
+    mixer.add_source(PcmSource("old", _const(10000, 48000)))
+    mixer.crossfade("old", PcmSource("new", _const(20000, 48000)), at_sample=1000, duration_samples=400)
+
+    out = np.concatenate([_samples(mixer.process()) for _ in range(3)])
+    assert np.all(out[:1000] == 10000)
+    assert out[1000] == 10000                 # fade starts exactly here
+    assert out[1200] == pytest.approx(15000, abs=2)
+    assert np.all(out[1400:] == 20000)        # old source fully gone
+    assert "old" not in mixer.sources
+
+
+def test_ducking_ramps_other_sources_down_and_back():
+    mixer = Mixer(duck_level=0.25, duck_attack_ms=20, duck_release_ms=40)
+    mixer.add_source(PcmSource("music", _const(8000, 48000)))
+    mixer.add_source(PcmSource("announcement", _const(0, 1920), ducks_others=True))
+
+    first = _samples(mixer.process())
+    assert first[0] == 8000 and first[-1] == pytest.approx(2000, abs=10)
+    assert np.all(np.diff(first.astype(int)) <= 0)   # smooth ramp, no step
+    assert np.all(_samples(mixer.process()) == 2000)
+    mixer.process()  # announcement ended
+    assert _samples(mixer.process())[-1] == pytest.approx(8000, abs=10)
+
+
+def test_tone_is_phase_continuous_across_blocks():
+    mixer = Mixer()
+    mixer.add_source(ToneSource("tone", frequency=1000.0, amplitude=0.5))
+    out = np.concatenate([_samples(mixer.process()) for _ in range(2)]).astype(float)
+    expected = np.sin(2 * np.pi * 1000.0 * np.arange(len(out)) / 48000) * 0.5 * 32768
+    assert np.max(np.abs(out - expected)) <= 2
+
+
+def test_envelope_holds_and_interpolates():
+    env = Envelope(1.0)
+    env.ramp(100, 200, 0.0)
+    assert env.value(50) == 1.0 and env.value(150) == 0.5 and env.value(500) == 0.0
+    assert env.is_flat(0, 100) and not env.is_flat(90, 110) and env.is_flat(200, 300)
+
+
+def test_host_crossfades_between_scheduled_tracks():
+    from host_main import HiveMindHostEnhanced
+    from hivemind.host.timeline import VOLUME
+
+    host = HiveMindHostEnhanced(port=0, enable_web_dashboard=False, profile_path=":memory:")
+    assert host._mixer is None
+    host.audio_scheduler.clock = host.session_manager.timeline.clock = lambda: 1000.0
+    t0 = host.audio_scheduler.next_play_at
+    host.schedule_track("a.wav", _const(1000, 48000), start_at=t0 + 0.1, crossfade_ms=0)
+    host.schedule_track("b.wav", _const(1000, 48000), start_at=t0 + 0.4, crossfade_ms=100)
+    host.schedule_event(VOLUME, "b.wav", t0 + 5.0, gain=0.5)
+    assert host.mixer.sources == {}
+
+    host._run_timeline()
+    a, b = host.mixer.sources["a.wav"], host.mixer.sources["b.wav"]
+    assert (a.start_sample, b.start_sample, a.stop_sample) == (4800, 19200, 24000)
+    # The volume change is beyond the horizon and still queued
+    assert host.session_manager.timeline.pending
+    assert b.level.value(48000 * 6) == 1.0
+    info = host.session_manager.get_session_info()
+    assert [e["track_url"] for e in info["scheduled"]] == ["a.wav", "b.wav", "b.wav"]
+    assert info["scheduled"][0]["duration"] == 1.0
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+
+from hivemind.host.clock_sync import ClockSyncService
+from hivemind.host.profile_store import NodeProfileStore, default_profile_path
+from hivemind.node.client import HiveMindClient
+from host_main import HiveMindHostEnhanced
+
+
+def test_default_path_is_outside_the_checkout(tmp_path, monkeypatch):
+    monkeypatch.delenv("HIVEMIND_PROFILE_DB", raising=False)
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    assert default_profile_path() == tmp_path / "state" / "hiveminde" / "profiles.sqlite3"
+    store = NodeProfileStore(flush_interval=60.0)
+    store.open()
+    store.update("dev", tier=1)
+    store.close()
+    assert default_profile_path().exists()
+    monkeypatch.setenv("HIVEMIND_PROFILE_DB", str(tmp_path / "elsewhere.sqlite3"))
+    assert default_profile_path() == tmp_path / "elsewhere.sqlite3"
+
+
+def test_profiles_are_batched_and_survive_reopen(tmp_path):
+    path = tmp_path / "profiles.sqlite3"
+    store = NodeProfileStore(path, flush_interval=60.0)
+    store.open()
+    assert store.record_join("dev") is None
+    store.update("dev", latency_ms=21.5, tier=2)
+    store.update("dev", clock_offset=0.25)
+    store.update("other", tier=1)
+    with pytest.raises(ValueError):
+        store.update("dev", bogus=1)
+    assert store.writes == 0  # nothing hits the disk until a flush
+    store.close()
+    assert store.writes == 1
+
+    reopened = NodeProfileStore(path)
+    reopened.open()
+    profile = reopened.record_join("dev")
+    reopened.close()
+    assert profile["latency_ms"] == 21.5
+    assert profile["tier"] == 2
+    assert profile["clock_offset"] == 0.25
+    assert profile["joins"] == 1
+    assert reopened.get("dev")["joins"] == 2
+    assert len(reopened) == 2
+
+
+def test_clock_sync_measures_skew():
+    now = [0.0]
+    sync = ClockSyncService(skew_min_span_s=10.0, clock=lambda: now[0])
+    sync.record_estimate("dev", 0.100)
+    now[0] = 5.0
+    sync.record_estimate("dev", 0.1001)
+    assert "skew_ppm" not in sync.get_estimate("dev")
+    now[0] = 20.0
+    sync.record_estimate("dev", 0.1004)
+    assert sync.get_estimate("dev")["skew_ppm"] == pytest.approx(20.0)
+
+
+@pytest.mark.asyncio
+async def test_known_device_warm_starts_from_stored_profile(tmp_path):
+    path = tmp_path / "profiles.sqlite3"
+    seeded = NodeProfileStore(path)
+    seeded.open()
+    # The stored offset is off on purpose, to tell it apart from measured ones
+    seeded.update("dev", latency_ms=12.5, tier=2, clock_offset=0.25, clock_skew_ppm=0.0)
+    seeded.close()
+
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=path)
+    host_task = asyncio.create_task(host.start())
+    server = host.network_server
+    while server._server is None:
+        await asyncio.sleep(0.01)
+    port = server._server.sockets[0].getsockname()[1]
+
+    client = HiveMindClient(host.session_manager.session_code, device_id="dev")
+    started = time.monotonic()
+    await client.connect("localhost", port)
+    # Sync state is usable as soon as the join completes, before any sync reply: the stored
+    # profile's, which the one sample pipelined in the join does not override
+    assert client.time_sync.synced and len(client.time_sync.samples) == 1
+    assert client.time_sync.offset == pytest.approx(0.25, abs=0.01)
+    assert time.monotonic() - started < 0.5
+    assert client.node_state["tier"] == 2
+    assert client.node_state["latency_ms"] == 12.5
+    assert host.bitrate_controller.tier_for("dev") == 2
+    assert host.session_manager.nodes["dev"]["latency_ms"] == 12.5
+    # No calibration round was scheduled for the known device
+    assert not any("_calibrate_node_latency" in repr(t.get_coro()) for t in host._tasks)
+    # Measured samples take over from the second one on
+    while len(client.time_sync.samples) < 2:
+        await asyncio.sleep(0.01)
+    assert client.time_sync.offset == pytest.approx(0.0, abs=0.01)
+
+    await client.disconnect()
+    await host.stop()
+    await host_task
+
+    stored = NodeProfileStore(path)
+    stored.open()
+    stored.close()
+    assert stored.get("dev")["joins"] == 1
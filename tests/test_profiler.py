@@ -0,0 +1,89 @@
+import asyncio
+import threading
+
+import pytest
+import websockets
+
+import hivemind.host.network_server as network_server
+from helpers import spin, start_host
+from hivemind.host.profiler import IDLE, LOOP_THREAD, SamplingProfiler
+from hivemind.node.client import HiveMindClient
+from host_main import HiveMindHostEnhanced
+
+LOUD = b"\xe8\x03" * 960 * 2
+
+
+def test_stacks_are_collapsed_per_thread_and_overhead_is_capped():
+    worker = threading.Thread(target=spin, args=(0.3,), name="capture")
+    worker.start()
+    # Asks for far more samples than the overhead cap allows
+    profiler = SamplingProfiler(hz=10000, max_overhead=0.01).profile(0.25)
+    worker.join()
+
+    lines = profiler.collapsed().splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert stack.startswith("capture;") and stack.endswith("helpers.py:spin")
+    assert int(count) == profiler.threads["capture"]
+    assert profiler.samples < 0.25 * 10000
+    assert profiler.overhead < 0.02
+
+
+@pytest.mark.asyncio
+async def test_loop_time_is_charged_to_coroutines(monkeypatch):
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:")
+    task, port = await start_host(host)
+    client = HiveMindClient(host.session_manager.session_code, device_id="dev")
+    await client.connect("localhost", port)
+
+    # Make both the audio path and frame parsing measurably busy
+    distribute = host._distribute_chunk
+
+    async def slow_distribute(chunk, schedule_info):
+        spin(0.005)
+        await distribute(chunk, schedule_info)
+
+    host._distribute_chunk = slow_distribute
+    decode = network_server.decode_frame
+    monkeypatch.setattr(network_server, "decode_frame", lambda raw: spin(0.005) or decode(raw))
+
+    profiler = SamplingProfiler(asyncio.get_running_loop(), threading.get_ident(), hz=500, max_overhead=0.05)
+    profiler.start()
+    async with websockets.connect(f"ws://localhost:{port}") as ws:
+        for _ in range(25):
+            host.audio_capture.push_chunk(LOUD)
+            await ws.send('{"type": "heartbeat"}')
+            await asyncio.sleep(0.02)
+    profiler.stop()
+
+    loop = profiler.report()["loop"]
+    assert loop["HiveMindHostEnhanced._audio_distribution_loop"] > 0.05
+    assert loop["NetworkServer._handler"] > 0.05
+    assert loop[IDLE] > 0.1
+    assert sum(loop.values()) == pytest.approx(1.0)
+    assert any(line.startswith(LOOP_THREAD + ";") and "slow_distribute" in line
+               for line in profiler.collapsed().splitlines())
+
+    await client.disconnect()
+    await host.stop()
+    await task
+
+
+def test_dashboard_profile_endpoint():
+    pytest.importorskip("flask")
+    import app as dashboard
+
+    client = dashboard.app.test_client()
+    # Stacks and thread names are not for every dashboard visitor
+    assert not dashboard.app.config["PROFILE_ENDPOINT"]
+    assert client.get("/debug/profile?seconds=0.1").status_code == 404
+
+    dashboard.app.config["PROFILE_ENDPOINT"] = True
+    try:
+        r = client.get("/debug/profile?seconds=0.1")
+        assert r.status_code == 200 and r.mimetype == "text/plain"
+        report = client.get("/debug/profile?seconds=0.1&hz=50&format=json").get_json()
+        assert report["samples"] > 0 and set(report) >= {"loop", "threads", "stacks", "overhead"}
+        assert client.get("/debug/profile?seconds=3600").status_code == 400
+    finally:
+        dashboard.app.config["PROFILE_ENDPOINT"] = False
@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import pytest
+import websockets
+
+from hivemind.common.protocol import (
+    AUTH_FAILED,
+    SERIALIZERS,
+    Protocol,
+    decode_frame,
+    get_serializer,
+    negotiate_serializer,
+)
+from hivemind.common.session_auth import authenticate
+from host_main import HiveMindHostEnhanced
+
+
+@pytest.mark.parametrize("name", list(SERIALIZERS))
+def test_serializer_roundtrip_keeps_audio_bytes(name):
+    serializer = SERIALIZERS[name]
+    msg = Protocol.create_audio_chunk(play_at=1.5, sample_rate=48000, channels=2, audio_data=b"\x00\x01\xff")
+    decoded = decode_frame(serializer.dumps(msg))
+    assert decoded["type"] == "audio_chunk"
+    assert decoded["play_at"] == 1.5
+    # JSON formats carry bytes as base64 text, msgpack keeps them raw
+    if serializer.binary:
+        assert decoded["audio_data"] == b"\x00\x01\xff"
+    else:
+        assert decoded["audio_data"] == "AAH/"
+
+
+@pytest.mark.parametrize("name", list(SERIALIZERS))
+def test_fixed_messages_are_built_and_encoded_once(name):
+    serializer = SERIALIZERS[name]
+    reject = Protocol.create_join_reject(AUTH_FAILED)
+    assert reject is Protocol.create_join_reject(AUTH_FAILED)
+    frame = serializer.dumps(reject)
+    assert serializer.dumps(reject) is frame
+    assert decode_frame(frame) == {"type": "join_reject", "reason": AUTH_FAILED}
+    with pytest.raises(TypeError):
+        reject["reason"] = "changed"
+    # With a variable field it is an ordinary message
+    assert Protocol.create_join_reject(AUTH_FAILED, retry_after=2.0) == {
+        "type": "join_reject", "reason": AUTH_FAILED, "retry_after": 2.0}
+
+
+def test_negotiation_prefers_host_order_and_falls_back_to_json():
+    assert negotiate_serializer(None) == "json"
+    assert negotiate_serializer(["bogus"]) == "json"
+    assert negotiate_serializer(["json", *SERIALIZERS]) == next(iter(SERIALIZERS))
+    assert get_serializer("bogus") is get_serializer("json")
+
+
+@pytest.mark.asyncio
+async def test_join_handshake_switches_connection_format():
+    pytest.importorskip("msgpack")
+    host = HiveMindHostEnhanced(port=0, enable_web_dashboard=False)
+    server = host.network_server
+    task = asyncio.create_task(server.start())
+    while server._server is None:
+        await asyncio.sleep(0.01)
+    port = server._server.sockets[0].getsockname()[1]
+
+    async with websockets.connect(f"ws://localhost:{port}") as ws:
+        accept, _ = await authenticate(ws, host.session_manager.session_code, {
+            "type": "join_request",
+            "payload": {"device_id": "dev-1", "device_name": "Dev", "metadata": {},
+                        "serializers": ["msgpack", "json"]},
+        }, "dev-1")
+        assert isinstance(accept, str)
+        assert json.loads(accept)["serializer"] == "msgpack"
+
+        await ws.send(SERIALIZERS["msgpack"].dumps({"type": "heartbeat", "payload": {"device_id": "dev-1"}}))
+        ack = await asyncio.wait_for(ws.recv(), timeout=2.0)
+        assert isinstance(ack, bytes)
+        assert decode_frame(ack) == {"type": "heartbeat", "device_id": "dev-1"}
+
+    await server.stop()
+    await task
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import pytest
+
+from hivemind.host.session_manager import SessionManager
+from hivemind.node.client import HiveMindClient
+from host_main import HiveMindHostEnhanced
+
+
+def test_resume_requires_matching_token():
+    sm = SessionManager()
+    assert sm.accept_node("dev", "Dev", {})
+    token = sm.nodes["dev"]["resume_token"]
+    assert not sm.accept_node("dev", "Dev", {})
+    assert not sm.resume_node("dev", "wrong")
+    assert not sm.resume_node("other", token)
+    assert sm.resume_node("dev", token)
+    assert sm.nodes["dev"]["resumes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_node_resumes_session_after_connection_drop():
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:")
+    host_task = asyncio.create_task(host.start())
+    server = host.network_server
+    while server._server is None:
+        await asyncio.sleep(0.01)
+    port = server._server.sockets[0].getsockname()[1]
+
+    async def feed():
+        chunk = b"\xe8\x03" * 960 * 2  # quiet, but not silence (which DTX would not send)
+        while True:
+            host.audio_capture.push_chunk(chunk)
+            await asyncio.sleep(0.02)
+
+    feeder = asyncio.create_task(feed())
+    played = []
+    client = HiveMindClient(host.session_manager.session_code, device_id="dev",
+                            sink=lambda seq, play_at, pcm, local: played.append((seq, time.time())))
+    await client.connect("localhost", port)
+    token = client.resume_token
+    assert token
+
+    while len(played) < 5:
+        await asyncio.sleep(0.02)
+    host.bitrate_controller.set_tier("dev", 2)
+    host.session_manager.update_node("dev", latency_ms=12.5)
+
+    # Simulate a Wi-Fi blip: the host side of the socket dies abruptly
+    dropped_at = time.time()
+    server.clients["dev"].ws.transport.abort()
+    while client.reconnects == 0:
+        assert time.time() - dropped_at < 1.0
+        await asyncio.sleep(0.01)
+    # Audible again once a frame scheduled after the reconnect reaches the output
+    resumed_sequence = host.audio_scheduler.sequence
+    while played[-1][0] < resumed_sequence:
+        await asyncio.sleep(0.01)
+    recovered_after = time.time() - dropped_at
+
+    assert recovered_after < 1.0
+    assert client.resume_token == token
+    assert client.node_state["tier"] == 2
+    assert client.node_state["latency_ms"] == 12.5
+    assert client.node_state["clock"]["samples"] >= 1
+    assert list(host.session_manager.nodes) == ["dev"]
+    assert host.session_manager.nodes["dev"]["resumes"] == 1
+    # Resumed by proving the session key, without a new handshake
+    assert host.session_manager.nodes["dev"]["resume_counter"] == 1
+
+    feeder.cancel()
+    await client.disconnect()
+    await host.stop()
+    await host_task
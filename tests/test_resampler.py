@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from hivemind.common.resampler import AudioConverter, Resampler, float_to_pcm, mix_matrix, pcm_to_float
+from hivemind.host.audio_capture import AudioCapture
+
+
+def _sine(freq, rate, seconds=0.5, channels=1):
+    t = np.arange(int(rate * seconds)) / rate
+    return np.repeat(np.sin(2 * np.pi * freq * t)[:, None], channels, axis=1).astype(np.float32)
+
+
+def test_chunked_stream_matches_one_shot_and_is_accurate():
+    x = _sine(1000.0, 44100, channels=2)
+    whole = Resampler(44100, 48000, 2).process(x)
+
+    streaming = Resampler(44100, 48000, 2)
+    sizes = [441, 17, 1000, 3, 2000]
+    parts, i = [], 0
+    while i < len(x):
+        n = sizes[len(parts) % len(sizes)]
+        parts.append(streaming.process(x[i:i + n]))
+        i += n
+    chunked = np.concatenate(parts)
+    assert chunked.shape == whole.shape
+    assert np.allclose(chunked, whole, atol=1e-6)
+
+    # Output is the input at 48 kHz, delayed by taps/2 input samples
+    n = np.arange(len(whole))
+    ideal = np.sin(2 * np.pi * 1000.0 * (n / 48000 - 16 / 44100))
+    assert np.max(np.abs(whole[64:, 0] - ideal[64:])) < 1e-3
+    assert len(whole) == pytest.approx(len(x) * 48000 / 44100, abs=32)
+
+
+def test_downsampling_rejects_content_above_new_nyquist():
+    out = Resampler(48000, 22050, 1).process(_sine(16000.0, 48000))
+    assert np.max(np.abs(out[64:])) < 0.05
+
+
+def test_channel_matrices():
+    assert np.array_equal(mix_matrix(1, 2), [[1.0, 1.0]])
+    assert np.allclose(mix_matrix(2, 1), [[0.5], [0.5]])
+    five_one = mix_matrix(6, 2)
+    assert five_one[3].sum() == 0.0           # LFE dropped
+    assert five_one.sum(axis=0).max() <= 1.0  # no clipping at full scale
+
+
+def test_converter_handles_mono_44k_int16_to_pipeline_format():
+    conv = AudioConverter(44100, 1)
+    pcm = float_to_pcm(_sine(440.0, 44100) * 0.5)
+    out = pcm_to_float(conv.process(pcm) + float_to_pcm(conv.flush_float()), 2)
+    assert out.shape[1] == 2
+    assert np.array_equal(out[:, 0], out[:, 1])
+    assert len(out) == pytest.approx(24000 + 16 * 48000 / 44100, abs=2)  # plus the filter delay
+    assert np.max(np.abs(out)) == pytest.approx(0.5, abs=0.01)
+    assert AudioConverter(48000, 2).process(b"\x01\x00\x02\x00") == b"\x01\x00\x02\x00"
+
+
+def test_capture_converts_native_device_format():
+    capture = AudioCapture(sample_rate=44100, channels=1)
+    pcm = float_to_pcm(_sine(440.0, 44100, seconds=0.1) * 0.5)
+    total = 0
+    for i in range(0, len(pcm), 882):
+        capture.push_chunk(pcm[i:i + 882])
+    while (chunk := capture.get_chunk(timeout=0)) is not None:
+        assert len(chunk) % 4 == 0
+        total += len(chunk) // 4
+    assert total == pytest.approx(4800, abs=20)
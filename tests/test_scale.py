@@ -0,0 +1,70 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+from hivemind.host import network_server
+from hivemind.host.network_server import NetworkServer, WSClient
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _load_test_script():
+    spec = importlib.util.spec_from_file_location("load_test", ROOT / "scripts" / "load_test.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_ws_client_has_no_instance_dict():
+    client = WSClient(ws=None, addr="1.2.3.4:5", server=None)
+    assert not hasattr(client, "__dict__")
+
+
+class _Transport:
+    def __init__(self, backlog):
+        self.backlog = backlog
+        self.written = []
+
+    def is_closing(self):
+        return False
+
+    def get_write_buffer_size(self):
+        return self.backlog
+
+    def write(self, data):
+        self.written.append(data)
+
+
+class _Socket:
+    def __init__(self, backlog):
+        self.transport = _Transport(backlog)
+        self.protocol = type("Protocol", (), {"extensions": [], "state": network_server._OPEN})()
+
+
+@pytest.mark.asyncio
+async def test_frames_dropped_for_backpressure_are_not_counted_as_sent():
+    server = NetworkServer(port=0, max_send_buffer_bytes=1000)
+    keeping_up = WSClient(_Socket(0), "1.2.3.4:5", server)
+    behind = WSClient(_Socket(5000), "1.2.3.4:6", server)
+    await server.send_to([keeping_up, behind], {"type": "audio_chunk"})
+
+    metrics = server.get_metrics()
+    assert metrics["shared_writes"] == 1 and metrics["dropped_backpressure"] == 1
+    assert metrics["fallback_sends"] == 0
+    assert metrics["bytes_sent"] == len(keeping_up.ws.transport.written[0])
+    assert behind.ws.transport.written == []
+
+
+@pytest.mark.asyncio
+async def test_fanout_to_many_listeners_shares_frames():
+    load_test = _load_test_script()
+    stats, server = await load_test.run_in_process(connections=200, chunks=25, chunk_ms=40)
+
+    assert stats["received"] == stats["expected"] == 200 * 25
+    # Framed once per chunk, written to every socket without the per-connection send path
+    metrics = server.get_metrics()
+    assert metrics["shared_frames"] == 25
+    assert metrics["shared_writes"] == 200 * 25
+    assert metrics["fallback_sends"] == 0
+    assert stats["p99_ms"] < 500
@@ -0,0 +1,237 @@
+import asyncio
+import json
+import time
+
+import pytest
+import websockets
+
+from helpers import start_host
+from hivemind.common.protocol import AUTH_FAILED, AUTH_LOCKED, Protocol
+from hivemind.common.session_auth import (
+    _P, ClientHandshake, HostHandshake, _in_subgroup, authenticate, resume_proof,
+)
+from hivemind.host.session_manager import SessionManager
+from hivemind.node.client import HiveMindClient
+from host_main import HiveMindHostEnhanced
+
+
+def _join(device_id):
+    return {"type": "join_request", "payload": {"device_id": device_id, "device_name": device_id, "metadata": {}}}
+
+
+def test_handshake_agrees_only_on_the_same_code():
+    node = ClientHandshake("HM-1234", "dev")
+    host = HostHandshake("HM-1234", "dev", node.hello())
+    # Nothing in the challenge to test a guess against: the node proves the code first
+    assert set(host.challenge()) == {"Y"}
+    assert host.verify(node.respond(host.challenge()))
+    node.check(host.confirm())
+    assert node.host_confirmed and node.key == host.key
+
+    node = ClientHandshake("HM-1235", "dev")
+    host = HostHandshake("HM-1234", "dev", node.hello())
+    assert not host.verify(node.respond(host.challenge()))
+    with pytest.raises(ValueError):
+        host.confirm()
+    with pytest.raises(ValueError):
+        node.check({"confirm": "00" * 32})
+
+    # A share outside the prime-order subgroup is refused, however it is masked
+    for value in (2, 3, _P - 2, int(node.hello()["X"], 16)):
+        assert _in_subgroup(value) == (pow(value, (_P - 1) // 2, _P) == 1)
+    node = ClientHandshake("HM-1234", "dev")
+    node.hello()
+    with pytest.raises(ValueError, match="not in the group"):
+        HostHandshake("HM-1234", "dev", {"X": format(_P - 2, "x")})
+    with pytest.raises(ValueError, match="not in the group"):
+        node.respond({"Y": format(_P - 2, "x")})
+
+
+def test_resume_proof_cannot_be_replayed():
+    sm = SessionManager()
+    sm.accept_node("dev", "Dev", {})
+    key = b"k" * 32
+    sm.update_node("dev", session_key=key.hex(), resume_counter=0)
+    proof = {"counter": 1, "proof": resume_proof(key, "dev", 1)}
+    assert sm.verify_resume("dev", proof) == key
+    assert sm.verify_resume("dev", proof) is None
+    assert sm.verify_resume("dev", {"counter": 2, "proof": resume_proof(b"x" * 32, "dev", 2)}) is None
+
+
+@pytest.mark.asyncio
+async def test_wrong_code_is_rejected_and_failures_lock_out_joins():
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:")
+    task, port = await start_host(host)
+
+    client = HiveMindClient("HM-9999", device_id="dev")
+    with pytest.raises(ConnectionError, match=AUTH_FAILED):
+        await client.connect("localhost", port)
+
+    # A peer that ignores the host's proof and guesses the confirmation
+    reasons = []
+    for n in range(12):
+        async with websockets.connect(f"ws://localhost:{port}") as ws:
+            handshake = ClientHandshake("HM-9999", f"guess-{n}")
+            message = _join(f"guess-{n}")
+            message["payload"]["auth"] = handshake.hello()
+            await ws.send(json.dumps(message))
+            reply = json.loads(await ws.recv())
+            if reply["type"] == "join_challenge":
+                await ws.send(json.dumps(Protocol.create_join_confirm({"confirm": "00" * 32})))
+                reply = json.loads(await ws.recv())
+            reasons.append(reply["reason"])
+    # The node's wrong code above was the first of ten failures allowed
+    assert reasons[:9] == [AUTH_FAILED] * 9
+    assert reasons[-1] == AUTH_LOCKED
+    assert not host.session_manager.nodes
+
+    await host.stop()
+    await task
+
+
+@pytest.mark.asyncio
+async def test_unanswered_challenges_count_as_failed_guesses():
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:")
+    task, port = await start_host(host)
+    uri = f"ws://localhost:{port}"
+    # A proven join costs nothing
+    async with websockets.connect(uri) as ws:
+        reply, _ = await authenticate(ws, host.session_manager.session_code, _join("dev"), "dev")
+        assert json.loads(reply)["type"] == "join_accept"
+    assert host._failed_joins.tokens("127.0.0.1") == 10
+
+    # Taking challenges and hanging up without a proof still spends the address's failure budget
+    async def challenge(n, local_addr):
+        async with websockets.connect(uri, local_addr=(local_addr, 0)) as ws:
+            handshake = ClientHandshake("HM-9999", f"guess-{n}")
+            message = _join(f"guess-{n}")
+            message["payload"]["auth"] = handshake.hello()
+            await ws.send(json.dumps(message))
+            return json.loads(await ws.recv())
+
+    replies = [await challenge(n, "127.0.0.1") for n in range(11)]
+    assert [r["type"] for r in replies[:10]] == ["join_challenge"] * 10
+    assert replies[-1] == {"type": "join_reject", "reason": AUTH_LOCKED}
+
+    # ...but not anyone else's
+    assert (await challenge(11, "127.0.0.2"))["type"] == "join_challenge"
+    async with websockets.connect(uri, local_addr=("127.0.0.2", 0)) as ws:
+        reply, _ = await authenticate(ws, host.session_manager.session_code, _join("dev2"), "dev2")
+        assert json.loads(reply)["type"] == "join_accept"
+
+    await host.stop()
+    await task
+
+
+@pytest.mark.asyncio
+async def test_node_refuses_a_host_that_does_not_prove_the_code():
+    async def impostor(ws):
+        request = json.loads(await ws.recv())
+        handshake = HostHandshake("HM-0001", "dev", request["payload"]["auth"])
+        await ws.send(json.dumps(Protocol.create_join_challenge(handshake.challenge())))
+        await ws.recv()
+        # Accepts without its own proof, which it could not have made
+        await ws.send(json.dumps(Protocol.create_join_accept("dev", {"node_count": 1})))
+        await ws.wait_closed()
+
+    async with websockets.serve(impostor, "localhost", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        client = HiveMindClient("HM-1234", device_id="dev")
+        with pytest.raises(ConnectionError, match="Host failed authentication"):
+            await client.connect("localhost", port)
+        assert client.session_info == {}
+
+
+@pytest.mark.asyncio
+async def test_resuming_node_refuses_a_host_without_its_session_key():
+    async def impostor(ws):
+        await ws.recv()
+        # Accepts the resume outright, without answering the node's proof
+        await ws.send(json.dumps(Protocol.create_join_accept("dev", {"node_count": 1}, resumed=True,
+                                                             resume_confirm="00" * 32)))
+        await ws.wait_closed()
+
+    async with websockets.serve(impostor, "localhost", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        client = HiveMindClient("HM-1234", device_id="dev")
+        client.resume_token, client._session_key = "token", b"k" * 32
+        with pytest.raises(ConnectionError, match="Host failed authentication"):
+            await client.connect("localhost", port)
+        assert client.session_info == {}
+
+
+@pytest.mark.asyncio
+async def test_broadcasts_reach_each_joined_client_once():
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:")
+    task, port = await start_host(host)
+    uri = f"ws://localhost:{port}"
+    async with websockets.connect(uri) as joined, websockets.connect(uri) as stranger:
+        reply, _ = await authenticate(joined, host.session_manager.session_code, _join("dev"), "dev")
+        assert json.loads(reply)["type"] == "join_accept"
+
+        await host.network_server.broadcast(Protocol.create_schedule_message("a.wav", 0.0))
+        chunk = b"\x00\x00" * 960 * 2
+        await host._distribute_chunk(chunk, host.audio_scheduler.schedule_chunk(chunk))
+
+        received = []
+        while True:
+            try:
+                received.append(json.loads(await asyncio.wait_for(joined.recv(), 0.2))["type"])
+            except asyncio.TimeoutError:
+                break
+        assert received == ["schedule_track", "audio_chunk"]
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(stranger.recv(), 0.2)
+
+    await host.stop()
+    await task
+
+
+@pytest.mark.asyncio
+async def test_encrypted_audio_is_sealed_once_per_frame():
+    pytest.importorskip("cryptography")
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:", encrypt_audio=True)
+    task, port = await start_host(host)
+    seals = []
+    seal = host.room_cipher.seal
+    host.room_cipher.seal = lambda *args: seals.append(args[1]) or seal(*args)
+
+    played = {"a": [], "b": []}
+    clients = [HiveMindClient(host.session_manager.session_code, device_id=name,
+                              sink=lambda seq, play_at, pcm, local, name=name: played[name].append(pcm))
+               for name in played]
+    for client in clients:
+        await client.connect("localhost", port)
+
+    async with websockets.connect(f"ws://localhost:{port}") as ws:
+        # Joined without being able to decrypt: refused outright
+        message = _join("legacy")
+        reply, _ = await authenticate(ws, host.session_manager.session_code, message, "legacy")
+        assert json.loads(reply)["reason"] == "Node cannot decrypt audio"
+
+    chunk = bytes(range(256)) * 15
+    for _ in range(5):
+        host.audio_capture.push_chunk(chunk)
+        await asyncio.sleep(0.02)
+    deadline = time.monotonic() + 5.0
+    while min(len(v) for v in played.values()) < 5:
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.02)
+
+    assert played["a"][:5] == [chunk] * 5 and played["b"][:5] == [chunk] * 5
+    # Two listeners, one seal per frame
+    assert len(seals) == len(set(seals))
+    assert all(client.undecryptable == 0 for client in clients)
+    # In an encrypted room, an unsealed frame is not the host's
+    clients[0]._handle_audio_chunk(Protocol.create_audio_chunk(
+        play_at=host.host_clock() + 1.0, sample_rate=48000, channels=2, audio_data=chunk, sequence=10 ** 6))
+    assert clients[0].undecryptable == 1 and 10 ** 6 not in clients[0].buffer._seen
+
+    for client in clients:
+        await client.disconnect()
+    await host.stop()
+    await task
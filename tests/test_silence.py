@@ -0,0 +1,117 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+import websockets
+
+from helpers import start_host
+from hivemind.common.session_auth import authenticate
+from hivemind.host.silence import MARK, SEND, SKIP, SilenceDetector, peak
+from hivemind.node.client import HiveMindClient
+from host_main import HiveMindHostEnhanced
+
+LOUD = b"\xe8\x03" * 960 * 2
+SILENT = b"\x00\x00" * 960 * 2
+
+
+def test_silence_starts_after_the_hangover_and_is_re_announced():
+    detector = SilenceDetector(threshold_dbfs=-60.0, hangover_ms=40, refresh_ms=100)
+    assert peak(b"\x00\x80" + b"\x00\x00") == 32768
+    assert detector.update(LOUD, 0.02) == SEND
+    actions = [detector.update(SILENT, 0.02) for _ in range(12)]
+    assert actions == [SEND, SEND, MARK, SKIP, SKIP, SKIP, SKIP, MARK, SKIP, SKIP, SKIP, SKIP]
+    assert detector.update(LOUD, 0.02) == SEND and not detector.silent
+    assert detector.skipped == 10
+
+
+@pytest.mark.asyncio
+async def test_idle_host_sends_markers_instead_of_audio():
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:")
+    task, port = await start_host(host)
+
+    # No node joined: nothing is scheduled or encoded, and what was captured is dropped
+    for _ in range(5):
+        host.audio_capture.push_chunk(LOUD)
+    await asyncio.sleep(0.2)
+    assert host.audio_scheduler.sequence == 0 and host.tier_encoders.stream_count() == 0
+
+    async with websockets.connect(f"ws://localhost:{port}") as ws:
+        message = {"type": "join_request", "payload": {"device_id": "dev", "device_name": "dev", "metadata": {}}}
+        reply, _ = await authenticate(ws, host.session_manager.session_code, message, "dev")
+        assert json.loads(reply)["type"] == "join_accept"
+
+        received = []
+
+        async def receive():
+            async for raw in ws:
+                msg = json.loads(raw)
+                if msg["type"] in ("audio_chunk", "silence"):
+                    received.append(msg)
+
+        receiver = asyncio.create_task(receive())
+        # Paced like a capture device, so the timeline is never re-anchored
+        next_at = time.monotonic()
+        for chunk in [LOUD] * 5 + [SILENT] * 80 + [LOUD] * 3:
+            host.audio_capture.push_chunk(chunk)
+            next_at += 0.02
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+        while len(received) < 20:
+            await asyncio.sleep(0.02)
+        receiver.cancel()
+
+    types = [m["type"] for m in received]
+    hangover = 10  # 200 ms of 20 ms chunks
+    assert types == ["audio_chunk"] * (5 + hangover) + ["silence"] * 2 + ["audio_chunk"] * 3
+    first, second = (m for m in received if m["type"] == "silence")
+    # Announced one refresh (50 chunks) ahead, and re-announced after it
+    assert (first["until"], second["until"]) == (15 + 51, 65 + 51)
+    # The timeline ran on through the gap
+    last_before, first_after = received[5 + hangover - 1], received[-3]
+    assert first_after["sequence"] == 85
+    assert first_after["play_at"] == pytest.approx(last_before["play_at"] + 71 * 0.02)
+
+    await host.stop()
+    await task
+
+
+async def _listen_to_demo(host, web):
+    while host.network_server._server is None:
+        await asyncio.sleep(0.01)
+    played = []
+    client = HiveMindClient(host.session_manager.session_code, device_id="dev",
+                            sink=lambda seq, play_at, pcm, local: played.append(seq))
+    await client.connect("localhost", host.network_server._server.sockets[0].getsockname()[1])
+
+    assert web.post("/api/demo/start", json={"duration": 0.5}).get_json() == {"ok": True}
+    assert web.post("/api/demo/start", json={}).get_json()["reason"] == "demo already running"
+    deadline = time.monotonic() + 5.0
+    while "demo" in host.mixer.sources or len(played) < 10:
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.02)
+    # Sequenced by the scheduler like captured audio, so the node plays it; then it ends on its own
+    assert played == list(range(played[0], played[0] + len(played)))
+    assert web.post("/api/demo/stop").get_json()["reason"] == "demo not running"
+    await client.disconnect()
+
+
+def test_dashboard_demo_plays_through_the_audio_path():
+    pytest.importorskip("flask")
+    import app as dashboard
+
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:")
+    dashboard._host_state["host"] = host
+    thread = threading.Thread(target=dashboard._run_host, args=(host,), daemon=True)
+    thread.start()
+    try:
+        while dashboard._host_state["loop"] is None:
+            time.sleep(0.01)
+        asyncio.run(_listen_to_demo(host, dashboard.app.test_client()))
+    finally:
+        # The host's loop ends with start(), which returns while stop() is still finishing
+        asyncio.run_coroutine_threadsafe(host.stop(), dashboard._host_state["loop"])
+        thread.join(10)
+        dashboard._host_state["host"] = None
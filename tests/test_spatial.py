@@ -0,0 +1,101 @@
+import asyncio
+import base64
+import json
+
+import numpy as np
+import pytest
+import websockets
+
+from hivemind.common.session_auth import authenticate
+from hivemind.host.spatial import SpatialLayout
+from host_main import HiveMindHostEnhanced
+
+
+def _stereo(left, right, frames=960):
+    return np.tile(np.array([left, right], dtype=np.int16), frames).tobytes()
+
+
+def _channels(pcm):
+    return np.frombuffer(pcm, dtype=np.int16).reshape(-1, 2)
+
+
+def test_layout_validates_and_renders_maps():
+    layout = SpatialLayout()
+    pcm = _stereo(1000, 3000)
+    assert layout.render(None, pcm) is pcm
+    assert np.all(_channels(layout.render("left", pcm)) == [1000, 1000])
+    assert np.all(_channels(layout.render("mono", pcm)) == [2000, 2000])
+    assert np.all(_channels(layout.render(layout.parse_map([[0, 1], [1, 0]]), pcm)) == [3000, 1000])
+
+    with pytest.raises(ValueError):
+        layout.set_node("a", "bogus")
+    with pytest.raises(ValueError):
+        layout.set_node("a", "left", delay_ms=-1)
+    with pytest.raises(ValueError):
+        layout.parse_map([[1, 0, 0]])
+    assert layout.set_node("a", "left", delay_ms=12) == {"channel_map": "left", "delay_ms": 12.0}
+    layout.set_node("a", "stereo")
+    assert layout.placements == {}
+
+
+@pytest.mark.asyncio
+async def test_each_channel_map_is_rendered_and_encoded_once():
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:")
+    server = host.network_server
+    task = asyncio.create_task(server.start())
+    while server._server is None:
+        await asyncio.sleep(0.01)
+    uri = f"ws://localhost:{server._server.sockets[0].getsockname()[1]}"
+
+    placements = {"l1": ("left", 0), "l2": ("left", 25), "r": ("right", 0), "s": ("stereo", 0)}
+    sockets = {}
+    for device_id, (channel_map, delay_ms) in placements.items():
+        ws = sockets[device_id] = await websockets.connect(uri)
+        reply, _ = await authenticate(ws, host.session_manager.session_code, {
+            "type": "join_request",
+            "payload": {"device_id": device_id, "device_name": device_id, "metadata": {}},
+        }, device_id)
+        assert json.loads(reply)["type"] == "join_accept"
+        host.spatial.set_node(device_id, channel_map, delay_ms=delay_ms)
+
+    renders = []
+    render = host.spatial.render
+    host.spatial.render = lambda key, pcm: renders.append(key) or render(key, pcm)
+    chunk = _stereo(1000, 3000)
+    await host._distribute_chunk(chunk, host.audio_scheduler.schedule_chunk(chunk))
+
+    received = {}
+    for device_id, ws in sockets.items():
+        msg = json.loads(await asyncio.wait_for(ws.recv(), 1.0))
+        received[device_id] = (msg["play_at"], _channels(base64.b64decode(msg["audio_data"]))[0].tolist())
+        await ws.close()
+    await server.stop()
+    await task
+
+    assert sorted(renders, key=str) == sorted([None, "left", "right"], key=str)
+    assert host.tier_encoders.stream_count() == 3
+    assert received["l1"][1] == received["l2"][1] == [1000, 1000]
+    assert received["r"][1] == [3000, 3000]
+    assert received["s"][1] == [1000, 3000]
+    assert received["l2"][0] - received["l1"][0] == pytest.approx(0.025, abs=1e-6)
+
+
+def test_dashboard_api_sets_node_placement():
+    pytest.importorskip("flask")
+    import app as dashboard
+
+    host = HiveMindHostEnhanced(port=0, enable_web_dashboard=False, profile_path=":memory:")
+    host.session_manager.accept_node("dev", "Kitchen", {})
+    dashboard._host_state["host"] = host
+    try:
+        client = dashboard.app.test_client()
+        r = client.post("/api/nodes/dev/spatial", json={"channel_map": "surround", "delay_ms": 8})
+        assert r.get_json() == {"ok": True, "channel_map": "surround", "delay_ms": 8.0}
+        assert client.post("/api/nodes/dev/spatial", json={"channel_map": "nope"}).status_code == 400
+        nodes = client.get("/api/nodes").get_json()
+        assert nodes["nodes"] == [{"device_id": "dev", "name": "Kitchen", "tier": 0,
+                                   "channel_map": "surround", "delay_ms": 8.0}]
+        assert "surround" in nodes["channel_maps"]
+    finally:
+        dashboard._host_state["host"] = None
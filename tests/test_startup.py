@@ -0,0 +1,54 @@
+"""Cold-start checks for the host, node and dashboard processes.
+
+Each entry point is imported in a fresh interpreter; the test fails if the
+import pulls in subsystems that entry point must only load on demand. Those
+are what made imports slow, and unlike a wall-clock budget, their absence
+does not depend on how busy the machine running the tests is.
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# module -> modules that must not be loaded by the import
+DEFERRED = {
+    "app": ["host_main", "websockets", "opuslib", "hivemind.host.network_server"],
+    "host_main": ["websockets", "opuslib", "flask", "numpy", "cryptography", "hivemind.host.web_dashboard"],
+    "node_main": ["opuslib", "flask", "host_main"],
+    "hivemind": ["websockets", "opuslib", "hivemind.node.client"],
+}
+
+_PROBE = """
+import json, sys
+import {module}
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def _cold_import(module):
+    out = subprocess.run([sys.executable, "-c", _PROBE.format(module=module)], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    return set(json.loads(out.stdout.strip().splitlines()[-1]))
+
+
+@pytest.mark.parametrize("module", list(DEFERRED))
+def test_cold_import_defers_heavy_modules(module):
+    if module == "app":
+        pytest.importorskip("flask")
+    loaded = _cold_import(module)
+    assert module in loaded
+    assert not [m for m in DEFERRED[module] if m in loaded]
+
+
+def test_host_defers_codec_until_first_join():
+    from host_main import HiveMindHostEnhanced
+
+    host = HiveMindHostEnhanced(port=0)
+    assert host._codec_manager is None
+    assert host._metrics is None
+    assert host.tier_encoders.active_tiers() == []
+    assert host.web_dashboard is None
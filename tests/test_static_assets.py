@@ -0,0 +1,59 @@
+import gzip
+
+import pytest
+
+from hivemind.host.static_assets import AssetPipeline
+
+
+def _site(tmp_path, script="let a = 1;"):
+    static = tmp_path / "static"
+    static.mkdir(exist_ok=True)
+    (static / "styles.css").write_text("body { color: #222 }\n" * 50)
+    (static / "script.js").write_text(script)
+    (static / "logo.png").write_bytes(b"\x89PNG" + bytes(range(256)))
+    page = tmp_path / "index.html"
+    page.write_text('<link rel="stylesheet" href="/static/styles.css">\n<img src="/static/logo.png">\n'
+                    '<script src="/static/script.js"></script>\n')
+    return str(static), str(page)
+
+
+def test_assets_are_fingerprinted_compressed_and_inlined_within_budget(tmp_path):
+    pipeline = AssetPipeline(*_site(tmp_path, 'document.write("</script>");')).build()
+    css = pipeline.assets[pipeline.urls["styles.css"].rsplit("/", 1)[1]]
+    assert css.hashed_name == f"styles.{css.digest}.css"
+    assert gzip.decompress(css.bodies["gzip"]) == css.bodies["identity"]
+    # Incompressible files are stored as they are
+    assert list(pipeline.assets[pipeline.urls["logo.png"][8:]].bodies) == ["identity"]
+
+    page = pipeline.page.bodies["identity"].decode()
+    assert pipeline.inlined == ["styles.css", "script.js"]
+    assert "<style>body { color: #222 }" in page and '<script>document.write("<\\/script>");</script>' in page
+    assert f'src="{pipeline.urls["logo.png"]}"' in page and "/static/" not in page
+
+    # Over the inline budget: linked under the hashed name instead
+    tight = AssetPipeline(*_site(tmp_path, "x" * 4000), inline_bytes=css.size).build()
+    assert tight.inlined == ["styles.css"]
+    assert f'<script src="{tight.urls["script.js"]}"></script>' in tight.page.bodies["identity"].decode()
+    assert tight.urls["script.js"] != pipeline.urls["script.js"]
+
+
+def test_dashboard_loads_in_one_cacheable_request():
+    pytest.importorskip("flask")
+    import app as dashboard
+
+    client = dashboard.app.test_client()
+    r = client.get("/", headers={"Accept-Encoding": "gzip, br;q=0"})
+    assert r.status_code == 200 and r.headers["Content-Encoding"] == "gzip"
+    assert r.headers["Cache-Control"] == "no-cache" and r.headers["Vary"] == "Accept-Encoding"
+    assert "/static/" not in gzip.decompress(r.data).decode()
+    assert client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": r.headers["ETag"]}).status_code == 304
+    plain = client.get("/")
+    assert "Content-Encoding" not in plain.headers and plain.headers["ETag"] != r.headers["ETag"]
+
+    url = dashboard._asset_pipeline().urls["script.js"]
+    r = client.get(url)
+    # Which of the two a platform maps .js to depends on its mimetypes tables
+    assert r.status_code == 200 and r.mimetype in ("text/javascript", "application/javascript")
+    assert r.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert client.get(url, headers={"If-None-Match": r.headers["ETag"]}).status_code == 304
+    assert client.get("/assets/script.000000000000.js").status_code == 404
@@ -0,0 +1,53 @@
+import pytest
+
+from hivemind.node.time_sync_client import TimeSyncClient
+from hivemind.sim import LinkConditions, NodeSpec, SyncHarness, SyncReport, VirtualClock
+
+
+def test_virtual_clock_inverts_offset_and_drift():
+    t = [1000.0]
+    clock = VirtualClock(offset_s=2.5, drift_ppm=100, base=lambda: t[0])
+    t[0] = 1010.0
+    local = clock()
+    assert local == pytest.approx(1010.0 + 2.5 + 10 * 100e-6)
+    assert clock.to_true(local) == pytest.approx(1010.0)
+
+
+def test_time_sync_prefers_lowest_rtt_sample():
+    now = [0.0]
+    sync = TimeSyncClient(clock=lambda: now[0])
+    # True offset is +5 s; the second exchange had asymmetric queuing delay
+    for sent, host, received in ((0.0, 5.010, 0.020), (1.0, 6.100, 1.110), (2.0, 7.004, 2.008)):
+        now[0] = received
+        sync.handle_response(host, sent)
+    assert sync.offset == pytest.approx(5.0)
+    assert sync.rtt == pytest.approx(0.008)
+
+
+def test_report_spread_and_convergence():
+    records = {
+        "a": [(0, 10.0, 10.050), (1, 10.02, 10.0201), (2, 10.04, 10.0401)],
+        "b": [(1, 10.02, 10.0203), (2, 10.04, 10.0398)],
+    }
+    report = SyncReport(records, {"a": 9.5, "b": 9.9}, {}, threshold_ms=5.0)
+    assert sorted(round(s, 3) for s in report.spread_ms()) == [0.2, 0.3]
+    assert report.convergence_s("a") == pytest.approx(10.0201 - 9.5)
+    assert report.summary()["compared_sequences"] == 2
+
+
+@pytest.mark.asyncio
+async def test_simulated_nodes_stay_within_sync_budget():
+    nodes = [
+        NodeSpec(clock=VirtualClock(offset_s=0.8, drift_ppm=40)),
+        NodeSpec(clock=VirtualClock(offset_s=-1.3, drift_ppm=-60), link=LinkConditions(delay_ms=3, seed=1)),
+        NodeSpec(clock=VirtualClock(offset_s=0.2), join_at=0.4),
+    ]
+    report = await SyncHarness(nodes).run(1.5)
+    summary = report.summary()
+
+    assert summary["compared_sequences"] > 10
+    # README promise: <50 ms across devices; on localhost it should be far tighter
+    assert summary["spread_p95_ms"] < 50.0
+    for node in summary["nodes"].values():
+        assert node["played"] > 0
+        assert node["convergence_s"] is not None
@@ -0,0 +1,75 @@
+from hivemind.common.protocol import JSON_SERIALIZER, Protocol
+from hivemind.config import SESSION_INFO_EVENTS
+from hivemind.host.session_manager import SessionManager
+from hivemind.host.timeline import CROSSFADE, START, STOP, VOLUME, Timeline
+
+
+def test_events_fire_in_start_order_and_cancel():
+    timeline = Timeline(clock=lambda: 0.0)
+    late = timeline.add(START, 3.0, "c")
+    first = timeline.add(START, 1.0, "a")
+    timeline.add(VOLUME, 2.0, "a", gain=0.5)
+    timeline.cancel(late.event_id)
+    assert [e.event_id for e in timeline.due(2.5)] == [first.event_id, first.event_id + 1]
+    assert not timeline.pending
+    assert timeline.due(10.0) == []
+
+
+def test_tracks_stay_listed_until_they_end_or_are_replaced():
+    timeline = Timeline(clock=lambda: 0.0)
+    timeline.add(START, 1.0, "a", duration=60.0)
+    timeline.add(CROSSFADE, 10.0, "b", duration=60.0, replaces="a", fade_ms=2000)
+    timeline.add(STOP, 30.0, "b", fade_ms=1000)
+    timeline.due(100.0)
+    assert [e["track_url"] for e in timeline.window(now=11.0)["events"]] == ["a", "b"]
+    assert [e["track_url"] for e in timeline.window(now=12.0)["events"]] == ["b"]
+    assert timeline.window(now=31.0)["total"] == 0
+
+
+def test_unfired_past_events_expire():
+    now = [0.0]
+    timeline = Timeline(clock=lambda: now[0])
+    timeline.add(START, 1.0, "a", duration=5.0)
+    timeline.add(START, 2.0, "b")
+    timeline.add(START, 20.0, "c")
+    now[0] = 10.0
+    assert timeline.expire() == 2
+    assert len(timeline) == 1
+
+
+def test_window_pages_through_every_event():
+    timeline = Timeline(clock=lambda: 0.0)
+    for i in range(25):
+        timeline.add(START, 100.0 - i, f"t{i}")
+    seen, after = [], None
+    while True:
+        page = timeline.window(limit=10, after_id=after)
+        seen += [e["start_at"] for e in page["events"]]
+        after = page["next"]
+        if after is None:
+            break
+    assert seen == sorted(100.0 - i for i in range(25))
+    assert page["total"] == 25
+
+
+def test_join_accept_size_is_constant_over_a_long_session():
+    sm = SessionManager(clock=lambda: 0.0)
+    sm.add_scheduled_track("a.wav", 10.0)
+    small = len(JSON_SERIALIZER.dumps(Protocol.create_join_accept("dev", sm.get_session_info())))
+    for i in range(5000):
+        sm.add_scheduled_track(f"track-{i:05d}.wav", 20.0 + i)
+    info = sm.get_session_info()
+    assert len(info["scheduled"]) == SESSION_INFO_EVENTS and info["scheduled_total"] == 5001
+    large = len(JSON_SERIALIZER.dumps(Protocol.create_join_accept("dev", info)))
+    assert large < small + SESSION_INFO_EVENTS * 200
+
+
+def test_replicated_timeline_restores_pending_events():
+    timeline = Timeline(clock=lambda: 0.0)
+    timeline.add(START, 1.0, "a", duration=5.0)
+    timeline.add(VOLUME, 2.0, "a", gain=0.25, ramp_ms=50)
+    timeline.due(1.5)
+    copy = Timeline(clock=lambda: 0.0)
+    copy.restore(timeline.snapshot())
+    assert copy.snapshot() == timeline.snapshot()
+    assert copy.add(STOP, 3.0, "a").event_id == 3
@@ -0,0 +1,107 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+from helpers import start_host
+from hivemind.common.protocol import JSON_SERIALIZER, decode_frame
+from hivemind.host.network_server import NetworkServer
+from hivemind.host.traffic_recorder import (
+    CLOSE,
+    CONNECT,
+    DROPPED,
+    INBOUND,
+    OUTBOUND,
+    TrafficRecorder,
+    read_records,
+)
+from hivemind.node.client import HiveMindClient
+from host_main import HiveMindHostEnhanced
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _load_replay():
+    spec = importlib.util.spec_from_file_location("replay_traffic", ROOT / "scripts" / "replay_traffic.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_log_round_trip_and_backlog_limit(tmp_path):
+    path = tmp_path / "t.hmrec"
+    rec = TrafficRecorder(path, flush_interval=60.0, max_pending_bytes=25)
+    rec.open()
+    rec.record(CONNECT, 1, "1.2.3.4:5")
+    rec.record(INBOUND, 1, '{"type": "x"}')
+    rec.record(OUTBOUND, 1, b"\x81\xa4type")   # over the backlog limit: dropped
+    rec.close()
+    records = list(read_records(path))
+    assert [(r.kind, r.conn, r.data) for r in records] == [(CONNECT, 1, "1.2.3.4:5"), (INBOUND, 1, '{"type": "x"}')]
+    assert records[0].t <= records[1].t
+    assert rec.dropped == 1
+
+    # A log cut off mid-record still reads up to the last complete frame
+    path.write_bytes(path.read_bytes()[:-3])
+    assert len(list(read_records(path))) == 1
+
+
+class _Listener:
+    serializer = JSON_SERIALIZER
+
+    def __init__(self, conn_id, behind):
+        self.conn_id = conn_id
+        self.behind = behind
+
+    def write_shared(self, shared):
+        return None if self.behind else True
+
+
+@pytest.mark.asyncio
+async def test_frames_dropped_for_backpressure_are_not_logged_as_sent(tmp_path):
+    path = tmp_path / "t.hmrec"
+    recorder = TrafficRecorder(path)
+    recorder.open()
+    server = NetworkServer(port=0, recorder=recorder)
+    await server.send_to([_Listener(1, behind=False), _Listener(2, behind=True)], {"type": "heartbeat", "payload": {}})
+    recorder.close()
+    assert [(r.kind, r.conn) for r in read_records(path)] == [(OUTBOUND, 1), (DROPPED, 2)]
+
+
+@pytest.mark.asyncio
+async def test_recorded_session_replays_against_another_host(tmp_path):
+    path = tmp_path / "session.hmrec"
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:", record_path=str(path))
+    task, port = await start_host(host)
+    client = HiveMindClient(host.session_manager.session_code, device_id="dev")
+    await client.connect("localhost", port)
+    for _ in range(10):
+        host.audio_capture.push_chunk(b"\xe8\x03" * 960 * 2)
+        await asyncio.sleep(0.02)
+    await client.disconnect()
+    await asyncio.sleep(0.05)
+    await host.stop()
+    await task
+
+    records = list(read_records(path))
+    kinds = {r.kind for r in records}
+    assert {CONNECT, INBOUND, OUTBOUND, CLOSE} <= kinds
+    out_types = [decode_frame(r.data).get("type") for r in records if r.kind == OUTBOUND]
+    assert out_types[:3] == ["join_challenge", "join_confirm", "join_accept"]
+    assert "audio_chunk" in out_types and "time_sync_response" in out_types
+
+    replay = _load_replay()
+    target = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                  profile_path=":memory:")
+    task, port = await start_host(target)
+    stats = await replay.replay_host(str(path), f"ws://localhost:{port}", speed=4.0, clones=3,
+                                     session_code=target.session_manager.session_code)
+    await target.stop()
+    await task
+
+    assert stats.errors == 0
+    assert sorted(target.session_manager.nodes) == ["dev-r0", "dev-r1", "dev-r2"]
+    assert len(stats.latency["join_request"]) == 3
+    assert len(stats.latency["time_sync_request"]) >= 3
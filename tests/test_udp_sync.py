@@ -0,0 +1,70 @@
+import asyncio
+import socket
+import sys
+
+import pytest
+
+from helpers import start_host
+from hivemind.common.protocol import SYNC_PACKET, pack_sync, unpack_sync
+from hivemind.config import SYNC_BURST
+from hivemind.host.clock_sync import HostClock
+from hivemind.host.udp_sync import UdpSyncResponder
+from hivemind.node.client import HiveMindClient
+from hivemind.node.time_sync_client import TimeSyncClient
+from host_main import HiveMindHostEnhanced
+
+
+def test_responder_answers_probes_on_the_host_time_base():
+    responder = UdpSyncResponder(HostClock(offset=100.0), host="127.0.0.1")
+    responder.start()
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(1.0)
+            address = ("127.0.0.1", responder.port)
+            sock.sendto(b"not a probe", address)
+            sock.sendto(pack_sync(1.5, 2.0, 3.0), address)  # an answer, not a request
+            sock.sendto(pack_sync(1.5), address)
+            answer = sock.recv(64)
+    finally:
+        responder.stop()
+
+    assert len(answer) == SYNC_PACKET.size
+    client_time, received, sent = unpack_sync(answer)
+    assert client_time == 1.5
+    assert received <= sent < received + 0.1
+    assert sent == pytest.approx(HostClock(offset=100.0)(), abs=1.0)
+    assert responder.answered == 1 and responder.dropped == 2
+    if sys.platform.startswith("linux"):
+        assert responder.kernel_timestamps
+
+
+def test_host_hold_time_is_not_round_trip():
+    now = [0.0]
+    sync = TimeSyncClient(clock=lambda: now[0])
+    # True offset is +5 s, 2 ms each way; the host held the probe for 30 ms
+    now[0] = 1.034
+    rtt = sync.handle_response(host_time=6.002, client_time=1.0, host_sent=6.032)
+    assert rtt == pytest.approx(0.004)
+    assert sync.offset == pytest.approx(5.0)
+
+
+@pytest.mark.asyncio
+async def test_node_syncs_over_udp_when_the_host_offers_it():
+    host = HiveMindHostEnhanced(port=0, enable_compression=False, enable_web_dashboard=False,
+                                profile_path=":memory:", udp_sync_port=0)
+    task, port = await start_host(host)
+    client = HiveMindClient(host.session_manager.session_code, device_id="dev")
+    await client.connect("localhost", port)
+    assert client.sync_address == ("127.0.0.1", host.udp_sync.port)
+
+    while client.udp_sync is None or client.udp_sync.answered < SYNC_BURST:
+        await asyncio.sleep(0.02)
+    assert host.udp_sync.answered == SYNC_BURST
+    # Probes skip the WebSocket and the handler queue, so the best sample is a tight one
+    assert client.time_sync.rtt < 0.005
+    assert abs(client.time_sync.offset) < 0.005
+
+    await client.disconnect()
+    assert client.udp_sync is None
+    await host.stop()
+    await task